@@ -0,0 +1,165 @@
+"""
+Memory admission control for the DataAnalysis app.
+Estimates the peak memory of an analysis from the schema recorded at upload
+time and only lets it run within the worker's memory budget: requests that
+cannot fit now wait for running ones, requests that can never fit are run on
+a row sample, and the rest are rejected instead of risking an OOM kill of
+the whole worker.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+NUMERIC_CELL_BYTES = 8
+STRING_CELL_BYTES = 64  # Python string object plus its pointer
+CSV_EXPANSION = 10  # Parsed bytes per CSV byte when the schema is unknown
+PARSE_OVERHEAD = 2  # read_csv peak relative to the parsed frame
+FIGURE_BYTES = 32 * 1024 * 1024  # Rendering and encoding one chart
+HEATMAP_CELL_BYTES = 200  # Drawn cell of the EDA missing-values heatmap
+MIN_SAMPLE_ROWS = 1000
+
+# Working memory of each operation, in copies of the parsed frame
+OPERATION_FACTORS = {
+    'table': 0,
+    'linear_regression': 1,
+    'clustering': 3,
+    'distribution': 1,
+    'statistics': 2,
+    'eda': 4,
+    'correlation': 2,
+    'scatter': 2,
+    'histogram': 1,
+    'boxplot': 1,
+    'categorical': 1,
+    'outliers': 3,
+    'timeseries': 1,
+}
+
+# Operations that produce charts
+PLOT_OPERATIONS = {'linear_regression', 'clustering', 'distribution', 'eda',
+                   'correlation', 'scatter', 'histogram', 'boxplot', 'categorical',
+                   'outliers', 'timeseries'}
+
+# Operations that may be degraded to a row sample
+SAMPLEABLE_OPERATIONS = set(OPERATION_FACTORS) - {'table'}
+
+_reserved = 0
+_condition = threading.Condition()
+
+
+class AdmissionError(Exception):
+    """Raised when an analysis cannot be run within the memory budget."""
+
+
+def _file_shape(uploaded_file):
+    """
+    Return (rows, bytes per row, columns) of a file from its upload schema,
+    or an estimate from the file size when there is none.
+    """
+    columns = (uploaded_file.schema or {}).get('columns') or []
+    if uploaded_file.row_count is None or not columns:
+        return 1, uploaded_file.file_size * CSV_EXPANSION, max(len(columns), 1)
+    numeric = sum(1 for column in columns if column.get('type') in ('integer', 'float', 'datetime'))
+    row_bytes = numeric * NUMERIC_CELL_BYTES + (len(columns) - numeric) * STRING_CELL_BYTES
+    return uploaded_file.row_count, row_bytes, len(columns)
+
+
+def _memory_cost(uploaded_file, operation):
+    """
+    Split the estimated peak memory of an operation into a fixed part and
+    a part proportional to the rows it processes.
+
+    Returns:
+        tuple: (fixed bytes, bytes per processed row, total rows)
+    """
+    rows, row_bytes, n_columns = _file_shape(uploaded_file)
+    fixed = rows * row_bytes * PARSE_OVERHEAD
+    if operation in PLOT_OPERATIONS:
+        fixed += FIGURE_BYTES
+    per_row = row_bytes * OPERATION_FACTORS.get(operation, 2)
+    if operation == 'eda':
+        per_row += n_columns * HEATMAP_CELL_BYTES
+    return fixed, per_row, rows
+
+
+def estimate_peak_memory(uploaded_file, operation, sample_rows=None):
+    """
+    Estimate the peak memory of running an operation on a file.
+
+    Args:
+        uploaded_file: UploadedFile instance
+        operation: Operation name
+        sample_rows: Row sample size (optional)
+
+    Returns:
+        int: Estimated bytes
+    """
+    fixed, per_row, rows = _memory_cost(uploaded_file, operation)
+    if sample_rows is not None:
+        rows = min(rows, sample_rows)
+    return int(fixed + per_row * rows)
+
+
+@contextmanager
+def admit(uploaded_file, operation, params):
+    """
+    Reserve memory for an analysis for the duration of the block.
+
+    An analysis estimated above the whole budget is degraded to the largest
+    row sample that fits (sampleable operations only, at least
+    MIN_SAMPLE_ROWS rows). An analysis that fits the budget but not what
+    running analyses left of it waits up to ADMISSION_QUEUE_TIMEOUT.
+
+    Args:
+        uploaded_file: UploadedFile instance
+        operation: Operation name
+        params: Normalized parameters
+
+    Yields:
+        dict: The parameters to run with, 'sample_rows' set when degraded
+
+    Raises:
+        AdmissionError: If the analysis cannot be admitted
+    """
+    global _reserved
+    budget = settings.ANALYSIS_MEMORY_BUDGET
+    estimate = estimate_peak_memory(uploaded_file, operation, params.get('sample_rows'))
+
+    if estimate > budget:
+        fixed, per_row, rows = _memory_cost(uploaded_file, operation)
+        sample_rows = int((budget - fixed) // per_row) if per_row else 0
+        if operation not in SAMPLEABLE_OPERATIONS or sample_rows < MIN_SAMPLE_ROWS:
+            raise AdmissionError(
+                f"This file is too large to run '{operation}' within the server's memory limits")
+        params = {**params, 'sample_rows': sample_rows}
+        estimate = estimate_peak_memory(uploaded_file, operation, sample_rows)
+
+    with _condition:
+        admitted = _condition.wait_for(lambda: _reserved + estimate <= budget,
+                                       timeout=settings.ADMISSION_QUEUE_TIMEOUT)
+        if not admitted:
+            raise AdmissionError("The server is busy, please try again shortly")
+        _reserved += estimate
+    try:
+        yield params
+    finally:
+        with _condition:
+            _reserved -= estimate
+            _condition.notify_all()
+
+
+def current_rss(pid=None):
+    """
+    Return the resident set size of a process (this one by default) in
+    bytes, or None where /proc is not available. (getrusage only reports
+    the peak size, which never goes down, so it is no substitute.)
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
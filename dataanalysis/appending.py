@@ -0,0 +1,238 @@
+"""
+Row appends for the DataAnalysis app.
+Adds the rows of an uploaded CSV chunk to an existing file: the rows are
+checked against the file's columns, the stored CSV and column store are
+extended, and the mergeable artifacts (column profile, co-moments, row
+index, time indexes) are updated from the new rows alone instead of being
+rebuilt. Stored gzip members are kept as they are, only the new rows are
+compressed. Results the new rows cannot affect are carried over; the others,
+like the remaining artifacts, are rebuilt on demand for the new content.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .datasets import (
+    COLUMN_STORE_NAME,
+    MOMENTS_NAME,
+    NO_ARTIFACT,
+    PROFILE_NAME,
+    SCHEMA_NAME,
+    artifact_key,
+    load_block_index,
+    load_dataframe,
+    load_row_index,
+    save_block_index,
+    save_row_index,
+)
+from .models import AnalysisResult
+from .results import carry_over_results
+from .singleflight import single_flight
+from .utils.analysis import load_csv
+from .utils.arrow_formats import format_of
+from .utils.columnar import MANIFEST_NAME, append_column_store, open_column_store
+from .utils.compression import (
+    STORAGE_COMPRESSION,
+    STORAGE_SUFFIX,
+    GzipBlockWriter,
+    compression_of,
+    open_csv,
+)
+from .utils.operations import profile_columns
+from .utils.paging import RecordScanner
+from .utils.parsing import append_column_types, conform_rows
+from .utils.profiling import build_column_profile, merge_column_profiles, update_moments
+
+
+COPY_BLOCK_SIZE = 1024 * 1024
+
+
+def read_appended_rows(uploaded_file, df, chunk):
+    """
+    Parse the data rows of an uploaded chunk as rows of a file.
+
+    Args:
+        uploaded_file: UploadedFile instance the rows are appended to
+        df: Its DataFrame, as returned by load_dataframe
+        chunk: Uploaded CSV returned by CSVInspectingUploadHandler
+
+    Returns:
+        pandas.DataFrame: The rows, conformed to df (see parsing.conform_rows)
+    """
+    sep = uploaded_file.csv_read_options().get('sep', ',')
+    if chunk.csv_schema['delimiter'] != sep:
+        raise ValueError(f"The rows must be delimited by '{sep}', like the file they are appended to")
+    rows = load_csv(chunk.temporary_file_path(), sep=sep, encoding=chunk.csv_schema['encoding'],
+                    column_types=append_column_types(df), engine=settings.CSV_PARSE_ENGINE,
+                    compression=STORAGE_COMPRESSION)
+    return conform_rows(df, rows)
+
+
+def _write_combined(uploaded_file, data):
+    """
+    Write a file's CSV followed by appended data rows to a temporary
+    gzip-compressed file next to it, hashing the uncompressed result.
+
+    The gzip members of a compressed file are copied as they are and only
+    decompressed for hashing; a plain file is compressed whole.
+
+    Returns:
+        tuple: (temporary path, SHA-256 of the content, uncompressed offset of
+        the first appended row, block index of the temporary file)
+    """
+    path = uploaded_file.file.path
+    compressed = compression_of(path) == STORAGE_COMPRESSION
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            blocks = []
+            writer = None
+            if compressed:
+                blocks = load_block_index(uploaded_file).tolist()
+                with open(path, 'rb') as f:
+                    shutil.copyfileobj(f, out, COPY_BLOCK_SIZE)
+            else:
+                writer = GzipBlockWriter(out)
+            size = 0
+            last = b''
+            with open_csv(path) as f:
+                for block in iter(lambda: f.read(COPY_BLOCK_SIZE), b''):
+                    digest.update(block)
+                    if writer is not None:
+                        writer.write(block)
+                    size += len(block)
+                    last = block[-1:]
+            if writer is None:
+                writer = GzipBlockWriter(out, offset=size)  # New members follow the copied ones
+            if last not in (b'\n', b''):
+                writer.write(b'\n')
+                digest.update(b'\n')
+            start = writer.size
+            writer.write(data)
+            digest.update(data)
+            writer.close()
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), start, blocks + writer.blocks
+
+
+def _extend_row_index(uploaded_file, data, start, row_count):
+    """Row-offset index of the combined CSV: the file's index plus a scan of the appended bytes."""
+    offsets = load_row_index(uploaded_file)
+    # Resume after the header and existing rows, each ended by a newline
+    scanner = RecordScanner(newlines=uploaded_file.row_count + 1, position=start)
+    scanner.feed(data)
+    appended = scanner.offsets
+    if uploaded_file.row_count % scanner.stride == 0:
+        # The first appended row starts after the file's last newline, which
+        # the scan of the appended bytes does not see
+        appended = [start] + appended
+    appended = np.asarray(appended, dtype=np.int64)
+    return np.concatenate([offsets, appended])[:-(-row_count // scanner.stride)]
+
+
+def _merge_artifacts(previous_hash, content_hash, df, rows):
+    """Derive the new content's schema, profile and co-moments from the previous ones and the rows."""
+    cache = caches[settings.RESULT_CACHE_ALIAS]
+    cache.set(artifact_key(SCHEMA_NAME, content_hash), profile_columns(df))
+    profile = cache.get(artifact_key(PROFILE_NAME, previous_hash))
+    if profile is not None:
+        cache.set(artifact_key(PROFILE_NAME, content_hash),
+                  merge_column_profiles(profile, build_column_profile(rows)))
+    moments = cache.get(artifact_key(MOMENTS_NAME, previous_hash))
+    if moments == NO_ARTIFACT:
+        cache.set(artifact_key(MOMENTS_NAME, content_hash), NO_ARTIFACT)  # Same columns, still too many
+    elif moments is not None:
+        cache.set(artifact_key(MOMENTS_NAME, content_hash), update_moments(moments, rows))
+
+
+def append_rows(uploaded_file, chunk):
+    """
+    Append the rows of an uploaded CSV chunk to a file.
+
+    The chunk must have the file's columns, in order, with values of the
+    same types. Both must be CSV files. The file then points at the
+    combined content, under its new content hash; other uploads sharing
+    the previous content keep it.
+
+    Args:
+        uploaded_file: UploadedFile instance (updated in place)
+        chunk: Uploaded CSV returned by CSVInspectingUploadHandler
+
+    Returns:
+        dict: Rows appended, total rows and number of results carried over
+
+    Raises:
+        ValueError: If the chunk does not fit the file
+    """
+    if not uploaded_file.content_hash:
+        raise ValueError("Rows can only be appended to files uploaded with a content hash")
+    if format_of(uploaded_file.file.name) is not None or chunk.csv_schema.get('format'):
+        raise ValueError("Rows can only be appended from and to CSV files")
+    if not chunk.row_count:
+        raise ValueError("The uploaded file has no rows to append")
+
+    with single_flight(f'append-{uploaded_file.pk}'):
+        uploaded_file.refresh_from_db()
+        previous_hash = uploaded_file.content_hash
+        df = load_dataframe(uploaded_file)
+        rows = read_appended_rows(uploaded_file, df, chunk)
+
+        # Skip the header
+        with open_csv(chunk.temporary_file_path(), chunk.row_offsets[0],
+                      compression=STORAGE_COMPRESSION) as f:
+            data = f.read()
+        encoding = uploaded_file.schema.get('encoding') or 'utf-8'
+        if chunk.csv_schema['encoding'] != encoding:
+            data = data.decode(chunk.csv_schema['encoding']).encode(encoding)
+        tmp_path, content_hash, start, blocks = _write_combined(uploaded_file, data)
+
+        storage = uploaded_file.file.storage
+        name = os.path.join(os.path.dirname(uploaded_file.file.name), f'{content_hash}{STORAGE_SUFFIX}')
+        if storage.exists(name):
+            os.remove(tmp_path)  # Identical content was uploaded before
+            blocks = None  # The existing file's members may be laid out differently
+        else:
+            os.replace(tmp_path, storage.path(name))
+
+        row_count = None
+        offsets = None
+        if uploaded_file.row_count is not None:
+            row_count = uploaded_file.row_count + chunk.row_count
+            offsets = _extend_row_index(uploaded_file, data, start, row_count)
+
+        store_path = os.path.join(os.path.dirname(uploaded_file.cache_dir), content_hash, COLUMN_STORE_NAME)
+        if not os.path.exists(os.path.join(store_path, MANIFEST_NAME)):
+            append_column_store(os.path.join(uploaded_file.cache_dir, COLUMN_STORE_NAME), rows, store_path)
+        _merge_artifacts(previous_hash, content_hash, open_column_store(store_path), rows)
+        carried = carry_over_results(previous_hash, content_hash, rows)
+
+        with transaction.atomic():
+            uploaded_file.release_content()
+            uploaded_file.file = name
+            uploaded_file.content_hash = content_hash
+            uploaded_file.file_size = start + len(data)
+            uploaded_file.row_count = row_count
+            uploaded_file.save()
+            for result in carried:
+                result.uploaded_file = uploaded_file
+            AnalysisResult.objects.bulk_create(carried)
+        if offsets is not None:
+            save_row_index(uploaded_file, offsets)
+        if blocks is not None:
+            save_block_index(uploaded_file, blocks)
+
+    return {
+        'rows_appended': len(rows),
+        'row_count': row_count if row_count is not None else len(df) + len(rows),
+        'results_carried_over': len(carried),
+    }
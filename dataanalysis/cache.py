@@ -0,0 +1,234 @@
+"""
+Shared disk cache for the DataAnalysis app.
+A Django cache backend storing pickled values as files on the media volume,
+indexed by a SQLite database, so every worker process and every container
+mounting the same volume shares one cache. Entries are evicted least
+recently used first once the cache exceeds its size or entry limits.
+
+Configured in settings.CACHES; any other Django cache backend (e.g.
+django.core.cache.backends.redis.RedisCache) can be used in its place.
+"""
+
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+INDEX_NAME = 'index.sqlite3'
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024  # Bytes of pickled values
+CULL_TARGET = 0.9  # Culling frees space down to this fraction of the limits
+
+# Per-thread SQLite connections to the indexes, reused across requests
+_local = threading.local()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    file TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+"""
+
+
+class DiskCache(BaseCache):
+    """
+    Process-safe, size-bounded file cache with a SQLite index.
+
+    Values are written to uniquely named files through a temporary sibling
+    and only then published in the index, so readers never see partial
+    values. The index runs in WAL mode and is shared by all processes; each
+    thread keeps its own connection to it.
+
+    OPTIONS:
+        MAX_SIZE: Maximum total size of the stored values, in bytes
+        MAX_ENTRIES: Maximum number of entries (Django's usual option)
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._dir = os.path.abspath(location)
+        self._max_size = int(options.get('MAX_SIZE', DEFAULT_MAX_SIZE))
+
+    # Storage ------------------------------------------------------------
+
+    def _db(self):
+        # Cache instances are shared by a request and the threads it hands
+        # work to, so index connections belong to threads, not instances
+        connections = getattr(_local, 'connections', None)
+        if connections is None or _local.pid != os.getpid():
+            connections = _local.connections = {}
+            _local.pid = os.getpid()
+        connection = connections.get(self._dir)
+        if connection is None:
+            os.makedirs(self._dir, exist_ok=True)
+            connection = sqlite3.connect(os.path.join(self._dir, INDEX_NAME),
+                                         timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(_SCHEMA)
+            connections[self._dir] = connection
+        return connection
+
+    def _path(self, file_name):
+        return os.path.join(self._dir, file_name[:2], file_name)
+
+    def _write_value(self, value):
+        """Pickle a value into a new file; return its name and size."""
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        file_name = uuid.uuid4().hex
+        path = self._path(file_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return file_name, len(data)
+
+    def _remove_files(self, file_names):
+        for file_name in file_names:
+            try:
+                os.remove(self._path(file_name))
+            except FileNotFoundError:
+                pass
+
+    def _store(self, key, value, timeout, only_if_missing=False):
+        file_name, size = self._write_value(value)
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute('SELECT file, expires FROM entries WHERE key = ?', (key,)).fetchone()
+            if row and only_if_missing and (row[1] is None or row[1] > now):
+                db.execute('ROLLBACK')
+                self._remove_files([file_name])
+                return False
+            db.execute('INSERT OR REPLACE INTO entries (key, file, size, expires, accessed) '
+                       'VALUES (?, ?, ?, ?, ?)', (key, file_name, size, expires, now))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            self._remove_files([file_name])
+            raise
+        if row:
+            self._remove_files([row[0]])
+        self._cull()
+        return True
+
+    def _cull(self):
+        """Drop expired entries, then least recently used ones while over the limits."""
+        db = self._db()
+        count, size = db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        if count <= self._max_entries and size <= self._max_size:
+            return
+
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            victims = db.execute('SELECT key, file, size FROM entries '
+                                 'WHERE expires IS NOT NULL AND expires <= ?', (time.time(),)).fetchall()
+            count -= len(victims)
+            size -= sum(victim[2] for victim in victims)
+            excess_count = count - int(self._max_entries * CULL_TARGET)
+            excess_size = size - int(self._max_size * CULL_TARGET)
+            if excess_count > 0 or excess_size > 0:
+                expired = {victim[0] for victim in victims}
+                for victim in db.execute('SELECT key, file, size FROM entries ORDER BY accessed'):
+                    if excess_count <= 0 and excess_size <= 0:
+                        break
+                    if victim[0] in expired:
+                        continue
+                    victims.append(victim)
+                    excess_count -= 1
+                    excess_size -= victim[2]
+            db.executemany('DELETE FROM entries WHERE key = ?', [(victim[0],) for victim in victims])
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        self._remove_files([victim[1] for victim in victims])
+
+    # Django cache API ---------------------------------------------------
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._store(key, value, timeout, only_if_missing=True)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db = self._db()
+        row = db.execute('SELECT file, expires FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return default
+        file_name, expires = row
+        if expires is not None and expires <= time.time():
+            self._delete(key)
+            return default
+        try:
+            with open(self._path(file_name), 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return default  # Replaced or evicted by another process meanwhile
+        db.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._store(key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._db().execute(
+            'UPDATE entries SET expires = ?, accessed = ? WHERE key = ?',
+            (self.get_backend_timeout(timeout), time.time(), key))
+        return cursor.rowcount > 0
+
+    def _delete(self, key):
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute('SELECT file FROM entries WHERE key = ?', (key,)).fetchone()
+            if row:
+                db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        if row:
+            self._remove_files([row[0]])
+        return row is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._delete(key)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._db().execute('SELECT expires FROM entries WHERE key = ?', (key,)).fetchone()
+        return row is not None and (row[0] is None or row[0] > time.time())
+
+    def clear(self):
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            files = [row[0] for row in db.execute('SELECT file FROM entries')]
+            db.execute('DELETE FROM entries')
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        self._remove_files(files)
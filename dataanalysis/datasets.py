@@ -0,0 +1,565 @@
+"""
+Dataset access for the DataAnalysis app.
+Loads the data behind an UploadedFile using what was learned at upload time,
+keeping one parsed copy per distinct file content. Files the data is read
+from (column store, row and block indexes) live in the file's cache
+directory; smaller derived artifacts (profiles, zone maps, fitted models) go
+to the shared result cache. Parquet and Arrow IPC files are read through
+pyarrow instead of being parsed, and views reading a few columns or
+filtered rows of them read only those until the column store is built.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import UploadedFile
+from .singleflight import single_flight
+from .utils.analysis import (
+    load_csv,
+    clustering_columns,
+    fit_clusters,
+    fit_projection,
+    get_datetime_columns,
+    select_numeric_columns,
+    wants_projection,
+)
+from .utils.paging import (
+    build_row_index,
+    read_csv_columns,
+    read_csv_rows,
+    page_dataframe,
+    rows_to_json,
+)
+from .utils.arrow_formats import format_of, read_frame, read_rows, schema_profile
+from .utils.compression import STORAGE_COMPRESSION, STORAGE_SUFFIX, compression_of, gzip_block_index
+from .utils.columnar import (
+    MANIFEST_NAME,
+    build_time_index,
+    open_column_store,
+    open_time_index,
+    write_column_store,
+)
+from .utils.query import apply_filters, build_zone_maps, parse_filter_spec
+from .utils.profiling import build_column_profile, build_moments
+from .utils.outliers import fit_outlier_model
+from .utils.operations import profile_columns
+from .utils.parsing import DATETIME_TYPE, parse_datetimes
+from .utils.timeseries import time_values
+
+
+COLUMN_STORE_NAME = 'columns'
+ROW_INDEX_NAME = 'row_index.npy'
+BLOCK_INDEX_NAME = 'blocks.npy'
+ZONE_MAPS_NAME = 'zone_maps'
+PROFILE_NAME = 'profile'
+PROJECTION_NAME = 'projection'
+CLUSTER_MODEL_NAME = 'cluster-model'
+OUTLIER_MODEL_NAME = 'outlier-model'
+MOMENTS_NAME = 'moments'
+SCHEMA_NAME = 'schema'
+
+# Cached in place of an artifact built as None, which a cache miss
+# could not be told from
+NO_ARTIFACT = 'no-artifact'
+
+
+def _write_atomic(path, write):
+    """Write a file through a temporary sibling so readers never see partial data."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _parse_csv(uploaded_file):
+    """Parse an uploaded file with the configured engine and its upload-time column types."""
+    return load_csv(uploaded_file.file.path, column_types=uploaded_file.csv_column_types(),
+                    engine=settings.CSV_PARSE_ENGINE, **uploaded_file.csv_read_options())
+
+
+def _read_file(uploaded_file):
+    """Read an uploaded file: Parquet and Arrow IPC files through pyarrow, CSV files parsed."""
+    file_format = format_of(uploaded_file.file.name)
+    if file_format is not None:
+        return read_frame(uploaded_file.file.path, file_format)
+    return _parse_csv(uploaded_file)
+
+
+def load_dataframe(uploaded_file):
+    """
+    Load an uploaded file into a pandas DataFrame.
+
+    Files with a content hash are parsed once into a column store next to
+    the other derived artifacts, shared by every upload with the same
+    content. Its numeric columns are memory-mapped, so worker processes
+    share them through the page cache instead of each holding a copy.
+
+    Args:
+        uploaded_file: UploadedFile instance
+
+    Returns:
+        pandas.DataFrame: Loaded data (numeric columns are read-only)
+    """
+    if not uploaded_file.content_hash:
+        return _read_file(uploaded_file)
+
+    store_path = os.path.join(uploaded_file.cache_dir, COLUMN_STORE_NAME)
+    try:
+        df = open_column_store(store_path)
+    except Exception:
+        df = None  # Corrupt or incompatible store, parse again
+    if df is not None:
+        return df
+
+    with single_flight(f'{COLUMN_STORE_NAME}-{uploaded_file.content_hash}'):
+        df = open_column_store(store_path)  # Built while waiting for the lock
+        if df is not None:
+            return df
+        df = _read_file(uploaded_file)
+        if os.path.exists(store_path):
+            shutil.rmtree(store_path, ignore_errors=True)
+        write_column_store(df, store_path)
+        return open_column_store(store_path)
+
+
+def _save_index(path, values):
+    """Store an integer index array unless it exists already."""
+    if os.path.exists(path):
+        return
+
+    def write(tmp_path):
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.asarray(values, dtype=np.int64))
+
+    _write_atomic(path, write)
+
+
+def save_row_index(uploaded_file, row_offsets):
+    """Store the row-offset index computed while the file was uploaded."""
+    _save_index(os.path.join(uploaded_file.cache_dir, ROW_INDEX_NAME), row_offsets)
+
+
+def load_row_index(uploaded_file):
+    """
+    Return the row-offset index of an uploaded file, building it if missing.
+
+    Args:
+        uploaded_file: UploadedFile instance
+
+    Returns:
+        numpy.ndarray or None: Byte offsets of every ROW_INDEX_STRIDE-th row,
+        None for files without a content hash
+    """
+    if not uploaded_file.content_hash:
+        return None
+    path = os.path.join(uploaded_file.cache_dir, ROW_INDEX_NAME)
+    if os.path.exists(path):
+        return np.load(path)
+    offsets = build_row_index(uploaded_file.file.path)
+    save_row_index(uploaded_file, offsets)
+    return offsets
+
+
+def save_block_index(uploaded_file, blocks):
+    """Store the block index of a compressed file, recorded while it was written."""
+    _save_index(os.path.join(uploaded_file.cache_dir, BLOCK_INDEX_NAME),
+                np.asarray(blocks, dtype=np.int64).reshape(-1, 2))
+
+
+def load_block_index(uploaded_file):
+    """
+    Return the block index of a gzip-compressed uploaded file, building it if missing.
+
+    Args:
+        uploaded_file: UploadedFile instance
+
+    Returns:
+        numpy.ndarray or None: See utils.compression.gzip_block_index, None
+        for plain files and files without a content hash
+    """
+    if not uploaded_file.content_hash or compression_of(uploaded_file.file.name) != STORAGE_COMPRESSION:
+        return None
+    path = os.path.join(uploaded_file.cache_dir, BLOCK_INDEX_NAME)
+    if os.path.exists(path):
+        return np.load(path)
+    blocks = gzip_block_index(uploaded_file.file.path)
+    save_block_index(uploaded_file, blocks)
+    return blocks
+
+
+def save_upload(csv_file):
+    """
+    Create the UploadedFile of a file returned by CSVInspectingUploadHandler.
+
+    Identical content is stored once: the model points at the stored file
+    of an earlier upload with the same content hash when there is one. The
+    indexes recorded while the file was received are saved with it.
+
+    Args:
+        csv_file: Uploaded file, with the attributes the handler attaches
+
+    Returns:
+        UploadedFile: The saved instance
+    """
+    content_hash = getattr(csv_file, 'content_hash', '')
+    uploaded_file = UploadedFile(
+        file=csv_file,
+        original_filename=csv_file.name,
+        file_size=getattr(csv_file, 'data_size', csv_file.size),
+        content_hash=content_hash,
+        row_count=getattr(csv_file, 'row_count', None),
+        schema=getattr(csv_file, 'csv_schema', {}),
+    )
+
+    existing = None
+    if content_hash:
+        existing = UploadedFile.objects.filter(content_hash=content_hash).exclude(file='').first()
+        csv_file.name = f"{content_hash}{getattr(csv_file, 'storage_suffix', STORAGE_SUFFIX)}"
+    if existing is not None and existing.file.storage.exists(existing.file.name):
+        uploaded_file.file = existing.file.name
+    uploaded_file.save()
+
+    if content_hash and getattr(csv_file, 'row_offsets', None) is not None:
+        save_row_index(uploaded_file, csv_file.row_offsets)
+    if existing is None and getattr(csv_file, 'block_offsets', None) is not None:
+        save_block_index(uploaded_file, csv_file.block_offsets)
+    return uploaded_file
+
+
+def artifact_key(name, content_hash):
+    """Key of a derived artifact of some file content in the shared result cache."""
+    return f'{name}:{content_hash}'
+
+
+def _load_or_build(uploaded_file, name, build):
+    """
+    Fetch a derived artifact from the shared result cache, building it on a
+    miss. Artifacts built as None (skipped, e.g. co-moments of too many
+    columns) are cached as NO_ARTIFACT, so they are not rebuilt every time.
+    """
+    cache = caches[settings.RESULT_CACHE_ALIAS]
+    key = artifact_key(name, uploaded_file.content_hash)
+    artifact = cache.get(key)
+    if artifact is None:
+        artifact = build()
+        cache.set(key, NO_ARTIFACT if artifact is None else artifact)
+    elif isinstance(artifact, str) and artifact == NO_ARTIFACT:
+        return None
+    return artifact
+
+
+def load_column_schema(uploaded_file, df=None):
+    """
+    Return the column names and kinds of a file, without loading it on a
+    cache hit. Those of Parquet and Arrow IPC files come from their
+    metadata, with per-column missing counts and ranges.
+
+    Args:
+        uploaded_file: UploadedFile instance
+        df: The file's DataFrame (optional, loaded on a cache miss)
+
+    Returns:
+        dict: Shape plus numeric, categorical and all column names
+        (see utils.operations.profile_columns and
+        utils.arrow_formats.schema_profile)
+    """
+    def build():
+        if format_of(uploaded_file.file.name) is not None:
+            return schema_profile(uploaded_file.schema)
+        return profile_columns(load_dataframe(uploaded_file) if df is None else df)
+
+    if not uploaded_file.content_hash:
+        return build()
+    return _load_or_build(uploaded_file, SCHEMA_NAME, build)
+
+
+def load_column_profile(uploaded_file, df):
+    """
+    Return the column profile (numeric sketches and box statistics,
+    categorical frequency sketches) of a file, building it if missing.
+
+    Args:
+        uploaded_file: UploadedFile instance
+        df: The file's DataFrame, as returned by load_dataframe
+
+    Returns:
+        dict: Profile (see utils.profiling.build_column_profile)
+    """
+    if not uploaded_file.content_hash:
+        return build_column_profile(df)
+    return _load_or_build(uploaded_file, PROFILE_NAME, lambda: build_column_profile(df))
+
+
+def load_moments(uploaded_file, df):
+    """
+    Return the co-moments of the numeric columns of a file, building them
+    if missing.
+
+    Args:
+        uploaded_file: UploadedFile instance
+        df: The file's DataFrame, as returned by load_dataframe
+
+    Returns:
+        dict or None: Co-moments (see utils.profiling.build_moments), None
+        for files with too many numeric columns
+    """
+    if not uploaded_file.content_hash:
+        return build_moments(df)
+    return _load_or_build(uploaded_file, MOMENTS_NAME, lambda: build_moments(df))
+
+
+def load_projection(uploaded_file, df, params):
+    """
+    Return the fitted principal component projection a clustering request
+    runs on, fitting it on the first request for its columns.
+
+    Args:
+        uploaded_file: UploadedFile instance
+        df: The file's DataFrame, as returned by load_dataframe
+        params: Normalized clustering parameters
+
+    Returns:
+        dict or None: Projection (see utils.analysis.fit_projection), None
+        when the request clusters on the raw columns
+    """
+    columns = clustering_columns(df, params['columns'])
+    if not wants_projection(columns, params['reduce']):
+        return None
+    if not uploaded_file.content_hash:
+        return fit_projection(df, columns)
+    digest = hashlib.sha256(json.dumps(columns).encode('utf-8')).hexdigest()[:16]
+    return _load_or_build(uploaded_file, f'{PROJECTION_NAME}-{digest}',
+                          lambda: fit_projection(df, columns))
+
+
+def _params_digest(params, names):
+    """Short digest of some parameters, naming the artifacts fitted with them."""
+    values = json.dumps({name: params[name] for name in names}, sort_keys=True, default=str)
+    return hashlib.sha256(values.encode('utf-8')).hexdigest()[:16]
+
+
+def _filtered(uploaded_file, df, filters, columns):
+    """The rows of some columns a filter spec selects, skipping chunks by zone map."""
+    columns = list(dict.fromkeys(columns + [predicate['column'] for predicate in filters]))
+    return apply_filters(df[columns], filters, load_zone_maps(uploaded_file, df))
+
+
+def load_cluster_model(uploaded_file, df, params):
+    """
+    Return the fitted clustering of a clustering request (see
+    utils.analysis.fit_clusters), fitting it on the first request for its
+    parameters. Filtered requests are fitted on the rows they select.
+
+    Args:
+        uploaded_file: UploadedFile instance
+        df: The file's DataFrame, as returned by load_dataframe
+        params: Normalized clustering parameters
+
+    Returns:
+        dict: Fitted clustering model
+    """
+    columns = clustering_columns(df, params['columns'])
+
+    def build():
+        if params['filters']:
+            return fit_clusters(_filtered(uploaded_file, df, params['filters'], columns), params['n_clusters'],
+                                columns, params['reduce'], params['n_components'])
+        return fit_clusters(df, params['n_clusters'], columns, params['reduce'], params['n_components'],
+                            projection=load_projection(uploaded_file, df, params))
+
+    if not uploaded_file.content_hash:
+        return build()
+    digest = _params_digest({**params, 'columns': columns},
+                            ('columns', 'n_clusters', 'reduce', 'n_components', 'filters'))
+    return _load_or_build(uploaded_file, f'{CLUSTER_MODEL_NAME}-{digest}', build)
+
+
+def load_outlier_model(uploaded_file, df, params):
+    """
+    Return the fitted outlier model of an outlier request (see
+    utils.outliers.fit_outlier_model), fitting it on the first request for
+    its parameters. Filtered requests are fitted on the rows they select.
+
+    Args:
+        uploaded_file: UploadedFile instance
+        df: The file's DataFrame, as returned by load_dataframe
+        params: Normalized outlier parameters
+
+    Returns:
+        dict: Fitted outlier model
+    """
+    columns = select_numeric_columns(df, params['columns'], analysis='outlier detection')
+
+    def build():
+        data = df
+        if params['filters']:
+            data = _filtered(uploaded_file, df, params['filters'], columns)
+        return fit_outlier_model(data, columns, params['method'], params['threshold'], params['contamination'])
+
+    if not uploaded_file.content_hash:
+        return build()
+    digest = _params_digest({**params, 'columns': columns},
+                            ('columns', 'method', 'threshold', 'contamination', 'filters'))
+    return _load_or_build(uploaded_file, f'{OUTLIER_MODEL_NAME}-{digest}', build)
+
+
+def load_time_index(uploaded_file, df, params):
+    """
+    Return the sorted time index a time-series request selects its range
+    from: memory-mapped from the column store when it has one for the
+    column, built in memory otherwise.
+
+    Args:
+        uploaded_file: UploadedFile instance
+        df: The file's DataFrame, as returned by load_dataframe
+        params: Normalized time-series parameters
+
+    Returns:
+        tuple or None: (sorted timestamps, row positions), see
+        utils.columnar.build_time_index; None when the file has no such
+        datetime column
+    """
+    datetime_cols = get_datetime_columns(df)
+    name = params['time_column'] or (datetime_cols[0] if datetime_cols else None)
+    if name not in datetime_cols:
+        return None
+    if uploaded_file.content_hash:
+        index = open_time_index(os.path.join(uploaded_file.cache_dir, COLUMN_STORE_NAME), name)
+        if index is not None:
+            return index
+    return build_time_index(time_values(df[name]))
+
+
+def load_zone_maps(uploaded_file, df):
+    """
+    Return the per-chunk min/max zone maps of a file, building them if missing.
+
+    Args:
+        uploaded_file: UploadedFile instance
+        df: The file's DataFrame, as returned by load_dataframe
+
+    Returns:
+        dict or None: Zone maps (see utils.query.build_zone_maps), None for
+        files without a content hash
+    """
+    if not uploaded_file.content_hash:
+        return None
+    return _load_or_build(uploaded_file, ZONE_MAPS_NAME, lambda: build_zone_maps(df))
+
+
+def load_filtered_columns(uploaded_file, columns=None, filters=None):
+    """
+    Return the rows of a file matching a filter spec, restricted to some
+    columns.
+
+    Once the column store is built the rows come from it, skipping chunks
+    through the zone maps. Before that, Parquet and Arrow IPC files are read
+    with column projection and predicate pushdown, decoding only the needed
+    columns and, for Parquet, the row groups whose statistics the filters
+    do not rule out.
+
+    Args:
+        uploaded_file: UploadedFile instance
+        columns: Columns to return (optional, all by default)
+        filters: Filter spec, see utils.query (optional)
+
+    Returns:
+        pandas.DataFrame: Matching rows
+    """
+    predicates = parse_filter_spec(filters)
+    file_format = format_of(uploaded_file.file.name)
+    store_path = os.path.join(uploaded_file.cache_dir, COLUMN_STORE_NAME)
+    if file_format is None or not uploaded_file.content_hash or os.path.exists(
+            os.path.join(store_path, MANIFEST_NAME)):
+        df = load_dataframe(uploaded_file)
+        names = df.columns.tolist()
+    else:
+        names = [column['name'] for column in uploaded_file.schema['columns']]
+        df = None
+    wanted = names if columns is None else list(columns)
+    for name in wanted:
+        if name not in names:
+            raise ValueError(f"Unknown column: {name}")
+
+    if df is not None:
+        if predicates:
+            df = apply_filters(df, predicates, load_zone_maps(uploaded_file, df))
+        return df[wanted]
+    filtered = {predicate['column'] for predicate in predicates or []}
+    read = [name for name in names if name in wanted or name in filtered]
+    df = read_frame(uploaded_file.file.path, file_format, columns=read, predicates=predicates)
+    return apply_filters(df, predicates)[wanted]
+
+
+def get_table_page(uploaded_file, offset=0, limit=50, col_offset=0, col_limit=20,
+                   sort_by=None, descending=False, filters=None):
+    """
+    Return a window of rows and columns of an uploaded file as compact JSON.
+
+    Plain pages are read straight from the CSV through the row-offset index
+    (and the block index of compressed files), or from the row groups of
+    Parquet and Arrow IPC files holding them, so later pages cost the same
+    as the first one. Sorted or filtered pages are sliced from the (cached)
+    parsed DataFrame, see load_filtered_columns.
+
+    Args:
+        uploaded_file: UploadedFile instance
+        offset, limit: Row window
+        col_offset, col_limit: Column window
+        sort_by: Column to sort by (optional)
+        descending: Sort order
+        filters: Filter spec, see utils.query (optional)
+
+    Returns:
+        dict: Column names, rows and totals of the page
+    """
+    row_index = None
+    file_format = format_of(uploaded_file.file.name)
+    if not sort_by and not filters and uploaded_file.row_count is not None and file_format is None:
+        row_index = load_row_index(uploaded_file)
+
+    if file_format is not None and not sort_by and not filters:
+        columns = [column['name'] for column in uploaded_file.schema['columns']]
+        total_rows = uploaded_file.row_count
+        page = read_rows(uploaded_file.file.path, file_format, uploaded_file.schema['row_groups'],
+                         offset, limit, columns[col_offset:col_offset + col_limit])
+    elif row_index is not None:
+        options = uploaded_file.csv_read_options()
+        columns = read_csv_columns(uploaded_file.file.path, **options)
+        total_rows = uploaded_file.row_count
+        page = read_csv_rows(uploaded_file.file.path, row_index, offset, limit, columns,
+                             blocks=load_block_index(uploaded_file), **options)
+        # Dates as the parsed file has them, so every path formats them alike
+        dates = [name for name, kind in uploaded_file.csv_column_types().items()
+                 if kind == DATETIME_TYPE]
+        page = parse_datetimes(page, dates)
+    else:
+        df = load_filtered_columns(uploaded_file, filters=filters)
+        columns = df.columns.tolist()
+        total_rows = len(df)
+        page = page_dataframe(df, offset, limit, sort_by, descending)
+
+    window = columns[col_offset:col_offset + col_limit]
+    return {
+        'columns': window,
+        'rows': rows_to_json(page[window]),
+        'offset': offset,
+        'limit': limit,
+        'total_rows': int(total_rows),
+        'total_columns': len(columns),
+        'col_offset': col_offset,
+    }
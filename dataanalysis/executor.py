@@ -0,0 +1,122 @@
+"""
+Analysis executor for the DataAnalysis app.
+Async views hand CPU-bound work (parsing, analyses, chart rendering) to a
+bounded thread pool, keeping the event loop free for cheap requests. When
+the pool and its queue are full, new work is refused at once instead of
+piling up behind the running jobs. Streamed responses produce each piece
+on the executor as well.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+
+STREAM_RETRY_DELAY = 0.1  # Seconds between attempts to produce a piece while busy
+
+_executor = None
+_in_flight = 0
+_lock = threading.Lock()
+
+
+class ExecutorBusy(Exception):
+    """Raised when the analysis executor has no room for more work."""
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.ANALYSIS_EXECUTOR_WORKERS,
+                                       thread_name_prefix='analysis')
+    return _executor
+
+
+def _call(func, args, kwargs):
+    # Pool threads outlive requests: apply the request cycle's connection handling
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_cpu_bound(func, *args, **kwargs):
+    """
+    Run a blocking function on the analysis executor and await its result.
+
+    Args:
+        func: Callable to run
+        *args, **kwargs: Its arguments
+
+    Returns:
+        The function's return value
+
+    Raises:
+        ExecutorBusy: If ANALYSIS_EXECUTOR_WORKERS jobs are running and
+            ANALYSIS_EXECUTOR_QUEUE more are already waiting
+    """
+    global _in_flight
+    with _lock:
+        if _in_flight >= settings.ANALYSIS_EXECUTOR_WORKERS + settings.ANALYSIS_EXECUTOR_QUEUE:
+            raise ExecutorBusy("The server is busy, please try again shortly")
+        _in_flight += 1
+    try:
+        return await sync_to_async(_call, thread_sensitive=False,
+                                   executor=_get_executor())(func, args, kwargs)
+    finally:
+        with _lock:
+            _in_flight -= 1
+
+
+async def iterate_cpu_bound(iterable):
+    """
+    Iterate a blocking iterable on the analysis executor, for streamed
+    responses: each item is produced by run_cpu_bound.
+
+    Once a response has started it can no longer be refused, so an item
+    that finds the executor full waits for room instead of failing.
+
+    Args:
+        iterable: Iterable whose items are expensive to produce (e.g. a
+            generator encoding export chunks)
+
+    Yields:
+        Its items
+    """
+    iterator = iter(iterable)
+    done = object()
+    try:
+        while True:
+            try:
+                item = await run_cpu_bound(next, iterator, done)
+            except ExecutorBusy:
+                await asyncio.sleep(STREAM_RETRY_DELAY)
+                continue
+            if item is done:
+                return
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            try:
+                close()
+            except ValueError:
+                pass  # Still producing an item on the executor (client went away)
+
+
+def executor_status():
+    """
+    Return the load of the analysis executor.
+
+    Returns:
+        dict: Worker count, jobs running or queued, and the queue limit
+    """
+    return {
+        'workers': settings.ANALYSIS_EXECUTOR_WORKERS,
+        'in_flight': _in_flight,
+        'queue_limit': settings.ANALYSIS_EXECUTOR_QUEUE,
+    }
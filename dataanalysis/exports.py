@@ -0,0 +1,193 @@
+"""
+Data exports for the DataAnalysis app.
+Streams the rows of a file, optionally filtered and labeled with their
+cluster and/or outlier flags, as CSV or Parquet. Labels come from the
+fitted models the clustering and outlier analyses use (cached as
+artifacts, fitted on the first request), so an export agrees with the
+analysis of the same parameters and never refits per download. Rows are
+filtered, labeled and encoded EXPORT_CHUNK_ROWS at a time while the
+response is sent, so memory use does not grow with the export; filtered
+exports skip the chunks their zone maps rule out.
+"""
+
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from .admission import admit
+from .datasets import load_cluster_model, load_dataframe, load_outlier_model, load_zone_maps
+from .upload_handlers import file_stem
+from .utils.analysis import predict_clusters
+from .utils.arrow_formats import arrow_schema, available as arrow_available, parquet_chunks
+from .utils.operations import normalize_params, split_columns
+from .utils.outliers import outlier_labels
+from .utils.paging import CSV_CHUNK_ROWS, csv_stream
+from .utils.query import apply_filters, candidate_ranges, parse_filter_spec
+
+
+EXPORT_CHUNK_ROWS = CSV_CHUNK_ROWS
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+LABELS = ('cluster', 'outlier')
+
+
+def _export_format(value):
+    if value not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {value} (use {', '.join(EXPORT_FORMATS)})")
+    return value
+
+
+def _labels(value):
+    labels = split_columns(value) or []
+    unknown = [label for label in labels if label not in LABELS]
+    if unknown:
+        raise ValueError(f"Unknown labels: {', '.join(unknown)} (use {', '.join(LABELS)})")
+    return labels
+
+
+def _flag(value):
+    return value if isinstance(value, bool) else str(value).lower() in ('true', '1', 'yes')
+
+
+# Export parameter -> (converter, default). Clustering and outlier
+# parameters are those of the analyses, the column lists prefixed.
+EXPORT_PARAMETERS = {
+    'format': (_export_format, 'csv'),
+    'columns': (split_columns, None),
+    'filters': (parse_filter_spec, None),
+    'labels': (_labels, None),
+    'cluster': (int, None),
+    'outliers_only': (_flag, False),
+}
+CLUSTERING_PARAMETERS = {'cluster_columns': 'columns', 'n_clusters': 'n_clusters',
+                         'reduce': 'reduce', 'n_components': 'n_components'}
+OUTLIER_PARAMETERS = {'outlier_columns': 'columns', 'method': 'method',
+                      'threshold': 'threshold', 'contamination': 'contamination'}
+
+
+def export_params(params=None):
+    """
+    Convert export request parameters to canonical form.
+
+    Selecting a cluster or outliers only implies the matching label.
+
+    Returns:
+        dict: Export parameters, plus the normalized 'clustering' and
+        'outliers' parameters of the requested labels (None otherwise)
+    """
+    params = params or {}
+    normalized = {}
+    for name, (convert, default) in EXPORT_PARAMETERS.items():
+        value = params.get(name)
+        normalized[name] = default if value in (None, '') else convert(value)
+    labels = normalized['labels'] = normalized['labels'] or []
+    if normalized['cluster'] is not None and 'cluster' not in labels:
+        labels.append('cluster')
+    if normalized['outliers_only'] and 'outlier' not in labels:
+        labels.append('outlier')
+
+    for label, operation, names in (('cluster', 'clustering', CLUSTERING_PARAMETERS),
+                                    ('outlier', 'outliers', OUTLIER_PARAMETERS)):
+        normalized[operation] = None
+        if label in labels:
+            normalized[operation] = normalize_params(
+                operation, {**{name: params.get(key) for key, name in names.items()},
+                            'filters': normalized['filters']})
+    if normalized['format'] == 'parquet' and not arrow_available():
+        raise ValueError("Parquet exports need pyarrow, which is not installed on this server")
+    return normalized
+
+
+def _fit(uploaded_file, df, operation, params, load):
+    with admit(uploaded_file, operation, params) as admitted:
+        if admitted['sample_rows'] != params['sample_rows']:
+            raise ValueError(f"This file is too large to export its {operation} labels "
+                             "within the server's memory limits")
+        return load(uploaded_file, df, params)
+
+
+def _label_name(df, name):
+    while name in df.columns:
+        name = '_' + name
+    return name
+
+
+def export_data(uploaded_file, params=None):
+    """
+    Prepare the streamed export of a file.
+
+    The models behind the requested labels are fitted (or read from the
+    cache) before anything is sent, so errors are reported as such rather
+    than as a truncated download.
+
+    Args:
+        uploaded_file: UploadedFile instance
+        params: Export request parameters, see export_params
+
+    Returns:
+        tuple: (iterable of the file's pieces, content type, file name)
+    """
+    params = export_params(params)
+    df = load_dataframe(uploaded_file)
+    columns = params['columns'] or list(df.columns)
+    unknown = [col for col in columns if col not in df.columns]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(map(str, unknown))}")
+
+    cluster_model = outlier_model = None
+    if params['clustering'] is not None:
+        cluster_model = _fit(uploaded_file, df, 'clustering', params['clustering'], load_cluster_model)
+    if params['outliers'] is not None:
+        outlier_model = _fit(uploaded_file, df, 'outliers', params['outliers'], load_outlier_model)
+
+    # Label column -> Arrow type, declared rather than inferred from rows
+    label_types = {}
+    cluster_name = _label_name(df, 'cluster')
+    if cluster_model is not None:
+        label_types[cluster_name] = 'int64'
+    outlier_name = _label_name(df, 'is_outlier')
+    if outlier_model is not None and outlier_model['method'] == 'isolation_forest':
+        detail_name = _label_name(df, 'anomaly_score')
+        detail_type = 'float64'
+    else:
+        detail_name = _label_name(df, 'outlier_columns')
+        detail_type = 'large_string'
+    if outlier_model is not None:
+        label_types.update({outlier_name: 'bool_', detail_name: detail_type})
+
+    def label(chunk):
+        chunk = apply_filters(chunk, params['filters'])
+        labeled = chunk[columns]
+        if cluster_model is not None:
+            clusters = predict_clusters(cluster_model, chunk)
+            # Rows missing a clustered value have no cluster
+            labeled = labeled.assign(**{cluster_name: pd.array(
+                np.where(clusters < 0, None, clusters), dtype='Int64')})
+            if params['cluster'] is not None:
+                selected = clusters == params['cluster']
+                labeled, chunk = labeled[selected], chunk[selected]
+        if outlier_model is not None:
+            mask, detail = outlier_labels(outlier_model, chunk)
+            labeled = labeled.assign(**{outlier_name: mask, detail_name: detail})
+            if params['outliers_only']:
+                labeled = labeled[mask]
+        return labeled
+
+    if params['filters']:
+        ranges = candidate_ranges(params['filters'], load_zone_maps(uploaded_file, df))
+    else:
+        ranges = [(start, start + EXPORT_CHUNK_ROWS) for start in range(0, len(df), EXPORT_CHUNK_ROWS)]
+
+    def frames():
+        for start, stop in ranges:
+            yield label(df.iloc[start:stop])
+
+    filename = f"{file_stem(uploaded_file.original_filename)}_export.{params['format']}"
+    if params['format'] == 'parquet':
+        schema = arrow_schema(df[columns], label_types)
+        return parquet_chunks(frames(), schema), EXPORT_FORMATS['parquet'], filename
+    # The header goes first, even when no row is exported
+    return csv_stream(chain([label(df.iloc[:0])], frames())), EXPORT_FORMATS['csv'], filename
@@ -5,18 +5,21 @@ Handles CSV file upload validation.
 
 from django import forms
 from .models import UploadedFile
+from .upload_handlers import MAX_UPLOAD_SIZE, file_name_error
 
 
 class CSVUploadForm(forms.Form):
     """
-    Form for uploading CSV files.
-    Validates file type and size.
+    Form for uploading CSV files, plain or compressed (.csv.gz, .csv.zst),
+    and Parquet or Arrow IPC files.
+    Validates file type and size; the size limit applies to the bytes
+    uploaded, the uncompressed size is capped by the upload handler.
     """
     csv_file = forms.FileField(
         label='Select a CSV file',
-        help_text='Maximum file size: 10MB',
+        help_text='Maximum file size: 10MB (100MB uncompressed)',
         widget=forms.FileInput(attrs={
-            'accept': '.csv',
+            'accept': '.csv,.gz,.zst,.parquet,.arrow,.feather',
             'class': 'file-input',
             'id': 'csv-file-input',
         })
@@ -28,11 +31,12 @@ class CSVUploadForm(forms.Form):
         
         if file:
             # Check file extension
-            if not file.name.endswith('.csv'):
-                raise forms.ValidationError('Only CSV files are allowed.')
+            error = file_name_error(file.name)
+            if error:
+                raise forms.ValidationError(error)
             
             # Check file size (10MB limit)
-            if file.size > 10 * 1024 * 1024:
+            if file.size > MAX_UPLOAD_SIZE:
                 raise forms.ValidationError('File size must be under 10MB.')
             
             # Check if file is not empty
@@ -0,0 +1,97 @@
+"""
+Benchmark of the CSV parse engines.
+
+Times every available engine on synthetic CSVs of the shapes the load test
+uses (or on given files), with and without the dtype hints recorded at
+upload time, and reports the best time and throughput of each.
+
+Examples:
+    python manage.py benchmark_parse
+    python manage.py benchmark_parse --shapes 10000x12,100000x20 --repeat 5
+    python manage.py benchmark_parse data/sales.csv data/sensors.csv
+"""
+
+import csv
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from dataanalysis.upload_handlers import SNIFF_SAMPLE_SIZE, _infer_type
+from dataanalysis.utils.parsing import ENGINES, available_engines, dtype_hints
+
+from .loadtest import DEFAULT_SHAPES, parse_shapes, synthetic_csv
+
+
+def sample_column_types(path):
+    """Infer column types from the start of a file, as the upload handler does."""
+    with open(path, 'rb') as f:
+        text = f.read(SNIFF_SAMPLE_SIZE).decode('utf-8-sig', errors='replace')
+    if '\n' in text:
+        text = text[:text.rindex('\n')]
+    rows = [row for row in csv.reader(io.StringIO(text)) if row]
+    if not rows:
+        return {}
+    return {name: _infer_type([row[i] for row in rows[1:] if i < len(row)])
+            for i, name in enumerate(rows[0])}
+
+
+class Command(BaseCommand):
+    help = "Compare the CSV parse engines on synthetic data shapes or given files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help="CSV files to parse (default: synthetic shapes)")
+        parser.add_argument('--shapes', default=DEFAULT_SHAPES, help="CSV shapes, e.g. '1000x8,50000x20'")
+        parser.add_argument('--repeat', type=int, default=3, help="Parses per engine, the best is kept")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1")
+        with tempfile.TemporaryDirectory(prefix='benchmark-parse-') as directory:
+            paths = options['files'] or self._write_synthetic(options, directory)
+            for path in paths:
+                if not os.path.isfile(path):
+                    raise CommandError(f"No such file: {path}")
+
+            header = f"{'file':<28}{'MB':>8}{'engine':>10}{'hints':>7}{'best ms':>10}{'MB/s':>9}"
+            self.stdout.write(header)
+            self.stdout.write('-' * len(header))
+            for path in paths:
+                self._benchmark(path, options['repeat'])
+        if 'pyarrow' not in available_engines():
+            self.stdout.write(self.style.WARNING("pyarrow is not installed, only pandas was timed"))
+
+    def _write_synthetic(self, options, directory):
+        rng = np.random.default_rng(options['seed'])
+        paths = []
+        for rows, cols in parse_shapes(options['shapes']):
+            path = os.path.join(directory, f'{rows}x{cols}.csv')
+            with open(path, 'wb') as f:
+                f.write(synthetic_csv(rows, cols, rng))
+            paths.append(path)
+        return paths
+
+    def _benchmark(self, path, repeat):
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        hints = dtype_hints(sample_column_types(path)) or None
+        for engine in available_engines():
+            for dtype in (None, hints) if hints else (None,):
+                best = None
+                try:
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        ENGINES[engine](path, ',', None, dtype)
+                        elapsed = time.perf_counter() - start
+                        best = elapsed if best is None else min(best, elapsed)
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(
+                        f"{os.path.basename(path)[:27]:<28}{size_mb:>8.2f}{engine:>10}"
+                        f"{'yes' if dtype else 'no':>7}  failed: {e}"))
+                    continue
+                self.stdout.write(
+                    f"{os.path.basename(path)[:27]:<28}{size_mb:>8.2f}{engine:>10}"
+                    f"{'yes' if dtype else 'no':>7}{best * 1000:>10.1f}{size_mb / best:>9.1f}")
@@ -0,0 +1,115 @@
+"""
+Batch analysis reports.
+
+Runs analyses on the CSV, Parquet and Arrow files of directories or glob
+patterns, outside of any request, and writes a self-contained HTML and/or
+PDF report per file plus a JSON summary of the run. Files are stored and
+analysed as uploads are, through the shared result cache, so unchanged
+files are served from the results of earlier runs or of the web views.
+Each file is handled by a worker process with memory and time limits.
+Exits with an error when any file failed (see the summary).
+
+Examples:
+    python manage.py generate_reports data/ --output reports/
+    python manage.py generate_reports 'exports/**/*.csv.gz' --operations eda,outliers --format html
+    python manage.py generate_reports 'data/*.parquet' --workers 4 --memory-limit 1024 --timeout 300
+"""
+
+import glob
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from dataanalysis.reports import REPORT_FORMATS, SUMMARY_NAME, run_reports
+from dataanalysis.upload_handlers import file_name_error
+from dataanalysis.utils.operations import OPERATIONS
+
+
+def find_files(inputs):
+    """
+    Expand directories (their files, not recursively) and glob patterns
+    into the files an upload would accept, in order and without duplicates.
+    """
+    paths = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            matches = sorted(os.path.join(pattern, name) for name in os.listdir(pattern))
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                raise CommandError(f"No such file: {pattern}")
+        paths += [path for path in matches if os.path.isfile(path) and file_name_error(path) is None]
+    return list(dict.fromkeys(os.path.abspath(path) for path in paths))
+
+
+def split_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class Command(BaseCommand):
+    help = "Write analysis reports for the data files of directories or glob patterns."
+
+    def add_arguments(self, parser):
+        parser.add_argument('inputs', nargs='+', help="Directories, files or glob patterns")
+        parser.add_argument('--output', default='reports', help="Directory the reports are written to")
+        parser.add_argument('--operations', default=','.join(settings.REPORT_OPERATIONS),
+                            help="Analyses to run, e.g. 'eda,correlation,outliers'")
+        parser.add_argument('--format', default=','.join(REPORT_FORMATS), help="'html', 'pdf' or both")
+        parser.add_argument('--workers', type=int, default=settings.REPORT_WORKERS,
+                            help="Files processed at once")
+        parser.add_argument('--memory-limit', type=int, default=settings.REPORT_MEMORY_LIMIT // (1024 * 1024),
+                            help="Resident size of a worker in MB before it is killed (0: no limit)")
+        parser.add_argument('--timeout', type=int, default=settings.REPORT_TIMEOUT,
+                            help="Seconds per file before its worker is killed (0: no limit)")
+
+    def handle(self, *args, **options):
+        operations = split_list(options['operations'])
+        formats = split_list(options['format'])
+        for operation in operations:
+            if operation not in OPERATIONS:
+                raise CommandError(f"Unknown operation: {operation}")
+        for report_format in formats:
+            if report_format not in REPORT_FORMATS:
+                raise CommandError(f"Unknown format: {report_format}")
+        if not operations or not formats:
+            raise CommandError("At least one operation and one format are needed")
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1")
+        if options['memory_limit'] < 0 or options['timeout'] < 0:
+            raise CommandError("--memory-limit and --timeout cannot be negative")
+
+        paths = find_files(options['inputs'])
+        if not paths:
+            raise CommandError("No CSV, Parquet or Arrow files found")
+        self.stdout.write(f"{len(paths)} files, {options['workers']} workers, "
+                          f"operations: {', '.join(operations)}")
+
+        summary = run_reports(
+            paths,
+            options['output'],
+            operations=operations,
+            formats=formats,
+            workers=options['workers'],
+            memory_limit=options['memory_limit'] * 1024 * 1024,
+            timeout=options['timeout'],
+            progress=self._progress,
+        )
+
+        self.stdout.write(f"{summary['succeeded']} reports written to {options['output']}, "
+                          f"{summary['failed']} failed")
+        if summary['failed']:
+            raise CommandError(f"{summary['failed']} of {len(paths)} files failed, "
+                               f"see {os.path.join(options['output'], SUMMARY_NAME)}")
+
+    def _progress(self, entry):
+        name = os.path.basename(entry['file'])
+        if entry['status'] != 'ok':
+            self.stdout.write(self.style.ERROR(f"failed  {name:<40}{entry['seconds']:>8.1f}s  {entry['error']}"))
+            return
+        failed = [operation for operation, outcome in entry['operations'].items() if not outcome['success']]
+        line = f"ok      {name:<40}{entry['seconds']:>8.1f}s"
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{line}  failed analyses: {', '.join(failed)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(line))
@@ -0,0 +1,362 @@
+"""
+Load test of the upload -> analysis -> charts flow.
+
+Starts the app under gunicorn with the settings entrypoint.sh uses (or
+targets a running server with --url), replays simulated user sessions with
+synthetic CSVs and reports throughput, latency percentiles and error and
+timeout rates per endpoint.
+
+Examples:
+    python manage.py loadtest --users 8 --duration 60
+    python manage.py loadtest --workers 4 --threads 2 --shapes 1000x10,50000x30
+    python manage.py loadtest --interface asgi --mix eda=1,table=3 --json out.json
+"""
+
+import io
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Endpoint name -> (method, path template, JSON body or None)
+ENDPOINTS = {
+    'page': ('GET', '/analysis/{id}/', None),
+    'columns': ('GET', '/api/columns/{id}/', None),
+    'table': ('GET', '/api/table/{id}/', None),
+    'rows': ('GET', '/api/rows/{id}/?offset=0&limit=100', None),
+    'statistics': ('GET', '/api/statistics/{id}/', None),
+    'correlation': ('GET', '/api/correlation/{id}/', None),
+    'distribution': ('GET', '/api/distribution/{id}/', None),
+    'histogram': ('GET', '/api/histogram/{id}/?column=num_0', None),
+    'boxplot': ('GET', '/api/boxplot/{id}/', None),
+    'categorical': ('GET', '/api/categorical/{id}/?column=cat_0', None),
+    'outliers': ('GET', '/api/outliers/{id}/', None),
+    'scatter': ('GET', '/api/scatter/{id}/', None),
+    'linear_regression': ('GET', '/api/linear-regression/{id}/', None),
+    'clustering': ('GET', '/api/clustering/{id}/', None),
+    'eda': ('GET', '/api/eda/{id}/', None),
+    'query': ('POST', '/api/query/{id}/', {
+        'group_by': ['cat_0'],
+        'aggregates': [{'func': 'count'}, {'func': 'mean', 'column': 'num_0'}],
+    }),
+}
+
+DEFAULT_MIX = ('table=3,statistics=2,correlation=2,distribution=2,histogram=2,'
+               'boxplot=1,rows=2,columns=1,query=1,clustering=1,eda=1')
+DEFAULT_SHAPES = '1000x8,10000x12,50000x20'
+
+
+def parse_mix(value):
+    """Parse 'name=weight,...' into {name: weight}."""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise CommandError(f"Unknown endpoint in mix: {name} (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_shapes(value):
+    """Parse 'ROWSxCOLS,...' into [(rows, cols)]."""
+    shapes = []
+    for item in value.split(','):
+        match = re.fullmatch(r'\s*(\d+)x(\d+)\s*', item)
+        if not match or int(match.group(2)) < 2:
+            raise CommandError(f"Invalid shape: {item} (expected ROWSxCOLS, at least 2 columns)")
+        shapes.append((int(match.group(1)), int(match.group(2))))
+    return shapes
+
+
+def synthetic_csv(rows, cols, rng):
+    """
+    Build a CSV with numeric columns (num_*, some missing values) and
+    categorical ones (cat_*, about a quarter of the columns).
+
+    Returns:
+        bytes: CSV content
+    """
+    n_cat = max(1, cols // 4)
+    data = {}
+    for i in range(cols - n_cat):
+        values = rng.normal(loc=rng.uniform(-100, 100), scale=rng.uniform(1, 50), size=rows)
+        values[rng.random(rows) < 0.02] = np.nan
+        data[f'num_{i}'] = values.round(3)
+    for i in range(n_cat):
+        categories = [f'c{i}_{k}' for k in range(rng.integers(3, 12))]
+        data[f'cat_{i}'] = rng.choice(categories, size=rows)
+    buffer = io.StringIO()
+    pd.DataFrame(data).to_csv(buffer, index=False)
+    return buffer.getvalue().encode('utf-8')
+
+
+def multipart_body(field, filename, content):
+    """Encode a single file field as multipart/form-data; return (body, content type)."""
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: text/csv\r\n\r\n').encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+class Recorder:
+    """Thread-safe collection of request outcomes per endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)  # endpoint -> [(latency, outcome)]
+
+    def add(self, endpoint, latency, outcome):
+        with self.lock:
+            self.samples[endpoint].append((latency, outcome))
+
+    def report(self, elapsed):
+        """
+        Summarize the recorded requests.
+
+        Returns:
+            dict: Per endpoint (and 'TOTAL'): requests, throughput, latency
+            percentiles in ms, error and timeout rates
+        """
+        rows = {}
+        everything = []
+        for endpoint, samples in sorted(self.samples.items()):
+            rows[endpoint] = self._summarize(samples, elapsed)
+            everything.extend(samples)
+        if everything:
+            rows['TOTAL'] = self._summarize(everything, elapsed)
+        return rows
+
+    @staticmethod
+    def _summarize(samples, elapsed):
+        latencies = np.array([latency for latency, _ in samples]) * 1000
+        outcomes = [outcome for _, outcome in samples]
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return {
+            'requests': len(samples),
+            'rps': round(len(samples) / elapsed, 2),
+            'p50_ms': round(float(p50), 1),
+            'p95_ms': round(float(p95), 1),
+            'p99_ms': round(float(p99), 1),
+            'error_rate': round(sum(o not in ('ok', 'timeout') for o in outcomes) / len(samples), 4),
+            'timeout_rate': round(outcomes.count('timeout') / len(samples), 4),
+        }
+
+
+class Session:
+    """One simulated user: opens the site, uploads a CSV, then runs analyses."""
+
+    def __init__(self, base_url, recorder, timeout):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.timeout = timeout
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()))
+        self.csrf_token = ''
+
+    def request(self, endpoint, method, path, body=None, content_type=None):
+        """Send a request and record its latency and outcome; return the response body or None."""
+        headers = {'Referer': self.base_url + '/'}
+        if method == 'POST':
+            headers['X-CSRFToken'] = self.csrf_token
+        if content_type:
+            headers['Content-Type'] = content_type
+        request = Request(self.base_url + path, data=body, headers=headers, method=method)
+        start = time.perf_counter()
+        outcome, payload = 'ok', None
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                payload = response.read()
+        except HTTPError as e:
+            outcome = f'http_{e.code}'
+        except (socket.timeout, TimeoutError):
+            outcome = 'timeout'
+        except URLError as e:
+            outcome = 'timeout' if isinstance(e.reason, socket.timeout) else 'connection_error'
+        except (ConnectionError, OSError):
+            outcome = 'connection_error'
+        self.recorder.add(endpoint, time.perf_counter() - start, outcome)
+        return payload
+
+    def run(self, csv_content, mix, calls):
+        page = self.request('landing', 'GET', '/')
+        if page is None:
+            return None
+        match = re.search(rb'id="csrf-token" value="([^"]+)"', page)
+        self.csrf_token = match.group(1).decode() if match else ''
+
+        body, content_type = multipart_body('csv_file', 'loadtest.csv', csv_content)
+        payload = self.request('upload', 'POST', '/upload/', body, content_type)
+        if payload is None:
+            return None
+        file_id = json.loads(payload).get('file_id')
+        if not file_id:
+            return None
+
+        names, weights = list(mix), list(mix.values())
+        for name in ['page'] + random.choices(names, weights, k=calls):
+            method, path, data = ENDPOINTS[name]
+            self.request(name, method, path.format(id=file_id),
+                         json.dumps(data).encode() if data is not None else None,
+                         'application/json' if data is not None else None)
+        return file_id
+
+
+class Command(BaseCommand):
+    help = ("Load test the upload and analysis endpoints with simulated user sessions "
+            "and report throughput, latency percentiles and error rates per endpoint.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="Test a running server instead of starting gunicorn")
+        parser.add_argument('--interface', choices=['wsgi', 'asgi'],
+                            default=os.environ.get('SERVER_INTERFACE', 'wsgi'))
+        parser.add_argument('--workers', type=int, default=int(os.environ.get('GUNICORN_WORKERS', 2)))
+        parser.add_argument('--threads', type=int, default=int(os.environ.get('GUNICORN_THREADS', 4)))
+        parser.add_argument('--server-timeout', type=int,
+                            default=int(os.environ.get('GUNICORN_TIMEOUT', 120)),
+                            help="Gunicorn worker timeout (seconds)")
+        parser.add_argument('--port', type=int, default=8089)
+        parser.add_argument('--users', type=int, default=4, help="Concurrent simulated users")
+        parser.add_argument('--duration', type=float, default=30, help="Seconds to keep starting sessions")
+        parser.add_argument('--calls', type=int, default=8, help="Analysis calls per session")
+        parser.add_argument('--mix', default=DEFAULT_MIX, help="Endpoint weights, e.g. 'table=3,eda=1'")
+        parser.add_argument('--shapes', default=DEFAULT_SHAPES, help="CSV shapes, e.g. '1000x8,50000x20'")
+        parser.add_argument('--same-content', action='store_true',
+                            help="Upload identical CSVs per shape (exercises deduplication and caches)")
+        parser.add_argument('--timeout', type=float, default=60, help="Client timeout per request (seconds)")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', dest='json_path', help="Also write the report to this file")
+        parser.add_argument('--keep-data', action='store_true', help="Keep the uploaded files afterwards")
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        shapes = parse_shapes(options['shapes'])
+        random.seed(options['seed'])
+        rng = np.random.default_rng(options['seed'])
+        fixed_csvs = {shape: synthetic_csv(*shape, rng) for shape in shapes} if options['same_content'] else {}
+
+        server = None
+        base_url = (options['url'] or '').rstrip('/')
+        if not base_url:
+            base_url = f"http://127.0.0.1:{options['port']}"
+            server = self._start_server(options, base_url)
+
+        recorder = Recorder()
+        file_ids = []
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+
+        def user(index):
+            user_rng = np.random.default_rng([options['seed'], index])
+            while time.monotonic() < deadline:
+                shape = shapes[user_rng.integers(len(shapes))]
+                content = fixed_csvs.get(shape) or synthetic_csv(*shape, user_rng)
+                session = Session(base_url, recorder, options['timeout'])
+                file_id = session.run(content, mix, options['calls'])
+                if file_id:
+                    with lock:
+                        file_ids.append(file_id)
+
+        self.stdout.write(f"Load testing {base_url}: {options['users']} users for {options['duration']:g}s")
+        start = time.monotonic()
+        try:
+            threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(options['users'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            elapsed = time.monotonic() - start
+            if server is not None:
+                self._stop_server(server)
+
+        report = recorder.report(elapsed)
+        self._print_report(report, options, elapsed, len(file_ids))
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump({'options': {k: options[k] for k in (
+                    'interface', 'workers', 'threads', 'users', 'duration', 'calls',
+                    'mix', 'shapes', 'same_content')},
+                    'elapsed': round(elapsed, 2), 'sessions': len(file_ids),
+                    'endpoints': report}, f, indent=2)
+
+        if not options['keep_data'] and not options['url']:
+            self._delete_uploads(file_ids)
+
+    def _start_server(self, options, base_url):
+        """Start gunicorn the way entrypoint.sh does, bound to localhost."""
+        if options['interface'] == 'asgi':
+            application = 'modelyourdata.asgi:application'
+            worker_options = ['--worker-class', 'uvicorn_worker.UvicornWorker']
+        else:
+            application = 'modelyourdata.wsgi:application'
+            worker_options = ['--threads', str(options['threads'])]
+        command = [sys.executable, '-m', 'gunicorn', application,
+                   '--bind', f"127.0.0.1:{options['port']}",
+                   '--workers', str(options['workers']),
+                   *worker_options,
+                   '--timeout', str(options['server_timeout'])]
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'modelyourdata.settings')}
+        self.stdout.write(' '.join(command[2:]))
+        # Server logs go to a file: an undrained pipe would eventually block the workers
+        log = tempfile.TemporaryFile()
+        server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=log)
+
+        opener = build_opener()
+        for _ in range(100):
+            if server.poll() is not None:
+                log.seek(0)
+                raise CommandError(f"gunicorn exited:\n{log.read().decode(errors='replace')}")
+            try:
+                opener.open(base_url + '/', timeout=1).close()
+                return server
+            except (URLError, ConnectionError, OSError):
+                time.sleep(0.2)
+        self._stop_server(server)
+        raise CommandError("gunicorn did not start listening within 20 seconds")
+
+    @staticmethod
+    def _stop_server(server):
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    @staticmethod
+    def _delete_uploads(file_ids):
+        from dataanalysis.models import UploadedFile
+        for uploaded_file in UploadedFile.objects.filter(id__in=file_ids):
+            uploaded_file.delete()
+
+    def _print_report(self, report, options, elapsed, sessions):
+        self.stdout.write(f"\n{sessions} sessions in {elapsed:.1f}s "
+                          f"({options['interface']}, {options['workers']} workers"
+                          + (f", {options['threads']} threads" if options['interface'] == 'wsgi' else '')
+                          + ")\n")
+        header = f"{'endpoint':<18}{'reqs':>7}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}{'timeouts':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for endpoint, row in report.items():
+            line = (f"{endpoint:<18}{row['requests']:>7}{row['rps']:>9.2f}{row['p50_ms']:>10.1f}"
+                    f"{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}"
+                    f"{row['error_rate']:>9.1%}{row['timeout_rate']:>10.1%}")
+            self.stdout.write(self.style.ERROR(line) if row['error_rate'] or row['timeout_rate'] else line)
@@ -0,0 +1,217 @@
+"""
+Middleware for the DataAnalysis app.
+"""
+
+import gc
+import logging
+import os
+import re
+import signal
+import sys
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .admission import current_rss
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+# Content types worth compressing; PNG downloads and other binary payloads
+# are compressed already
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # Higher qualities cost far more time per response than they save in bytes
+
+
+class WorkerRecycleMiddleware:
+    """
+    Gracefully restart a gunicorn worker whose memory keeps growing.
+
+    Fragmentation from pandas and matplotlib makes a worker's resident
+    size ratchet up over its lifetime. After each response, if the RSS is
+    still above WORKER_MAX_RSS once garbage is collected, the worker sends
+    itself SIGTERM: gunicorn then lets it finish its in-flight requests
+    and starts a fresh worker in its place. Works with both the WSGI and
+    the ASGI (uvicorn worker) entry points. Nothing is recycled where the
+    RSS cannot be read (no /proc).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.recycling = False
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self._check_memory()
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self._check_memory()
+        return response
+
+    def _check_memory(self):
+        # Only a gunicorn arbiter replaces a worker that exits
+        if self.recycling or not settings.WORKER_MAX_RSS or 'gunicorn' not in sys.modules:
+            return
+        rss = current_rss()
+        if rss is None or rss <= settings.WORKER_MAX_RSS:
+            return
+        gc.collect()
+        rss = current_rss()
+        if rss is not None and rss > settings.WORKER_MAX_RSS:
+            self.recycling = True
+            logger.warning("Worker %s uses %d MB, recycling it",
+                           os.getpid(), rss // (1024 * 1024))
+            os.kill(os.getpid(), signal.SIGTERM)
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware that can also run in an async middleware chain.
+
+    The stock middleware is synchronous only, which makes Django run the
+    rest of the chain, async views included, inside its single
+    thread-sensitive executor thread under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
+
+
+def accepted_encodings(header):
+    """Return the content codings an Accept-Encoding header accepts (q > 0)."""
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.partition(';')
+        match = re.search(r'q\s*=\s*([0-9.]+)', params)
+        try:
+            quality = float(match.group(1)) if match else 1.0
+        except ValueError:
+            quality = 0.0
+        if name.strip() and quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def _compressor(encoding):
+    """Return (compress, flush, finish) functions of a new brotli or gzip stream."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _compress_stream(encoding, chunks):
+    compress, flush, finish = _compressor(encoding)
+    for chunk in chunks:
+        yield compress(chunk) + flush()
+    yield finish()
+
+
+async def _acompress_stream(encoding, chunks):
+    compress, flush, finish = _compressor(encoding)
+    async for chunk in chunks:
+        yield compress(chunk) + flush()
+    yield finish()
+
+
+class CompressionMiddleware:
+    """
+    Compress JSON and text responses with brotli (when installed) or gzip,
+    whichever the client accepts.
+
+    Bodies under RESPONSE_COMPRESSION_MIN_SIZE bytes, responses already
+    encoded or of other content types (such as PNG downloads), and bodies
+    compression does not shrink are sent unchanged. Streamed responses are
+    compressed chunk by chunk and flushed after every chunk, so NDJSON
+    lines still reach the client as they are produced.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self._compress(request, response)
+
+    def _compress(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if response.has_header('Content-Encoding') or not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        if not response.streaming and len(response.content) < settings.RESPONSE_COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+        else:
+            return response
+
+        if response.streaming:
+            stream = _acompress_stream if response.is_async else _compress_stream
+            response.streaming_content = stream(encoding, response.streaming_content)
+            del response['Content-Length']
+        else:
+            compress, _, finish = _compressor(encoding)
+            body = compress(response.content) + finish()
+            if len(body) >= len(response.content):
+                return response
+            response.content = body
+            response['Content-Length'] = str(len(body))
+
+        # The compressed body is a different representation of the resource
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:20
+
+import dataanalysis.responses
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataanalysis', '0003_analysisresult_cache'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='analysisresult',
+            name='result_data',
+            field=models.JSONField(blank=True, encoder=dataanalysis.responses.NumpyJSONEncoder, null=True),
+        ),
+    ]
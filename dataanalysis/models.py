@@ -3,20 +3,29 @@ Models for the DataAnalysis app.
 Handles storage of uploaded CSV files and analysis sessions.
 """
 
+import os
 import uuid
-from django.db import models
+import shutil
+from django.conf import settings
+from .responses import NumpyJSONEncoder
+from django.db import models, transaction
 
 
 class UploadedFile(models.Model):
     """
     Model to store uploaded CSV files.
-    Uses UUID for unique identification and secure file access.
+    Uses UUID for unique identification and secure file access. Files are
+    stored gzip-compressed (older uploads may be plain CSV), Parquet and
+    Arrow IPC files as uploaded.
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     file = models.FileField(upload_to='uploads/')
     original_filename = models.CharField(max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
-    file_size = models.PositiveIntegerField(default=0)  # Size in bytes
+    file_size = models.PositiveIntegerField(default=0)  # Size of the CSV in bytes, uncompressed
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)  # SHA-256 of the uncompressed CSV
+    row_count = models.PositiveIntegerField(null=True, blank=True)  # Data rows, header excluded
+    schema = models.JSONField(default=dict, blank=True)  # Delimiter, encoding and column types
     
     class Meta:
         ordering = ['-uploaded_at']
@@ -24,11 +33,55 @@ class UploadedFile(models.Model):
     def __str__(self):
         return f"{self.original_filename} ({self.id})"
     
-    def delete(self, *args, **kwargs):
-        """Delete the file from storage when model is deleted."""
-        if self.file:
+    def csv_read_options(self):
+        """Return the pandas read_csv options detected at upload time."""
+        options = {}
+        if self.schema.get('delimiter'):
+            options['sep'] = self.schema['delimiter']
+        if self.schema.get('encoding'):
+            options['encoding'] = self.schema['encoding']
+        return options
+    
+    def csv_column_types(self):
+        """Return the column types detected at upload time, by column name."""
+        return {column['name']: column['type'] for column in self.schema.get('columns', [])}
+    
+    @property
+    def cache_dir(self):
+        """Directory holding artifacts derived from this file's content."""
+        return os.path.join(settings.MEDIA_ROOT, 'cache', self.content_hash)
+    
+    def release_content(self):
+        """
+        Release this model's reference to its stored file and content, before
+        it is deleted or pointed at new content (see appending.append_rows).
+        Uploads with identical content share one file, one cache directory and
+        one set of cached results; those are only removed with the last reference.
+        """
+        file_refs = UploadedFile.objects.filter(file=self.file.name).exclude(pk=self.pk)
+        content_refs = UploadedFile.objects.none()
+        if self.content_hash:
+            content_refs = UploadedFile.objects.filter(
+                content_hash=self.content_hash
+            ).exclude(pk=self.pk)
+        
+        survivor = content_refs.first()
+        if survivor is not None:
+            # Hand the cached results over instead of dropping them
+            self.analysis_results.update(uploaded_file=survivor)
+        else:
+            self.analysis_results.all().delete()
+            if self.content_hash:
+                shutil.rmtree(self.cache_dir, ignore_errors=True)
+        
+        if self.file and not file_refs.exists():
             self.file.delete(save=False)
-        super().delete(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        """Delete the model, releasing its reference to the stored file and content."""
+        with transaction.atomic():
+            self.release_content()
+            super().delete(*args, **kwargs)
 
 
 class AnalysisResult(models.Model):
@@ -58,6 +111,8 @@ class AnalysisResult(models.Model):
     operation = models.CharField(max_length=50, choices=OPERATION_CHOICES)
     result_image = models.ImageField(upload_to='results/', null=True, blank=True)
     result_html = models.TextField(null=True, blank=True)  # For table/summary HTML
+    result_data = models.JSONField(null=True, blank=True, encoder=NumpyJSONEncoder)  # Full JSON result returned by the API
+    cache_key = models.CharField(max_length=64, blank=True, db_index=True)  # Content hash + operation + parameters
     created_at = models.DateTimeField(auto_now_add=True)
     parameters = models.JSONField(default=dict, blank=True)  # Store operation parameters
     
@@ -0,0 +1,404 @@
+"""
+Batch reports for the DataAnalysis app.
+Runs analyses on files from the local filesystem outside of any request
+(see manage.py generate_reports). Files are received by the upload handler
+and analysed through the shared result cache like uploads are, so reports
+and the web views of the same content reuse each other's work. Each file's
+report is built in a worker process of its own, killed when it runs past
+its time limit or grows past its memory limit, and written as a
+self-contained HTML page and/or a PDF.
+"""
+
+import base64
+import io
+import mimetypes
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import wait
+
+import matplotlib
+matplotlib.use('Agg')  # Use non-interactive backend for server
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.files.uploadhandler import SkipFile, StopFutureHandlers
+from django.db import connections
+from django.template.loader import render_to_string
+from django.utils import timezone
+from matplotlib.backends.backend_pdf import PdfPages
+
+from .admission import current_rss
+from .datasets import load_dataframe, save_upload
+from .models import AnalysisResult, UploadedFile
+from .responses import dumps
+from .results import RESULT_OPERATIONS, get_analysis_result
+from .upload_handlers import CSVInspectingUploadHandler, file_stem
+
+
+REPORT_FORMATS = ('html', 'pdf')
+SUMMARY_NAME = 'summary.json'
+POLL_INTERVAL = 0.5  # Seconds between checks of the running workers
+
+PDF_PAGE_SIZE = (8.27, 11.69)  # A4, in inches
+PDF_LINES_PER_PAGE = 80
+PDF_LINE_WIDTH = 110  # Characters
+
+
+def import_file(path):
+    """
+    Receive a local file through the upload handler, as if it was uploaded.
+
+    Files are not capped in size as received, only in uncompressed size.
+
+    Args:
+        path: Path to a CSV (optionally compressed), Parquet or Arrow IPC file
+
+    Returns:
+        UploadedFile: The model of an earlier upload of the same content if
+        there is one, a new one otherwise
+
+    Raises:
+        ValueError: If the handler rejects the file
+    """
+    name = os.path.basename(path)
+    handler = CSVInspectingUploadHandler(max_upload_size=None)
+    csv_file = None
+    size = 0
+    try:
+        try:
+            handler.new_file('csv_file', name, mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                             os.path.getsize(path))
+        except StopFutureHandlers:
+            pass
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(handler.chunk_size), b''):
+                handler.receive_data_chunk(chunk, size)
+                size += len(chunk)
+        if size == 0:
+            handler.error = 'The file is empty.'
+            handler.upload_interrupted()
+        else:
+            csv_file = handler.file_complete(size)
+    except SkipFile:
+        handler.upload_interrupted()
+    if csv_file is None:
+        raise ValueError(handler.error or 'The file could not be read.')
+
+    try:
+        existing = (UploadedFile.objects
+                    .filter(content_hash=csv_file.content_hash)
+                    .exclude(file='')
+                    .first())
+        if existing is not None and existing.file.storage.exists(existing.file.name):
+            return existing
+        return save_upload(csv_file)
+    finally:
+        csv_file.close()  # Removes the temporary file unless it was moved to storage
+
+
+def operation_title(operation):
+    """Human-readable name of an operation."""
+    choices = dict(AnalysisResult.OPERATION_CHOICES)
+    return choices.get(RESULT_OPERATIONS.get(operation, operation), operation.replace('_', ' ').title())
+
+
+def _is_scalar(value):
+    return value is None or isinstance(value, (str, bool, int, float, np.generic))
+
+
+def _format_value(value):
+    if isinstance(value, (float, np.floating)):
+        return f'{value:.6g}'
+    return str(value)
+
+
+def _add_table(section, title, frame, index=True):
+    section['tables'].append({
+        'title': title,
+        'html': frame.to_html(classes='data-table', index=index, na_rep='-', float_format=_format_value),
+        'text': frame.to_string(index=index, na_rep='-', float_format=_format_value),
+    })
+
+
+def _add_result(section, result, prefix=''):
+    """Sort the entries of an analysis result into a section's charts, tables and facts."""
+    for key, value in result.items():
+        label = f'{prefix}{key}'.replace('_', ' ').capitalize()
+        if key == 'image':
+            section['images'].append(value)
+        elif key == 'images':
+            section['images'].extend(item['image'] for item in value)
+        elif key == 'html' or key.endswith('_html'):
+            # Rendered by the analysis function, HTML reports only
+            section['tables'].append({'title': label.removesuffix(' html'), 'html': value, 'text': None})
+        elif isinstance(value, dict) and value:
+            if any(k == 'image' or k == 'images' or str(k).endswith('_html') for k in value):
+                _add_result(section, value, prefix)  # Nested result, e.g. the EDA summary
+            elif all(_is_scalar(v) for v in value.values()):
+                _add_table(section, label, pd.DataFrame({'Value': pd.Series(value, dtype=object)}))
+            else:
+                _add_table(section, label, pd.DataFrame.from_dict(value, orient='index'))
+        elif isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+            _add_table(section, label, pd.DataFrame(value), index=False)
+        elif isinstance(value, list):
+            section['facts'].append((label, ', '.join(_format_value(item) for item in value)))
+        elif _is_scalar(value):
+            section['facts'].append((label, _format_value(value)))
+
+
+def report_sections(results):
+    """
+    Lay analysis results out as report sections.
+
+    Args:
+        results: {operation: result dict, or the error message (str)}
+
+    Returns:
+        list: One dict per operation: 'operation', 'title', 'error', 'facts'
+        ((label, value) pairs), 'tables' ({'title', 'html', 'text'}, 'text'
+        being None for tables only available as HTML) and 'images' (base64 PNG)
+    """
+    sections = []
+    for operation, result in results.items():
+        section = {'operation': operation, 'title': operation_title(operation), 'error': None,
+                   'facts': [], 'tables': [], 'images': []}
+        if isinstance(result, str):
+            section['error'] = result
+        else:
+            _add_result(section, result)
+        sections.append(section)
+    return sections
+
+
+def write_html_report(path, context):
+    """Write a report as a single HTML page with its charts embedded."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(render_to_string('dataanalysis/report.html', context))
+
+
+def _text_pages(title, lines):
+    """Yield figures showing lines of text, PDF_LINES_PER_PAGE per page."""
+    for start in range(0, max(len(lines), 1), PDF_LINES_PER_PAGE):
+        fig = plt.figure(figsize=PDF_PAGE_SIZE)
+        fig.text(0.06, 0.96, title, fontsize=14, fontweight='bold', va='top')
+        for i, line in enumerate(lines[start:start + PDF_LINES_PER_PAGE]):
+            if len(line) > PDF_LINE_WIDTH:
+                line = line[:PDF_LINE_WIDTH - 3] + '...'
+            fig.text(0.06, 0.92 - i * 0.0108, line, fontsize=7, family='monospace', va='top')
+        yield fig
+
+
+def write_pdf_report(path, context):
+    """
+    Write a report as a PDF: the facts and tables of each section as text,
+    then its charts, one per page. Tables rendered as HTML by the analysis
+    functions (e.g. the statistical summary) are only in HTML reports.
+    """
+    with PdfPages(path) as pdf:
+        header = [f'{label}: {value}' for label, value in context['details']]
+        for fig in _text_pages(context['title'], header):
+            pdf.savefig(fig)
+            plt.close(fig)
+
+        for section in context['sections']:
+            lines = []
+            if section['error']:
+                lines.append(f"Failed: {section['error']}")
+            lines += [f'{label}: {value}' for label, value in section['facts']]
+            for table in section['tables']:
+                lines += ['', table['title']]
+                lines += table['text'].splitlines() if table['text'] is not None else ['(see the HTML report)']
+            for fig in _text_pages(section['title'], lines):
+                pdf.savefig(fig)
+                plt.close(fig)
+
+            for image in section['images']:
+                fig = plt.figure(figsize=PDF_PAGE_SIZE)
+                ax = fig.add_axes([0.05, 0.05, 0.9, 0.88])
+                ax.imshow(plt.imread(io.BytesIO(base64.b64decode(image)), format='png'))
+                ax.set_axis_off()
+                ax.set_title(section['title'], fontsize=12, fontweight='bold')
+                pdf.savefig(fig)
+                plt.close(fig)
+
+
+REPORT_WRITERS = {
+    'html': write_html_report,
+    'pdf': write_pdf_report,
+}
+
+
+def build_report(path, operations, output_path, formats=REPORT_FORMATS):
+    """
+    Import a file, run analyses on it and write its report.
+
+    The analyses go through get_analysis_result on a DataFrame loaded once,
+    so results cached for the same content are reused and new ones cached.
+    An analysis that fails is reported in its section; the report is
+    written regardless.
+
+    Args:
+        path: Path to the file
+        operations: Operation names (keys of utils.operations.OPERATIONS)
+        output_path: Report path without its extension
+        formats: Report formats, see REPORT_WRITERS
+
+    Returns:
+        dict: Summary entry: 'file', 'status' ('ok' or 'failed'), 'error',
+        'file_id', 'rows', per-operation 'operations' outcomes, 'reports'
+        written and 'seconds'
+    """
+    started = time.perf_counter()
+    entry = {'file': path, 'status': 'failed', 'error': None, 'operations': {}, 'reports': []}
+    try:
+        uploaded_file = import_file(path)
+        entry['file_id'] = str(uploaded_file.id)
+        entry['content_hash'] = uploaded_file.content_hash
+        df = load_dataframe(uploaded_file)
+        entry['rows'] = len(df)
+
+        results = {}
+        for operation in operations:
+            try:
+                results[operation] = get_analysis_result(uploaded_file, operation, df=df)
+                entry['operations'][operation] = {'success': True}
+            except Exception as e:
+                results[operation] = str(e)
+                entry['operations'][operation] = {'success': False, 'error': str(e)}
+
+        context = {
+            'title': os.path.basename(path),
+            'details': [
+                ('File', path),
+                ('Rows', len(df)),
+                ('Columns', len(df.columns)),
+                ('Content hash', uploaded_file.content_hash),
+                ('Generated', timezone.now().strftime('%Y-%m-%d %H:%M:%S %Z')),
+            ],
+            'sections': report_sections(results),
+        }
+        for report_format in formats:
+            report_path = f'{output_path}.{report_format}'
+            REPORT_WRITERS[report_format](report_path, context)
+            entry['reports'].append(report_path)
+        entry['status'] = 'ok'
+    except Exception as e:
+        entry['error'] = str(e)
+    finally:
+        connections.close_all()
+    entry['seconds'] = round(time.perf_counter() - started, 2)
+    return entry
+
+
+def _report_worker(connection, path, operations, output_path, formats, memory_limit):
+    """Worker process entry point: build one report and send its summary entry."""
+    rss = current_rss()
+    if memory_limit and rss is not None:
+        # Leave what the process already holds out of the admission budget, so
+        # analyses too large for the limit run on a sample instead of being killed
+        settings.ANALYSIS_MEMORY_BUDGET = min(settings.ANALYSIS_MEMORY_BUDGET, max(memory_limit - rss, 0))
+    connection.send(build_report(path, operations, output_path, formats))
+    connection.close()
+
+
+def report_names(paths):
+    """Report file names of input files: their stems, numbered when several are equal."""
+    names = []
+    seen = {}
+    for path in paths:
+        stem = file_stem(path)
+        seen[stem] = seen.get(stem, 0) + 1
+        names.append(stem if seen[stem] == 1 else f'{stem}-{seen[stem]}')
+    return names
+
+
+def _failed_entry(path, error, started):
+    return {'file': path, 'status': 'failed', 'error': error, 'operations': {}, 'reports': [],
+            'seconds': round(time.monotonic() - started, 2)}
+
+
+def run_reports(paths, output_dir, operations=None, formats=REPORT_FORMATS, workers=None,
+                memory_limit=None, timeout=None, progress=None):
+    """
+    Build the reports of many files in parallel worker processes.
+
+    Each file is handled by a process of its own, forked from this one. A
+    worker still running after ``timeout`` seconds, or whose resident size
+    exceeds ``memory_limit`` bytes (checked every POLL_INTERVAL seconds), is
+    killed and its file reported as failed. Worker processes need the fork
+    start method (POSIX).
+
+    Args:
+        paths: Paths to the input files
+        output_dir: Directory the reports and the summary are written to
+        operations: Operation names (optional, REPORT_OPERATIONS by default)
+        formats: Report formats, see REPORT_WRITERS
+        workers: Processes running at once (optional, REPORT_WORKERS by default)
+        memory_limit: Bytes per worker (optional, REPORT_MEMORY_LIMIT by default; 0 for no limit)
+        timeout: Seconds per file (optional, REPORT_TIMEOUT by default; 0 for no limit)
+        progress: Called with each file's summary entry as it completes (optional)
+
+    Returns:
+        dict: The summary, also written to SUMMARY_NAME in output_dir
+    """
+    operations = list(operations or settings.REPORT_OPERATIONS)
+    workers = workers or settings.REPORT_WORKERS
+    memory_limit = settings.REPORT_MEMORY_LIMIT if memory_limit is None else memory_limit
+    timeout = settings.REPORT_TIMEOUT if timeout is None else timeout
+    os.makedirs(output_dir, exist_ok=True)
+    context = multiprocessing.get_context('fork')
+
+    pending = list(zip(paths, report_names(paths)))
+    running = {}  # Receiving end of a worker's pipe -> (process, path, start time)
+    entries = {}
+    while pending or running:
+        while pending and len(running) < workers:
+            path, name = pending.pop(0)
+            receiver, sender = context.Pipe(duplex=False)
+            connections.close_all()  # Workers must not inherit the database connections
+            process = context.Process(target=_report_worker, daemon=True, args=(
+                sender, path, operations, os.path.join(output_dir, name), formats, memory_limit))
+            process.start()
+            sender.close()
+            running[receiver] = (process, path, time.monotonic())
+
+        ready = wait(list(running), timeout=POLL_INTERVAL)
+        for receiver, (process, path, started) in list(running.items()):
+            entry = None
+            if receiver in ready:
+                try:
+                    entry = receiver.recv()
+                except EOFError:
+                    process.join()
+                    entry = _failed_entry(path, f"The worker exited unexpectedly (code {process.exitcode})",
+                                          started)
+            elif timeout and time.monotonic() - started > timeout:
+                entry = _failed_entry(path, f"Timed out after {timeout}s", started)
+            elif memory_limit and (current_rss(process.pid) or 0) > memory_limit:
+                entry = _failed_entry(path, f"Exceeded the memory limit of {memory_limit // (1024 * 1024)}MB",
+                                      started)
+            if entry is None:
+                continue
+            if receiver not in ready:
+                process.kill()
+            process.join()
+            receiver.close()
+            del running[receiver]
+            entries[path] = entry
+            if progress is not None:
+                progress(entry)
+
+    files = [entries[path] for path in paths]
+    summary = {
+        'generated_at': timezone.now().isoformat(),
+        'operations': operations,
+        'formats': list(formats),
+        'succeeded': sum(1 for entry in files if entry['status'] == 'ok'),
+        'failed': sum(1 for entry in files if entry['status'] != 'ok'),
+        'files': files,
+    }
+    with open(os.path.join(output_dir, SUMMARY_NAME), 'wb') as f:
+        f.write(dumps(summary))
+    return summary
@@ -0,0 +1,80 @@
+"""
+JSON responses for the DataAnalysis app.
+Serializes with orjson where installed, which encodes NumPy scalars and
+arrays natively, so analysis results need no conversion to Python types
+first; the standard library encoder with NumPy support is the fallback.
+Both encode NaN and infinite floats as null.
+"""
+
+import json
+import math
+
+import numpy as np
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class NumpyJSONEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder that also encodes NumPy scalars and arrays."""
+
+    def default(self, o):
+        if isinstance(o, np.integer):
+            return int(o)
+        if isinstance(o, np.floating):
+            return float(o)
+        if isinstance(o, np.bool_):
+            return bool(o)
+        if isinstance(o, np.ndarray):
+            return o.tolist()
+        return super().default(o)
+
+
+_fallback_encoder = NumpyJSONEncoder()
+
+
+def _json_safe(value):
+    """
+    Replace NaN and infinite floats with None, as orjson encodes them, in
+    nested dicts, lists and arrays; the standard library would write NaN
+    and Infinity, which are not JSON.
+    """
+    if isinstance(value, (float, np.floating)):
+        return float(value) if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return _json_safe(value.tolist())
+    return value
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(data):
+    """
+    Serialize data to JSON.
+
+    Args:
+        data: Any value NumpyJSONEncoder accepts
+
+    Returns:
+        bytes: UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_fallback_encoder.default, option=ORJSON_OPTIONS)
+    return json.dumps(_json_safe(data), cls=NumpyJSONEncoder).encode('utf-8')
+
+
+class ApiJsonResponse(HttpResponse):
+    """HttpResponse with a body serialized by dumps (a JsonResponse replacement)."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
@@ -0,0 +1,176 @@
+"""
+Analysis result caching for the DataAnalysis app.
+Results are stored as AnalysisResult rows keyed by file content, operation
+and normalized parameters, so repeat uploads of the same data are cache hits.
+The shared result cache sits in front of the database and is checked first.
+When rows are appended to a file, the results the new rows cannot affect
+are carried over to the new content.
+"""
+
+import json
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError
+
+from .admission import admit
+from .models import AnalysisResult
+from .singleflight import single_flight
+from .datasets import (
+    load_dataframe,
+    load_zone_maps,
+    load_column_profile,
+    load_cluster_model,
+    load_time_index,
+    load_moments,
+)
+from .utils.query import apply_filters
+from .utils.operations import (
+    normalize_params,
+    run_operation,
+    PROFILE_OPERATIONS,
+    MODEL_OPERATIONS,
+    TIME_INDEX_OPERATIONS,
+    MOMENT_OPERATIONS,
+)
+
+
+# Registry operation name -> AnalysisResult.operation choice
+RESULT_OPERATIONS = {
+    'statistics': 'statistical_summary',
+    'eda': 'eda_report',
+}
+
+
+def result_cache_key(content_hash, operation, params):
+    """
+    Build the cache key of an analysis result.
+
+    Args:
+        content_hash: SHA-256 of the file content
+        operation: Operation name
+        params: Normalized parameters
+
+    Returns:
+        str: Hex digest identifying the result
+    """
+    payload = json.dumps([content_hash, operation, params], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_analysis_result(uploaded_file, operation, params=None, df=None):
+    """
+    Return the result of an operation, computing it only on a cache miss.
+
+    Args:
+        uploaded_file: UploadedFile instance
+        operation: Operation name (key of utils.operations.OPERATIONS)
+        params: Request parameters (optional)
+        df: Already loaded DataFrame (optional, loaded on demand)
+
+    Returns:
+        dict: Result of the analysis function
+    """
+    params = normalize_params(operation, params)
+    if not uploaded_file.content_hash:
+        with admit(uploaded_file, operation, params) as admitted:
+            return run_operation(load_dataframe(uploaded_file) if df is None else df,
+                                 operation, admitted)
+
+    cache_key = result_cache_key(uploaded_file.content_hash, operation, params)
+    cache = caches[settings.RESULT_CACHE_ALIAS]
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+    cached = (AnalysisResult.objects
+              .filter(cache_key=cache_key, result_data__isnull=False)
+              .values_list('result_data', flat=True)
+              .first())
+    if cached is not None:
+        cache.set(cache_key, cached)
+        return cached
+
+    # Identical concurrent requests compute once; the others wait and read
+    # the result from the shared cache
+    with single_flight(cache_key):
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Only the computing caller holds a memory reservation. A degraded
+        # (sampled) result is cached under the requested parameters: the
+        # same request on the same file is always degraded the same way.
+        with admit(uploaded_file, operation, params) as admitted:
+            if df is None:
+                df = load_dataframe(uploaded_file)
+            zone_maps = profile = None
+            if admitted['filters']:
+                zone_maps = load_zone_maps(uploaded_file, df)
+            elif operation in PROFILE_OPERATIONS:
+                profile = load_column_profile(uploaded_file, df)
+            elif operation in MODEL_OPERATIONS and not admitted['sample_rows']:
+                profile = load_cluster_model(uploaded_file, df, admitted)
+            elif operation in TIME_INDEX_OPERATIONS and not admitted['sample_rows']:
+                profile = load_time_index(uploaded_file, df, admitted)
+            elif operation in MOMENT_OPERATIONS and not admitted['sample_rows']:
+                profile = load_moments(uploaded_file, df)
+            result = run_operation(df, operation, admitted, zone_maps, profile)
+        cache.set(cache_key, result)
+    try:
+        AnalysisResult.objects.create(
+            uploaded_file=uploaded_file,
+            operation=RESULT_OPERATIONS.get(operation, operation),
+            parameters=admitted,
+            result_data=result,
+            cache_key=cache_key,
+        )
+    except (DatabaseError, TypeError, ValueError):
+        pass  # Not storable (e.g. NaN values), serve it uncached
+    return result
+
+
+def carry_over_results(previous_hash, content_hash, rows):
+    """
+    Carry the cached results of a file over to its content after an append,
+    when the appended rows cannot have changed them.
+
+    Only filtered, unsampled results whose filters reject every appended row
+    qualify: they were computed on exactly the rows they would be computed
+    on now. They are stored in the shared cache under the new content's
+    keys; every other result is simply not found there and is recomputed on
+    demand.
+
+    Args:
+        previous_hash: Content hash before the append
+        content_hash: Content hash after the append
+        rows: pandas.DataFrame of the appended rows
+
+    Returns:
+        list: Unsaved AnalysisResult instances for the carried results, to be
+        attached to the file once it points at the new content
+    """
+    operations = {choice: name for name, choice in RESULT_OPERATIONS.items()}
+    cache = caches[settings.RESULT_CACHE_ALIAS]
+    carried = {}
+    previous = AnalysisResult.objects.filter(uploaded_file__content_hash=previous_hash)
+    for stored in previous.exclude(cache_key=''):
+        params = stored.parameters
+        operation = operations.get(stored.operation, stored.operation)
+        if not params.get('filters') or params.get('sample_rows') is not None:
+            continue
+        if stored.cache_key != result_cache_key(previous_hash, operation, params):
+            continue  # Stored under other parameters (e.g. degraded by admission)
+        try:
+            if len(apply_filters(rows, params['filters'])):
+                continue
+        except (KeyError, ValueError, TypeError):
+            continue
+        cache_key = result_cache_key(content_hash, operation, params)
+        if cache_key in carried:
+            continue
+        result = cache.get(stored.cache_key) or stored.result_data
+        cache.set(cache_key, result)
+        carried[cache_key] = AnalysisResult(operation=stored.operation, parameters=params,
+                                            result_data=result, cache_key=cache_key)
+    return list(carried.values())
@@ -0,0 +1,122 @@
+"""
+Single-flight coordination for the DataAnalysis app.
+Makes concurrent identical computations run once: the first caller takes
+the key's lock and computes, the others wait for it and then find the
+result in the shared cache. Threads of one process wait on an in-memory
+lock; processes (gunicorn workers, containers sharing the media volume)
+wait on a lock file, which the OS releases if its holder dies.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Not POSIX: coordinate threads of this process only
+    fcntl = None
+
+
+POLL_INTERVAL = 0.05  # Seconds between attempts to take a lock file
+
+_local_locks = {}
+_local_guard = threading.Lock()
+
+
+def _lock_dir():
+    return os.path.join(settings.MEDIA_ROOT, 'cache', 'locks')
+
+
+@contextmanager
+def _local_lock(key, timeout):
+    with _local_guard:
+        entry = _local_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    acquired = entry[0].acquire(timeout=timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            entry[0].release()
+        with _local_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _local_locks[key]
+
+
+def _acquire_file_lock(path, deadline):
+    """
+    Take an exclusive lock on a lock file.
+
+    Returns:
+        int or None: Descriptor holding the lock, None on timeout
+    """
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        os.close(fd)
+                        return None
+                    time.sleep(POLL_INTERVAL)
+            # The previous holder unlinks the file before releasing it; a lock
+            # on an unlinked file excludes nobody, so start over on the new one
+            try:
+                if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        except BaseException:
+            os.close(fd)
+            raise
+        os.close(fd)
+
+
+@contextmanager
+def single_flight(key, timeout=None):
+    """
+    Hold the lock of a computation key across threads and processes.
+
+    Callers should check for a cached result again once inside: a caller
+    that waited usually finds it there. If the lock cannot be taken within
+    the timeout the caller proceeds without it rather than fail.
+
+    Args:
+        key: Identifier of the computation (e.g. a result cache key)
+        timeout: Maximum seconds to wait (settings.SINGLE_FLIGHT_TIMEOUT)
+
+    Yields:
+        bool: Whether the lock was obtained
+    """
+    if timeout is None:
+        timeout = settings.SINGLE_FLIGHT_TIMEOUT
+    deadline = time.monotonic() + timeout
+
+    with _local_lock(key, timeout) as acquired:
+        if not acquired or fcntl is None:
+            yield acquired
+            return
+
+        os.makedirs(_lock_dir(), exist_ok=True)
+        path = os.path.join(_lock_dir(), f'{key}.lock')
+        fd = _acquire_file_lock(path, deadline)
+        if fd is None:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
@@ -0,0 +1,56 @@
+"""
+Shared test fixtures: a temporary media directory and result cache per
+test, and uploads through the upload endpoint.
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from dataanalysis.models import UploadedFile
+
+
+class MediaTestCase(TestCase):
+    """TestCase with its own MEDIA_ROOT and shared result cache."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = Path(tempfile.mkdtemp(prefix='modelyourdata-tests-'))
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        caches = {**settings.CACHES, settings.RESULT_CACHE_ALIAS: {
+            'BACKEND': 'dataanalysis.cache.DiskCache',
+            'LOCATION': self.media_root / 'cache' / 'shared',
+            'TIMEOUT': None,
+        }}
+        overrides = override_settings(
+            MEDIA_ROOT=self.media_root,
+            CACHES=caches,
+            STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def upload(self, content, name='data.csv', status=200):
+        """Upload a file through the upload endpoint and return its UploadedFile."""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        response = self.client.post('/upload/', {'csv_file': SimpleUploadedFile(name, content)})
+        self.assertEqual(response.status_code, status, response.content)
+        if status != 200:
+            return response
+        return UploadedFile.objects.get(id=response.json()['file_id'])
+
+    def streamed_content(self, response):
+        """Read the whole body of a streamed response, sync or async."""
+        if not response.is_async:
+            return b''.join(response.streaming_content)
+
+        async def read():
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        return async_to_sync(read)()
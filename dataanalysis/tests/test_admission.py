@@ -0,0 +1,162 @@
+"""
+Tests of memory admission control and RSS-based worker recycling.
+"""
+
+import sys
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import SimpleTestCase, override_settings
+
+from dataanalysis import admission, middleware
+from dataanalysis.admission import (
+    MIN_SAMPLE_ROWS,
+    AdmissionError,
+    admit,
+    current_rss,
+    estimate_peak_memory,
+)
+from dataanalysis.middleware import WorkerRecycleMiddleware
+from dataanalysis.results import get_analysis_result
+
+from .base import MediaTestCase
+
+
+MB = 1024 * 1024
+
+
+def _file(rows=100_000, columns=('integer', 'float', 'string')):
+    """Stand-in for an UploadedFile with an upload schema."""
+    return SimpleNamespace(row_count=rows, file_size=rows * 20,
+                           schema={'columns': [{'name': f'c{i}', 'type': kind}
+                                               for i, kind in enumerate(columns)]})
+
+
+@override_settings(ANALYSIS_MEMORY_BUDGET=512 * MB, ADMISSION_QUEUE_TIMEOUT=0.1)
+class AdmissionTests(SimpleTestCase):
+
+    def test_estimates_grow_with_rows_and_operation(self):
+        small, large = _file(1000), _file(1_000_000)
+        self.assertLess(estimate_peak_memory(small, 'clustering'), estimate_peak_memory(large, 'clustering'))
+        self.assertLess(estimate_peak_memory(large, 'table'), estimate_peak_memory(large, 'clustering'))
+        self.assertLess(estimate_peak_memory(large, 'clustering', sample_rows=1000),
+                        estimate_peak_memory(large, 'clustering'))
+        # Without a schema the file size is all there is to go by
+        unknown = SimpleNamespace(row_count=None, file_size=MB, schema={})
+        self.assertGreater(estimate_peak_memory(unknown, 'table'), MB)
+
+    def test_admits_what_fits(self):
+        with admit(_file(), 'clustering', {'sample_rows': None}) as params:
+            self.assertEqual(params, {'sample_rows': None})
+            self.assertGreater(admission._reserved, 0)
+        self.assertEqual(admission._reserved, 0)
+
+    def test_degrades_what_never_fits_to_a_sample(self):
+        uploaded_file = _file(3_000_000)
+        with admit(uploaded_file, 'clustering', {'sample_rows': None}) as params:
+            sample_rows = params['sample_rows']
+        self.assertGreaterEqual(sample_rows, MIN_SAMPLE_ROWS)
+        self.assertLess(sample_rows, uploaded_file.row_count)
+        self.assertLessEqual(estimate_peak_memory(uploaded_file, 'clustering', sample_rows), 512 * MB)
+
+    def test_rejects_what_cannot_be_sampled(self):
+        # Parsing alone exceeds the budget, so no sample fits
+        with self.assertRaises(AdmissionError):
+            with admit(_file(20_000_000), 'clustering', {'sample_rows': None}):
+                pass
+        with override_settings(ANALYSIS_MEMORY_BUDGET=MB):
+            with self.assertRaises(AdmissionError):
+                with admit(_file(), 'table', {'sample_rows': None}):
+                    pass
+        self.assertEqual(admission._reserved, 0)
+
+    def test_waits_for_running_analyses(self):
+        uploaded_file = _file(1_000_000)
+        params = {'sample_rows': None}
+        self.assertGreater(2 * estimate_peak_memory(uploaded_file, 'clustering'), 512 * MB)
+
+        with admit(uploaded_file, 'clustering', params):
+            with self.assertRaisesMessage(AdmissionError, 'busy'):
+                with admit(uploaded_file, 'clustering', params):
+                    pass
+
+        # Admitted once the running analysis releases its reservation
+        release = threading.Event()
+        admitted = []
+
+        def run():
+            with admit(uploaded_file, 'clustering', params):
+                release.wait()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        with override_settings(ADMISSION_QUEUE_TIMEOUT=5):
+            threading.Timer(0.1, release.set).start()
+            with admit(uploaded_file, 'clustering', params):
+                admitted.append(True)
+        thread.join()
+        self.assertEqual(admitted, [True])
+        self.assertEqual(admission._reserved, 0)
+
+
+class DegradedAnalysisTests(MediaTestCase):
+
+    def test_degraded_results_report_their_sample(self):
+        rows = 20_000
+        uploaded_file = self.upload('x,y\n' + ''.join(f'{i},{i % 7}\n' for i in range(rows)))
+        # A budget with room for 5000 of the rows on top of the fixed cost
+        fixed, per_row, _ = admission._memory_cost(uploaded_file, 'distribution')
+        with override_settings(ANALYSIS_MEMORY_BUDGET=int(fixed + per_row * 5000)):
+            result = get_analysis_result(uploaded_file, 'distribution')
+        self.assertEqual(result['sample'], {'rows': 5000, 'total_rows': rows})
+
+
+class CurrentRssTests(SimpleTestCase):
+
+    def test_reads_proc(self):
+        rss = current_rss()
+        if rss is None:
+            self.skipTest('/proc is not available')
+        self.assertGreater(rss, MB)
+
+    def test_none_without_proc(self):
+        with mock.patch('builtins.open', side_effect=FileNotFoundError):
+            self.assertIsNone(current_rss())
+            self.assertIsNone(current_rss(12345))
+
+
+@override_settings(WORKER_MAX_RSS=100 * MB)
+class WorkerRecycleTests(SimpleTestCase):
+
+    def setUp(self):
+        # Only workers of a gunicorn arbiter recycle themselves
+        patcher = mock.patch.dict(sys.modules, {'gunicorn': mock.MagicMock()})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(middleware.os, 'kill')
+        self.kill = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def respond(self, *rss):
+        recycle = WorkerRecycleMiddleware(lambda request: HttpResponse('ok'))
+        with mock.patch.object(middleware, 'current_rss', side_effect=list(rss)):
+            response = recycle(mock.MagicMock())
+        self.assertEqual(response.content, b'ok')
+        return recycle
+
+    def test_recycles_above_the_limit(self):
+        recycle = self.respond(200 * MB, 150 * MB)
+        self.kill.assert_called_once()
+        self.assertTrue(recycle.recycling)
+
+    def test_keeps_workers_below_the_limit(self):
+        self.respond(50 * MB)
+        self.respond(200 * MB, 50 * MB)  # Freed by garbage collection
+        self.kill.assert_not_called()
+
+    def test_keeps_workers_whose_rss_is_unknown(self):
+        self.respond(None)
+        self.respond(200 * MB, None)
+        self.kill.assert_not_called()
@@ -0,0 +1,264 @@
+"""
+Tests of appending rows to a file: checking the rows against its columns,
+the extended column store, and statistics merged from the new rows alone.
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase
+from sklearn.linear_model import LinearRegression
+
+from dataanalysis.datasets import (
+    COLUMN_STORE_NAME,
+    MOMENTS_NAME,
+    NO_ARTIFACT,
+    PROFILE_NAME,
+    artifact_key,
+    load_column_profile,
+    load_dataframe,
+    load_moments,
+    load_row_index,
+)
+from dataanalysis.models import UploadedFile
+from dataanalysis.utils import profiling
+from dataanalysis.utils.columnar import (
+    append_column_store,
+    open_column_store,
+    open_time_index,
+    write_column_store,
+)
+from dataanalysis.utils.paging import build_row_index
+from dataanalysis.utils.parsing import append_column_types, conform_rows
+from dataanalysis.utils.profiling import (
+    build_column_profile,
+    build_moments,
+    correlation_from_moments,
+    merge_column_profiles,
+    regression_from_moments,
+    update_moments,
+)
+
+from .base import MediaTestCase
+
+
+def _frame(rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=rows)
+    df = pd.DataFrame({'x': x, 'y': 3 * x + rng.normal(scale=0.5, size=rows) + 1,
+                       'n': rng.integers(0, 100, size=rows), 'label': rng.choice(['a', 'b', 'c'], size=rows)})
+    df.loc[::17, 'y'] = np.nan
+    return df
+
+
+class MomentsTests(SimpleTestCase):
+
+    def test_correlation_matches_pairwise_corr(self):
+        df = _frame()
+        moments = build_moments(df)
+        self.assertEqual(moments['columns'], ['x', 'y', 'n'])
+        pd.testing.assert_frame_equal(correlation_from_moments(moments, ['y', 'x', 'n']),
+                                      df[['y', 'x', 'n']].corr())
+
+    def test_updated_moments_match_the_whole_frame(self):
+        df = _frame()
+        moments = update_moments(build_moments(df.iloc[:100]), df.iloc[100:], chunk_rows=64)
+        expected = build_moments(df)
+        pd.testing.assert_frame_equal(correlation_from_moments(moments, ['x', 'y', 'n']),
+                                      correlation_from_moments(expected, ['x', 'y', 'n']))
+        np.testing.assert_array_equal(moments['n'], expected['n'])
+
+    def test_regression_matches_linear_regression(self):
+        df = _frame().dropna()
+        slope, intercept, r2 = regression_from_moments(build_moments(df), 'x', 'y')
+        model = LinearRegression().fit(df[['x']], df['y'])
+        self.assertAlmostEqual(slope, model.coef_[0])
+        self.assertAlmostEqual(intercept, model.intercept_)
+        self.assertAlmostEqual(r2, model.score(df[['x']], df['y']))
+
+    def test_constant_columns(self):
+        df = pd.DataFrame({'x': [1.0, 2.0, 3.0], 'c': [5.0, 5.0, 5.0]})
+        moments = build_moments(df)
+        self.assertTrue(np.isnan(correlation_from_moments(moments, ['c'])).all().all())
+        self.assertEqual(regression_from_moments(moments, 'x', 'c'), (0.0, 5.0, 1.0))
+        with self.assertRaises(ValueError):
+            regression_from_moments(build_moments(df.iloc[:1]), 'x', 'c')
+
+    def test_too_many_columns(self):
+        with mock.patch.object(profiling, 'MOMENTS_MAX_COLUMNS', 2):
+            self.assertIsNone(build_moments(_frame()))
+
+
+class MergeProfileTests(SimpleTestCase):
+
+    def test_merged_profile_matches_the_whole_frame(self):
+        df = _frame()
+        merged = merge_column_profiles(build_column_profile(df.iloc[:120]), build_column_profile(df.iloc[120:]))
+        self.assertEqual(merged['rows'], len(df))
+        for col in ('x', 'y', 'n'):
+            with self.subTest(col=col):
+                stats = merged['columns'][col]
+                values = df[col].dropna()
+                self.assertEqual(stats['count'], len(values))
+                self.assertAlmostEqual(stats['mean'], values.mean())
+                self.assertAlmostEqual(stats['std'], values.std())
+                self.assertEqual((stats['min'], stats['max']), (values.min(), values.max()))
+                self.assertIsNone(stats['box'])
+        label = merged['categorical']['label']
+        self.assertEqual(label['count'], len(df))
+        self.assertEqual(label['distinct'], 3)
+        self.assertEqual({value: count for value, count, _ in label['top'].top(3)},
+                         df['label'].value_counts().to_dict())
+
+    def test_single_appended_row(self):
+        df = _frame(rows=10)
+        merged = merge_column_profiles(build_column_profile(df.iloc[:9]), build_column_profile(df.iloc[9:]))
+        self.assertAlmostEqual(merged['columns']['x']['std'], df['x'].std())
+
+
+class ConformRowsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({'id': [1, 2], 'code': ['007', '010'], 'flag': [True, False],
+                                'when': pd.to_datetime(['2024-01-01', '2024-01-02'])})
+
+    def test_append_column_types(self):
+        self.assertEqual(append_column_types(self.df), {'code': 'string', 'when': 'datetime'})
+
+    def test_rows_are_cast(self):
+        rows = pd.DataFrame({'id': [np.nan], 'code': ['3'], 'flag': [True],
+                             'when': pd.to_datetime(['2024-02-01'])}, index=[5])
+        conformed = conform_rows(self.df, rows)
+        self.assertEqual(conformed.index.tolist(), [0])
+        self.assertEqual(conformed['id'].dtype, float)
+        self.assertEqual(conformed['when'].dtype, self.df['when'].dtype)
+
+    def test_rows_that_do_not_fit(self):
+        rows = pd.DataFrame({'id': [3], 'code': ['x'], 'flag': [True], 'when': pd.to_datetime(['2024-02-01'])})
+        cases = {
+            'columns': (rows[['code', 'id', 'flag', 'when']], 'must have the columns'),
+            'numbers': (rows.assign(id=['three']), "Column 'id' expects numbers"),
+            'booleans': (rows.assign(flag=[1]), "Column 'flag' expects True/False"),
+            'dates': (rows.assign(when=['soon']), "Column 'when' expects dates"),
+            'time zone': (rows.assign(when=pd.to_datetime(['2024-02-01T00:00Z'])), 'time zone'),
+        }
+        for name, (bad, message) in cases.items():
+            with self.subTest(name=name):
+                with self.assertRaisesMessage(ValueError, message):
+                    conform_rows(self.df, bad)
+
+
+class AppendColumnStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='modelyourdata-tests-')
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def test_store_matches_the_combined_frame(self):
+        df = pd.DataFrame({'n': [3, 1, 2], 'when': pd.to_datetime(['2024-01-03', '2024-01-01', '2024-01-02']),
+                           'label': ['a', 'b', 'c']})
+        rows = pd.DataFrame({'n': [4.5, np.nan], 'when': pd.to_datetime(['2024-01-02', '2023-12-31']),
+                             'label': ['d', 'e']})
+        old, new = os.path.join(self.tmp, 'old'), os.path.join(self.tmp, 'new')
+        write_column_store(df, old)
+        append_column_store(old, rows, new)
+        store = open_column_store(new)
+        # Integers widen to floats for the missing value
+        self.assertEqual(store['n'].dtype, float)
+        pd.testing.assert_frame_equal(store, pd.concat([df, rows], ignore_index=True))
+        # Ties keep the earlier rows first
+        sorted_values, order = open_time_index(new, 'when')
+        self.assertEqual(order.tolist(), [4, 1, 2, 3, 0])
+        self.assertTrue((np.diff(sorted_values) >= np.timedelta64(0)).all())
+        self.assertEqual(len(open_column_store(old)), 3)
+
+
+class AppendEndpointTests(MediaTestCase):
+
+    def append(self, uploaded_file, content, status=200):
+        response = self.client.post(f'/api/append/{uploaded_file.id}/',
+                                    {'csv_file': SimpleUploadedFile('rows.csv', content.encode())})
+        self.assertEqual(response.status_code, status, response.content)
+        return response.json()
+
+    def test_append_rows(self):
+        df = _frame()
+        uploaded_file = self.upload(df.iloc[:200].to_csv(index=False))
+        previous_hash = uploaded_file.content_hash
+        load_column_profile(uploaded_file, load_dataframe(uploaded_file))
+        load_moments(uploaded_file, load_dataframe(uploaded_file))
+
+        result = self.append(uploaded_file, df.iloc[200:].to_csv(index=False))['data']
+        self.assertEqual((result['rows_appended'], result['row_count']), (100, 300))
+        uploaded_file.refresh_from_db()
+        self.assertNotEqual(uploaded_file.content_hash, previous_hash)
+        self.assertEqual(uploaded_file.row_count, 300)
+        np.testing.assert_array_equal(load_row_index(uploaded_file), build_row_index(uploaded_file.file.path))
+
+        combined = load_dataframe(uploaded_file)
+        pd.testing.assert_frame_equal(combined, df, check_exact=False)
+        # The statistics were merged, not rebuilt
+        cache = caches[settings.RESULT_CACHE_ALIAS]
+        profile = cache.get(artifact_key(PROFILE_NAME, uploaded_file.content_hash))
+        self.assertEqual(profile['rows'], 300)
+        moments = cache.get(artifact_key(MOMENTS_NAME, uploaded_file.content_hash))
+        pd.testing.assert_frame_equal(correlation_from_moments(moments, ['x', 'y', 'n']), df[['x', 'y', 'n']].corr())
+        store = os.path.join(uploaded_file.cache_dir, COLUMN_STORE_NAME)
+        pd.testing.assert_frame_equal(open_column_store(store), combined)
+
+    def test_row_index_is_extended(self):
+        df = pd.DataFrame({'n': np.arange(3500)})
+        # The appended rows start on and off a multiple of the index stride
+        for rows in (1000, 999):
+            with self.subTest(rows=rows):
+                uploaded_file = self.upload(df.iloc[:rows].to_csv(index=False))
+                self.append(uploaded_file, df.iloc[rows:].to_csv(index=False))
+                uploaded_file.refresh_from_db()
+                expected = build_row_index(uploaded_file.file.path)
+                self.assertEqual(len(expected), 4)
+                np.testing.assert_array_equal(load_row_index(uploaded_file), expected)
+
+    def test_skipped_moments_stay_skipped(self):
+        uploaded_file = self.upload(_frame(rows=50).to_csv(index=False))
+        with mock.patch.object(profiling, 'MOMENTS_MAX_COLUMNS', 2):
+            self.assertIsNone(load_moments(uploaded_file, load_dataframe(uploaded_file)))
+        self.append(uploaded_file, _frame(rows=5, seed=1).to_csv(index=False))
+        uploaded_file.refresh_from_db()
+        cache = caches[settings.RESULT_CACHE_ALIAS]
+        self.assertEqual(cache.get(artifact_key(MOMENTS_NAME, uploaded_file.content_hash)), NO_ARTIFACT)
+        self.assertIsNone(load_moments(uploaded_file, load_dataframe(uploaded_file)))
+
+    def test_other_uploads_keep_the_previous_content(self):
+        content = _frame(rows=20).to_csv(index=False)
+        first, second = self.upload(content), self.upload(content, name='copy.csv')
+        self.append(first, _frame(rows=5, seed=1).to_csv(index=False))
+        second.refresh_from_db()
+        self.assertEqual(len(load_dataframe(second)), 20)
+        self.assertEqual(UploadedFile.objects.get(id=first.id).row_count, 25)
+
+    def test_rows_that_do_not_fit(self):
+        uploaded_file = self.upload(_frame(rows=20).to_csv(index=False))
+        cases = {
+            'columns': ('x,y\n1,2\n', 'must have the columns'),
+            'types': ('x,y,n,label\n1,2,many,a\n', "Column 'n' expects numbers"),
+            'delimiter': ('x;y;n;label\n1;2;3;a\n', "delimited by ','"),
+            'no rows': ('x,y,n,label\n', 'no rows to append'),
+        }
+        for name, (content, message) in cases.items():
+            with self.subTest(name=name):
+                self.assertIn(message, self.append(uploaded_file, content, status=400)['error'])
+        uploaded_file.refresh_from_db()
+        self.assertEqual(uploaded_file.row_count, 20)
+
+    def test_form_errors(self):
+        uploaded_file = self.upload('a,b\n1,2\n')
+        response = self.client.post(f'/api/append/{uploaded_file.id}/', {})
+        self.assertEqual(response.status_code, 400)
+        self.assertIsInstance(response.json()['errors']['csv_file'], list)
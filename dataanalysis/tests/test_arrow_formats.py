@@ -0,0 +1,211 @@
+"""
+Tests of Parquet and Arrow IPC uploads: schemas read from file metadata,
+column types normalized to the CSV parser's and reads that only decode
+the columns and row groups they need.
+"""
+
+import decimal
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase
+
+from dataanalysis.datasets import (
+    COLUMN_STORE_NAME,
+    get_table_page,
+    load_column_schema,
+    load_dataframe,
+    load_filtered_columns,
+)
+from dataanalysis.utils import arrow_formats
+from dataanalysis.utils.arrow_formats import (
+    available,
+    filter_expression,
+    format_of,
+    inspect_file,
+    read_frame,
+    read_rows,
+    schema_profile,
+)
+from dataanalysis.utils.operations import profile_columns
+from dataanalysis.utils.query import parse_filter_spec
+
+from .base import MediaTestCase
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+
+def _table():
+    """Columns of every supported type, with missing values, in row groups of 4 rows."""
+    return pa.table({
+        'n': pa.array(range(10), pa.int64()),
+        'price': pa.array([decimal.Decimal(f'{i}.25') for i in range(9)] + [None], pa.decimal128(6, 2)),
+        'day': pa.array([pd.Timestamp('2024-01-01') + pd.Timedelta(days=i) for i in range(10)], pa.date32()),
+        'label': pa.array(['a', 'b', None, 'a', 'c', 'a', 'b', 'c', 'a', 'b']).dictionary_encode(),
+        'flag': pa.array([True, False] * 5),
+    })
+
+
+def _parquet_bytes(table, row_group_size=4):
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, row_group_size=row_group_size)
+    return buffer.getvalue()
+
+
+def _arrow_bytes(table, chunksize=4):
+    buffer = io.BytesIO()
+    feather.write_feather(table, buffer, compression='uncompressed', chunksize=chunksize)
+    return buffer.getvalue()
+
+
+@unittest.skipUnless(available(), "pyarrow is not installed")
+class ArrowFormatTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='modelyourdata-tests-')
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_format_of(self):
+        self.assertEqual(format_of('a.PARQUET'), 'parquet')
+        self.assertEqual(format_of('a.feather'), 'arrow')
+        self.assertEqual(format_of('a.arrow'), 'arrow')
+        self.assertIsNone(format_of('a.csv'))
+
+    def test_parquet_schema_from_metadata(self):
+        info = inspect_file(self.write('t.parquet', _parquet_bytes(_table())), 'parquet')
+        self.assertEqual(info['row_count'], 10)
+        schema = info['schema']
+        self.assertEqual(schema['row_groups'], [4, 4, 2])
+        columns = {column['name']: column for column in schema['columns']}
+        self.assertEqual({name: column['type'] for name, column in columns.items()},
+                         {'n': 'integer', 'price': 'float', 'day': 'datetime', 'label': 'string', 'flag': 'boolean'})
+        self.assertEqual((columns['n']['min'], columns['n']['max'], columns['n']['missing']), (0, 9, 0))
+        self.assertEqual(columns['price']['missing'], 1)
+        self.assertEqual((columns['day']['min'], columns['day']['max']), ('2024-01-01', '2024-01-10'))
+
+    def test_arrow_schema_from_batches(self):
+        info = inspect_file(self.write('t.arrow', _arrow_bytes(_table())), 'arrow')
+        self.assertEqual(info['schema']['row_groups'], [4, 4, 2])
+        missing = {column['name']: column['missing'] for column in info['schema']['columns']}
+        self.assertEqual(missing, {'n': 0, 'price': 1, 'day': 0, 'label': 1, 'flag': 0})
+
+    def test_unsupported_files(self):
+        nested = pa.table({'a': pa.array([[1, 2], [3]])})
+        with self.assertRaisesMessage(ValueError, "Column 'a' has an unsupported type"):
+            inspect_file(self.write('nested.parquet', _parquet_bytes(nested)), 'parquet')
+        with self.assertRaisesMessage(ValueError, 'not a valid parquet file'):
+            inspect_file(self.write('bad.parquet', b'a,b\n1,2\n'), 'parquet')
+        with self.assertRaisesMessage(ValueError, 'not a valid arrow file'):
+            inspect_file(self.write('bad.arrow', b'a,b\n1,2\n'), 'arrow')
+        with mock.patch.object(arrow_formats, 'pa', None):
+            with self.assertRaisesMessage(ValueError, 'need pyarrow'):
+                inspect_file(self.write('t.parquet', b''), 'parquet')
+
+    def test_types_are_normalized(self):
+        for name, content in (('t.parquet', _parquet_bytes(_table())), ('t.arrow', _arrow_bytes(_table()))):
+            with self.subTest(name=name):
+                path = self.write(name, content)
+                df = read_frame(path, format_of(name))
+                self.assertEqual(df['price'].dtype, float)
+                self.assertTrue(np.isnan(df['price'].iloc[-1]))
+                self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['day']))
+                self.assertFalse(isinstance(df['label'].dtype, pd.CategoricalDtype))
+                self.assertEqual(df['label'].tolist()[:2], ['a', 'b'])
+
+    def test_schema_profile_matches_the_loaded_frame(self):
+        path = self.write('t.parquet', _parquet_bytes(_table()))
+        profile = schema_profile(inspect_file(path, 'parquet')['schema'])
+        expected = profile_columns(read_frame(path, 'parquet'))
+        for key, value in expected.items():
+            with self.subTest(key=key):
+                self.assertEqual(profile[key], value)
+
+    def test_filters_are_pushed_down(self):
+        schema = _table().schema
+        predicates = parse_filter_spec([
+            {'column': 'n', 'op': 'ge', 'value': 5},
+            {'column': 'label', 'op': 'in', 'value': ['a', 'b']},
+            {'column': 'label', 'op': 'ne', 'value': 'c'},
+            {'column': 'n', 'op': 'eq', 'value': 'not a number'},
+        ])
+        expression = filter_expression(predicates, schema)
+        self.assertIn('n', str(expression))
+        self.assertNotIn('not a number', str(expression))
+        self.assertIsNone(filter_expression(parse_filter_spec([{'column': 'n', 'op': 'ne', 'value': 1}]), schema))
+
+        path = self.write('t.parquet', _parquet_bytes(_table()))
+        df = read_frame(path, 'parquet', columns=['n', 'label'], predicates=predicates)
+        self.assertEqual(df.columns.tolist(), ['n', 'label'])
+        self.assertEqual(df['n'].tolist(), [5, 6, 8, 9])
+
+    def test_read_rows_across_row_groups(self):
+        for name, content in (('t.parquet', _parquet_bytes(_table())), ('t.arrow', _arrow_bytes(_table()))):
+            with self.subTest(name=name):
+                path = self.write(name, content)
+                page = read_rows(path, format_of(name), [4, 4, 2], 3, 6, ['n', 'label'])
+                self.assertEqual(page['n'].tolist(), [3, 4, 5, 6, 7, 8])
+                self.assertEqual(len(read_rows(path, format_of(name), [4, 4, 2], 10, 5, ['n'])), 0)
+
+
+@unittest.skipUnless(available(), "pyarrow is not installed")
+class ColumnFileUploadTests(MediaTestCase):
+
+    def test_parquet_upload(self):
+        content = _parquet_bytes(_table())
+        uploaded_file = self.upload(content, 'data.parquet')
+        self.assertTrue(uploaded_file.file.name.endswith('.parquet'))
+        self.assertEqual(uploaded_file.row_count, 10)
+        self.assertEqual(uploaded_file.schema['format'], 'parquet')
+        # Stored as uploaded
+        with open(uploaded_file.file.path, 'rb') as f:
+            self.assertEqual(f.read(), content)
+        df = load_dataframe(uploaded_file)
+        self.assertEqual(df['price'].dtype, float)
+        self.assertEqual(load_column_schema(uploaded_file)['numeric_columns'], ['n', 'price'])
+
+    def test_arrow_upload(self):
+        uploaded_file = self.upload(_arrow_bytes(_table()), 'data.feather')
+        self.assertEqual(uploaded_file.row_count, 10)
+        page = get_table_page(uploaded_file, offset=6, limit=3, col_limit=1)
+        self.assertEqual(page['rows'], [[6], [7], [8]])
+
+    def test_filtered_reads_skip_the_column_store(self):
+        uploaded_file = self.upload(_parquet_bytes(_table()), 'data.parquet')
+        df = load_filtered_columns(uploaded_file, ['label'], {'column': 'n', 'op': 'lt', 'value': 3})
+        self.assertEqual(df['label'].tolist()[:2], ['a', 'b'])
+        self.assertTrue(pd.isna(df['label'].iloc[2]))
+        self.assertFalse(os.path.exists(os.path.join(uploaded_file.cache_dir, COLUMN_STORE_NAME)))
+        with self.assertRaisesMessage(ValueError, 'Unknown column'):
+            load_filtered_columns(uploaded_file, ['missing'])
+
+    def test_invalid_uploads(self):
+        nested = _parquet_bytes(pa.table({'a': pa.array([[1, 2], [3]])}))
+        response = self.upload(nested, 'nested.parquet', status=400)
+        self.assertIn('unsupported type', response.json()['errors']['csv_file'][0])
+        response = self.upload(b'a,b\n1,2\n', 'data.parquet', status=400)
+        self.assertIn('not a valid parquet file', response.json()['errors']['csv_file'][0])
+
+    def test_rows_are_not_appended_to_column_files(self):
+        uploaded_file = self.upload(_parquet_bytes(_table()), 'data.parquet')
+        response = self.client.post(f'/api/append/{uploaded_file.id}/',
+                                    {'csv_file': SimpleUploadedFile('rows.csv', b'n\n1\n')})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('only be appended from and to CSV files', response.json()['error'])
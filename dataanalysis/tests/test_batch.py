@@ -0,0 +1,77 @@
+"""
+Tests of the batch endpoint.
+"""
+
+import json
+from unittest import mock
+
+from dataanalysis import executor
+
+from .base import MediaTestCase
+
+
+CSV = (
+    'name,age,salary,team\n'
+    + ''.join(f'p{i},{20 + i % 30},{30000 + 137 * i},{"abc"[i % 3]}\n' for i in range(60))
+)
+
+
+class BatchTests(MediaTestCase):
+    """api_batch: several operations on one load, streamed as NDJSON."""
+
+    def setUp(self):
+        super().setUp()
+        self.file = self.upload(CSV)
+
+    def _batch(self, operations, parallel=True):
+        response = self.client.post(f'/api/batch/{self.file.id}/',
+                                    json.dumps({'operations': operations, 'parallel': parallel}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in self.streamed_content(response).splitlines()]
+
+    def test_profile_then_one_result_per_operation(self):
+        operations = [{'operation': 'table'}, {'operation': 'statistics'},
+                      {'operation': 'histogram', 'params': {'column': 'age', 'bins': 5}}]
+        for parallel in (False, True):
+            with self.subTest(parallel=parallel):
+                parts = self._batch(operations, parallel)
+                self.assertEqual(parts[0]['type'], 'profile')
+                self.assertEqual(parts[0]['data']['all_columns'], ['name', 'age', 'salary', 'team'])
+                results = sorted(parts[1:], key=lambda part: part['index'])
+                self.assertEqual([part['operation'] for part in results], ['table', 'statistics', 'histogram'])
+                self.assertTrue(all(part['success'] for part in results))
+
+    def test_results_match_the_single_operation_endpoints(self):
+        parts = self._batch([{'operation': 'statistics'}])
+        single = self.client.get(f'/api/statistics/{self.file.id}/').json()['data']
+        self.assertEqual(parts[1]['data'], single)
+
+    def test_failing_operation_does_not_fail_the_batch(self):
+        parts = self._batch([{'operation': 'outliers', 'params': {'columns': 'team'}},
+                             {'operation': 'table'}], parallel=False)
+        self.assertFalse(parts[1]['success'])
+        self.assertTrue(parts[1]['error'])
+        self.assertTrue(parts[2]['success'])
+
+    def test_invalid_batches_are_rejected(self):
+        for body in ({'operations': []}, {'operations': [{'operation': 'nope'}]},
+                     {'operations': [{'operation': 'table'}] * 21}):
+            with self.subTest(body=body):
+                response = self.client.post(f'/api/batch/{self.file.id}/', json.dumps(body),
+                                            content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+
+    def test_busy_executor(self):
+        body = json.dumps({'operations': [{'operation': 'table'}]})
+        with mock.patch.object(executor, '_in_flight', 10 ** 6):
+            response = self.client.post(f'/api/batch/{self.file.id}/', body, content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()['success'])
+
+    def test_analysis_page_prefetches_the_warmed_up_operations(self):
+        response = self.client.get(f'/analysis/{self.file.id}/')
+        self.assertEqual(json.loads(response.context['warmup_operations']),
+                         ['table', 'statistics', 'correlation', 'distribution'])
@@ -0,0 +1,127 @@
+"""
+Tests of the shared disk cache backend.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from dataanalysis.cache import INDEX_NAME, DiskCache
+
+
+class DiskCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp(prefix='modelyourdata-tests-')
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return DiskCache(self.location, {'TIMEOUT': None, 'OPTIONS': options})
+
+    def value_files(self):
+        return [name for _, _, files in os.walk(self.location) for name in files
+                if not name.startswith(INDEX_NAME)]
+
+    def test_get_set_delete(self):
+        value = {'array': np.arange(5), 'text': 'hello'}
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+        self.cache.set('key', value)
+        cached = self.cache.get('key')
+        np.testing.assert_array_equal(cached['array'], value['array'])
+        self.assertTrue(self.cache.has_key('key'))
+
+        self.cache.set('key', 'replaced')
+        self.assertEqual(self.cache.get('key'), 'replaced')
+        self.assertEqual(len(self.value_files()), 1)
+
+        self.assertTrue(self.cache.delete('key'))
+        self.assertFalse(self.cache.delete('key'))
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertEqual(self.value_files(), [])
+
+    def test_add_only_if_missing(self):
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 1)
+        self.assertEqual(len(self.value_files()), 1)
+
+    def test_entries_expire(self):
+        self.cache.set('short', 1, timeout=0.05)
+        self.cache.set('forever', 2)
+        time.sleep(0.1)
+        self.assertFalse(self.cache.has_key('short'))
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short', 3))
+        self.assertEqual(self.cache.get('forever'), 2)
+        self.assertTrue(self.cache.touch('forever', timeout=0.05))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('forever'))
+
+    def test_processes_share_entries(self):
+        # Another instance (as in another worker) on the same location
+        self.cache.set('key', 'shared')
+        other = self.make_cache()
+        self.assertEqual(other.get('key'), 'shared')
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_threads_share_entries(self):
+        def store(i):
+            self.cache.set(f'key-{i}', i)
+
+        threads = [threading.Thread(target=store, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([self.cache.get(f'key-{i}') for i in range(8)], list(range(8)))
+
+    def test_culls_least_recently_used_entries(self):
+        cache = self.make_cache(MAX_ENTRIES=10)
+        for i in range(10):
+            cache.set(f'key-{i}', i)
+        cache.get('key-0')  # Now the most recently used
+        cache.set('key-10', 10)
+        # Culled down to 90% of the limit, oldest first
+        remaining = [i for i in range(11) if cache.has_key(f'key-{i}')]
+        self.assertEqual(remaining, [0, 3, 4, 5, 6, 7, 8, 9, 10])
+        self.assertEqual(len(self.value_files()), 9)
+
+    def test_culls_by_size(self):
+        cache = self.make_cache(MAX_SIZE=10_000)
+        for i in range(5):
+            cache.set(f'key-{i}', b'x' * 3000)
+        remaining = [i for i in range(5) if cache.has_key(f'key-{i}')]
+        self.assertEqual(remaining, [2, 3, 4])
+
+    def test_culls_expired_entries_first(self):
+        cache = self.make_cache(MAX_ENTRIES=10)
+        for i in range(9):
+            cache.set(f'key-{i}', i)
+        cache.set('expiring', 'x', timeout=0.05)  # The most recently used
+        time.sleep(0.1)
+        cache.set('key-9', 9)
+        # Dropping the expired entry leaves one entry to cull, not two
+        remaining = [i for i in range(10) if cache.has_key(f'key-{i}')]
+        self.assertEqual(remaining, list(range(1, 10)))
+        self.assertEqual(len(self.value_files()), 9)
+
+    def test_clear(self):
+        for i in range(3):
+            self.cache.set(f'key-{i}', i)
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('key-0'))
+        self.assertEqual(self.value_files(), [])
+
+    def test_missing_value_file(self):
+        self.cache.set('key', 1)
+        for name in self.value_files():
+            os.remove(os.path.join(self.location, name[:2], name))
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
@@ -0,0 +1,139 @@
+"""
+Tests of clustering on principal components and the cached projection.
+"""
+
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+from sklearn.decomposition import PCA, IncrementalPCA
+
+from dataanalysis import datasets
+from dataanalysis.datasets import load_dataframe, load_projection
+from dataanalysis.utils import analysis
+from dataanalysis.utils.analysis import (
+    PCA_MAX_COMPONENTS,
+    fit_clusters,
+    fit_projection,
+    perform_clustering,
+    predict_clusters,
+    wants_projection,
+)
+from dataanalysis.utils.operations import normalize_params
+
+from .base import MediaTestCase
+
+
+def _blobs(rows=300, columns=6, seed=0):
+    """Three well separated groups spread over a few directions of many columns."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(scale=10, size=(3, 2)) @ rng.normal(size=(2, columns))
+    labels = np.arange(rows) % 3
+    values = centers[labels] + rng.normal(scale=0.5, size=(rows, columns))
+    df = pd.DataFrame(values, columns=[f'x{i}' for i in range(columns)])
+    return df, labels
+
+
+class ProjectionTests(SimpleTestCase):
+
+    def test_wants_projection(self):
+        self.assertFalse(wants_projection(['a', 'b']))
+        self.assertTrue(wants_projection(['a', 'b', 'c']))
+        self.assertTrue(wants_projection(['a', 'b'], 'pca'))
+        self.assertFalse(wants_projection(['a', 'b', 'c'], 'none'))
+
+    def test_fit_projection(self):
+        df, _ = _blobs(columns=30)
+        df.iloc[0, 0] = np.nan
+        projection = fit_projection(df, list(df.columns))
+        self.assertIsInstance(projection['pca'], PCA)
+        self.assertEqual(projection['pca'].n_components_, PCA_MAX_COMPONENTS)
+        self.assertEqual(projection['columns'], list(df.columns))
+        # Three groups lie in a plane: two components explain nearly everything
+        self.assertGreater(projection['pca'].explained_variance_ratio_[:2].sum(), 0.9)
+
+    def test_large_matrices_fit_incrementally(self):
+        df, _ = _blobs(rows=600, columns=8)
+        with mock.patch.object(analysis, 'PCA_INCREMENTAL_CELLS', 1000), \
+                mock.patch.object(analysis, 'PCA_BATCH_ROWS', 100):
+            projection = fit_projection(df, list(df.columns))
+        self.assertIsInstance(projection['pca'], IncrementalPCA)
+        self.assertGreater(projection['pca'].explained_variance_ratio_[:2].sum(), 0.9)
+
+    def test_not_enough_rows(self):
+        with self.assertRaises(ValueError):
+            fit_projection(pd.DataFrame({'a': [1.0, np.nan], 'b': [1.0, 2.0], 'c': [3.0, 4.0]}), ['a', 'b', 'c'])
+
+
+class FitClustersTests(SimpleTestCase):
+
+    def assert_recovers(self, clusters, labels):
+        # Same partition, whatever the cluster numbering
+        self.assertEqual(len(set(zip(clusters, labels))), 3)
+
+    def test_clusters_on_leading_components(self):
+        df, labels = _blobs(columns=10)
+        model = fit_clusters(df, 3, list(df.columns))
+        self.assertEqual(model['n_components'], 2)
+        self.assert_recovers(predict_clusters(model, df), labels)
+
+    def test_component_count(self):
+        df, _ = _blobs(columns=10)
+        self.assertEqual(fit_clusters(df, 3, list(df.columns), n_components=5)['n_components'], 5)
+        # At least the two plotted, at most those fitted
+        self.assertEqual(fit_clusters(df, 3, list(df.columns), n_components=1)['n_components'], 2)
+        self.assertEqual(fit_clusters(df, 3, list(df.columns), n_components=50)['n_components'], 10)
+
+    def test_raw_columns_without_reduction(self):
+        df, labels = _blobs(columns=4)
+        model = fit_clusters(df, 3, list(df.columns), reduce='none')
+        self.assertIsNone(model['pca'])
+        self.assertIsNone(model['n_components'])
+        self.assert_recovers(predict_clusters(model, df), labels)
+
+    def test_reuses_a_matching_projection(self):
+        df, _ = _blobs(columns=5)
+        projection = fit_projection(df, list(df.columns))
+        with mock.patch.object(analysis, 'fit_projection') as fit:
+            model = fit_clusters(df, 4, list(df.columns), projection=projection)
+        fit.assert_not_called()
+        self.assertIs(model['pca'], projection['pca'])
+
+    def test_perform_clustering(self):
+        df, _ = _blobs(columns=6)
+        result = perform_clustering(df, 3, list(df.columns))
+        self.assertEqual(result['n_components'], 2)
+        self.assertEqual(len(result['explained_variance']), 2)
+        self.assertEqual(sum(result['cluster_sizes'].values()), len(df))
+        self.assertTrue(result['image'])
+        result = perform_clustering(df, 3, ['x0', 'x1'])
+        self.assertNotIn('explained_variance', result)
+
+
+class ProjectionCacheTests(MediaTestCase):
+
+    def test_projection_is_shared_across_requests(self):
+        df, _ = _blobs(columns=5)
+        uploaded_file = self.upload(df.to_csv(index=False))
+        df = load_dataframe(uploaded_file)
+        columns = ','.join(df.columns)
+        with mock.patch.object(datasets, 'fit_projection', wraps=fit_projection) as fit:
+            for k in (2, 3, 4):
+                params = normalize_params('clustering', {'n_clusters': k, 'columns': columns})
+                load_projection(uploaded_file, df, params)
+        self.assertEqual(fit.call_count, 1)
+        params = normalize_params('clustering', {'columns': 'x0,x1'})
+        self.assertIsNone(load_projection(uploaded_file, df, params))
+
+    def test_endpoint(self):
+        df, _ = _blobs(columns=5)
+        uploaded_file = self.upload(df.to_csv(index=False))
+        response = self.client.get(f'/api/clustering/{uploaded_file.id}/',
+                                   {'columns': ','.join(df.columns), 'n_clusters': 3, 'n_components': 3})
+        self.assertEqual(response.status_code, 200, response.content)
+        result = response.json()['data']
+        self.assertEqual(result['n_components'], 3)
+        self.assertEqual(len(result['explained_variance']), 3)
+        response = self.client.get(f'/api/clustering/{uploaded_file.id}/', {'reduce': 'tsne'})
+        self.assertEqual(response.status_code, 400)
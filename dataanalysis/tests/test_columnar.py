@@ -0,0 +1,150 @@
+"""
+Tests of the on-disk structures parsed files are served from: the CSV
+row-offset index and the memory-mapped column store.
+"""
+
+import mmap
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from dataanalysis.datasets import COLUMN_STORE_NAME, load_dataframe
+from dataanalysis.utils.columnar import MANIFEST_NAME, open_column_store, write_column_store
+from dataanalysis.utils.paging import RecordScanner, build_row_index, read_csv_rows
+
+from .base import MediaTestCase
+
+
+def _is_mapped(values):
+    while isinstance(values, np.ndarray):
+        if isinstance(values, np.memmap):
+            return True
+        values = values.base
+    return isinstance(values, mmap.mmap)
+
+
+class TempDirTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='modelyourdata-tests-')
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+
+class RecordScannerTests(SimpleTestCase):
+
+    def scan(self, data, chunk_size, stride=2):
+        scanner = RecordScanner(stride=stride)
+        for start in range(0, len(data), chunk_size):
+            scanner.feed(data[start:start + chunk_size])
+        return scanner
+
+    def test_quoted_newlines_do_not_end_records(self):
+        data = b'a,b\n1,"x\ny"\n2,"say ""hi""\n"\n3,z\n4,w\n'
+        # Data rows 0, 2 and 4 (none, past the end of the data)
+        expected = [data.index(b'1,'), data.index(b'3,'), len(data)]
+        # Quotes and newlines split across chunks of every size
+        for chunk_size in range(1, len(data) + 1):
+            with self.subTest(chunk_size=chunk_size):
+                scanner = self.scan(data, chunk_size)
+                self.assertEqual(scanner.newlines, 5)
+                self.assertEqual(scanner.offsets, expected)
+                self.assertEqual(scanner.row_offsets(4), expected[:2])
+
+    def test_row_offsets_drop_offsets_past_the_last_row(self):
+        scanner = self.scan(b'a\n1\n2\n', 4)
+        self.assertEqual(scanner.offsets, [2, 6])
+        self.assertEqual(scanner.row_offsets(2), [2])
+
+    def test_resumed_scan_matches_a_full_scan(self):
+        head, tail = b'a,b\n1,"x\ny"\n2,3\n', b'4,"5\n"\n6,7\n8,9\n'
+        full = self.scan(head + tail, 5)
+        first = self.scan(head, 5)
+        resumed = RecordScanner(stride=2, newlines=first.newlines, position=len(head))
+        resumed.feed(tail)
+        self.assertEqual(first.offsets + resumed.offsets, full.offsets)
+
+
+class RowIndexTests(TempDirTestCase):
+
+    def test_index_reads_rows_with_quoted_newlines(self):
+        df = pd.DataFrame({'n': range(2500), 'text': [f'line {i}\nnext' if i % 3 else f'{i}' for i in range(2500)]})
+        path = os.path.join(self.tmp, 'data.csv')
+        df.to_csv(path, index=False)
+        index = build_row_index(path)
+        self.assertEqual(len(index), 3)
+        for offset in (0, 999, 1000, 2499):
+            page = read_csv_rows(path, index, offset, 3, ['n', 'text'])
+            expected = df.iloc[offset:offset + 3]
+            self.assertEqual(page['n'].tolist(), expected['n'].tolist())
+            self.assertEqual(page['text'].astype(str).tolist(), expected['text'].tolist())
+
+    def test_file_without_final_newline(self):
+        path = os.path.join(self.tmp, 'data.csv')
+        with open(path, 'wb') as f:
+            f.write(b'a\n' + b'\n'.join(str(i).encode() for i in range(1000)))
+        self.assertEqual(build_row_index(path).tolist(), [2])
+
+
+class ColumnStoreTests(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.df = pd.DataFrame({
+            'int': np.arange(100, dtype=np.int64),
+            'float': np.linspace(0, 1, 100),
+            'text': [f'row {i}' for i in range(100)],
+            'when': pd.date_range('2024-01-01', periods=100, freq='h'),
+            'flag': np.arange(100) % 2 == 0,
+        })
+        self.path = os.path.join(self.tmp, 'store')
+
+    def test_round_trip(self):
+        write_column_store(self.df, self.path)
+        stored = open_column_store(self.path)
+        self.assertEqual(stored.dtypes.tolist(), self.df.dtypes.tolist())
+        for name in self.df.columns:
+            np.testing.assert_array_equal(np.asarray(stored[name]), self.df[name].to_numpy())
+
+    def test_numeric_columns_are_mapped_read_only(self):
+        write_column_store(self.df, self.path)
+        stored = open_column_store(self.path)
+        self.assertFalse(_is_mapped(stored['text'].to_numpy()))
+        for name in ('int', 'float', 'when'):
+            values = stored[name].to_numpy()
+            self.assertTrue(_is_mapped(values), name)
+            self.assertFalse(values.flags.writeable)
+
+    def test_incomplete_or_missing_store(self):
+        self.assertIsNone(open_column_store(self.path))
+        write_column_store(self.df, self.path)
+        os.remove(os.path.join(self.path, MANIFEST_NAME))
+        self.assertIsNone(open_column_store(self.path))
+
+    def test_second_writer_keeps_the_first_store(self):
+        write_column_store(self.df, self.path)
+        write_column_store(self.df.head(10), self.path)
+        self.assertEqual(len(open_column_store(self.path)), 100)
+        self.assertEqual(sorted(os.listdir(self.tmp)), ['store'])
+
+    def test_empty_frame(self):
+        write_column_store(self.df.head(0), self.path)
+        stored = open_column_store(self.path)
+        self.assertEqual(stored.columns.tolist(), self.df.columns.tolist())
+        self.assertEqual(len(stored), 0)
+
+
+class LoadDataFrameTests(MediaTestCase):
+
+    def test_parsed_once_into_the_column_store(self):
+        uploaded_file = self.upload('a,b,c\n1,2.5,x\n3,,y\n')
+        first = load_dataframe(uploaded_file)
+        self.assertTrue(os.path.exists(os.path.join(uploaded_file.cache_dir, COLUMN_STORE_NAME, MANIFEST_NAME)))
+        second = load_dataframe(uploaded_file)
+        self.assertEqual(second.dtypes.tolist(), first.dtypes.tolist())
+        self.assertEqual(second['a'].tolist(), [1, 3])
+        self.assertTrue(np.isnan(second['b'][1]))
+        self.assertTrue(_is_mapped(second['a'].to_numpy()))
@@ -0,0 +1,168 @@
+"""
+Tests of compressed uploads and storage: streamed decompression, the
+independent gzip members files are stored as and reads seeking by them.
+"""
+
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from dataanalysis import upload_handlers
+from dataanalysis.datasets import load_block_index, load_dataframe
+from dataanalysis.utils import compression
+from dataanalysis.utils.compression import (
+    DECOMPRESS_PIECE_SIZE,
+    GzipBlockWriter,
+    StreamDecompressor,
+    compression_of,
+    gzip_block_index,
+    open_csv,
+)
+
+from .base import MediaTestCase
+
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+CONTENT = ''.join(f'{i},{i * 0.5},label{i % 7}\n' for i in range(20_000)).encode()
+
+
+def _decompress(compressed, name='gzip', chunk_size=4096):
+    pieces = []
+    decompressor = StreamDecompressor(name, pieces.append)
+    for start in range(0, len(compressed), chunk_size):
+        decompressor.feed(compressed[start:start + chunk_size])
+    decompressor.close()
+    return pieces
+
+
+class StreamDecompressorTests(SimpleTestCase):
+
+    def test_concatenated_members(self):
+        compressed = gzip.compress(CONTENT[:1000]) + gzip.compress(CONTENT[1000:])
+        self.assertEqual(b''.join(_decompress(compressed)), CONTENT)
+
+    def test_output_comes_in_bounded_pieces(self):
+        # A small, highly compressed upload is expanded a piece at a time
+        pieces = _decompress(gzip.compress(b'0' * (DECOMPRESS_PIECE_SIZE * 4)), chunk_size=1 << 20)
+        self.assertGreaterEqual(len(pieces), 4)
+        self.assertLessEqual(max(map(len, pieces)), DECOMPRESS_PIECE_SIZE)
+
+    def test_invalid_and_truncated_data(self):
+        with self.assertRaisesMessage(ValueError, 'not valid gzip data'):
+            _decompress(b'not gzip at all')
+        with self.assertRaisesMessage(ValueError, 'truncated'):
+            _decompress(gzip.compress(CONTENT)[:-100])
+
+    def test_zstd(self):
+        if zstandard is None:
+            self.skipTest('zstandard is not installed')
+        compressed = zstandard.ZstdCompressor().compress(CONTENT)
+        self.assertEqual(b''.join(_decompress(compressed, 'zstd')), CONTENT)
+
+    def test_zstd_requires_zstandard(self):
+        with mock.patch.object(compression, 'zstandard', None):
+            with self.assertRaisesMessage(ValueError, 'Unsupported compression: zstd'):
+                StreamDecompressor('zstd', print)
+
+    def test_compression_of(self):
+        self.assertEqual(compression_of('a.csv.GZ'), 'gzip')
+        self.assertEqual(compression_of('a.csv.zst'), 'zstd')
+        self.assertIsNone(compression_of('a.csv'))
+
+
+class GzipStorageTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='modelyourdata-tests-')
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.path = os.path.join(self.tmp, 'data.csv.gz')
+        with open(self.path, 'wb') as f:
+            self.writer = GzipBlockWriter(f, block_size=10_000)
+            for start in range(0, len(CONTENT), 3000):
+                self.writer.write(CONTENT[start:start + 3000])
+            self.writer.close()
+
+    def test_members_are_independent_blocks(self):
+        blocks = gzip_block_index(self.path)
+        self.assertEqual(len(blocks), -(-len(CONTENT) // 10_000))
+        self.assertEqual([tuple(block) for block in blocks.tolist()], self.writer.blocks)
+        self.assertEqual(self.writer.size, len(CONTENT))
+        with gzip.open(self.path) as f:
+            self.assertEqual(f.read(), CONTENT)
+
+    def test_open_csv_seeks_to_the_member(self):
+        blocks = gzip_block_index(self.path)
+        for offset in (0, 9_999, 10_000, 123_456, len(CONTENT)):
+            with self.subTest(offset=offset):
+                with open_csv(self.path, offset, blocks) as f:
+                    self.assertEqual(f.read(100), CONTENT[offset:offset + 100])
+                with open_csv(self.path, offset) as f:
+                    self.assertEqual(f.read(100), CONTENT[offset:offset + 100])
+
+    def test_plain_files(self):
+        path = os.path.join(self.tmp, 'data.csv')
+        with open(path, 'wb') as f:
+            f.write(CONTENT)
+        with open_csv(path, 50) as f:
+            self.assertEqual(f.read(10), CONTENT[50:60])
+        with self.assertRaises(ValueError):
+            with open_csv(path, compression='zstd'):
+                pass
+
+
+class CompressedUploadTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.csv = b'id,value,label\n' + CONTENT
+
+    def test_gzip_upload_shares_the_plain_file(self):
+        plain = self.upload(self.csv)
+        compressed = self.upload(gzip.compress(self.csv), 'data.csv.gz')
+        self.assertEqual(compressed.content_hash, hashlib.sha256(self.csv).hexdigest())
+        self.assertEqual((compressed.row_count, compressed.file_size), (20_000, len(self.csv)))
+        self.assertEqual(compressed.file.name, plain.file.name)
+        self.assertEqual(compression_of(compressed.file.name), 'gzip')
+        with gzip.open(compressed.file.path) as f:
+            self.assertEqual(f.read(), self.csv)
+        self.assertEqual(len(load_dataframe(compressed)), 20_000)
+        self.assertGreaterEqual(len(load_block_index(compressed)), 1)
+
+    def test_zstd_upload(self):
+        if zstandard is None:
+            self.skipTest('zstandard is not installed')
+        uploaded = self.upload(zstandard.ZstdCompressor().compress(self.csv), 'data.csv.zst')
+        self.assertEqual(uploaded.content_hash, hashlib.sha256(self.csv).hexdigest())
+
+    def test_zstd_upload_without_zstandard(self):
+        with mock.patch.object(compression, 'zstandard', None):
+            response = self.upload(b'\x28\xb5\x2f\xfd', 'data.csv.zst', status=400)
+        self.assertIn('Zstandard-compressed files are not supported', response.json()['errors']['csv_file'][0])
+
+    def test_decompressed_size_is_capped(self):
+        with mock.patch.object(upload_handlers, 'MAX_DATA_SIZE', 100_000):
+            response = self.upload(gzip.compress(self.csv), 'bomb.csv.gz', status=400)
+        self.assertIn('uncompressed file must be under', response.json()['errors']['csv_file'][0])
+
+    def test_invalid_gzip_upload(self):
+        response = self.upload(b'id,value\n1,2\n', 'data.csv.gz', status=400)
+        self.assertIn('not valid gzip data', response.json()['errors']['csv_file'][0])
+
+    def test_table_pages_read_by_member(self):
+        uploaded = self.upload(gzip.compress(self.csv), 'data.csv.gz')
+        response = self.client.get(f'/api/rows/{uploaded.id}/', {'offset': 15_000, 'limit': 3})
+        self.assertEqual(response.status_code, 200, response.content)
+        expected = pd.read_csv(io.BytesIO(self.csv)).iloc[15_000:15_003]
+        self.assertEqual([row[0] for row in response.json()['data']['rows']], expected['id'].tolist())
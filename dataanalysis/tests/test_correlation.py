@@ -0,0 +1,109 @@
+"""
+Tests of correlation matrices: clustered column order, the strongest pairs
+and drawing of wide matrices.
+"""
+
+from unittest import mock
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from dataanalysis.utils import analysis
+from dataanalysis.utils.analysis import (
+    CORRELATION_ANNOTATE_MAX,
+    CORRELATION_LABEL_MAX,
+    cluster_order,
+    draw_correlation_heatmap,
+    generate_correlation_matrix,
+    top_correlated_pairs,
+)
+
+from .base import MediaTestCase
+
+
+def _grouped_frame(rows=500, seed=0):
+    """Two groups of correlated columns, interleaved."""
+    rng = np.random.default_rng(seed)
+    a, b = rng.normal(size=rows), rng.normal(size=rows)
+    noise = rng.normal(scale=0.1, size=(5, rows))
+    return pd.DataFrame({'a1': a + noise[0], 'b1': b + noise[1], 'a2': a + noise[2],
+                         'b2': -b + noise[3], 'a3': a + noise[4]})
+
+
+class CorrelationTests(SimpleTestCase):
+
+    def test_cluster_order_groups_correlated_columns(self):
+        ordered = cluster_order(_grouped_frame().corr())
+        self.assertEqual(sorted(ordered), ['a1', 'a2', 'a3', 'b1', 'b2'])
+        groups = ''.join(name[0] for name in ordered)
+        self.assertIn(groups, ('aaabb', 'bbaaa'))
+
+    def test_cluster_order_with_constant_columns(self):
+        corr = _grouped_frame().assign(const=1.0).corr()
+        self.assertEqual(sorted(cluster_order(corr)), sorted(corr.columns))
+
+    def test_top_pairs(self):
+        corr = pd.DataFrame([[1.0, 0.2, -0.9], [0.2, 1.0, np.nan], [-0.9, np.nan, 1.0]],
+                            index=list('xyz'), columns=list('xyz'))
+        self.assertEqual(top_correlated_pairs(corr, k=5), [
+            {'x': 'x', 'y': 'z', 'correlation': -0.9},
+            {'x': 'x', 'y': 'y', 'correlation': 0.2},
+        ])
+        self.assertEqual(top_correlated_pairs(corr, k=1), [{'x': 'x', 'y': 'z', 'correlation': -0.9}])
+        self.assertEqual(top_correlated_pairs(corr.iloc[:1, :1]), [])
+
+    def test_top_pairs_match_a_full_sort(self):
+        rng = np.random.default_rng(1)
+        corr = pd.DataFrame(rng.normal(size=(200, 40))).corr()
+        pairs = top_correlated_pairs(corr, k=15)
+        upper = corr.where(np.triu(np.ones(corr.shape, dtype=bool), k=1)).stack()
+        expected = upper.abs().sort_values(ascending=False).index[:15]
+        self.assertEqual([(pair['x'], pair['y']) for pair in pairs], list(expected))
+
+    def test_wide_matrices_are_drawn_as_one_image(self):
+        n = CORRELATION_LABEL_MAX * 2 + 1
+        corr = pd.DataFrame(np.random.default_rng(2).normal(size=(50, n))).corr()
+        fig, ax = plt.subplots()
+        self.addCleanup(plt.close, fig)
+        with mock.patch.object(analysis.sns, 'heatmap') as heatmap:
+            draw_correlation_heatmap(ax, corr)
+        heatmap.assert_not_called()
+        self.assertEqual(len(ax.images), 1)
+        self.assertLessEqual(len(ax.get_xticks()), CORRELATION_LABEL_MAX)
+        self.assertEqual(len(ax.texts), 0)
+
+    def test_narrow_matrices_are_annotated(self):
+        corr = pd.DataFrame(np.random.default_rng(3).normal(size=(50, CORRELATION_ANNOTATE_MAX))).corr()
+        fig, ax = plt.subplots()
+        self.addCleanup(plt.close, fig)
+        draw_correlation_heatmap(ax, corr)
+        self.assertEqual(len(ax.texts), CORRELATION_ANNOTATE_MAX ** 2)
+
+    def test_generate_correlation_matrix(self):
+        df = _grouped_frame().assign(label='x')
+        result = generate_correlation_matrix(df, order='cluster', top_pairs=3)
+        self.assertEqual(sorted(result['columns']), ['a1', 'a2', 'a3', 'b1', 'b2'])
+        self.assertEqual(len(result['top_pairs']), 3)
+        self.assertTrue(all(abs(pair['correlation']) > 0.9 for pair in result['top_pairs']))
+        self.assertTrue(result['image'])
+        with self.assertRaises(ValueError):
+            generate_correlation_matrix(df[['a1', 'label']])
+
+
+class CorrelationEndpointTests(MediaTestCase):
+
+    def test_order_and_top_pairs(self):
+        uploaded_file = self.upload(_grouped_frame(rows=200).to_csv(index=False))
+        response = self.client.get(f'/api/correlation/{uploaded_file.id}/', {'order': 'cluster', 'top_pairs': 2})
+        self.assertEqual(response.status_code, 200, response.content)
+        result = response.json()['data']
+        self.assertIn(''.join(name[0] for name in result['columns']), ('aaabb', 'bbaaa'))
+        self.assertEqual(len(result['top_pairs']), 2)
+
+    def test_unknown_order(self):
+        uploaded_file = self.upload(_grouped_frame(rows=20).to_csv(index=False))
+        response = self.client.get(f'/api/correlation/{uploaded_file.id}/', {'order': 'random'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Unknown column order', response.json()['error'])
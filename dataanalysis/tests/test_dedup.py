@@ -0,0 +1,53 @@
+"""
+Tests of content-addressed deduplication of uploads.
+"""
+
+import os
+
+from dataanalysis.models import AnalysisResult
+from dataanalysis.results import get_analysis_result
+
+from .base import MediaTestCase
+
+
+CSV = 'a,b\n1,2\n3,5\n4,4\n'
+
+
+class DeduplicationTests(MediaTestCase):
+    """Identical uploads share one stored file, cache directory and result set."""
+
+    def test_identical_uploads_share_storage_and_results(self):
+        first = self.upload(CSV, 'first.csv')
+        get_analysis_result(first, 'table')
+        second = self.upload(CSV, 'second.csv')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(first.cache_dir, second.cache_dir)
+        self.assertEqual(len(os.listdir(self.media_root / 'uploads')), 1)
+
+        # Served from the first upload's result, not computed again
+        self.assertEqual(get_analysis_result(second, 'table'), get_analysis_result(first, 'table'))
+        self.assertEqual(AnalysisResult.objects.count(), 1)
+
+    def test_content_is_released_with_the_last_reference(self):
+        first = self.upload(CSV, 'first.csv')
+        get_analysis_result(first, 'table')
+        second = self.upload(CSV, 'second.csv')
+        path, cache_dir = first.file.path, first.cache_dir
+
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(os.path.isdir(cache_dir))
+        self.assertEqual(list(AnalysisResult.objects.values_list('uploaded_file', flat=True)), [second.id])
+        self.assertEqual(get_analysis_result(second, 'table')['rows'], 3)
+
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(cache_dir))
+        self.assertEqual(AnalysisResult.objects.count(), 0)
+
+    def test_different_content_is_stored_separately(self):
+        first = self.upload(CSV)
+        second = self.upload(CSV + '5,6\n')
+        self.assertNotEqual(first.file.name, second.file.name)
+        first.delete()
+        self.assertTrue(os.path.exists(second.file.path))
@@ -0,0 +1,86 @@
+"""
+Tests of the bounded analysis executor.
+"""
+
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, override_settings
+
+from dataanalysis import executor
+from dataanalysis.executor import ExecutorBusy, iterate_cpu_bound, run_cpu_bound
+
+
+def _collect(iterable):
+    async def collect():
+        return [item async for item in iterable]
+
+    return async_to_sync(collect)()
+
+
+class RunCpuBoundTests(SimpleTestCase):
+
+    def test_runs_on_a_pool_thread(self):
+        name = async_to_sync(run_cpu_bound)(lambda: threading.current_thread().name)
+        self.assertTrue(name.startswith('analysis'))
+        self.assertEqual(executor._in_flight, 0)
+
+    def test_closes_old_connections_around_the_call(self):
+        with mock.patch.object(executor, 'close_old_connections') as close:
+            self.assertEqual(async_to_sync(run_cpu_bound)(sum, [1, 2], start=3), 6)
+        self.assertEqual(close.call_count, 2)
+
+    @override_settings(ANALYSIS_EXECUTOR_WORKERS=1, ANALYSIS_EXECUTOR_QUEUE=0)
+    def test_refuses_work_when_full(self):
+        with mock.patch.object(executor, '_in_flight', 1):
+            with self.assertRaises(ExecutorBusy):
+                async_to_sync(run_cpu_bound)(sum, [1])
+
+    def test_errors_are_raised(self):
+        with self.assertRaises(ZeroDivisionError):
+            async_to_sync(run_cpu_bound)(lambda: 1 / 0)
+        self.assertEqual(executor._in_flight, 0)
+
+
+class IterateCpuBoundTests(SimpleTestCase):
+
+    def test_produces_every_item_on_the_pool(self):
+        def items():
+            for i in range(3):
+                yield i, threading.current_thread().name
+
+        produced = _collect(iterate_cpu_bound(items()))
+        self.assertEqual([i for i, _ in produced], [0, 1, 2])
+        self.assertTrue(all(name.startswith('analysis') for _, name in produced))
+
+    def test_waits_for_room_instead_of_failing(self):
+        run = executor.run_cpu_bound
+        busy = [True, False, True]
+
+        async def sometimes_busy(*args):
+            if busy and busy.pop(0):
+                raise ExecutorBusy("busy")
+            return await run(*args)
+
+        with mock.patch.object(executor, 'run_cpu_bound', sometimes_busy), \
+                mock.patch.object(executor, 'STREAM_RETRY_DELAY', 0):
+            self.assertEqual(_collect(iterate_cpu_bound(['a', 'b'])), ['a', 'b'])
+
+    def test_closes_the_iterable_when_abandoned(self):
+        closed = []
+
+        def items():
+            try:
+                yield from range(10)
+            finally:
+                closed.append(True)
+
+        async def first():
+            stream = iterate_cpu_bound(items())
+            item = await stream.__anext__()
+            await stream.aclose()
+            return item
+
+        self.assertEqual(async_to_sync(first)(), 0)
+        self.assertEqual(closed, [True])
@@ -0,0 +1,69 @@
+"""
+Tests of the streamed exports of labeled rows.
+"""
+
+import io
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from dataanalysis import executor
+from dataanalysis.utils.arrow_formats import available as arrow_available
+
+from .base import MediaTestCase
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+
+@unittest.skipUnless(arrow_available(), "pyarrow is not installed")
+class ExportTests(MediaTestCase):
+    """Streamed exports of labeled rows (api_export)."""
+
+    def setUp(self):
+        super().setUp()
+        rng = np.random.default_rng(0)
+        data = pd.DataFrame({
+            'x': rng.normal(size=500).round(3),
+            'y': rng.normal(size=500).round(3),
+            'group': rng.choice(['a', 'b'], size=500),
+        })
+        data.loc[::50, 'x'] = 25.0  # Outliers of x
+        data.loc[::7, 'y'] = np.nan
+        self.file_id = self.upload(data.to_csv(index=False)).id
+
+    def _export(self, **params):
+        response = self.client.get(f'/api/export/{self.file_id}/', params)
+        self.assertEqual(response.status_code, 200)
+        return self.streamed_content(response)
+
+    def _outliers(self, method):
+        response = self.client.get(f'/api/outliers/{self.file_id}/', {'method': method})
+        return response.json()['data']['flagged_rows']
+
+    def test_parquet_export_with_univariate_outlier_labels(self):
+        for method in ('iqr', 'zscore'):
+            with self.subTest(method=method):
+                table = pq.read_table(io.BytesIO(self._export(labels='outlier', method=method, format='parquet')))
+                exported = table.to_pandas()
+                self.assertEqual(len(exported), 500)
+                self.assertEqual(str(table.schema.field('outlier_columns').type), 'large_string')
+                self.assertEqual(int(exported['is_outlier'].sum()), self._outliers(method))
+                self.assertTrue(exported.loc[exported['is_outlier'], 'outlier_columns'].str.len().gt(0).all())
+
+    def test_csv_export_cluster_labels_match_the_analysis(self):
+        response = self.client.get(f'/api/clustering/{self.file_id}/', {'n_clusters': 3})
+        sizes = {int(cluster): size for cluster, size in response.json()['data']['cluster_sizes'].items()}
+        exported = pd.read_csv(io.BytesIO(self._export(labels='cluster', n_clusters=3)))
+        self.assertEqual(exported['cluster'].value_counts().to_dict(), sizes)
+        self.assertEqual(int(exported['cluster'].isna().sum()), int(exported['y'].isna().sum()))
+
+    def test_busy_executor(self):
+        with mock.patch.object(executor, '_in_flight', 10 ** 6):
+            response = self.client.get(f'/api/export/{self.file_id}/')
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()['success'])
@@ -0,0 +1,99 @@
+"""
+Tests of the helpers of the loadtest management command.
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from dataanalysis.management.commands.loadtest import (
+    ENDPOINTS,
+    Recorder,
+    multipart_body,
+    parse_mix,
+    parse_shapes,
+    synthetic_csv,
+)
+from dataanalysis.models import UploadedFile
+
+from .base import MediaTestCase
+
+
+class ParseOptionsTests(SimpleTestCase):
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix('table=3, eda=0.5,rows'), {'table': 3.0, 'eda': 0.5, 'rows': 1.0})
+        with self.assertRaisesMessage(CommandError, 'Unknown endpoint in mix: nope'):
+            parse_mix('table=1,nope=2')
+
+    def test_parse_shapes(self):
+        self.assertEqual(parse_shapes('1000x8, 50x2'), [(1000, 8), (50, 2)])
+        for value in ('1000', '1000x1', '10x8,x3'):
+            with self.subTest(value=value), self.assertRaises(CommandError):
+                parse_shapes(value)
+
+
+class SyntheticCsvTests(SimpleTestCase):
+
+    def test_shape_and_columns(self):
+        content = synthetic_csv(500, 8, np.random.default_rng(0))
+        df = pd.read_csv(io.BytesIO(content))
+        self.assertEqual(df.shape, (500, 8))
+        self.assertEqual(df.columns.tolist(), [f'num_{i}' for i in range(6)] + ['cat_0', 'cat_1'])
+        self.assertTrue(df['num_0'].isna().any())
+        self.assertNotIn(df['cat_0'].dtype.kind, 'iuf')
+
+    def test_columns_the_endpoints_use(self):
+        # The mixes reference num_0 and cat_0, which even the narrowest shape has
+        df = pd.read_csv(io.BytesIO(synthetic_csv(20, 2, np.random.default_rng(1))))
+        self.assertEqual(df.columns.tolist(), ['num_0', 'cat_0'])
+        for name, (_, path, _) in ENDPOINTS.items():
+            if 'column=' in path:
+                self.assertIn(path.split('column=')[1], df.columns, name)
+
+    def test_deterministic_per_seed(self):
+        first = synthetic_csv(100, 4, np.random.default_rng(7))
+        self.assertEqual(first, synthetic_csv(100, 4, np.random.default_rng(7)))
+        self.assertNotEqual(first, synthetic_csv(100, 4, np.random.default_rng(8)))
+
+
+class MultipartBodyTests(MediaTestCase):
+
+    def test_upload_endpoint_accepts_the_body(self):
+        content = synthetic_csv(50, 4, np.random.default_rng(0))
+        body, content_type = multipart_body('csv_file', 'loadtest.csv', content)
+        self.assertTrue(content_type.startswith('multipart/form-data; boundary='))
+        response = self.client.generic('POST', '/upload/', body, content_type=content_type)
+        self.assertEqual(response.status_code, 200, response.content)
+        uploaded_file = UploadedFile.objects.get(id=response.json()['file_id'])
+        self.assertEqual(uploaded_file.original_filename, 'loadtest.csv')
+        self.assertEqual(uploaded_file.row_count, 50)
+        self.assertEqual(uploaded_file.file_size, len(content))
+
+
+class RecorderTests(SimpleTestCase):
+
+    def test_report(self):
+        recorder = Recorder()
+        for latency in (0.1, 0.2, 0.3, 0.4):
+            recorder.add('table', latency, 'ok')
+        recorder.add('eda', 1.0, 'timeout')
+        recorder.add('eda', 0.5, 'http_503')
+        report = recorder.report(elapsed=2)
+
+        self.assertEqual(list(report), ['eda', 'table', 'TOTAL'])
+        self.assertEqual(report['table']['requests'], 4)
+        self.assertEqual(report['table']['rps'], 2.0)
+        self.assertEqual(report['table']['p50_ms'], 250.0)
+        self.assertEqual(report['table']['error_rate'], 0)
+        # Timeouts are counted apart from errors
+        self.assertEqual(report['eda']['error_rate'], 0.5)
+        self.assertEqual(report['eda']['timeout_rate'], 0.5)
+        self.assertEqual(report['TOTAL']['requests'], 6)
+        self.assertEqual(report['TOTAL']['p99_ms'], 975.0)
+
+    def test_empty_report(self):
+        self.assertEqual(Recorder().report(elapsed=1), {})
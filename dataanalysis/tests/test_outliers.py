@@ -0,0 +1,141 @@
+"""
+Tests of outlier detection: the vectorized univariate rules, the
+IsolationForest and fitted models flagging other rows.
+"""
+
+import io
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from dataanalysis.utils import outliers
+from dataanalysis.utils.outliers import (
+    detect_outliers,
+    fit_outlier_model,
+    generate_outlier_report,
+    outlier_labels,
+    univariate_flags,
+)
+
+from .base import MediaTestCase
+
+
+def _frame(rows=400, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'x': rng.normal(size=rows), 'y': rng.normal(10, 2, size=rows),
+                       'const': 1.0, 'label': 'a'})
+    df.loc[[5, 50], 'x'] = [30.0, -25.0]
+    df.loc[100, 'y'] = 80.0
+    df.loc[7, 'y'] = np.nan
+    return df
+
+
+class UnivariateRuleTests(SimpleTestCase):
+
+    def test_rules_match_column_by_column(self):
+        X = _frame()[['x', 'y']].to_numpy()
+        flags = univariate_flags(X)
+        for i in range(X.shape[1]):
+            column = X[:, i]
+            values = column[~np.isnan(column)]
+            q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+            iqr = q3 - q1
+            np.testing.assert_array_equal(flags['iqr'][:, i], (column < q1 - 1.5 * iqr) | (column > q3 + 1.5 * iqr))
+            z = np.abs(column - values.mean()) / values.std(ddof=1)
+            np.testing.assert_array_equal(flags['zscore'][:, i], z > 3)
+            mad = np.median(np.abs(values - median))
+            np.testing.assert_array_equal(flags['mad'][:, i], 0.6745 * np.abs(column - median) / mad > 3.5)
+
+    def test_missing_values_and_constant_columns_are_not_flagged(self):
+        X = _frame()[['y', 'const']].to_numpy()
+        for method, flags in univariate_flags(X).items():
+            with self.subTest(method=method):
+                self.assertFalse(flags[7, 0])
+                self.assertFalse(flags[:, 1].any())
+
+    def test_threshold(self):
+        X = _frame()[['x']].to_numpy()
+        self.assertGreater(univariate_flags(X, {'zscore': 1})['zscore'].sum(),
+                           univariate_flags(X)['zscore'].sum())
+
+
+class DetectOutliersTests(SimpleTestCase):
+
+    def test_univariate(self):
+        detected = detect_outliers(_frame(), method='zscore')
+        self.assertEqual(detected['columns'], ['x', 'y', 'const'])
+        self.assertEqual(np.flatnonzero(detected['mask']).tolist(), [5, 50, 100])
+        self.assertIsNone(detected['scores'])
+
+    def test_isolation_forest(self):
+        detected = detect_outliers(_frame(), ['x', 'y'], 'isolation_forest', contamination=0.01)
+        self.assertEqual(int(detected['mask'].sum()), 4)
+        self.assertTrue(detected['mask'][[5, 50, 100]].all())
+        self.assertTrue((detected['scores'][detected['mask']] < detected['score_threshold']).all())
+
+    def test_isolation_forest_fits_on_a_sample(self):
+        with mock.patch.object(outliers, 'ISOLATION_FOREST_FIT_ROWS', 100), \
+                mock.patch.object(outliers.IsolationForest, 'fit', autospec=True,
+                                  side_effect=outliers.IsolationForest.fit) as fit:
+            detected = detect_outliers(_frame(), ['x', 'y'], 'isolation_forest')
+        self.assertEqual(fit.call_args.args[1].shape, (100, 2))
+        self.assertEqual(len(detected['scores']), 400)
+
+    def test_unknown_method(self):
+        with self.assertRaisesMessage(ValueError, 'Unknown outlier method'):
+            detect_outliers(_frame(), method='dbscan')
+
+    def test_report(self):
+        result = generate_outlier_report(_frame(), ['x', 'y'], 'iqr')
+        self.assertEqual(result['method'], 'iqr')
+        self.assertEqual(result['rows'], 400)
+        self.assertGreaterEqual(result['flagged_rows'], 3)
+        self.assertTrue(result['image'])
+
+
+class OutlierModelTests(SimpleTestCase):
+
+    def test_chunks_are_flagged_as_the_whole_frame(self):
+        df = _frame()
+        for method in ('iqr', 'zscore', 'mad', 'isolation_forest'):
+            with self.subTest(method=method):
+                detected = detect_outliers(df, ['x', 'y'], method)
+                model = fit_outlier_model(df, ['x', 'y'], method)
+                mask = np.concatenate([outlier_labels(model, df.iloc[start:start + 64])[0]
+                                       for start in range(0, len(df), 64)])
+                np.testing.assert_array_equal(mask, detected['mask'])
+
+    def test_flagged_columns(self):
+        df = _frame()
+        mask, detail = outlier_labels(fit_outlier_model(df, ['x', 'y'], 'zscore'), df.iloc[[5, 6, 100]])
+        self.assertEqual(mask.tolist(), [True, False, True])
+        self.assertEqual(detail, ['x', '', 'y'])
+        mask, scores = outlier_labels(fit_outlier_model(df, ['x', 'y'], 'isolation_forest'), df.iloc[:0])
+        self.assertEqual((len(mask), len(scores)), (0, 0))
+
+
+class OutliersEndpointTests(MediaTestCase):
+
+    def test_flagged_rows_export_through_api_export(self):
+        df = _frame()
+        uploaded_file = self.upload(df.to_csv(index=False))
+        response = self.client.get(f'/api/outliers/{uploaded_file.id}/', {'method': 'zscore', 'columns': 'x,y'})
+        self.assertEqual(response.status_code, 200, response.content)
+        result = response.json()['data']
+        self.assertEqual(result['flagged_rows'], 3)
+        self.assertNotIn('export_url', result)
+
+        response = self.client.get(f'/api/export/{uploaded_file.id}/', {
+            'outliers_only': 'true', 'method': result['method'], 'outlier_columns': ','.join(result['columns'])})
+        self.assertEqual(response.status_code, 200)
+        exported = pd.read_csv(io.BytesIO(self.streamed_content(response)))
+        self.assertEqual(len(exported), result['flagged_rows'])
+        self.assertEqual(exported['outlier_columns'].tolist(), ['x', 'x', 'y'])
+
+    def test_unknown_method(self):
+        uploaded_file = self.upload('a,b\n1,2\n3,4\n')
+        response = self.client.get(f'/api/outliers/{uploaded_file.id}/', {'method': 'dbscan'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
@@ -0,0 +1,76 @@
+"""
+Tests of table paging: plain pages read through the row-offset index,
+sorted and filtered pages sliced from the parsed file, and pages of
+Parquet uploads.
+"""
+
+import io
+import json
+
+import pandas as pd
+
+from dataanalysis.datasets import get_table_page
+from dataanalysis.responses import dumps
+from dataanalysis.utils.paging import ROW_INDEX_STRIDE
+
+from .base import MediaTestCase
+
+
+def _page_json(page):
+    return json.loads(dumps(page['rows']))
+
+
+class TablePagingTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        n = 2 * ROW_INDEX_STRIDE + 500
+        self.data = pd.DataFrame({
+            'n': range(n),
+            'when': pd.date_range('2024-01-01', periods=n, freq='h'),
+            'label': ['row, "quoted"' if i % 7 == 0 else f'row {i}' for i in range(n)],
+        })
+        self.uploaded_file = self.upload(self.data.to_csv(index=False))
+
+    def test_pages_across_the_index_stride(self):
+        for offset in (0, ROW_INDEX_STRIDE - 10, ROW_INDEX_STRIDE, 2 * ROW_INDEX_STRIDE + 490):
+            page = get_table_page(self.uploaded_file, offset=offset, limit=20)
+            expected = list(range(offset, min(offset + 20, len(self.data))))
+            self.assertEqual([row[0] for row in page['rows']], expected)
+            self.assertEqual([row[2] for row in page['rows']], self.data['label'][expected].tolist())
+            self.assertEqual(page['total_rows'], len(self.data))
+
+        page = get_table_page(self.uploaded_file, offset=len(self.data), limit=20)
+        self.assertEqual(page['rows'], [])
+
+    def test_column_window(self):
+        page = get_table_page(self.uploaded_file, offset=5, limit=2, col_offset=1, col_limit=1)
+        self.assertEqual(page['columns'], ['when'])
+        self.assertEqual(page['total_columns'], 3)
+        self.assertEqual(_page_json(page), [['2024-01-01T05:00:00'], ['2024-01-01T06:00:00']])
+
+    def test_dates_are_formatted_alike_on_every_path(self):
+        offset, limit = ROW_INDEX_STRIDE - 5, 10
+        plain = get_table_page(self.uploaded_file, offset=offset, limit=limit)
+        sorted_page = get_table_page(self.uploaded_file, offset=offset, limit=limit, sort_by='n')
+        filtered = get_table_page(self.uploaded_file, offset=offset, limit=limit,
+                                  filters=[{'column': 'n', 'op': 'ge', 'value': 0}])
+        self.assertEqual(_page_json(plain)[0][1], '2024-02-11T11:00:00')
+        self.assertEqual(_page_json(sorted_page), _page_json(plain))
+        self.assertEqual(_page_json(filtered), _page_json(plain))
+
+        buffer = io.BytesIO()
+        self.data.to_parquet(buffer, index=False, row_group_size=ROW_INDEX_STRIDE // 3)
+        parquet_file = self.upload(buffer.getvalue(), 'data.parquet')
+        parquet = get_table_page(parquet_file, offset=offset, limit=limit)
+        self.assertEqual(_page_json(parquet), _page_json(plain))
+
+    def test_rows_endpoint(self):
+        response = self.client.get(f'/api/rows/{self.uploaded_file.id}/',
+                                   {'offset': 3, 'limit': 2, 'sort_by': 'n', 'descending': 'true'})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()['data']
+        self.assertEqual([row[0] for row in body['rows']], [len(self.data) - 4, len(self.data) - 5])
+
+        response = self.client.get(f'/api/rows/{self.uploaded_file.id}/', {'sort_by': 'missing'})
+        self.assertEqual(response.status_code, 400)
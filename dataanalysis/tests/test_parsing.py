@@ -0,0 +1,164 @@
+"""
+Tests of the CSV parse engines and the dtype hints taken from upload-time
+column types.
+"""
+
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from dataanalysis.datasets import load_dataframe
+from dataanalysis.utils import parsing
+from dataanalysis.utils.parsing import (
+    PYARROW_MIN_SIZE,
+    available_engines,
+    choose_engine,
+    dtype_hints,
+    parse_datetimes,
+    read_csv,
+)
+
+from .base import MediaTestCase
+
+
+CSV = 'id,price,name,code,when\n1,2.5,apple,007,2024-01-02\n2,,pear,010,2024-02-03\n3,4,fig,100,\n'
+TYPES = {'id': 'integer', 'price': 'float', 'name': 'string', 'code': 'string', 'when': 'datetime'}
+
+
+class TempDirTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='modelyourdata-tests-')
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def write(self, content, name='data.csv'):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+
+class EngineChoiceTests(SimpleTestCase):
+
+    def test_choose_engine(self):
+        pyarrow = 'pyarrow' if 'pyarrow' in available_engines() else 'pandas'
+        self.assertEqual(choose_engine(PYARROW_MIN_SIZE - 1), 'pandas')
+        self.assertEqual(choose_engine(PYARROW_MIN_SIZE), pyarrow)
+        self.assertEqual(choose_engine(10, 'pyarrow'), pyarrow)
+        self.assertEqual(choose_engine(PYARROW_MIN_SIZE, 'pandas'), 'pandas')
+
+    def test_pandas_without_pyarrow(self):
+        with mock.patch.object(parsing, 'pyarrow', None):
+            self.assertEqual(available_engines(), ['pandas'])
+            self.assertEqual(choose_engine(PYARROW_MIN_SIZE), 'pandas')
+            self.assertEqual(choose_engine(10, 'pyarrow'), 'pandas')
+
+    def test_dtype_hints(self):
+        # Integers may turn out to have missing values and dates are converted afterwards
+        self.assertEqual(dtype_hints(TYPES), {'price': 'float64', 'name': 'str', 'code': 'str'})
+        self.assertEqual(dtype_hints(None), {})
+
+
+class ParseDatetimesTests(SimpleTestCase):
+
+    def test_converts_columns_that_all_parse(self):
+        df = pd.DataFrame({'when': ['2024-01-02', None, '2024-03-04T05:06'],
+                           'almost': ['2024-01-02', 'soon', None],
+                           'other': ['2024-01-02', 'x', 'y']})
+        parse_datetimes(df, ['when', 'almost', 'missing'])
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['when']))
+        self.assertEqual(df['when'][2], pd.Timestamp('2024-03-04 05:06'))
+        self.assertTrue(pd.isna(df['when'][1]))
+        # Kept as text when a value does not parse, or when not asked for
+        self.assertEqual(df['almost'].tolist()[:2], ['2024-01-02', 'soon'])
+        self.assertEqual(df['other'][0], '2024-01-02')
+
+    def test_mixed_offsets_become_utc(self):
+        df = pd.DataFrame({'when': ['2024-01-02T10:00+01:00', '2024-01-02T10:00-05:00']})
+        parse_datetimes(df, ['when'])
+        self.assertEqual(str(df['when'].dt.tz), 'UTC')
+        self.assertEqual(df['when'].tolist(), [pd.Timestamp('2024-01-02 09:00', tz='UTC'),
+                                               pd.Timestamp('2024-01-02 15:00', tz='UTC')])
+
+
+class ReadCsvTests(TempDirTestCase):
+
+    def check(self, df):
+        self.assertEqual(df['id'].tolist(), [1, 2, 3])
+        self.assertEqual(df['price'].dtype, np.float64)
+        self.assertTrue(np.isnan(df['price'][1]))
+        # Hinted as text, codes keep their leading zeros
+        self.assertEqual(df['code'].tolist(), ['007', '010', '100'])
+        self.assertEqual(df['name'].tolist(), ['apple', 'pear', 'fig'])
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['when']))
+        self.assertEqual(df['when'][0], pd.Timestamp('2024-01-02'))
+
+    def test_engines_agree(self):
+        path = self.write(CSV)
+        for engine in available_engines():
+            with self.subTest(engine=engine):
+                self.check(read_csv(path, column_types=TYPES, engine=engine))
+
+    def test_without_hints(self):
+        df = read_csv(self.write(CSV))
+        self.assertEqual(df['code'].tolist(), [7, 10, 100])
+        self.assertEqual(df['when'][0], '2024-01-02')
+
+    def test_wrong_hints_fall_back_to_a_plain_parse(self):
+        # The sample said float, a later row says otherwise
+        path = self.write('a,b\n1.5,x\n2.5,y\nn/a?,z\n')
+        for engine in available_engines():
+            with self.subTest(engine=engine):
+                df = read_csv(path, column_types={'a': 'float', 'b': 'string'}, engine=engine)
+                self.assertEqual(df['a'].tolist(), ['1.5', '2.5', 'n/a?'])
+
+    def test_pyarrow_dates_left_to_pandas(self):
+        if 'pyarrow' not in available_engines():
+            self.skipTest('pyarrow is not installed')
+        # Dates not typed as such stay text, as the pandas engine keeps them
+        df = read_csv(self.write('a,day\n1,2024-01-02\n2,2024-01-03\n'), engine='pyarrow')
+        self.assertEqual(df['day'].tolist(), ['2024-01-02', '2024-01-03'])
+
+    def test_large_file_parses_with_the_default_engine(self):
+        rows = PYARROW_MIN_SIZE // 20 + 1
+        content = 'n,x,label\n' + ''.join(f'{i},{i / 7:.6f},l{i % 5}\n' for i in range(rows))
+        path = self.write(content)
+        self.assertGreaterEqual(os.path.getsize(path), PYARROW_MIN_SIZE)
+        df = read_csv(path, column_types={'n': 'integer', 'x': 'float', 'label': 'string'})
+        expected = pd.read_csv(io.StringIO(content))
+        self.assertEqual(len(df), rows)
+        self.assertEqual(df['n'].tolist(), expected['n'].tolist())
+        np.testing.assert_allclose(df['x'], expected['x'])
+        self.assertEqual(df['label'].tolist(), expected['label'].tolist())
+
+
+class UploadedFileParseTests(MediaTestCase):
+
+    def test_engines_load_uploads_alike(self):
+        frames = {}
+        for engine in available_engines():
+            with override_settings(CSV_PARSE_ENGINE=engine):
+                frames[engine] = load_dataframe(self.upload(CSV))
+        for engine, df in frames.items():
+            with self.subTest(engine=engine):
+                self.assertEqual(df.dtypes.tolist(), frames['pandas'].dtypes.tolist())
+                self.assertEqual(df['name'].tolist(), ['apple', 'pear', 'fig'])
+                self.assertEqual(df['when'][1], pd.Timestamp('2024-02-03'))
+
+
+class BenchmarkParseTests(SimpleTestCase):
+
+    def test_reports_every_engine(self):
+        out = io.StringIO()
+        call_command('benchmark_parse', shapes='200x4', repeat=1, stdout=out)
+        lines = out.getvalue().splitlines()
+        for engine in available_engines():
+            self.assertEqual(sum(f' {engine} ' in line for line in lines), 2, engine)
+        self.assertNotIn('failed', out.getvalue())
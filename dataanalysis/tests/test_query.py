@@ -0,0 +1,212 @@
+"""
+Tests of the filter / group-by / top-k query engine and its zone maps.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from dataanalysis.utils.query import (
+    MAX_QUERY_ROWS,
+    apply_filters,
+    build_zone_maps,
+    candidate_ranges,
+    parse_filter_spec,
+    run_query,
+)
+
+from .base import MediaTestCase
+
+
+def _frame(n=1000):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'id': np.arange(n),
+        'value': rng.normal(50, 10, n),
+        'team': np.array(['red', 'green', 'blue', None], dtype=object)[np.arange(n) % 4],
+        'when': pd.date_range('2024-01-01', periods=n, freq='D'),
+    })
+
+
+class FilterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.df = _frame()
+
+    def test_parse_filter_spec(self):
+        self.assertIsNone(parse_filter_spec(''))
+        self.assertEqual(parse_filter_spec('{"column": "id"}'),
+                         [{'column': 'id', 'op': 'eq', 'value': None}])
+        for spec in ([{'column': 'id', 'op': 'like'}], [{'op': 'eq', 'value': 1}],
+                     [{'column': 'id', 'op': 'in', 'value': 1}],
+                     [{'column': 'id', 'op': 'between', 'value': [1]}]):
+            with self.assertRaises(ValueError):
+                parse_filter_spec(spec)
+
+    def test_operators(self):
+        cases = [
+            ({'op': 'eq', 'value': 10}, self.df['id'] == 10),
+            ({'op': 'ne', 'value': 10}, self.df['id'] != 10),
+            ({'op': 'lt', 'value': 10}, self.df['id'] < 10),
+            ({'op': 'le', 'value': 10}, self.df['id'] <= 10),
+            ({'op': 'gt', 'value': 990}, self.df['id'] > 990),
+            ({'op': 'ge', 'value': 990}, self.df['id'] >= 990),
+            ({'op': 'between', 'value': [5, 8]}, self.df['id'].between(5, 8)),
+            ({'op': 'in', 'value': [1, 3, 2000]}, self.df['id'].isin([1, 3])),
+        ]
+        for predicate, expected in cases:
+            with self.subTest(**predicate):
+                result = apply_filters(self.df, [{'column': 'id', **predicate}])
+                self.assertEqual(result['id'].tolist(), self.df['id'][expected].tolist())
+
+    def test_text_and_missing_values(self):
+        self.assertEqual(len(apply_filters(self.df, {'column': 'team', 'op': 'contains', 'value': 'RE'})), 500)
+        self.assertEqual(len(apply_filters(self.df, {'column': 'team', 'op': 'isnull'})), 250)
+        self.assertEqual(len(apply_filters(self.df, {'column': 'team', 'op': 'notnull'})), 750)
+        self.assertEqual(len(apply_filters(self.df, {'column': 'team', 'op': 'eq', 'value': 'blue'})), 250)
+
+    def test_values_are_coerced_to_the_column_type(self):
+        # Query strings carry numbers and dates as text
+        result = apply_filters(self.df, [{'column': 'id', 'op': 'between', 'value': ['10', '12']}])
+        self.assertEqual(result['id'].tolist(), [10, 11, 12])
+        result = apply_filters(self.df, [{'column': 'when', 'op': 'lt', 'value': '2024-01-03'}])
+        self.assertEqual(result['id'].tolist(), [0, 1])
+
+        aware = self.df.assign(when=self.df['when'].dt.tz_localize('UTC'))
+        result = apply_filters(aware, [{'column': 'when', 'op': 'lt', 'value': '2024-01-03'}])
+        self.assertEqual(result['id'].tolist(), [0, 1])
+        result = apply_filters(self.df, [{'column': 'when', 'op': 'lt', 'value': '2024-01-03T01:00:00+01:00'}])
+        self.assertEqual(result['id'].tolist(), [0, 1])
+
+    def test_predicates_are_combined_with_and(self):
+        result = apply_filters(self.df, [{'column': 'id', 'op': 'lt', 'value': 20},
+                                         {'column': 'team', 'op': 'eq', 'value': 'red'}])
+        self.assertEqual(result['id'].tolist(), [0, 4, 8, 12, 16])
+
+    def test_unknown_column(self):
+        with self.assertRaises(ValueError):
+            apply_filters(self.df, [{'column': 'missing', 'op': 'eq', 'value': 1}])
+
+
+class ZoneMapTests(SimpleTestCase):
+
+    def setUp(self):
+        self.df = _frame()
+        self.zone_maps = build_zone_maps(self.df, chunk_rows=100)
+
+    def test_zone_maps_cover_numeric_columns(self):
+        self.assertEqual(set(self.zone_maps['columns']), {'id', 'value'})
+        mins, maxs = self.zone_maps['columns']['id']
+        self.assertEqual(mins.tolist(), list(range(0, 1000, 100)))
+        self.assertEqual(maxs.tolist(), list(range(99, 1000, 100)))
+
+    def test_range_predicates_prune_chunks(self):
+        cases = [
+            ([{'column': 'id', 'op': 'eq', 'value': 250}], [(200, 300)]),
+            ([{'column': 'id', 'op': 'lt', 'value': 150}], [(0, 100), (100, 200)]),
+            ([{'column': 'id', 'op': 'ge', 'value': 900}], [(900, 1000)]),
+            ([{'column': 'id', 'op': 'between', 'value': [350, 420]}], [(300, 400), (400, 500)]),
+            ([{'column': 'id', 'op': 'in', 'value': [5, 705]}], [(0, 100), (700, 800)]),
+            ([{'column': 'id', 'op': 'gt', 'value': 2000}], []),
+        ]
+        for filters, expected in cases:
+            with self.subTest(filters=filters):
+                self.assertEqual(candidate_ranges(filters, self.zone_maps), expected)
+
+    def test_other_predicates_keep_every_chunk(self):
+        for filters in ([{'column': 'id', 'op': 'ne', 'value': 5}],
+                        [{'column': 'team', 'op': 'eq', 'value': 'red'}],
+                        [{'column': 'id', 'op': 'eq', 'value': 'not a number'}]):
+            with self.subTest(filters=filters):
+                self.assertEqual(len(candidate_ranges(filters, self.zone_maps)), 10)
+
+    def test_last_chunk_is_partial(self):
+        df = _frame(250)
+        zone_maps = build_zone_maps(df, chunk_rows=100)
+        self.assertEqual(candidate_ranges([{'column': 'id', 'op': 'ge', 'value': 240}], zone_maps), [(200, 250)])
+
+    def test_pruned_filters_match_a_full_scan(self):
+        df = self.df.copy()
+        df.loc[df.index[300:400], 'value'] = np.nan  # An all-missing chunk
+        zone_maps = build_zone_maps(df, chunk_rows=100)
+        for filters in ([{'column': 'value', 'op': 'gt', 'value': 70}],
+                        [{'column': 'value', 'op': 'between', 'value': [40, 41]},
+                         {'column': 'id', 'op': 'lt', 'value': 600}],
+                        [{'column': 'value', 'op': 'le', 'value': 20}]):
+            with self.subTest(filters=filters):
+                pd.testing.assert_frame_equal(apply_filters(df, filters, zone_maps), apply_filters(df, filters))
+
+    def test_zone_maps_of_another_frame_are_ignored(self):
+        head = self.df.head(150)
+        result = apply_filters(head, [{'column': 'id', 'op': 'ge', 'value': 120}], self.zone_maps)
+        self.assertEqual(result['id'].tolist(), list(range(120, 150)))
+
+
+class RunQueryTests(SimpleTestCase):
+
+    def setUp(self):
+        self.df = _frame()
+
+    def test_group_by_aggregates(self):
+        result = run_query(self.df, group_by='team', aggregates=[
+            {'func': 'count'}, {'func': 'mean', 'column': 'id'}, {'func': 'quantile', 'column': 'id', 'q': 0.9}])
+        self.assertEqual(result['columns'], ['team', 'count', 'mean_id', 'p90_id'])
+        rows = {row[0]: row[1:] for row in result['rows']}
+        self.assertEqual(set(rows), {'red', 'green', 'blue', None})
+        self.assertEqual(rows['red'][:2], [250, self.df['id'][self.df['team'] == 'red'].mean()])
+        self.assertEqual(result['matched_rows'], 1000)
+
+    def test_group_by_defaults_to_count(self):
+        result = run_query(self.df, filters=[{'column': 'id', 'op': 'lt', 'value': 6}], group_by=['team'])
+        self.assertEqual(result['columns'], ['team', 'count'])
+        self.assertEqual(sorted(row[1] for row in result['rows']), [1, 1, 2, 2])
+        self.assertEqual(result['matched_rows'], 6)
+
+    def test_top_k(self):
+        result = run_query(self.df, columns=['id', 'value'], order_by='value', top_k=5)
+        self.assertEqual([row[0] for row in result['rows']], self.df.nlargest(5, 'value')['id'].tolist())
+        result = run_query(self.df, columns=['id'], order_by='id', descending=False, top_k=3)
+        self.assertEqual(result['rows'], [[0], [1], [2]])
+        result = run_query(self.df, columns=['team'], order_by='team', top_k=2)
+        self.assertEqual(result['rows'], [['red'], ['red']])
+
+    def test_rows_are_capped(self):
+        df = _frame(MAX_QUERY_ROWS + 10)
+        self.assertEqual(len(run_query(df, top_k=MAX_QUERY_ROWS * 2)['rows']), MAX_QUERY_ROWS)
+
+    def test_aggregate_without_group_by(self):
+        result = run_query(self.df, aggregates=[{'func': 'max', 'column': 'id'}, {'func': 'count', 'column': 'team'}])
+        self.assertEqual(result['rows'], [[999, 750]])
+
+    def test_invalid_queries(self):
+        for kwargs in ({'aggregates': [{'func': 'mode', 'column': 'id'}]},
+                       {'aggregates': [{'func': 'sum'}]},
+                       {'aggregates': [{'func': 'sum', 'column': 'missing'}]},
+                       {'group_by': 'missing'},
+                       {'order_by': 'missing'}):
+            with self.subTest(**kwargs), self.assertRaises(ValueError):
+                run_query(self.df, **kwargs)
+
+
+class QueryEndpointTests(MediaTestCase):
+
+    def test_query_a_file(self):
+        df = _frame(300)
+        uploaded_file = self.upload(df.to_csv(index=False))
+        body = {'filters': [{'column': 'id', 'op': 'ge', 'value': 100}], 'group_by': ['team'],
+                'aggregates': [{'func': 'count'}, {'func': 'max', 'column': 'id'}],
+                'order_by': 'max_id', 'top_k': 2}
+        response = self.client.post(f'/api/query/{uploaded_file.id}/', json.dumps(body),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        self.assertEqual(data['columns'], ['team', 'count', 'max_id'])
+        self.assertEqual(data['rows'], [[None, 50, 299], ['blue', 50, 298]])
+        self.assertEqual((data['matched_rows'], data['total_rows']), (200, 300))
+
+        response = self.client.post(f'/api/query/{uploaded_file.id}/', json.dumps({'group_by': 'missing'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
@@ -0,0 +1,189 @@
+"""
+Tests of batch reports: files imported as uploads, reports written from
+cached analyses, and worker processes killed past their limits.
+"""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from dataanalysis import reports
+from dataanalysis.management.commands.generate_reports import find_files
+from dataanalysis.models import AnalysisResult, UploadedFile
+from dataanalysis.reports import SUMMARY_NAME, build_report, import_file, report_names, report_sections, run_reports
+
+from .base import MediaTestCase
+
+
+def _fake_worker(connection, path, operations, output_path, formats, memory_limit):
+    """Worker standing in for _report_worker, behaving as the file name says."""
+    name = os.path.basename(path)
+    if name.startswith('slow'):
+        time.sleep(60)
+    if name.startswith('crash'):
+        os._exit(3)
+    connection.send({'file': path, 'status': 'ok', 'error': None, 'operations': {}, 'reports': [output_path],
+                     'seconds': 0.0})
+    connection.close()
+
+
+class TempDirTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='modelyourdata-tests-')
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def write(self, name, content=b'a,b\n1,2\n'):
+        path = os.path.join(self.tmp, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+
+class ReportHelperTests(TempDirTestCase):
+
+    def test_find_files(self):
+        a = self.write('a.csv')
+        b = self.write('sub/b.csv.gz')
+        self.write('notes.txt')
+        self.assertEqual(find_files([self.tmp]), [a])
+        self.assertEqual(find_files([os.path.join(self.tmp, '**', '*.csv*'), a]), [a, b])
+        with self.assertRaisesMessage(CommandError, 'No such file'):
+            find_files([os.path.join(self.tmp, '*.parquet')])
+
+    def test_report_names(self):
+        self.assertEqual(report_names(['x/data.csv', 'y/data.csv.gz', 'z/other.parquet', 'w/data.csv']),
+                         ['data', 'data-2', 'other', 'data-3'])
+
+    def test_report_sections(self):
+        sections = report_sections({
+            'correlation': {'image': 'png', 'columns': ['a', 'b'], 'rows': 10,
+                            'top_pairs': [{'x': 'a', 'y': 'b', 'correlation': 0.5}],
+                            'stats': {'mean': 1.5, 'max': 3}},
+            'outliers': 'No numeric columns',
+        })
+        correlation, outliers = sections
+        self.assertEqual(correlation['images'], ['png'])
+        self.assertEqual(correlation['facts'], [('Columns', 'a, b'), ('Rows', '10')])
+        self.assertEqual([table['title'] for table in correlation['tables']], ['Top pairs', 'Stats'])
+        self.assertEqual(outliers['error'], 'No numeric columns')
+
+
+@mock.patch.object(reports, '_report_worker', _fake_worker)
+@mock.patch.object(reports, 'POLL_INTERVAL', 0.05)
+class RunReportsTests(TempDirTestCase):
+
+    def test_summary(self):
+        paths = [self.write('a.csv'), self.write('crash.csv'), self.write('slow.csv'), self.write('b.csv')]
+        output = os.path.join(self.tmp, 'out')
+        done = []
+        summary = run_reports(paths, output, operations=['eda'], workers=2, memory_limit=0, timeout=1,
+                              progress=done.append)
+        self.assertEqual((summary['succeeded'], summary['failed']), (2, 2))
+        # Entries follow the input order, whatever order the files complete in
+        files = summary['files']
+        self.assertEqual([entry['file'] for entry in files], paths)
+        self.assertEqual(files[0]['reports'], [os.path.join(output, 'a')])
+        self.assertIn('exited unexpectedly (code 3)', files[1]['error'])
+        self.assertEqual(files[2]['error'], 'Timed out after 1s')
+        self.assertEqual(len(done), 4)
+        with open(os.path.join(output, SUMMARY_NAME)) as f:
+            self.assertEqual(json.load(f)['files'], files)
+
+    def test_memory_limit(self):
+        with mock.patch.object(reports, 'current_rss', return_value=200 * 1024 * 1024):
+            summary = run_reports([self.write('slow.csv')], self.tmp, operations=['eda'],
+                                  memory_limit=100 * 1024 * 1024, timeout=0)
+        self.assertEqual(summary['files'][0]['error'], 'Exceeded the memory limit of 100MB')
+
+
+class GenerateReportsCommandTests(TempDirTestCase):
+
+    def call(self, *args):
+        return call_command('generate_reports', *args, stdout=io.StringIO())
+
+    def test_options_are_checked(self):
+        path = self.write('a.csv')
+        cases = {
+            'Unknown operation: nope': ['--operations', 'eda,nope'],
+            'Unknown format: docx': ['--format', 'docx'],
+            'at least 1': ['--workers', '0'],
+            'cannot be negative': ['--timeout', '-1'],
+        }
+        for message, options in cases.items():
+            with self.subTest(message=message):
+                with self.assertRaisesMessage(CommandError, message):
+                    self.call(path, *options)
+        with self.assertRaisesMessage(CommandError, 'No CSV, Parquet or Arrow files found'):
+            self.call(self.write('notes.txt'))
+
+    def test_failed_files_fail_the_command(self):
+        path = self.write('a.csv')
+        summary = {'succeeded': 0, 'failed': 1, 'files': []}
+        with mock.patch('dataanalysis.management.commands.generate_reports.run_reports',
+                        return_value=summary) as run:
+            with self.assertRaisesMessage(CommandError, '1 of 1 files failed'):
+                self.call(path, '--operations', 'eda, outliers', '--format', 'html', '--memory-limit', '64')
+        self.assertEqual(run.call_args.args, ([path], 'reports'))
+        self.assertEqual(run.call_args.kwargs['operations'], ['eda', 'outliers'])
+        self.assertEqual(run.call_args.kwargs['formats'], ['html'])
+        self.assertEqual(run.call_args.kwargs['memory_limit'], 64 * 1024 * 1024)
+
+
+class BuildReportTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({'x': rng.normal(size=200), 'y': rng.normal(size=200), 'label': rng.choice(['a', 'b'], 200)})
+        self.path = os.path.join(self.media_root, 'input', 'data.csv')
+        os.makedirs(os.path.dirname(self.path))
+        df.to_csv(self.path, index=False)
+        self.output = os.path.join(self.media_root, 'reports', 'data')
+        os.makedirs(os.path.dirname(self.output))
+
+    def test_report_is_written(self):
+        entry = build_report(self.path, ['correlation', 'timeseries'], self.output)
+        self.assertEqual(entry['status'], 'ok', entry['error'])
+        self.assertEqual(entry['rows'], 200)
+        self.assertEqual(entry['operations']['correlation'], {'success': True})
+        self.assertFalse(entry['operations']['timeseries']['success'])
+        self.assertEqual(entry['reports'], [f'{self.output}.html', f'{self.output}.pdf'])
+        with open(f'{self.output}.html', encoding='utf-8') as f:
+            html = f.read()
+        self.assertIn('data:image/png;base64,', html)
+        self.assertIn(entry['operations']['timeseries']['error'], html)
+        with open(f'{self.output}.pdf', 'rb') as f:
+            self.assertEqual(f.read(5), b'%PDF-')
+
+    def test_results_are_shared_with_uploads(self):
+        with open(self.path, 'rb') as f:
+            uploaded_file = self.upload(f.read())
+        entry = build_report(self.path, ['correlation'], self.output, formats=['html'])
+        self.assertEqual(entry['file_id'], str(uploaded_file.id))
+        self.assertEqual(UploadedFile.objects.count(), 1)
+        self.assertTrue(AnalysisResult.objects.filter(uploaded_file=uploaded_file).exists())
+        self.assertEqual(import_file(self.path).id, uploaded_file.id)
+
+    def test_rejected_files(self):
+        with open(self.path, 'w') as f:
+            f.write('a,b\n1,2\n3,4,5\n')
+        entry = build_report(self.path, ['eda'], self.output)
+        self.assertEqual(entry['status'], 'failed')
+        self.assertIn('row 3 has 3 fields', entry['error'])
+        self.assertEqual(entry['reports'], [])
+        with open(self.path, 'w'):
+            pass
+        with self.assertRaisesMessage(ValueError, 'The file is empty.'):
+            import_file(self.path)
@@ -0,0 +1,157 @@
+"""
+Tests of JSON serialization of API responses and their compression.
+"""
+
+import gzip
+import json
+import zlib
+from unittest import mock
+
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from dataanalysis import middleware, responses
+from dataanalysis.middleware import CompressionMiddleware, accepted_encodings
+from dataanalysis.responses import ApiJsonResponse, dumps
+
+from .base import MediaTestCase
+
+
+DATA = {
+    'count': np.int64(3),
+    'mean': np.float32(1.5),
+    'flag': np.bool_(True),
+    'values': np.array([[1.0, np.nan], [np.inf, 2.0]]),
+    'missing': float('nan'),
+    'nested': [{'low': -np.inf}, (np.float64('nan'), 4)],
+}
+EXPECTED = {
+    'count': 3,
+    'mean': 1.5,
+    'flag': True,
+    'values': [[1.0, None], [None, 2.0]],
+    'missing': None,
+    'nested': [{'low': None}, [None, 4]],
+}
+
+
+class DumpsTests(SimpleTestCase):
+
+    def test_numpy_values_and_non_finite_floats(self):
+        self.assertEqual(json.loads(dumps(DATA)), EXPECTED)
+
+    def test_standard_library_fallback(self):
+        with mock.patch.object(responses, 'orjson', None):
+            body = dumps(DATA)
+        # NaN and Infinity are not JSON: a strict parser must accept the body
+        self.assertEqual(json.loads(body, parse_constant=self.fail), EXPECTED)
+
+    def test_api_json_response(self):
+        response = ApiJsonResponse({'success': False, 'error': 'nope'}, status=400)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content), {'success': False, 'error': 'nope'})
+
+
+class ErrorResponseTests(MediaTestCase):
+
+    def test_form_errors_are_listed(self):
+        response = self.client.post('/upload/', {'csv_file': SimpleUploadedFile('data.csv', b'')})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'success': False,
+                                           'errors': {'csv_file': ['The submitted file is empty.']}})
+
+
+def _gunzip_stream(chunks):
+    """Decompress gzip pieces one at a time, as a client reading a stream would."""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    return [decompressor.decompress(chunk) for chunk in chunks]
+
+
+@override_settings(RESPONSE_COMPRESSION_MIN_SIZE=100)
+class CompressionTests(SimpleTestCase):
+
+    def setUp(self):
+        # Negotiate gzip whether or not brotli is installed
+        patcher = mock.patch.object(middleware, 'brotli', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.body = json.dumps({'rows': [[i, i * 2] for i in range(200)]}).encode()
+
+    def respond(self, response, accept='gzip, deflate'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings('gzip, br;q=0.5, zstd;q=0, *;q=0.1'), {'gzip', 'br', '*'})
+        self.assertEqual(accepted_encodings('GZip, br;q=0.0.1'), {'gzip'})
+        self.assertEqual(accepted_encodings(''), set())
+
+    def test_gzip(self):
+        response = self.respond(HttpResponse(self.body, content_type='application/json'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    def test_brotli(self):
+        try:
+            import brotli
+        except ImportError:
+            self.skipTest('brotli is not installed')
+        with mock.patch.object(middleware, 'brotli', brotli):
+            response = self.respond(HttpResponse(self.body, content_type='application/json'), 'gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), self.body)
+
+    def test_uncompressed_when_not_accepted(self):
+        for accept in ('', 'identity', 'gzip;q=0'):
+            with self.subTest(accept=accept):
+                response = self.respond(HttpResponse(self.body, content_type='application/json'), accept)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(response['Vary'], 'Accept-Encoding')
+                self.assertEqual(response.content, self.body)
+
+    def test_responses_left_unchanged(self):
+        incompressible = np.random.default_rng(0).bytes(1000)
+        cases = {
+            'small': HttpResponse(b'{"a": 1}', content_type='application/json'),
+            'image': HttpResponse(self.body, content_type='image/png'),
+            'encoded': HttpResponse(self.body, content_type='application/json', headers={'Content-Encoding': 'br'}),
+            'incompressible': HttpResponse(incompressible, content_type='text/plain'),
+        }
+        for name, original in cases.items():
+            with self.subTest(name=name):
+                content = original.content
+                response = self.respond(original)
+                self.assertEqual(response.content, content)
+                self.assertNotEqual(response.get('Content-Encoding'), 'gzip')
+
+    def test_etag_is_weakened(self):
+        response = self.respond(HttpResponse(self.body, content_type='application/json', headers={'ETag': '"abc"'}))
+        self.assertEqual(response['ETag'], 'W/"abc"')
+
+    def test_streams_are_compressed_chunk_by_chunk(self):
+        lines = [json.dumps({'part': i}).encode() + b'\n' for i in range(3)]
+        response = self.respond(StreamingHttpResponse(iter(lines), content_type='application/x-ndjson'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        # Every line can be read as soon as its piece arrives
+        self.assertEqual(_gunzip_stream(response.streaming_content), lines + [b''])
+
+    def test_async_streams(self):
+        lines = [b'a,b\n', b'1,2\n']
+
+        async def chunks():
+            for line in lines:
+                yield line
+
+        response = self.respond(StreamingHttpResponse(chunks(), content_type='text/csv'))
+        self.assertTrue(response.is_async)
+
+        async def read():
+            return [chunk async for chunk in response.streaming_content]
+
+        self.assertEqual(_gunzip_stream(async_to_sync(read)()), lines + [b''])
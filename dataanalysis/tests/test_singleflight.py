@@ -0,0 +1,111 @@
+"""
+Tests of single-flight coordination of identical computations.
+"""
+
+import os
+import threading
+import time
+from unittest import mock
+
+from django.db import connection
+
+from dataanalysis import results
+from dataanalysis.results import get_analysis_result
+from dataanalysis.singleflight import fcntl, single_flight
+
+from .base import MediaTestCase
+
+
+class SingleFlightTests(MediaTestCase):
+
+    def lock_path(self, key):
+        return os.path.join(self.media_root, 'cache', 'locks', f'{key}.lock')
+
+    def test_threads_take_turns(self):
+        running, overlaps = [], []
+
+        def compute():
+            with single_flight('key') as acquired:
+                self.assertTrue(acquired)
+                overlaps.append(len(running))
+                running.append(1)
+                time.sleep(0.05)
+                running.pop()
+
+        threads = [threading.Thread(target=compute) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(overlaps, [0, 0, 0, 0])
+
+    def test_different_keys_do_not_wait(self):
+        with single_flight('first') as first:
+            with single_flight('second', timeout=0) as second:
+                self.assertTrue(first and second)
+
+    def test_waiters_give_up_after_the_timeout(self):
+        outcome = []
+
+        def wait():
+            with single_flight('key', timeout=0.1) as acquired:
+                outcome.append(acquired)
+
+        with single_flight('key'):
+            thread = threading.Thread(target=wait)
+            thread.start()
+            thread.join()
+        self.assertEqual(outcome, [False])
+
+    def test_lock_file_is_removed(self):
+        if fcntl is None:
+            self.skipTest('Lock files need fcntl')
+        with single_flight('key'):
+            self.assertTrue(os.path.exists(self.lock_path('key')))
+        self.assertFalse(os.path.exists(self.lock_path('key')))
+
+    def test_processes_wait_on_the_lock_file(self):
+        if fcntl is None:
+            self.skipTest('Lock files need fcntl')
+        # A lock taken through another open file, as another process would
+        os.makedirs(os.path.dirname(self.lock_path('key')))
+        fd = os.open(self.lock_path('key'), os.O_RDWR | os.O_CREAT)
+        self.addCleanup(os.close, fd)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        with single_flight('key', timeout=0.1) as acquired:
+            self.assertFalse(acquired)
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        with single_flight('key', timeout=0.1) as acquired:
+            self.assertTrue(acquired)
+
+
+class CoalescedAnalysisTests(MediaTestCase):
+    """Identical concurrent analyses compute once."""
+
+    def test_identical_requests_compute_once(self):
+        uploaded_file = self.upload('a,b\n1,2\n3,5\n4,4\n')
+        calls = []
+        run_operation = results.run_operation
+
+        def slow_run_operation(*args, **kwargs):
+            calls.append(args[1])
+            time.sleep(0.2)
+            return run_operation(*args, **kwargs)
+
+        outcomes = []
+
+        def request():
+            try:
+                outcomes.append(get_analysis_result(uploaded_file, 'statistics'))
+            finally:
+                connection.close()
+
+        with mock.patch.object(results, 'run_operation', slow_run_operation):
+            threads = [threading.Thread(target=request) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(calls, ['statistics'])
+        self.assertEqual(len(outcomes), 3)
+        self.assertTrue(all(outcome == outcomes[0] for outcome in outcomes))
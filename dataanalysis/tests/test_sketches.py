@@ -0,0 +1,262 @@
+"""
+Tests of the streaming sketches and the column profiles built from them.
+"""
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from dataanalysis.utils.profiling import (
+    box_stats,
+    build_categorical_profile,
+    build_column_profile,
+    build_numeric_profile,
+    describe_from_profile,
+)
+from dataanalysis.utils.sketches import CountMinSketch, HyperLogLog, KLLSketch, SpaceSaving, hash_values
+
+from .base import MediaTestCase
+
+
+QS = np.linspace(0, 1, 21)
+
+
+def _rank_error(values, estimates, qs):
+    """Largest distance between the requested and the achieved rank."""
+    ranks = np.searchsorted(np.sort(values), estimates, side='right') / len(values)
+    return float(np.max(np.abs(ranks - qs)))
+
+
+class KLLSketchTests(SimpleTestCase):
+
+    def test_small_inputs_are_exact(self):
+        values = np.random.default_rng(1).normal(size=150)
+        sketch = KLLSketch()
+        sketch.update(values)
+        np.testing.assert_allclose(sketch.quantiles(QS), np.quantile(values, QS))
+        self.assertEqual(sketch.quantile(0.5), float(np.median(values)))
+
+    def test_large_inputs_are_within_rank_error(self):
+        values = np.random.default_rng(2).lognormal(size=200_000)
+        sketch = KLLSketch()
+        for chunk in np.array_split(values, 37):
+            sketch.update(chunk)
+        self.assertEqual(sketch.count, len(values))
+        self.assertLess(_rank_error(values, sketch.quantiles(QS[1:-1]), QS[1:-1]), 0.02)
+        self.assertEqual(sketch.quantile(0), values.min())
+        self.assertEqual(sketch.quantile(1), values.max())
+        # Far fewer items kept than values seen
+        self.assertLess(sum(len(level) for level in sketch.levels), 2000)
+
+    def test_merged_sketches_summarize_all_values(self):
+        rng = np.random.default_rng(3)
+        first, second = rng.uniform(0, 1, 50_000), rng.uniform(1, 3, 100_000)
+        a, b = KLLSketch(), KLLSketch()
+        a.update(first)
+        b.update(second)
+        a.merge(b)
+        values = np.concatenate([first, second])
+        self.assertEqual(a.count, len(values))
+        self.assertEqual((a.min, a.max), (values.min(), values.max()))
+        self.assertLess(_rank_error(values, a.quantiles(QS[1:-1]), QS[1:-1]), 0.02)
+
+    def test_missing_values_and_empty_sketches(self):
+        sketch = KLLSketch()
+        self.assertTrue(np.isnan(sketch.quantile(0.5)))
+        sketch.update([np.nan, 1.0, np.nan, 3.0])
+        self.assertEqual(sketch.count, 2)
+        self.assertEqual(sketch.quantile(0.5), 2.0)
+
+    def test_identical_data_gives_identical_sketches(self):
+        values = np.random.default_rng(4).normal(size=50_000)
+        a, b = KLLSketch(), KLLSketch()
+        a.update(values)
+        b.update(values)
+        np.testing.assert_array_equal(a.quantiles(QS), b.quantiles(QS))
+
+
+class BoxStatsTests(SimpleTestCase):
+
+    def test_exact_statistics(self):
+        values = np.concatenate([np.arange(1, 101, dtype=float), [500.0, -300.0, np.nan]])
+        stats = box_stats(values, 'x')
+        q1, med, q3 = np.quantile(values[~np.isnan(values)], [0.25, 0.5, 0.75])
+        self.assertEqual((stats['q1'], stats['med'], stats['q3']), (q1, med, q3))
+        self.assertEqual((stats['whislo'], stats['whishi']), (1.0, 100.0))
+        self.assertEqual(sorted(stats['fliers']), [-300.0, 500.0])
+        self.assertEqual(stats['n_fliers'], 2)
+        self.assertEqual(stats['label'], 'x')
+
+    def test_fliers_are_sampled(self):
+        values = np.concatenate([np.random.default_rng(6).uniform(size=2000), np.arange(1, 301) * 100.0])
+        stats = box_stats(values, 'x', max_fliers=50)
+        self.assertEqual(len(stats['fliers']), 50)
+        self.assertEqual(stats['n_fliers'], 300)
+        self.assertTrue(np.isin(stats['fliers'], values[2000:]).all())
+
+    def test_column_without_numbers(self):
+        with self.assertRaises(ValueError):
+            box_stats([np.nan, np.nan], 'x')
+
+
+class HyperLogLogTests(SimpleTestCase):
+
+    def test_small_cardinalities_are_near_exact(self):
+        hll = HyperLogLog()
+        hll.update(np.arange(1000).repeat(3))
+        self.assertLess(abs(hll.estimate() / 1000 - 1), 0.02)
+        self.assertEqual(HyperLogLog().estimate(), 0)
+
+    def test_large_cardinalities_are_within_error(self):
+        hll = HyperLogLog()
+        for chunk in np.array_split(np.arange(500_000), 10):
+            hll.update(chunk)
+        self.assertLess(abs(hll.estimate() / 500_000 - 1), 0.03)
+
+    def test_merge_is_a_union(self):
+        a, b = HyperLogLog(), HyperLogLog()
+        a.update(np.arange(0, 60_000))
+        b.update(np.arange(40_000, 100_000))
+        self.assertLess(abs(a.merge(b).estimate() / 100_000 - 1), 0.03)
+
+    def test_values_hash_by_their_text(self):
+        np.testing.assert_array_equal(hash_values([1, 2]), hash_values(['1', '2']))
+
+
+class CountMinSketchTests(SimpleTestCase):
+
+    def test_never_undercounts(self):
+        rng = np.random.default_rng(7)
+        values = rng.zipf(1.5, size=100_000).astype(str)
+        counts = pd.Series(values).value_counts()
+        cms = CountMinSketch(width=1024)
+        for chunk in np.array_split(values, 5):
+            chunk_counts = pd.Series(chunk).value_counts()
+            cms.update_hashes(hash_values(chunk_counts.index), chunk_counts.to_numpy())
+        self.assertEqual(cms.total, len(values))
+        estimates = cms.query(counts.index)
+        self.assertTrue((estimates >= counts.to_numpy()).all())
+        # Overcounts stay within e / width of the total for the heavy values
+        self.assertTrue((estimates[:20] - counts.to_numpy()[:20] <= np.e / 1024 * len(values)).all())
+
+    def test_merge_adds_counts(self):
+        a, b = CountMinSketch(), CountMinSketch()
+        a.update_hashes(hash_values(['x', 'y']))
+        b.update_hashes(hash_values(['x']), 4)
+        self.assertEqual(a.merge(b).query(['x', 'y']).tolist(), [5, 1])
+        self.assertEqual(a.total, 6)
+
+    def test_width_must_be_a_power_of_two(self):
+        with self.assertRaises(ValueError):
+            CountMinSketch(width=1000)
+
+
+class SpaceSavingTests(SimpleTestCase):
+
+    def test_exact_while_nothing_is_dropped(self):
+        summary = SpaceSaving(capacity=10)
+        summary.update_counts(pd.Series({'a': 3, 'b': 1}))
+        summary.update_counts(pd.Series({'b': 4, 'c': 2}))
+        self.assertTrue(summary.exact)
+        self.assertEqual(summary.top(2), [('b', 5, 0), ('a', 3, 0)])
+        self.assertEqual(summary.estimate('c'), 2)
+        self.assertEqual(summary.estimate('missing'), 0)
+        self.assertEqual(summary.total, 10)
+
+    def test_heavy_hitters_are_tracked(self):
+        rng = np.random.default_rng(8)
+        values = pd.Series(rng.zipf(1.3, size=200_000).astype(str))
+        counts = values.value_counts()
+        summary = SpaceSaving(capacity=50)
+        for start in range(0, len(values), 10_000):
+            summary.update_counts(values.iloc[start:start + 10_000].value_counts())
+        self.assertFalse(summary.exact)
+        for value, count in counts[counts > len(values) / 50].items():
+            self.assertGreaterEqual(summary.estimate(value), count)
+        top = summary.top(3)
+        self.assertEqual([value for value, _, _ in top], counts.index[:3].tolist())
+        for value, estimate, error in top:
+            self.assertLessEqual(estimate - error, counts[value])
+            self.assertGreaterEqual(estimate, counts[value])
+
+
+class CategoricalProfileTests(SimpleTestCase):
+
+    def test_profile_counts(self):
+        df = pd.DataFrame({'city': ['a', 'b', None, 'a', 'c', 'a'] * 1000, 'n': range(6000)})
+        profile = build_categorical_profile(df, chunk_rows=700)
+        self.assertEqual(list(profile), ['city'])
+        stats = profile['city']
+        self.assertEqual((stats['count'], stats['missing']), (5000, 1000))
+        self.assertEqual((stats['distinct'], stats['distinct_exact']), (3, True))
+        self.assertEqual(stats['top'].top(1), [('a', 3000, 0)])
+        self.assertEqual(stats['cms'].query(['b']).tolist(), [1000])
+
+    def test_many_distinct_values_are_estimated(self):
+        df = pd.DataFrame({'id': [f'id-{i}' for i in range(20_000)]})
+        stats = build_categorical_profile(df)['id']
+        self.assertFalse(stats['distinct_exact'])
+        self.assertLess(abs(stats['distinct'] / 20_000 - 1), 0.03)
+
+
+class DescribeFromProfileTests(SimpleTestCase):
+
+    def test_matches_describe(self):
+        rng = np.random.default_rng(5)
+        df = pd.DataFrame({
+            'a': rng.normal(size=100),
+            'b': np.where(rng.random(100) < 0.2, np.nan, rng.exponential(size=100)),
+            'when': pd.date_range('2024-01-01', periods=100, freq='D'),
+        })
+        profile = build_numeric_profile(df)
+        expected = df.describe(include='all')
+        desc = describe_from_profile(df, profile)
+        self.assertEqual(desc.columns.tolist(), ['a', 'b', 'when'])
+        for col in ('a', 'b'):
+            rows = expected[col].dropna().index
+            np.testing.assert_allclose(desc.loc[rows, col].astype(float), expected.loc[rows, col].astype(float))
+        self.assertEqual(desc.loc['count', 'when'], 100)
+
+    def test_categorical_columns(self):
+        df = pd.DataFrame({'kind': ['x', 'y', 'x', None, 'x'], 'n': [1, 2, 3, 4, 5]})
+        desc = describe_from_profile(df, build_column_profile(df))
+        expected = df.describe(include='all')
+        self.assertEqual(desc.columns.tolist(), ['kind', 'n'])
+        for row in ('count', 'unique', 'top', 'freq'):
+            self.assertEqual(desc.loc[row, 'kind'], expected.loc[row, 'kind'], row)
+
+
+class BoxplotEndpointTests(MediaTestCase):
+
+    def test_outlier_counts(self):
+        data = pd.DataFrame({'x': list(range(1, 101)) + [1000, 2000], 'y': range(102)})
+        uploaded_file = self.upload(data.to_csv(index=False))
+        response = self.client.get(f'/api/boxplot/{uploaded_file.id}/')
+        self.assertEqual(response.status_code, 200, response.content)
+        result = response.json()['data']
+        self.assertEqual(result['columns'], ['x', 'y'])
+        self.assertEqual(result['outlier_counts'], {'x': 2, 'y': 0})
+        self.assertTrue(result['image'])
+
+
+class CategoricalEndpointTests(MediaTestCase):
+
+    def test_top_values_and_frequencies(self):
+        data = pd.DataFrame({'fruit': ['apple'] * 5 + ['pear'] * 3 + ['fig'], 'n': range(9)})
+        uploaded_file = self.upload(data.to_csv(index=False))
+        response = self.client.get(f'/api/categorical/{uploaded_file.id}/',
+                                   {'column': 'fruit', 'top_k': 2, 'values': 'pear,kiwi'})
+        self.assertEqual(response.status_code, 200, response.content)
+        result = response.json()['data']
+        self.assertEqual(result['column'], 'fruit')
+        self.assertEqual((result['count'], result['distinct'], result['distinct_exact']), (9, 3, True))
+        self.assertEqual(result['top_values'], [{'value': 'apple', 'count': 5, 'max_error': 0},
+                                                {'value': 'pear', 'count': 3, 'max_error': 0}])
+        self.assertEqual(result['frequencies'], {'pear': 3, 'kiwi': 0})
+        self.assertTrue(result['image'])
+
+    def test_no_categorical_columns(self):
+        uploaded_file = self.upload('a,b\n1,2\n3,4\n')
+        response = self.client.get(f'/api/categorical/{uploaded_file.id}/')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
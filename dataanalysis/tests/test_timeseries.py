@@ -0,0 +1,139 @@
+"""
+Tests of datetime detection and time-series charts: the sorted time index,
+range selection and LTTB downsampling.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from dataanalysis.datasets import COLUMN_STORE_NAME, load_dataframe, load_time_index
+from dataanalysis.upload_handlers import _infer_type
+from dataanalysis.utils.columnar import build_time_index, open_time_index
+from dataanalysis.utils.operations import normalize_params
+from dataanalysis.utils.timeseries import generate_time_series, lttb, time_range, time_values
+
+from .base import MediaTestCase
+
+
+def _series(rows=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2024-01-01', periods=rows, freq='min')
+    df = pd.DataFrame({'when': times, 'value': np.sin(np.arange(rows) / 50) + rng.normal(scale=0.1, size=rows),
+                       'other': np.arange(rows, dtype=float)})
+    # Shuffled rows, some without a time
+    df = df.sample(frac=1, random_state=seed).reset_index(drop=True)
+    df.loc[:9, 'when'] = pd.NaT
+    return df
+
+
+class DatetimeDetectionTests(SimpleTestCase):
+
+    def test_infer_type(self):
+        self.assertEqual(_infer_type(['2024-01-31', '2024/2/3', '']), 'datetime')
+        self.assertEqual(_infer_type(['2024-01-31T08:30:00.250+01:00', '2024-01-31 08:30Z']), 'datetime')
+        # Day-first dates are ambiguous
+        self.assertEqual(_infer_type(['31/01/2024', '01/02/2024']), 'string')
+        self.assertEqual(_infer_type(['2024-01-31', 'soon']), 'string')
+        self.assertEqual(_infer_type(['2024', '2025']), 'integer')
+
+    def test_aware_times_are_compared_in_utc(self):
+        values = time_values(pd.Series(pd.to_datetime(['2024-01-01T10:00+02:00'])))
+        self.assertEqual(pd.Timestamp(values[0]), pd.Timestamp('2024-01-01 08:00'))
+
+
+class TimeIndexTests(SimpleTestCase):
+
+    def test_build_time_index(self):
+        values = np.array(['2024-03-01', 'NaT', '2024-01-01', '2024-02-01', '2024-01-01'], dtype='datetime64[ns]')
+        sorted_values, order = build_time_index(values)
+        self.assertEqual(order.tolist(), [2, 4, 3, 0])
+        np.testing.assert_array_equal(sorted_values, values[order])
+
+    def test_time_range(self):
+        sorted_values = np.array(['2024-01-01', '2024-01-02', '2024-01-02', '2024-01-05'], dtype='datetime64[ns]')
+        self.assertEqual(time_range(sorted_values), (0, 4))
+        # Inclusive bounds
+        self.assertEqual(time_range(sorted_values, '2024-01-02', '2024-01-02'), (1, 3))
+        self.assertEqual(time_range(sorted_values, '2024-01-03'), (3, 4))
+        self.assertEqual(time_range(sorted_values, end='2023-12-31'), (0, 0))
+        self.assertEqual(time_range(sorted_values, '2024-01-06', '2024-01-01'), (4, 4))
+        # Aware bounds are compared in UTC
+        self.assertEqual(time_range(sorted_values, '2024-01-02T01:00+02:00'), (1, 4))
+
+
+class LttbTests(SimpleTestCase):
+
+    def test_keeps_endpoints_and_extremes(self):
+        x = np.arange(10_000)
+        y = np.random.default_rng(1).normal(size=10_000)
+        y[4321], y[7000] = 50.0, -50.0
+        keep = lttb(x, y, 100)
+        self.assertEqual(len(keep), 100)
+        self.assertEqual((keep[0], keep[-1]), (0, 9999))
+        self.assertTrue((np.diff(keep) > 0).all())
+        self.assertIn(4321, keep)
+        self.assertIn(7000, keep)
+
+    def test_short_series_are_kept(self):
+        self.assertEqual(lttb(np.arange(5), np.ones(5), 10).tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(lttb(np.arange(5), np.ones(5), 2).tolist(), [0, 1, 2, 3, 4])
+
+
+class GenerateTimeSeriesTests(SimpleTestCase):
+
+    def test_downsampled_series(self):
+        df = _series()
+        result = generate_time_series(df, max_points=300)
+        self.assertEqual(result['time_column'], 'when')
+        self.assertEqual(result['columns'], ['value', 'other'])
+        self.assertEqual(result['rows'], 4990)
+        self.assertEqual(result['plotted_points'], {'value': 300, 'other': 300})
+        self.assertTrue(result['image'])
+
+    def test_range_and_period(self):
+        df = _series()
+        result = generate_time_series(df, columns=['other'], period='hour', agg='count',
+                                      start='2024-01-01 10:00', end='2024-01-01 11:59')
+        self.assertEqual(result['points'], 2)
+        self.assertEqual(pd.Timestamp(result['start']), pd.Timestamp('2024-01-01 10:00'))
+        self.assertLessEqual(result['rows'], 120)
+        # The time index of the column gives the same chart
+        index = build_time_index(time_values(df['when']))
+        self.assertEqual(generate_time_series(df, columns=['other'], time_index=index, max_points=50)['rows'], 4990)
+
+    def test_errors(self):
+        df = _series(rows=100)
+        with self.assertRaisesMessage(ValueError, 'No rows in the selected time range'):
+            generate_time_series(df, start='2030-01-01')
+        with self.assertRaisesMessage(ValueError, 'Not a datetime column'):
+            generate_time_series(df, time_column='value')
+        with self.assertRaisesMessage(ValueError, 'No datetime columns'):
+            generate_time_series(df.drop(columns='when'))
+
+
+class TimeSeriesEndpointTests(MediaTestCase):
+
+    def test_time_index_is_memory_mapped(self):
+        uploaded_file = self.upload(_series(rows=500).to_csv(index=False))
+        df = load_dataframe(uploaded_file)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['when']))
+        sorted_values, order = load_time_index(uploaded_file, df, normalize_params('timeseries', {}))
+        self.assertIsInstance(sorted_values, np.memmap)
+        expected_sorted, expected_order = build_time_index(time_values(df['when']))
+        np.testing.assert_array_equal(sorted_values, expected_sorted)
+        np.testing.assert_array_equal(order, expected_order)
+        store = os.path.join(uploaded_file.cache_dir, COLUMN_STORE_NAME)
+        self.assertIsNone(open_time_index(store, 'value'))
+
+    def test_endpoint(self):
+        uploaded_file = self.upload(_series(rows=500).to_csv(index=False))
+        response = self.client.get(f'/api/timeseries/{uploaded_file.id}/',
+                                   {'columns': 'value', 'period': 'hour', 'agg': 'max', 'start': '2024-01-01 02:00'})
+        self.assertEqual(response.status_code, 200, response.content)
+        result = response.json()['data']
+        self.assertEqual((result['period'], result['agg'], result['points']), ('hour', 'max', 7))
+        response = self.client.get(f'/api/timeseries/{uploaded_file.id}/', {'period': 'fortnight'})
+        self.assertEqual(response.status_code, 400)
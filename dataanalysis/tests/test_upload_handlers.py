@@ -0,0 +1,76 @@
+"""
+Tests of the inspecting upload handler.
+"""
+
+import hashlib
+
+from django.core.files.uploadhandler import SkipFile, StopFutureHandlers
+from django.test import SimpleTestCase
+
+from dataanalysis.datasets import load_dataframe
+from dataanalysis.upload_handlers import CSVInspectingUploadHandler, file_name_error, file_stem
+
+from .base import MediaTestCase
+
+
+class UploadInspectionTests(MediaTestCase):
+    """Uploads are hashed, sniffed and counted while they stream in."""
+
+    def test_hash_row_count_and_types(self):
+        content = 'id,price,day,label\n1,2.5,2024-01-01,a\n2,3,2024-01-02,"b, c"\n'
+        uploaded = self.upload(content)
+        self.assertEqual(uploaded.content_hash, hashlib.sha256(content.encode()).hexdigest())
+        self.assertEqual(uploaded.row_count, 2)
+        self.assertEqual(uploaded.file_size, len(content))
+        self.assertEqual(uploaded.csv_column_types(),
+                         {'id': 'integer', 'price': 'float', 'day': 'datetime', 'label': 'string'})
+
+    def test_quoted_newlines_and_missing_final_newline(self):
+        uploaded = self.upload('a,b\n1,"two\nlines"\n2,"x"\n3,y')
+        self.assertEqual(uploaded.row_count, 3)
+        self.assertEqual(len(load_dataframe(uploaded)), 3)
+
+    def test_delimiter_and_encoding_are_detected(self):
+        uploaded = self.upload('név;érték\nalma;1\nkörte;2\n'.encode('latin-1'))
+        self.assertEqual(uploaded.schema['delimiter'], ';')
+        self.assertEqual(uploaded.schema['encoding'], 'latin-1')
+        self.assertEqual(list(load_dataframe(uploaded).columns), ['név', 'érték'])
+
+    def test_padded_header_names_are_kept_as_pandas_reads_them(self):
+        uploaded = self.upload(' price , qty,,qty\n1.5,2,x,3\n2.5,3,y,4\n')
+        self.assertEqual([column['name'] for column in uploaded.schema['columns']],
+                         [' price ', ' qty', 'Unnamed: 2', 'qty'])
+        df = load_dataframe(uploaded)
+        self.assertEqual(list(df.columns), [' price ', ' qty', 'Unnamed: 2', 'qty'])
+        self.assertEqual(str(df[' qty'].dtype), 'int64')
+
+    def test_invalid_uploads_are_rejected_with_a_reason(self):
+        cases = {
+            'data.txt': ('a,b\n1,2\n', 'Only CSV'),
+            'binary.csv': (b'a,b\n\x00\x01,2\n', 'binary content'),
+            'ragged.csv': ('a,b\n1,2\n3,4,5\n', 'row 3 has 3 fields'),
+        }
+        for name, (content, message) in cases.items():
+            with self.subTest(name=name):
+                response = self.upload(content, name, status=400)
+                self.assertIn(message, response.json()['errors']['csv_file'][0])
+
+
+class UploadHandlerTests(SimpleTestCase):
+    """Limits checked as chunks arrive, before the body is fully received."""
+
+    def test_upload_size_cap(self):
+        handler = CSVInspectingUploadHandler(max_upload_size=1024 * 1024)
+        with self.assertRaises(StopFutureHandlers):
+            handler.new_file('csv_file', 'big.csv', 'text/csv', None)
+        handler.receive_data_chunk(b'a,b\n' + b'1,2\n' * 1000, 0)
+        with self.assertRaises(SkipFile):
+            handler.receive_data_chunk(b'1,2\n' * 300_000, 4004)
+        self.assertEqual(handler.error, 'File size must be under 1MB.')
+
+    def test_file_names(self):
+        self.assertIsNone(file_name_error('data.CSV'))
+        self.assertIsNone(file_name_error('data.csv.gz'))
+        self.assertIsNotNone(file_name_error('data.xlsx'))
+        self.assertEqual(file_stem('dir/b.CSV.gz'), 'b')
+        self.assertEqual(file_stem('f.tar.gz'), 'f.tar')
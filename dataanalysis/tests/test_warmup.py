@@ -0,0 +1,73 @@
+"""
+Tests of the background warm-up of default analyses after an upload.
+"""
+
+import os
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import override_settings
+
+from dataanalysis import warmup
+from dataanalysis.results import result_cache_key
+from dataanalysis.utils.operations import normalize_params
+
+from .base import MediaTestCase
+
+
+CSV = 'a,b,c\n1,2,x\n3,5,y\n4,4,x\n'
+
+
+def _wait_for_warmups():
+    # Warm-ups run in order on the executor's single worker (the default)
+    warmup._get_executor().submit(lambda: None).result()
+
+
+class WarmupTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Not busy whatever the load of the machine running the tests
+        patcher = mock.patch.object(os, 'getloadavg', return_value=(0.0, 0.0, 0.0))
+        self.getloadavg = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def is_cached(self, uploaded_file, operation):
+        key = result_cache_key(uploaded_file.content_hash, operation, normalize_params(operation, None))
+        return caches[settings.RESULT_CACHE_ALIAS].get(key) is not None
+
+    def test_upload_warms_up_default_analyses(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            uploaded_file = self.upload(CSV)
+        _wait_for_warmups()
+        for operation in settings.WARMUP_OPERATIONS:
+            self.assertTrue(self.is_cached(uploaded_file, operation), operation)
+        self.assertFalse(self.is_cached(uploaded_file, 'clustering'))
+        self.assertEqual(warmup._pending, 0)
+
+    def test_skipped_when_disabled(self):
+        uploaded_file = self.upload(CSV)
+        with override_settings(WARMUP_ENABLED=False):
+            self.assertFalse(warmup.schedule_warmup(uploaded_file))
+
+    def test_skipped_under_load(self):
+        uploaded_file = self.upload(CSV)
+        self.getloadavg.return_value = (settings.WARMUP_MAX_LOAD * (os.cpu_count() or 1) * 2, 0.0, 0.0)
+        self.assertTrue(warmup.server_is_busy())
+        self.assertFalse(warmup.schedule_warmup(uploaded_file))
+        self.assertEqual(warmup._pending, 0)
+
+    def test_skipped_when_too_many_are_pending(self):
+        uploaded_file = self.upload(CSV)
+        with mock.patch.object(warmup, '_pending', settings.WARMUP_MAX_PENDING):
+            self.assertTrue(warmup.server_is_busy())
+            self.assertFalse(warmup.schedule_warmup(uploaded_file))
+
+    def test_failures_are_not_raised(self):
+        uploaded_file = self.upload(CSV)
+        with mock.patch.object(warmup, 'load_dataframe', side_effect=OSError('gone')):
+            self.assertTrue(warmup.schedule_warmup(uploaded_file))
+            _wait_for_warmups()
+        self.assertEqual(warmup._pending, 0)
+        self.assertFalse(self.is_cached(uploaded_file, 'statistics'))
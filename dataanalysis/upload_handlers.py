@@ -0,0 +1,331 @@
+"""
+Upload handlers for the DataAnalysis app.
+Streams CSV uploads to disk while hashing, sniffing and counting rows,
+so malformed files are rejected before the body has been fully received.
+gzip and zstd uploads are decompressed as they arrive, and every file is
+written gzip-compressed (see utils.compression). Parquet and Arrow IPC
+files are stored as uploaded and inspected from their metadata.
+"""
+
+import io
+import os
+import re
+import csv
+import codecs
+import hashlib
+
+import pandas as pd
+from django.core.files.uploadhandler import (
+    TemporaryFileUploadHandler,
+    SkipFile,
+    StopFutureHandlers,
+)
+
+from .utils.arrow_formats import FORMATS, format_of, inspect_file
+from .utils.arrow_formats import available as arrow_formats_available
+from .utils.compression import (
+    STORAGE_SUFFIX,
+    GzipBlockWriter,
+    StreamDecompressor,
+    available_compressions,
+    compression_of,
+)
+from .utils.paging import RecordScanner
+
+
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB, as received (compressed or not)
+MAX_DATA_SIZE = 100 * 1024 * 1024  # 100MB of uncompressed CSV or column data
+CSV_EXTENSIONS = ('.csv', '.csv.gz', '.csv.zst')
+SNIFF_SAMPLE_SIZE = 64 * 1024  # Bytes inspected to detect the CSV dialect
+SNIFF_DELIMITERS = ',;\t|'
+
+# Year-first dates with an optional time and UTC offset, e.g. 2024-01-31,
+# 2024/01/31 08:30 or 2024-01-31T08:30:00.250+01:00. Day/month-first dates
+# are ambiguous and stay text.
+DATETIME_PATTERN = re.compile(
+    r'\d{4}([-/])\d{1,2}\1\d{1,2}'
+    r'(?:[ T]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?$'
+)
+
+
+def file_name_error(file_name):
+    """Return why a file name is not accepted for an upload, None if it is."""
+    if format_of(file_name) is not None:
+        if not arrow_formats_available():
+            return 'Parquet and Arrow files are not supported on this server.'
+        return None
+    if not file_name.lower().endswith(CSV_EXTENSIONS):
+        return 'Only CSV (.csv, .csv.gz or .csv.zst), Parquet and Arrow files are allowed.'
+    if compression_of(file_name) not in (None, *available_compressions()):
+        return 'Zstandard-compressed files are not supported on this server.'
+    return None
+
+
+def file_stem(file_name):
+    """Return a file name without its CSV, Parquet or Arrow suffix and compression suffix."""
+    stem = os.path.basename(file_name)
+    if compression_of(stem) is not None:
+        stem = os.path.splitext(stem)[0]
+    if format_of(stem) is not None or stem.lower().endswith('.csv'):
+        stem = os.path.splitext(stem)[0]
+    return stem
+
+
+def _header_names(text, delimiter, header):
+    """
+    Column names of a CSV sample exactly as pandas reads them (unstripped,
+    'Unnamed: i' for empty names, duplicates numbered), so dtype hints
+    keyed by them match the parsed columns.
+    """
+    try:
+        names = list(pd.read_csv(io.StringIO(text), sep=delimiter, nrows=0).columns)
+    except (ValueError, pd.errors.ParserError):
+        return header
+    return names if len(names) == len(header) else header
+
+
+def _infer_type(values):
+    """
+    Infer a simple column type ('integer', 'float', 'datetime' or 'string')
+    from sample values.
+    """
+    present = [value.strip() for value in values if value.strip()]
+    if present and all(DATETIME_PATTERN.match(value) for value in present):
+        return 'datetime'
+    inferred = 'integer'
+    for value in values:
+        value = value.strip()
+        if not value:
+            continue
+        if inferred == 'integer':
+            try:
+                int(value)
+                continue
+            except ValueError:
+                inferred = 'float'
+        try:
+            float(value)
+        except ValueError:
+            return 'string'
+    return inferred
+
+
+class CSVInspectingUploadHandler(TemporaryFileUploadHandler):
+    """
+    Upload handler that streams the file to a temporary file on disk and,
+    chunk by chunk:
+    - decompresses .csv.gz and .csv.zst files, all checks below applying to
+      the uncompressed CSV, which is capped at MAX_DATA_SIZE
+    - computes a SHA-256 content hash
+    - validates the encoding (UTF-8, falling back to Latin-1)
+    - sniffs the delimiter and header from the first bytes
+    - counts records, ignoring newlines inside quoted fields, and records
+      the byte offsets of the row-offset index used for paging
+    - writes the CSV to the temporary file as gzip blocks (see
+      compression.GzipBlockWriter), whatever the upload's compression
+
+    The results are attached to the returned file as ``content_hash``,
+    ``row_count``, ``row_offsets``, ``csv_schema``, ``data_size`` (uncompressed
+    bytes), ``block_offsets`` and ``storage_suffix``. Parquet and Arrow IPC
+    files (see utils.arrow_formats) are only hashed while streaming and
+    stored as they are; their schema and row count come from their metadata.
+
+    When the upload is invalid the file is skipped and the reason is kept
+    in ``error``. It must be the only handler of the request, since it may
+    end a file without returning it. ``max_upload_size`` caps the bytes
+    received (None for no cap, e.g. for local files); the uncompressed
+    data is always capped at MAX_DATA_SIZE.
+    """
+
+    def __init__(self, request=None, max_upload_size=MAX_UPLOAD_SIZE):
+        super().__init__(request)
+        self.error = None
+        self.max_upload_size = max_upload_size
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        self._hash = hashlib.sha256()
+        self._decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self._encoding = 'utf-8'
+        self._sample = b''
+        self._schema = None
+        self._scanner = RecordScanner()
+        self._last_byte = b''
+        self._received = 0
+        self._size = 0
+        self._writer = GzipBlockWriter(self.file)
+        self._decompressor = None
+        self._format = format_of(file_name)
+
+        error = file_name_error(file_name)
+        if error:
+            self._reject(error)
+        if compression_of(file_name) is not None:
+            self._decompressor = StreamDecompressor(compression_of(file_name), self._inspect)
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._received += len(raw_data)
+        if self.max_upload_size is not None and self._received > self.max_upload_size:
+            self._reject(f'File size must be under {self.max_upload_size // (1024 * 1024)}MB.')
+
+        if self._format is not None:
+            self._hash.update(raw_data)
+            return super().receive_data_chunk(raw_data, start)
+        if self._decompressor is None:
+            self._inspect(raw_data)
+        else:
+            try:
+                self._decompressor.feed(raw_data)
+            except ValueError as e:
+                self._reject(str(e))
+        # _inspect has written the data, compressed
+        return None
+
+    def _inspect(self, data):
+        """Check, hash, scan and write the next piece of uncompressed CSV."""
+        self._size += len(data)
+        if self._size > MAX_DATA_SIZE:
+            self._reject('The uncompressed file must be under 100MB.')
+
+        self._hash.update(data)
+        self._check_encoding(data)
+        self._scanner.feed(data)
+
+        if self._schema is None:
+            self._sample += data
+            if len(self._sample) >= SNIFF_SAMPLE_SIZE:
+                self._sniff()
+
+        self._last_byte = data[-1:]
+        self._writer.write(data)
+
+    def file_complete(self, file_size):
+        if file_size == 0:
+            # Let the form report the empty file
+            return super().file_complete(file_size)
+        if self._format is not None:
+            return self._complete_column_file(file_size)
+
+        if self._decompressor is not None:
+            try:
+                self._decompressor.close()
+            except ValueError as e:
+                # Too late to skip: drop the temporary file and return nothing
+                self.error = str(e)
+                self.upload_interrupted()
+                return None
+
+        if self._encoding == 'utf-8':
+            try:
+                self._decoder.decode(b'', final=True)
+            except UnicodeDecodeError:
+                self._encoding = 'latin-1'
+        if self._schema is None:
+            try:
+                self._sniff()
+            except SkipFile:
+                # Too late to skip: drop the temporary file and return nothing
+                self.upload_interrupted()
+                return None
+
+        records = self._scanner.newlines
+        if self._last_byte not in (b'\n', b''):
+            records += 1  # Last line has no trailing newline
+        records -= 1  # Header line
+
+        self._writer.close()
+        file = super().file_complete(file_size)
+        self._schema['encoding'] = self._encoding
+        file.content_hash = self._hash.hexdigest()
+        file.row_count = max(records, 0)
+        file.row_offsets = self._scanner.row_offsets(file.row_count)
+        file.csv_schema = self._schema
+        file.data_size = self._size
+        file.block_offsets = self._writer.blocks
+        file.storage_suffix = STORAGE_SUFFIX
+        return file
+
+    def _complete_column_file(self, file_size):
+        """Inspect a complete Parquet or Arrow IPC file from its metadata."""
+        file = super().file_complete(file_size)
+        try:
+            info = inspect_file(file.temporary_file_path(), self._format)
+            if info['data_size'] > MAX_DATA_SIZE:
+                raise ValueError('The uncompressed data must be under 100MB.')
+        except ValueError as e:
+            # Too late to skip: drop the temporary file and return nothing
+            self.error = str(e)
+            self.upload_interrupted()
+            return None
+
+        file.content_hash = self._hash.hexdigest()
+        file.row_count = info['row_count']
+        file.row_offsets = None
+        file.csv_schema = info['schema']
+        file.data_size = info['data_size']
+        file.block_offsets = None
+        file.storage_suffix = next(suffix for suffix, name in FORMATS.items() if name == self._format)
+        return file
+
+    def _reject(self, message):
+        self.error = message
+        raise SkipFile(message)
+
+    def _check_encoding(self, raw_data):
+        if b'\x00' in raw_data:
+            self._reject('The uploaded file is not a valid CSV file (binary content).')
+        if self._encoding == 'utf-8':
+            try:
+                self._decoder.decode(raw_data)
+            except UnicodeDecodeError:
+                # Latin-1 decodes any byte sequence, so pandas can still read it
+                self._encoding = 'latin-1'
+
+    def _sniff(self):
+        """Detect delimiter, header and column types from the sample."""
+        text = self._sample.decode('latin-1' if self._encoding == 'latin-1' else 'utf-8-sig',
+                                   errors='replace')
+        # Only keep complete lines unless the whole file fits in the sample
+        if len(self._sample) >= SNIFF_SAMPLE_SIZE and '\n' in text:
+            text = text[:text.rindex('\n')]
+        self._sample = b''
+
+        rows = [row for row in csv.reader(io.StringIO(text)) if row]
+        if not rows:
+            self._reject('The uploaded file does not contain any CSV rows.')
+
+        # Keep the comma (pandas' default) whenever it splits the sample consistently
+        delimiter = ','
+        widths = {len(row) for row in rows}
+        if len(widths) > 1 or widths == {1}:
+            try:
+                delimiter = csv.Sniffer().sniff(text, delimiters=SNIFF_DELIMITERS).delimiter
+            except csv.Error:
+                pass
+            if delimiter != ',':
+                rows = [row for row in csv.reader(io.StringIO(text), delimiter=delimiter) if row]
+
+        try:
+            has_header = csv.Sniffer().has_header(text)
+        except csv.Error:
+            has_header = True
+
+        width = len(rows[0])
+        for row_number, row in enumerate(rows[1:], start=2):
+            if len(row) > width:
+                self._reject(
+                    f'Malformed CSV: row {row_number} has {len(row)} fields, expected {width}.'
+                )
+
+        # The first row is always read as the header, like pandas does
+        columns = []
+        for i, name in enumerate(_header_names(text, delimiter, rows[0])):
+            values = [row[i] for row in rows[1:] if i < len(row)]
+            columns.append({'name': name, 'type': _infer_type(values)})
+
+        self._schema = {
+            'delimiter': delimiter,
+            'has_header': has_header,
+            'columns': columns,
+        }
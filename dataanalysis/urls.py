@@ -14,11 +14,16 @@ urlpatterns = [
     # Upload endpoint (AJAX)
     path('upload/', views.upload_file, name='upload'),
     
+    # Append rows to an uploaded file (AJAX)
+    path('api/append/<uuid:file_id>/', views.api_append, name='api_append'),
+    
     # Analysis page
     path('analysis/<uuid:file_id>/', views.analysis_page, name='analysis'),
     
     # API endpoints for analysis operations
     path('api/table/<uuid:file_id>/', views.api_table_preview, name='api_table'),
+    path('api/rows/<uuid:file_id>/', views.api_table_rows, name='api_rows'),
+    path('api/query/<uuid:file_id>/', views.api_query, name='api_query'),
     path('api/linear-regression/<uuid:file_id>/', views.api_linear_regression, name='api_linear_regression'),
     path('api/clustering/<uuid:file_id>/', views.api_clustering, name='api_clustering'),
     path('api/distribution/<uuid:file_id>/', views.api_distribution, name='api_distribution'),
@@ -28,10 +33,20 @@ urlpatterns = [
     path('api/scatter/<uuid:file_id>/', views.api_scatter, name='api_scatter'),
     path('api/histogram/<uuid:file_id>/', views.api_histogram, name='api_histogram'),
     path('api/boxplot/<uuid:file_id>/', views.api_boxplot, name='api_boxplot'),
+    path('api/categorical/<uuid:file_id>/', views.api_categorical, name='api_categorical'),
+    path('api/timeseries/<uuid:file_id>/', views.api_timeseries, name='api_timeseries'),
+    path('api/outliers/<uuid:file_id>/', views.api_outliers, name='api_outliers'),
+    
+    # Streamed export of filtered and cluster/outlier-labeled rows (CSV or Parquet)
+    path('api/export/<uuid:file_id>/', views.api_export, name='api_export'),
+    
+    # Batch endpoint: several operations, one load, streamed NDJSON response
+    path('api/batch/<uuid:file_id>/', views.api_batch, name='api_batch'),
     
     # Download endpoint
     path('download/<uuid:file_id>/', views.download_visualization, name='download'),
     
     # Get columns for a file
     path('api/columns/<uuid:file_id>/', views.api_get_columns, name='api_columns'),
+    path('api/status/', views.api_status, name='api_status'),
 ]
@@ -7,6 +7,7 @@ Contains functions for various data analysis operations:
 - Statistical Summary
 - EDA Report
 - Correlation Matrix
+- Categorical Analysis
 """
 
 import io
@@ -19,27 +20,57 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.linear_model import LinearRegression
 from sklearn.cluster import KMeans
+from sklearn.decomposition import PCA, IncrementalPCA
 from sklearn.preprocessing import StandardScaler
 from sklearn.impute import SimpleImputer
+from scipy.cluster.hierarchy import linkage, leaves_list
+from scipy.spatial.distance import squareform
+
+from .parsing import read_csv
+from .query import apply_filters
+from .profiling import (
+    box_stats,
+    build_categorical_profile,
+    correlation_from_moments,
+    describe_from_profile,
+    regression_from_moments,
+)
 
 
 # Set plot style
 plt.style.use('seaborn-v0_8-whitegrid')
 sns.set_palette(['#2E7D32', '#4CAF50', '#81C784', '#A5D6A7', '#C8E6C9'])
 
+# Correlation matrices wider than this are drawn without annotations
+CORRELATION_ANNOTATE_MAX = 15
+CORRELATION_LABEL_MAX = 60  # Column labels drawn on wide matrices
+
+# Principal components kept by clustering projections, and the share of
+# variance the components clustered on must explain by default
+PCA_MAX_COMPONENTS = 20
+PCA_EXPLAINED_VARIANCE = 0.9
+PCA_INCREMENTAL_CELLS = 20_000_000  # Fit larger matrices with IncrementalPCA
+PCA_BATCH_ROWS = 50_000
+
 
-def load_csv(file_path):
+def load_csv(file_path, sep=',', encoding=None, column_types=None, engine='auto', compression='infer'):
     """
     Load a CSV file into a pandas DataFrame.
     
     Args:
         file_path: Path to the CSV file
+        sep: Field delimiter (detected at upload time)
+        encoding: Text encoding (detected at upload time)
+        column_types: Column types detected at upload time, used as dtype hints
+        engine: Parse engine, 'auto' picks one by file size (see parsing.read_csv)
+        compression: 'gzip', 'zstd', None, or 'infer' from the file name
         
     Returns:
         pandas.DataFrame: Loaded data
     """
     try:
-        df = pd.read_csv(file_path)
+        df = read_csv(file_path, sep=sep, encoding=encoding,
+                      column_types=column_types, engine=engine, compression=compression)
         return df
     except Exception as e:
         raise ValueError(f"Error loading CSV: {str(e)}")
@@ -50,6 +81,11 @@ def get_numeric_columns(df):
     return df.select_dtypes(include=[np.number]).columns.tolist()
 
 
+def get_datetime_columns(df):
+    """Get list of datetime columns from DataFrame."""
+    return df.select_dtypes(include=['datetime', 'datetimetz']).columns.tolist()
+
+
 def get_categorical_columns(df):
     """Get list of categorical columns from DataFrame."""
     return df.select_dtypes(include=['object', 'category']).columns.tolist()
@@ -74,28 +110,47 @@ def fig_to_base64(fig):
     return image_base64
 
 
-def generate_table_preview(df, max_rows=20):
+def get_box_stats(df, col, profile=None):
+    """
+    Get box-plot statistics for a column, from the profile when available.
+    
+    Args:
+        df: pandas.DataFrame
+        col: Numeric column name
+        profile: Column profile of df (optional)
+        
+    Returns:
+        dict: Statistics for Axes.bxp
+    """
+    if profile is not None and profile['columns'].get(col, {}).get('box') is not None:
+        return profile['columns'][col]['box']
+    return box_stats(df[col].to_numpy(dtype=float, na_value=np.nan), col)
+
+
+def generate_table_preview(df, max_rows=20, filters=None):
     """
     Generate HTML table preview of the DataFrame.
     
     Args:
         df: pandas.DataFrame
         max_rows: Maximum number of rows to display
+        filters: Filter spec applied before the analysis (optional)
         
     Returns:
         dict: Contains HTML table, shape info, and column info
     """
+    df = apply_filters(df, filters)
+    
     # Get basic info
     shape = df.shape
     columns_info = []
     
+    null_counts = df.isnull().sum()
     for col in df.columns:
-        dtype = str(df[col].dtype)
-        null_count = int(df[col].isnull().sum())  # Convert to native int
         columns_info.append({
             'name': col,
-            'dtype': dtype,
-            'null_count': null_count
+            'dtype': str(df[col].dtype),
+            'null_count': null_counts[col]
         })
     
     # Generate HTML table
@@ -117,7 +172,7 @@ def generate_table_preview(df, max_rows=20):
     }
 
 
-def perform_linear_regression(df, x_column=None, y_column=None):
+def perform_linear_regression(df, x_column=None, y_column=None, filters=None, moments=None):
     """
     Perform linear regression analysis.
     
@@ -125,10 +180,18 @@ def perform_linear_regression(df, x_column=None, y_column=None):
         df: pandas.DataFrame
         x_column: Name of the x variable column (optional)
         y_column: Name of the y variable column (optional)
+        filters: Filter spec applied before the analysis (optional)
+        moments: Co-moments of df's numeric columns, see
+            profiling.build_moments; the line is taken from them instead of
+            being fitted (optional, ignored when filtering)
         
     Returns:
         dict: Contains plot image, R² score, coefficients
     """
+    df = apply_filters(df, filters)
+    if filters:
+        moments = None  # The moments describe the unfiltered data
+    
     numeric_cols = get_numeric_columns(df)
     
     if len(numeric_cols) < 2:
@@ -146,12 +209,16 @@ def perform_linear_regression(df, x_column=None, y_column=None):
     y = data[y_column].values
     
     # Fit model
-    model = LinearRegression()
-    model.fit(X, y)
-    y_pred = model.predict(X)
-    
-    # Calculate R² score
-    r2_score = model.score(X, y)
+    if moments is not None and x_column in moments['columns'] and y_column in moments['columns']:
+        coefficient, intercept, r2_score = regression_from_moments(moments, x_column, y_column)
+    else:
+        model = LinearRegression()
+        model.fit(X, y)
+        coefficient, intercept = model.coef_[0], model.intercept_
+        
+        # Calculate R² score
+        r2_score = model.score(X, y)
+    y_pred = coefficient * X[:, 0] + intercept
     
     # Create plot
     fig, ax = plt.subplots(figsize=(10, 6))
@@ -172,49 +239,222 @@ def perform_linear_regression(df, x_column=None, y_column=None):
     
     return {
         'image': image_base64,
-        'r2_score': float(round(r2_score, 4)),
-        'coefficient': float(round(model.coef_[0], 4)),
-        'intercept': float(round(model.intercept_, 4)),
+        'r2_score': round(r2_score, 4),
+        'coefficient': round(coefficient, 4),
+        'intercept': round(intercept, 4),
         'x_column': x_column,
         'y_column': y_column,
-        'equation': f'y = {model.coef_[0]:.4f}x + {model.intercept_:.4f}'
+        'equation': f'y = {coefficient:.4f}x + {intercept:.4f}'
     }
 
 
-def perform_clustering(df, n_clusters=3, columns=None):
+def select_numeric_columns(df, columns=None, minimum=1, default_count=None, analysis='analysis'):
     """
-    Perform KMeans clustering analysis.
+    Resolve the numeric columns an analysis runs on.
     
     Args:
         df: pandas.DataFrame
-        n_clusters: Number of clusters
-        columns: List of columns to use (optional)
+        columns: Requested columns (optional)
+        minimum: Number of columns the analysis needs
+        default_count: Leading numeric columns used when none are requested
+            (all of them by default)
+        analysis: Analysis name, for error messages
         
     Returns:
-        dict: Contains plot image and cluster info
+        list: Numeric column names
     """
     numeric_cols = get_numeric_columns(df)
     
-    if len(numeric_cols) < 2:
-        raise ValueError("Need at least 2 numeric columns for clustering")
-    
-    # Select columns for clustering
-    if columns is None or len(columns) < 2:
-        columns = numeric_cols[:2]
+    if len(numeric_cols) < minimum:
+        raise ValueError(f"Need at least {minimum} numeric column{'s' if minimum > 1 else ''} for {analysis}")
     
-    # Prepare data
-    data = df[columns].dropna()
+    if columns is None or len(columns) < minimum:
+        return numeric_cols[:default_count]
+    unknown = [col for col in columns if col not in numeric_cols]
+    if unknown:
+        raise ValueError(f"Not numeric columns: {', '.join(map(str, unknown))}")
+    return list(columns)
+
+
+def clustering_columns(df, columns=None):
+    """Resolve the columns a clustering runs on (the first two numeric by default)."""
+    return select_numeric_columns(df, columns, minimum=2, default_count=2, analysis='clustering')
+
+
+def impute_and_scale(data):
+    """
+    Mean-impute missing values and standardize numeric data.
     
-    # Impute missing values and scale
+    Args:
+        data: pandas.DataFrame of numeric columns
+        
+    Returns:
+        tuple: (fitted imputer, fitted scaler, scaled numpy.ndarray)
+    """
     imputer = SimpleImputer(strategy='mean')
     scaler = StandardScaler()
     
     X = imputer.fit_transform(data)
     X_scaled = scaler.fit_transform(X)
+    return imputer, scaler, X_scaled
+
+
+def wants_projection(columns, reduce='auto'):
+    """Whether a clustering on these columns runs on principal components."""
+    return reduce == 'pca' or (reduce == 'auto' and len(columns) > 2)
+
+
+def fit_projection(df, columns):
+    """
+    Fit the principal component projection of some columns.
+    
+    Rows with missing values are dropped and the columns standardized, as
+    for clustering. Components come from randomized SVD, or from
+    IncrementalPCA in batches on large matrices, and at most
+    PCA_MAX_COMPONENTS are kept.
+    
+    Args:
+        df: pandas.DataFrame
+        columns: Numeric column names
+        
+    Returns:
+        dict: Fitted 'imputer', 'scaler' and 'pca' plus the 'columns'
+    """
+    data = df[columns].dropna()
+    if len(data) < 2:
+        raise ValueError("Not enough complete rows for clustering")
+    
+    imputer, scaler, X_scaled = impute_and_scale(data)
+    
+    n_components = min(PCA_MAX_COMPONENTS, X_scaled.shape[0], X_scaled.shape[1])
+    if X_scaled.size > PCA_INCREMENTAL_CELLS:
+        batch_size = max(PCA_BATCH_ROWS, n_components)
+        pca = IncrementalPCA(n_components=n_components, batch_size=batch_size)
+    else:
+        pca = PCA(n_components=n_components, svd_solver='randomized', random_state=42)
+    pca.fit(X_scaled)
+    
+    return {'imputer': imputer, 'scaler': scaler, 'pca': pca, 'columns': list(columns)}
+
+
+def fit_clusters(df, n_clusters=3, columns=None, reduce='auto', n_components=None, projection=None):
+    """
+    Fit the KMeans model of a clustering.
+    
+    Rows with missing values in the columns are left out. On more than two
+    columns (or with reduce='pca') KMeans runs on the leading principal
+    components of the scaled data, on the scaled columns otherwise.
+    
+    Args:
+        df: pandas.DataFrame
+        n_clusters: Number of clusters
+        columns: List of columns to use (optional)
+        reduce: 'auto', 'pca' or 'none'
+        n_components: Components to cluster on (optional, by default enough
+            to explain PCA_EXPLAINED_VARIANCE of the variance)
+        projection: Fitted projection of the columns, see fit_projection (optional)
+        
+    Returns:
+        dict: 'columns', fitted 'imputer' and 'scaler', 'pca' and the
+        'n_components' clustered on (None without projection) and 'kmeans'
+    """
+    columns = clustering_columns(df, columns)
+    data = df[columns].dropna()
+    
+    if wants_projection(columns, reduce):
+        if projection is None or projection['columns'] != columns:
+            projection = fit_projection(df, columns)
+        imputer, scaler, pca = projection['imputer'], projection['scaler'], projection['pca']
+        ratios = pca.explained_variance_ratio_
+        if n_components is None:
+            n_components = int(np.searchsorted(np.cumsum(ratios), PCA_EXPLAINED_VARIANCE)) + 1
+        n_components = min(max(int(n_components), 2), len(ratios))
+    else:
+        # Impute missing values and scale
+        imputer, scaler, _ = impute_and_scale(data)
+        pca = n_components = None
+    
+    model = {'columns': columns, 'imputer': imputer, 'scaler': scaler, 'pca': pca,
+             'n_components': n_components}
+    model['kmeans'] = KMeans(n_clusters=n_clusters, random_state=42, n_init=10).fit(cluster_space(model, data))
+    return model
+
+
+def cluster_space(model, data):
+    """
+    Coordinates of rows in the space a clustering model clusters in.
+    
+    Args:
+        model: Fitted model, see fit_clusters
+        data: pandas.DataFrame of rows without missing values in the model's columns
+        
+    Returns:
+        numpy.ndarray: Scaled columns, or their leading principal components
+    """
+    X = model['scaler'].transform(model['imputer'].transform(data[model['columns']]))
+    if model['pca'] is not None:
+        X = model['pca'].transform(X)[:, :model['n_components']]
+    return X
+
+
+def predict_clusters(model, df):
+    """
+    Assign rows to the clusters of a fitted model (nearest centroid).
+    
+    Args:
+        model: Fitted model, see fit_clusters
+        df: pandas.DataFrame with the model's columns
+        
+    Returns:
+        numpy.ndarray: Cluster of each row, -1 for rows missing a value of
+        the model's columns
+    """
+    data = df[model['columns']]
+    complete = data.notna().all(axis=1).to_numpy()
+    clusters = np.full(len(df), -1, dtype=np.int64)
+    if complete.any():
+        clusters[complete] = model['kmeans'].predict(cluster_space(model, data[complete]))
+    return clusters
+
+
+def perform_clustering(df, n_clusters=3, columns=None, filters=None, reduce='auto',
+                       n_components=None, model=None):
+    """
+    Perform KMeans clustering analysis.
+    
+    On more than two columns (or with reduce='pca') the scaled data is
+    first projected on its principal components: KMeans runs on the
+    leading components and clusters are plotted against the first two.
+    
+    Args:
+        df: pandas.DataFrame
+        n_clusters: Number of clusters
+        columns: List of columns to use (optional)
+        filters: Filter spec applied before the analysis (optional)
+        reduce: 'auto', 'pca' or 'none'
+        n_components: Components to cluster on (optional, see fit_clusters)
+        model: Fitted model of these parameters, see fit_clusters (optional)
+        
+    Returns:
+        dict: Contains plot image and cluster info
+    """
+    df = apply_filters(df, filters)
+    if filters:
+        model = None  # The model was fitted on the unfiltered data
+    if model is None:
+        model = fit_clusters(df, n_clusters, columns, reduce, n_components)
+    
+    columns = model['columns']
+    use_projection = model['pca'] is not None
+    scaler, kmeans = model['scaler'], model['kmeans']
     
-    # Fit KMeans
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-    clusters = kmeans.fit_predict(X_scaled)
+    # Prepare data
+    data = df[columns].dropna()
+    X_fit = cluster_space(model, data)
+    clusters = kmeans.predict(X_fit)
+    if use_projection:
+        ratios = model['pca'].explained_variance_ratio_
+        n_components = model['n_components']
     
     # Create plot
     fig, ax = plt.subplots(figsize=(10, 6))
@@ -222,47 +462,64 @@ def perform_clustering(df, n_clusters=3, columns=None):
     # Color palette
     colors = ['#2E7D32', '#4CAF50', '#81C784', '#FFA726', '#42A5F5', '#AB47BC', '#EF5350', '#26A69A']
     
-    scatter = ax.scatter(data[columns[0]], data[columns[1]], 
+    if use_projection:
+        # Clusters and centroids in the plane of the first two components
+        x_values, y_values = X_fit[:, 0], X_fit[:, 1]
+        centroids = kmeans.cluster_centers_[:, :2]
+        x_label = f'PC1 ({ratios[0]:.1%} of variance)'
+        y_label = f'PC2 ({ratios[1]:.1%} of variance)'
+    else:
+        x_values, y_values = data[columns[0]], data[columns[1]]
+        centroids = scaler.inverse_transform(kmeans.cluster_centers_)
+        x_label, y_label = columns[0], columns[1]
+    
+    scatter = ax.scatter(x_values, y_values, 
                         c=[colors[c % len(colors)] for c in clusters],
                         alpha=0.7, s=60)
     
     # Plot centroids
-    centroids_original = scaler.inverse_transform(kmeans.cluster_centers_)
-    ax.scatter(centroids_original[:, 0], centroids_original[:, 1], 
+    ax.scatter(centroids[:, 0], centroids[:, 1], 
               c='red', marker='X', s=200, edgecolors='black', linewidth=2,
               label='Centroids')
     
-    ax.set_xlabel(columns[0], fontsize=12)
-    ax.set_ylabel(columns[1], fontsize=12)
+    ax.set_xlabel(x_label, fontsize=12)
+    ax.set_ylabel(y_label, fontsize=12)
     ax.set_title(f'KMeans Clustering (k={n_clusters})', fontsize=14, fontweight='bold')
     ax.legend()
     ax.grid(True, alpha=0.3)
     
     image_base64 = fig_to_base64(fig)
     
-    # Calculate cluster sizes - convert numpy int64 to native int
-    cluster_sizes = {int(k): int(v) for k, v in pd.Series(clusters).value_counts().sort_index().to_dict().items()}
+    # Calculate cluster sizes
+    cluster_sizes = pd.Series(clusters).value_counts().sort_index().to_dict()
     
-    return {
+    result = {
         'image': image_base64,
-        'n_clusters': int(n_clusters),
+        'n_clusters': n_clusters,
         'cluster_sizes': cluster_sizes,
         'columns_used': columns,
-        'inertia': float(round(kmeans.inertia_, 4))
+        'inertia': round(kmeans.inertia_, 4)
     }
+    if use_projection:
+        result['n_components'] = n_components
+        result['explained_variance'] = ratios[:n_components].round(4)
+    return result
 
 
-def generate_distribution_plot(df, column=None):
+def generate_distribution_plot(df, column=None, filters=None):
     """
     Generate distribution plot for numeric columns.
     
     Args:
         df: pandas.DataFrame
         column: Specific column to plot (optional)
+        filters: Filter spec applied before the analysis (optional)
         
     Returns:
         dict: Contains plot image
     """
+    df = apply_filters(df, filters)
+    
     numeric_cols = get_numeric_columns(df)
     
     if len(numeric_cols) == 0:
@@ -294,7 +551,7 @@ def generate_distribution_plot(df, column=None):
     for j in range(i + 1, len(axes)):
         axes[j].set_visible(False)
     
-    plt.tight_layout()
+    fig.tight_layout()
     image_base64 = fig_to_base64(fig)
     
     return {
@@ -303,34 +560,44 @@ def generate_distribution_plot(df, column=None):
     }
 
 
-def generate_statistical_summary(df):
+def generate_statistical_summary(df, filters=None, profile=None):
     """
     Generate comprehensive statistical summary.
     
     Args:
         df: pandas.DataFrame
+        filters: Filter spec applied before the analysis (optional)
+        profile: Column profile of df, serves the quantiles (optional)
         
     Returns:
         dict: Contains HTML summary table and statistics
     """
+    df = apply_filters(df, filters)
+    if filters:
+        profile = None  # The profile describes the unfiltered data
+    
     # Basic statistics
-    desc_stats = df.describe(include='all').round(4)
+    if profile is not None:
+        desc_stats = describe_from_profile(df, profile).round(4)
+    else:
+        desc_stats = df.describe(include='all').round(4)
     
-    # Additional statistics - convert numpy types to native Python types
+    # Additional statistics
+    missing = df.isnull().sum()
     stats_dict = {
-        'Total Rows': int(len(df)),
-        'Total Columns': int(len(df.columns)),
-        'Numeric Columns': int(len(get_numeric_columns(df))),
-        'Categorical Columns': int(len(get_categorical_columns(df))),
-        'Total Missing Values': int(df.isnull().sum().sum()),
-        'Memory Usage (KB)': float(round(df.memory_usage(deep=True).sum() / 1024, 2))
+        'Total Rows': len(df),
+        'Total Columns': len(df.columns),
+        'Numeric Columns': len(get_numeric_columns(df)),
+        'Categorical Columns': len(get_categorical_columns(df)),
+        'Total Missing Values': missing.sum(),
+        'Memory Usage (KB)': round(df.memory_usage(deep=True).sum() / 1024, 2)
     }
     
     # Missing values by column
     missing_df = pd.DataFrame({
         'Column': df.columns.tolist(),
-        'Missing Count': [int(x) for x in df.isnull().sum().values],
-        'Missing %': [float(round(x, 2)) for x in (df.isnull().sum().values / len(df) * 100)]
+        'Missing Count': missing.values,
+        'Missing %': (missing.values / len(df) * 100).round(2)
     })
     
     html_stats = desc_stats.to_html(classes='data-table stats-table')
@@ -343,16 +610,22 @@ def generate_statistical_summary(df):
     }
 
 
-def generate_eda_report(df):
+def generate_eda_report(df, filters=None, profile=None):
     """
     Generate comprehensive EDA report with multiple visualizations.
     
     Args:
         df: pandas.DataFrame
+        filters: Filter spec applied before the analysis (optional)
+        profile: Column profile of df, serves box plots and quantiles (optional)
         
     Returns:
         dict: Contains multiple plot images and summary statistics
     """
+    df = apply_filters(df, filters)
+    if filters:
+        profile = None  # The profile describes the unfiltered data
+    
     numeric_cols = get_numeric_columns(df)
     images = []
     
@@ -360,12 +633,9 @@ def generate_eda_report(df):
     if len(numeric_cols) >= 2:
         fig, ax = plt.subplots(figsize=(10, 8))
         corr_matrix = df[numeric_cols].corr()
-        mask = np.triu(np.ones_like(corr_matrix, dtype=bool))
-        sns.heatmap(corr_matrix, mask=mask, annot=True, fmt='.2f', 
-                   cmap='Greens', ax=ax, vmin=-1, vmax=1,
-                   linewidths=0.5, square=True)
+        draw_correlation_heatmap(ax, corr_matrix, lower_only=True)
         ax.set_title('Correlation Matrix', fontsize=14, fontweight='bold')
-        plt.tight_layout()
+        fig.tight_layout()
         images.append({'type': 'correlation', 'image': fig_to_base64(fig)})
     
     # 2. Missing Values Heatmap
@@ -376,7 +646,7 @@ def generate_eda_report(df):
         ax.set_title('Missing Values Heatmap', fontsize=14, fontweight='bold')
         ax.set_xlabel('Columns')
         ax.set_ylabel('Rows')
-        plt.tight_layout()
+        fig.tight_layout()
         images.append({'type': 'missing', 'image': fig_to_base64(fig)})
     
     # 3. Box plots for numeric columns
@@ -387,11 +657,14 @@ def generate_eda_report(df):
             axes = [axes]
         
         for i, col in enumerate(numeric_cols[:n_cols_plot]):
-            sns.boxplot(y=df[col], ax=axes[i], color='#4CAF50')
+            bp = axes[i].bxp([get_box_stats(df, col, profile)], patch_artist=True, widths=0.6)
+            bp['boxes'][0].set_facecolor('#4CAF50')
+            axes[i].set_xticks([])
+            axes[i].set_ylabel(col)
             axes[i].set_title(col, fontsize=10, fontweight='bold')
             axes[i].grid(True, alpha=0.3)
         
-        plt.tight_layout()
+        fig.tight_layout()
         images.append({'type': 'boxplots', 'image': fig_to_base64(fig)})
     
     # 4. Pairplot (for first 4 numeric columns if available)
@@ -400,15 +673,14 @@ def generate_eda_report(df):
         pair_df = df[cols_for_pair].dropna()
         
         if len(pair_df) > 0:
-            fig = plt.figure(figsize=(10, 10))
-            g = sns.pairplot(pair_df, diag_kind='kde', 
+            g = sns.pairplot(pair_df, diag_kind='kde', height=10 / len(cols_for_pair),
                            plot_kws={'alpha': 0.6, 'color': '#4CAF50'},
                            diag_kws={'color': '#2E7D32'})
             g.fig.suptitle('Pair Plot', y=1.02, fontsize=14, fontweight='bold')
             images.append({'type': 'pairplot', 'image': fig_to_base64(g.fig)})
     
     # Get statistical summary
-    summary = generate_statistical_summary(df)
+    summary = generate_statistical_summary(df, profile=profile)
     
     return {
         'images': images,
@@ -416,41 +688,137 @@ def generate_eda_report(df):
     }
 
 
-def generate_correlation_matrix(df):
+def cluster_order(corr_matrix):
+    """
+    Order the columns of a correlation matrix so that correlated columns
+    are adjacent (average-linkage clustering on 1 - |r|).
+    
+    Args:
+        corr_matrix: Square pandas.DataFrame of correlations
+        
+    Returns:
+        list: Column names in clustered order
+    """
+    distance = 1 - np.abs(np.nan_to_num(corr_matrix.to_numpy(), nan=0.0))
+    np.fill_diagonal(distance, 0)
+    distance = np.clip((distance + distance.T) / 2, 0, None)
+    leaves = leaves_list(linkage(squareform(distance, checks=False), method='average'))
+    return corr_matrix.columns[leaves].tolist()
+
+
+def top_correlated_pairs(corr_matrix, k=10):
+    """
+    Find the most strongly correlated column pairs.
+    
+    Selects from the upper triangle with argpartition, so only the k
+    selected pairs are sorted.
+    
+    Args:
+        corr_matrix: Square pandas.DataFrame of correlations
+        k: Number of pairs
+        
+    Returns:
+        list: {'x', 'y', 'correlation'} dicts by decreasing |r|
+    """
+    rows, cols = np.triu_indices(len(corr_matrix), k=1)
+    values = corr_matrix.to_numpy()[rows, cols]
+    strength = np.nan_to_num(np.abs(values), nan=-1.0)
+    k = min(k, len(values))
+    if k == 0:
+        return []
+    selected = np.argpartition(-strength, k - 1)[:k]
+    selected = selected[np.argsort(-strength[selected], kind='stable')]
+    names = corr_matrix.columns
+    return [{'x': names[rows[i]], 'y': names[cols[i]], 'correlation': round(float(values[i]), 4)}
+            for i in selected if not np.isnan(values[i])]
+
+
+def draw_correlation_heatmap(ax, corr_matrix, lower_only=False):
+    """
+    Draw a correlation matrix on an axis.
+    
+    Up to CORRELATION_ANNOTATE_MAX columns the matrix is drawn as an
+    annotated seaborn heatmap. Wider matrices are drawn as a single image
+    without annotations, labelling at most CORRELATION_LABEL_MAX columns,
+    so drawing cost no longer grows with the number of cells.
+    
+    Args:
+        ax: matplotlib Axes
+        corr_matrix: Square pandas.DataFrame of correlations
+        lower_only: Hide the upper triangle (narrow matrices only)
+    """
+    n = len(corr_matrix)
+    if n <= CORRELATION_ANNOTATE_MAX:
+        mask = np.triu(np.ones_like(corr_matrix, dtype=bool)) if lower_only else None
+        sns.heatmap(corr_matrix, mask=mask, annot=True, fmt='.2f', 
+                   cmap='Greens', ax=ax, vmin=-1, vmax=1,
+                   linewidths=0.5, square=True,
+                   cbar_kws={'shrink': 0.8})
+        return
+    
+    image = ax.imshow(corr_matrix.to_numpy(), cmap='Greens', vmin=-1, vmax=1,
+                      interpolation='nearest')
+    ax.figure.colorbar(image, ax=ax, shrink=0.8)
+    step = int(np.ceil(n / CORRELATION_LABEL_MAX))
+    ticks = np.arange(0, n, step)
+    labels = [str(corr_matrix.columns[i]) for i in ticks]
+    fontsize = 8 if len(ticks) <= 30 else 6
+    ax.set_xticks(ticks)
+    ax.set_xticklabels(labels, rotation=90, fontsize=fontsize)
+    ax.set_yticks(ticks)
+    ax.set_yticklabels(labels, fontsize=fontsize)
+    ax.grid(False)
+
+
+def generate_correlation_matrix(df, filters=None, order='original', top_pairs=10, moments=None):
     """
     Generate correlation matrix heatmap.
     
     Args:
         df: pandas.DataFrame
+        filters: Filter spec applied before the analysis (optional)
+        order: 'original' column order, or 'cluster' to group correlated columns
+        top_pairs: Number of strongest pairs to list
+        moments: Co-moments of df's numeric columns, see
+            profiling.build_moments (optional, ignored when filtering)
         
     Returns:
-        dict: Contains plot image
+        dict: Contains plot image and the strongest pairs
     """
+    df = apply_filters(df, filters)
+    if filters:
+        moments = None  # The moments describe the unfiltered data
+    
     numeric_cols = get_numeric_columns(df)
     
     if len(numeric_cols) < 2:
         raise ValueError("Need at least 2 numeric columns for correlation matrix")
     
     fig, ax = plt.subplots(figsize=(12, 10))
-    corr_matrix = df[numeric_cols].corr()
+    if moments is not None and moments['columns'] == numeric_cols:
+        corr_matrix = correlation_from_moments(moments, numeric_cols)
+    else:
+        corr_matrix = df[numeric_cols].corr()
+    
+    if order == 'cluster':
+        ordered = cluster_order(corr_matrix)
+        corr_matrix = corr_matrix.loc[ordered, ordered]
     
-    sns.heatmap(corr_matrix, annot=True, fmt='.2f', 
-               cmap='Greens', ax=ax, vmin=-1, vmax=1,
-               linewidths=0.5, square=True,
-               cbar_kws={'shrink': 0.8})
+    draw_correlation_heatmap(ax, corr_matrix)
     
     ax.set_title('Correlation Matrix', fontsize=14, fontweight='bold')
-    plt.tight_layout()
+    fig.tight_layout()
     
     image_base64 = fig_to_base64(fig)
     
     return {
         'image': image_base64,
-        'columns': numeric_cols
+        'columns': corr_matrix.columns.tolist(),
+        'top_pairs': top_correlated_pairs(corr_matrix, top_pairs)
     }
 
 
-def generate_scatter_plot(df, x_column=None, y_column=None):
+def generate_scatter_plot(df, x_column=None, y_column=None, filters=None):
     """
     Generate scatter plot for two numeric columns.
     
@@ -458,10 +826,13 @@ def generate_scatter_plot(df, x_column=None, y_column=None):
         df: pandas.DataFrame
         x_column: X-axis column name
         y_column: Y-axis column name
+        filters: Filter spec applied before the analysis (optional)
         
     Returns:
         dict: Contains plot image
     """
+    df = apply_filters(df, filters)
+    
     numeric_cols = get_numeric_columns(df)
     
     if len(numeric_cols) < 2:
@@ -491,7 +862,7 @@ def generate_scatter_plot(df, x_column=None, y_column=None):
     }
 
 
-def generate_histogram(df, column=None, bins=30):
+def generate_histogram(df, column=None, bins=30, filters=None):
     """
     Generate histogram for a numeric column.
     
@@ -499,10 +870,13 @@ def generate_histogram(df, column=None, bins=30):
         df: pandas.DataFrame
         column: Column name
         bins: Number of bins
+        filters: Filter spec applied before the analysis (optional)
         
     Returns:
         dict: Contains plot image
     """
+    df = apply_filters(df, filters)
+    
     numeric_cols = get_numeric_columns(df)
     
     if len(numeric_cols) == 0:
@@ -533,23 +907,32 @@ def generate_histogram(df, column=None, bins=30):
     return {
         'image': image_base64,
         'column': column,
-        'mean': float(round(mean_val, 4)),
-        'median': float(round(median_val, 4)),
-        'std': float(round(data.std(), 4))
+        'mean': round(mean_val, 4),
+        'median': round(median_val, 4),
+        'std': round(data.std(), 4)
     }
 
 
-def generate_boxplot(df, columns=None):
+def generate_boxplot(df, columns=None, filters=None, profile=None):
     """
     Generate box plot for numeric columns.
     
+    Box statistics come from the column profile when available, and only a
+    sample of the outliers is drawn, so the cost does not grow with rows.
+    
     Args:
         df: pandas.DataFrame
         columns: List of columns to plot
+        filters: Filter spec applied before the analysis (optional)
+        profile: Column profile of df (optional)
         
     Returns:
-        dict: Contains plot image
+        dict: Contains plot image and outlier counts
     """
+    df = apply_filters(df, filters)
+    if filters:
+        profile = None  # The profile describes the unfiltered data
+    
     numeric_cols = get_numeric_columns(df)
     
     if len(numeric_cols) == 0:
@@ -560,10 +943,10 @@ def generate_boxplot(df, columns=None):
     
     fig, ax = plt.subplots(figsize=(12, 6))
     
-    # Prepare data for boxplot
-    data_to_plot = [df[col].dropna() for col in columns]
+    # Precomputed statistics, drawn without passing the raw values
+    stats = [get_box_stats(df, col, profile) for col in columns]
     
-    bp = ax.boxplot(data_to_plot, labels=columns, patch_artist=True)
+    bp = ax.bxp(stats, patch_artist=True)
     
     # Color the boxes
     colors = ['#4CAF50', '#81C784', '#A5D6A7', '#C8E6C9', '#2E7D32', '#388E3C', '#43A047', '#66BB6A']
@@ -574,12 +957,85 @@ def generate_boxplot(df, columns=None):
     ax.set_ylabel('Values', fontsize=12)
     ax.set_title('Box Plot Comparison', fontsize=14, fontweight='bold')
     ax.grid(True, alpha=0.3, axis='y')
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    fig.tight_layout()
     
     image_base64 = fig_to_base64(fig)
     
     return {
         'image': image_base64,
-        'columns': columns
+        'columns': columns,
+        'outlier_counts': {stat['label']: stat['n_fliers'] for stat in stats}
+    }
+
+
+def generate_categorical_analysis(df, column=None, top_k=20, values=None, filters=None, profile=None):
+    """
+    Generate a top-k bar chart and frequency estimates for a categorical column.
+    
+    Counts come from the frequency sketches of the column profile, so the
+    cost does not depend on the number of rows or distinct values. Columns
+    with more distinct values than the sketches track get estimates, with
+    the maximum overcount of each bar shown as an error bar.
+    
+    Args:
+        df: pandas.DataFrame
+        column: Column name
+        top_k: Number of most frequent values to show
+        values: Values whose frequency should be estimated (optional)
+        filters: Filter spec applied before the analysis (optional)
+        profile: Column profile of df (optional)
+        
+    Returns:
+        dict: Contains plot image, top values and distinct count estimate
+    """
+    df = apply_filters(df, filters)
+    if filters:
+        profile = None  # The profile describes the unfiltered data
+    
+    categorical_cols = get_categorical_columns(df)
+    
+    if len(categorical_cols) == 0:
+        raise ValueError("No categorical columns found for categorical analysis")
+    
+    if column is None or column not in categorical_cols:
+        column = categorical_cols[0]
+    
+    stats = ((profile or {}).get('categorical') or {}).get(column)
+    if stats is None:
+        stats = build_categorical_profile(df[[column]])[column]
+    
+    top = stats['top'].top(top_k)
+    fig, ax = plt.subplots(figsize=(10, max(4, 0.35 * len(top) + 1.5)))
+    
+    labels = [str(value)[:40] for value, _, _ in reversed(top)]
+    counts = [count for _, count, _ in reversed(top)]
+    errors = [error for _, _, error in reversed(top)]
+    ax.barh(labels, counts, color='#4CAF50', alpha=0.8, edgecolor='#2E7D32',
+            xerr=[errors, [0] * len(errors)] if any(errors) else None, ecolor='#D32F2F')
+    
+    ax.set_xlabel('Count' if stats['distinct_exact'] else 'Estimated count', fontsize=12)
+    ax.set_title(f'Top {len(top)} values of {column}', fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3, axis='x')
+    fig.tight_layout()
+    
+    image_base64 = fig_to_base64(fig)
+    
+    result = {
+        'image': image_base64,
+        'column': column,
+        'count': stats['count'],
+        'missing': stats['missing'],
+        'distinct': stats['distinct'],
+        'distinct_exact': stats['distinct_exact'],
+        'top_values': [{'value': str(value), 'count': count, 'max_error': error}
+                       for value, count, error in top],
     }
+    if values:
+        # Both sketches only overcount: the smaller bound is the better one
+        estimates = stats['cms'].query(values)
+        result['frequencies'] = {
+            str(value): min(int(estimate), stats['top'].estimate(str(value)))
+            for value, estimate in zip(values, estimates)
+        }
+    return result
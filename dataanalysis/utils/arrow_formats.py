@@ -0,0 +1,422 @@
+"""
+Parquet and Arrow IPC files for ModelYourData.
+Reads column files through pyarrow (an optional dependency): the schema
+and row count come from the file metadata, row-group statistics give
+per-column missing counts and ranges without reading any data, and reads
+of a few columns or of filtered rows only decode the columns and row
+groups they need. Column types are normalized to what the CSV parser
+produces (plain strings and datetimes, floats for decimals), so the
+DataFrames work with the analysis functions unchanged.
+"""
+
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+
+# File name suffix -> format
+FORMATS = {
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+}
+# Format -> pyarrow.dataset format name
+DATASET_FORMATS = {
+    'parquet': 'parquet',
+    'arrow': 'ipc',
+}
+
+# Operators pushed down to pyarrow. Its comparisons drop missing values
+# like pandas' do; 'ne' and 'isnull' are left out since pandas treats NaN
+# as unequal and missing where pyarrow does not, and 'contains' has no
+# case-insensitive equivalent. Pushed-down filters only narrow the rows
+# down: the full filter spec is still applied to what is read.
+_PUSHDOWN = ('eq', 'lt', 'le', 'gt', 'ge', 'between', 'in', 'notnull')
+
+
+def format_of(name):
+    """Return the column-file format a file name implies ('parquet' or 'arrow'), None otherwise."""
+    return FORMATS.get(os.path.splitext(name.lower())[1])
+
+
+def available():
+    """Whether Parquet and Arrow IPC files can be read in this environment."""
+    return pa is not None
+
+
+def _column_type(arrow_type):
+    """Upload-time column type of an Arrow type ('integer', 'float', 'boolean', 'datetime', 'string')."""
+    if pa.types.is_dictionary(arrow_type):
+        return _column_type(arrow_type.value_type)
+    if pa.types.is_integer(arrow_type):
+        return 'integer'
+    if pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type) or pa.types.is_null(arrow_type):
+        return 'float'
+    if pa.types.is_boolean(arrow_type):
+        return 'boolean'
+    if pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type):
+        return 'datetime'
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return 'string'
+    return None
+
+
+def _normalize_type(arrow_type):
+    """Type an Arrow column is cast to before conversion to pandas, None to keep it."""
+    if pa.types.is_dictionary(arrow_type):
+        return _normalize_type(arrow_type.value_type) or arrow_type.value_type
+    if pa.types.is_decimal(arrow_type) or pa.types.is_null(arrow_type):
+        return pa.float64()
+    if pa.types.is_float16(arrow_type):
+        return pa.float32()
+    if pa.types.is_date(arrow_type):
+        return pa.timestamp('us')
+    return None
+
+
+def _to_pandas(table):
+    for i, field in enumerate(table.schema):
+        target = _normalize_type(field.type)
+        if target is not None:
+            table = table.set_column(i, field.name, table.column(i).cast(target))
+    return table.to_pandas()
+
+
+def _jsonable(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _parquet_columns(path):
+    """Columns of a Parquet file with missing counts and ranges from its row-group statistics."""
+    metadata = pq.ParquetFile(path).metadata
+    schema = metadata.schema.to_arrow_schema()
+    columns = []
+    for j, field in enumerate(schema):
+        missing, low, high = 0, None, None
+        for i in range(metadata.num_row_groups):
+            stats = metadata.row_group(i).column(j).statistics
+            if stats is None or not stats.has_null_count:
+                missing = None
+            elif missing is not None:
+                missing += stats.null_count
+            if stats is not None and stats.has_min_max:
+                low = stats.min if low is None else min(low, stats.min)
+                high = stats.max if high is None else max(high, stats.max)
+        columns.append({'name': field.name, 'type': _column_type(field.type), 'arrow_type': str(field.type),
+                        'missing': missing, 'min': _jsonable(low), 'max': _jsonable(high)})
+    row_groups = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+    size = sum(metadata.row_group(i).total_byte_size for i in range(metadata.num_row_groups))
+    return columns, row_groups, size
+
+
+def _arrow_columns(path):
+    """Columns of an Arrow IPC file with missing counts from its record batch headers."""
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        batches = [reader.get_batch(i) for i in range(reader.num_record_batches)]
+        columns = [{'name': field.name, 'type': _column_type(field.type), 'arrow_type': str(field.type),
+                    'missing': sum(batch.column(j).null_count for batch in batches)}
+                   for j, field in enumerate(reader.schema)]
+        return columns, [batch.num_rows for batch in batches], sum(batch.nbytes for batch in batches)
+
+
+def inspect_file(path, file_format):
+    """
+    Read the schema of a Parquet or Arrow IPC file from its metadata.
+
+    Args:
+        path: Path to the file
+        file_format: 'parquet' or 'arrow'
+
+    Returns:
+        dict: 'schema' ({'format', 'columns', 'row_groups'}, columns carrying
+        their type, Arrow type, missing count and, for Parquet, min/max),
+        'row_count' and 'data_size' (uncompressed bytes)
+
+    Raises:
+        ValueError: If the file cannot be read or has columns of types the
+            analyses cannot handle (lists, structs, binary, ...)
+    """
+    if pa is None:
+        raise ValueError("Parquet and Arrow files need pyarrow")
+    try:
+        if file_format == 'parquet':
+            columns, row_groups, size = _parquet_columns(path)
+        else:
+            columns, row_groups, size = _arrow_columns(path)
+    except (pa.ArrowException, OSError) as e:
+        raise ValueError(f"The file is not a valid {file_format} file ({e}).")
+    for column in columns:
+        if column['type'] is None:
+            raise ValueError(f"Column '{column['name']}' has an unsupported type: {column['arrow_type']}")
+    if len({column['name'] for column in columns}) != len(columns):
+        raise ValueError("The file has duplicate column names")
+    return {
+        'schema': {'format': file_format, 'columns': columns, 'row_groups': row_groups},
+        'row_count': sum(row_groups),
+        'data_size': size,
+    }
+
+
+def schema_profile(schema):
+    """
+    Column kinds of a file from its inspected schema, as
+    operations.profile_columns returns them for the loaded DataFrame.
+
+    Integer columns with missing values load as floats and boolean ones as
+    objects (categorical), like in parsed CSV files.
+
+    Returns:
+        dict: numeric, categorical, datetime and all column names plus the
+        shape, and 'column_stats': missing count, min and max by column
+        (None where the metadata has none)
+    """
+    columns = schema['columns']
+    return {
+        'rows': sum(schema['row_groups']),
+        'columns': len(columns),
+        'numeric_columns': [c['name'] for c in columns if c['type'] in ('integer', 'float')],
+        'categorical_columns': [c['name'] for c in columns
+                                if c['type'] == 'string' or (c['type'] == 'boolean' and c['missing'] != 0)],
+        'datetime_columns': [c['name'] for c in columns if c['type'] == 'datetime'],
+        'all_columns': [c['name'] for c in columns],
+        'column_stats': {c['name']: {'missing': c['missing'], 'min': c.get('min'), 'max': c.get('max')}
+                         for c in columns},
+    }
+
+
+def _pushdown_value(field, value):
+    """Convert a filter value to a pyarrow scalar comparable with a field, None if it is not."""
+    kind = _column_type(field.type)
+    try:
+        if kind in ('integer', 'float'):
+            return pa.scalar(float(value))
+        if kind == 'datetime':
+            timestamp = pd.Timestamp(value)
+            arrow_type = field.type.value_type if pa.types.is_dictionary(field.type) else field.type
+            aware = getattr(arrow_type, 'tz', None) is not None
+            if aware and timestamp.tzinfo is None:
+                timestamp = timestamp.tz_localize('UTC')
+            elif not aware and timestamp.tzinfo is not None:
+                timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+            if pa.types.is_date(arrow_type):
+                return pa.scalar(timestamp.date())
+            return pa.scalar(timestamp)
+    except (TypeError, ValueError):
+        return None
+    if kind == 'string' and isinstance(value, str):
+        return pa.scalar(value)
+    if kind == 'boolean' and isinstance(value, bool):
+        return pa.scalar(value)
+    return None
+
+
+def filter_expression(predicates, schema):
+    """
+    Translate the predicates of a filter spec that pyarrow can evaluate
+    into a dataset expression (see _PUSHDOWN).
+
+    Args:
+        predicates: Parsed filter spec, see query.parse_filter_spec
+        schema: pyarrow.Schema of the file
+
+    Returns:
+        pyarrow.dataset.Expression or None: AND of the translated predicates
+    """
+    expression = None
+    for predicate in predicates or []:
+        if predicate['op'] not in _PUSHDOWN or predicate['column'] not in schema.names:
+            continue
+        field = schema.field(predicate['column'])
+        column = ds.field(predicate['column'])
+        op = predicate['op']
+        if op == 'notnull':
+            condition = column.is_valid()
+        else:
+            values = predicate['value'] if isinstance(predicate['value'], list) else [predicate['value']]
+            values = [_pushdown_value(field, value) for value in values]
+            if not values or any(value is None for value in values):
+                continue
+            if op == 'eq':
+                condition = column == values[0]
+            elif op == 'lt':
+                condition = column < values[0]
+            elif op == 'le':
+                condition = column <= values[0]
+            elif op == 'gt':
+                condition = column > values[0]
+            elif op == 'ge':
+                condition = column >= values[0]
+            elif op == 'between':
+                condition = (column >= values[0]) & (column <= values[1])
+            else:
+                condition = pc.is_in(column, value_set=pa.array([value.as_py() for value in values],
+                                                                type=values[0].type))
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def read_frame(path, file_format, columns=None, predicates=None):
+    """
+    Read a Parquet or Arrow IPC file into a DataFrame.
+
+    Args:
+        path: Path to the file
+        file_format: 'parquet' or 'arrow'
+        columns: Columns to read (optional, all by default)
+        predicates: Parsed filter spec pushed down to the read (optional).
+            Parquet row groups whose statistics rule a predicate out are
+            skipped; the returned rows are a superset of the matching ones.
+
+    Returns:
+        pandas.DataFrame: The rows read
+    """
+    dataset = ds.dataset(path, format=DATASET_FORMATS[file_format])
+    expression = filter_expression(predicates, dataset.schema)
+    try:
+        table = dataset.to_table(columns=columns, filter=expression)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        if expression is None:
+            raise
+        table = dataset.to_table(columns=columns)  # A predicate pyarrow could not evaluate
+    return _to_pandas(table)
+
+
+def read_rows(path, file_format, row_groups, offset, limit, columns):
+    """
+    Read a range of rows of some columns, decoding only the row groups
+    (record batches for Arrow IPC) holding them.
+
+    Args:
+        path: Path to the file
+        file_format: 'parquet' or 'arrow'
+        row_groups: Rows per row group, from inspect_file
+        offset, limit: Row window
+        columns: Columns to read
+
+    Returns:
+        pandas.DataFrame: The requested rows
+    """
+    first, start, selected = None, 0, []
+    for i, rows in enumerate(row_groups):
+        if start + rows > offset and start < offset + limit:
+            if first is None:
+                first = start
+            selected.append(i)
+        start += rows
+    if not selected:
+        return pd.DataFrame(columns=columns)
+
+    if file_format == 'parquet':
+        table = pq.ParquetFile(path).read_row_groups(selected, columns=columns)
+        return _to_pandas(table.slice(offset - first, limit))
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        table = pa.Table.from_batches([reader.get_batch(i) for i in selected]).select(columns)
+        return _to_pandas(table.slice(offset - first, limit))
+
+
+# infer_dtype kind of an object column -> Arrow type it is written as
+# (anything else is written as strings)
+_OBJECT_TYPES = {
+    'boolean': 'bool_',
+    'integer': 'int64',
+    'floating': 'float64',
+    'mixed-integer-float': 'float64',
+    'string': 'large_string',
+}
+
+
+def arrow_schema(df, types=None):
+    """
+    Arrow schema of a DataFrame's columns, for writing it.
+
+    The types of object columns are inferred from their values, so every
+    piece of a DataFrame written in pieces gets the type of the whole.
+
+    Args:
+        df: pandas.DataFrame
+        types: {column: Arrow type name, e.g. 'int64', 'bool_',
+            'large_string'} of columns added after df's (optional)
+
+    Returns:
+        pyarrow.Schema
+    """
+    fields = []
+    for field in pa.Schema.from_pandas(df.iloc[:0], preserve_index=False):
+        if df[field.name].dtype == object:
+            kind = pd.api.types.infer_dtype(df[field.name], skipna=True)
+            field = field.with_type(getattr(pa, _OBJECT_TYPES.get(kind, 'large_string'))())
+        fields.append(field)
+    fields += [pa.field(name, getattr(pa, type_name)()) for name, type_name in (types or {}).items()]
+    return pa.schema(fields)
+
+
+def _arrow_table(frame, schema):
+    for field in schema:
+        column = frame[field.name]
+        if column.dtype == object and pa.types.is_large_string(field.type):
+            frame = frame.assign(**{field.name: column.where(column.isna(), column.astype(str))})
+    return pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+
+
+class _ChunkSink:
+    """Write-only file collecting what a writer outputs until it is drained."""
+
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.size
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def parquet_chunks(frames, schema):
+    """
+    Encode DataFrames as one Parquet file piece by piece, for streaming
+    responses: each DataFrame becomes a row group, sent once encoded.
+
+    Args:
+        frames: Iterable of pandas.DataFrame with the columns of schema
+        schema: pyarrow.Schema of the file, see arrow_schema
+
+    Yields:
+        bytes: The file's pieces
+    """
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    for frame in frames:
+        writer.write_table(_arrow_table(frame, schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
@@ -0,0 +1,248 @@
+"""
+Columnar storage for ModelYourData.
+Persists the numeric and datetime columns of a DataFrame as raw binary
+arrays, one file per column, and reopens them with np.memmap. The resulting
+DataFrame wraps the mapped arrays without copying, so every worker process
+reading the same store shares one copy of the data through the OS page
+cache. Datetime columns also get a time index (sorted values and the row
+order), so time ranges are found by binary search.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+MANIFEST_NAME = 'manifest.json'
+OTHER_COLUMNS_NAME = 'other.pkl'
+
+# Column dtypes stored as memory-mapped arrays: signed/unsigned ints, floats
+# and (timezone-naive) datetimes
+_MAPPED_KINDS = 'iufM'
+
+
+def _is_mapped(dtype):
+    return isinstance(dtype, np.dtype) and dtype.kind in _MAPPED_KINDS
+
+
+def build_time_index(values):
+    """
+    Sort the timestamps of a datetime column.
+
+    Args:
+        values: datetime64 numpy.ndarray
+
+    Returns:
+        tuple: (sorted timestamps, row positions in that order), both
+        without missing values
+    """
+    values = np.asarray(values)
+    order = np.argsort(values, kind='stable')  # NaT sorts last
+    sorted_values = values[order]
+    present = len(values) - int(np.isnat(values).sum())
+    return sorted_values[:present], order[:present].astype(np.int64)
+
+
+def _build_store(directory, write):
+    """
+    Run write(tmp_dir) in a temporary sibling of directory and rename the
+    result into place, so concurrent writers of the same store are harmless
+    and readers never see a partial one.
+    """
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, suffix='.tmp')
+    try:
+        write(tmp_dir)
+        try:
+            os.rename(tmp_dir, directory)
+        except OSError:
+            if not os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+                raise
+            shutil.rmtree(tmp_dir)  # Another process stored it first
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def _write_time_index(tmp_dir, position, sorted_values, order):
+    sorted_values.tofile(os.path.join(tmp_dir, f'{position}.sorted.bin'))
+    order.tofile(os.path.join(tmp_dir, f'{position}.order.bin'))
+    return {'sorted': f'{position}.sorted.bin', 'order': f'{position}.order.bin',
+            'rows': len(order)}
+
+
+def write_column_store(df, directory):
+    """
+    Write a DataFrame as a column store.
+
+    The store is assembled in a temporary sibling directory and renamed into
+    place, so concurrent writers of the same store are harmless and readers
+    never see a partial one.
+
+    Args:
+        df: pandas.DataFrame with a default RangeIndex
+        directory: Path of the store directory (must not exist yet)
+    """
+    def write(tmp_dir):
+        columns = []
+        other = []
+        for position, (name, dtype) in enumerate(df.dtypes.items()):
+            if not _is_mapped(dtype):
+                columns.append({'name': name, 'file': None})
+                other.append(position)
+                continue
+            file_name = f'{position}.bin'
+            values = np.ascontiguousarray(df.iloc[:, position].to_numpy())
+            values.tofile(os.path.join(tmp_dir, file_name))
+            column = {'name': name, 'file': file_name, 'dtype': dtype.str}
+            if dtype.kind == 'M':
+                column['time_index'] = _write_time_index(tmp_dir, position, *build_time_index(values))
+            columns.append(column)
+
+        if other:
+            df.iloc[:, other].to_pickle(os.path.join(tmp_dir, OTHER_COLUMNS_NAME))
+        # The manifest is written last: a store without one is incomplete
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w') as f:
+            json.dump({'rows': len(df), 'columns': columns}, f)
+
+    _build_store(directory, write)
+
+
+def append_column_store(directory, rows, target):
+    """
+    Write the store of a DataFrame extended with rows, from the store of
+    the DataFrame and the new rows alone.
+
+    Mapped column files are copied and the new values appended; a column
+    whose dtype widens (integers receiving missing or fractional values) is
+    rewritten in the wider dtype. Time indexes are merged with the sorted
+    new timestamps instead of being sorted again. The other columns are
+    pickled again.
+
+    Args:
+        directory: Path of the existing store
+        rows: pandas.DataFrame with the store's columns, in order, and
+            compatible dtypes (see parsing.conform_rows)
+        target: Path of the new store (must not exist yet)
+    """
+    with open(os.path.join(directory, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    old_rows = manifest['rows']
+
+    def write(tmp_dir):
+        columns = []
+        other = []
+        for position, column in enumerate(manifest['columns']):
+            if column['file'] is None:
+                columns.append(column)
+                other.append(position)
+                continue
+            old_dtype = np.dtype(column['dtype'])
+            values = rows.iloc[:, position].to_numpy()
+            dtype = np.result_type(old_dtype, values.dtype)
+            path = os.path.join(tmp_dir, column['file'])
+            if dtype == old_dtype:
+                shutil.copyfile(os.path.join(directory, column['file']), path)
+            else:
+                np.fromfile(os.path.join(directory, column['file']), dtype=old_dtype).astype(dtype).tofile(path)
+            with open(path, 'ab') as f:
+                f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+            column = {**column, 'dtype': dtype.str}
+
+            index = column.get('time_index')
+            if index is not None:
+                old_sorted = np.fromfile(os.path.join(directory, index['sorted']), dtype=old_dtype)
+                old_order = np.fromfile(os.path.join(directory, index['order']), dtype=np.int64)
+                new_sorted, new_order = build_time_index(values.astype(dtype))
+                # Stable merge: ties keep the earlier rows first
+                at = np.searchsorted(old_sorted, new_sorted, side='right')
+                column['time_index'] = _write_time_index(
+                    tmp_dir, position, np.insert(old_sorted, at, new_sorted),
+                    np.insert(old_order, at, new_order + old_rows))
+            columns.append(column)
+
+        if other:
+            previous = pd.read_pickle(os.path.join(directory, OTHER_COLUMNS_NAME))
+            appended = rows.iloc[:, other].set_axis(range(old_rows, old_rows + len(rows)))
+            pd.concat([previous, appended]).to_pickle(os.path.join(tmp_dir, OTHER_COLUMNS_NAME))
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w') as f:
+            json.dump({'rows': old_rows + len(rows), 'columns': columns}, f)
+
+    _build_store(target, write)
+
+
+def open_column_store(directory):
+    """
+    Open a column store written by write_column_store.
+
+    Numeric columns are read-only memory-mapped arrays; the other columns
+    are loaded into memory.
+
+    Args:
+        directory: Path of the store directory
+
+    Returns:
+        pandas.DataFrame or None: The stored frame, None if there is no
+        complete store at this path
+    """
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    rows = manifest['rows']
+    other = None
+    if any(column['file'] is None for column in manifest['columns']):
+        other = pd.read_pickle(os.path.join(directory, OTHER_COLUMNS_NAME))
+
+    data = {}
+    for column in manifest['columns']:
+        name = column['name']
+        if column['file'] is None:
+            data[name] = other[name]
+        elif rows:
+            data[name] = np.memmap(os.path.join(directory, column['file']),
+                                   dtype=np.dtype(column['dtype']), mode='r', shape=(rows,))
+        else:
+            data[name] = np.empty(0, dtype=np.dtype(column['dtype']))
+    # copy=False keeps one block per mapped column instead of consolidating
+    return pd.DataFrame(data, columns=[column['name'] for column in manifest['columns']],
+                        copy=False)
+
+
+def open_time_index(directory, name):
+    """
+    Open the time index of a datetime column of a column store.
+
+    Args:
+        directory: Path of the store directory
+        name: Column name
+
+    Returns:
+        tuple or None: Memory-mapped (sorted timestamps, row positions), see
+        build_time_index; None if the store has no index for the column
+    """
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    for column in manifest['columns']:
+        index = column.get('time_index')
+        if column['name'] != name or index is None:
+            continue
+        rows = index['rows']
+        if not rows:
+            return np.empty(0, dtype=np.dtype(column['dtype'])), np.empty(0, dtype=np.int64)
+        return (np.memmap(os.path.join(directory, index['sorted']),
+                          dtype=np.dtype(column['dtype']), mode='r', shape=(rows,)),
+                np.memmap(os.path.join(directory, index['order']),
+                          dtype=np.int64, mode='r', shape=(rows,)))
+    return None
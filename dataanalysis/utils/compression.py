@@ -0,0 +1,223 @@
+"""
+Compressed CSV files for ModelYourData.
+Decompresses gzip and zstd uploads as they stream in, in bounded pieces so
+a small upload cannot expand in memory all at once, and stores CSVs at rest
+as a sequence of independent gzip members of fixed uncompressed size. Any
+gzip reader decompresses such a file as a whole; the block index of its
+members lets readers start at the member holding an offset instead of
+decompressing everything before it.
+"""
+
+import contextlib
+import gzip
+import os
+import zlib
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# File name suffix -> compression
+COMPRESSIONS = {
+    '.gz': 'gzip',
+    '.zst': 'zstd',
+}
+STORAGE_COMPRESSION = 'gzip'
+STORAGE_SUFFIX = '.csv.gz'
+STORAGE_BLOCK_SIZE = 1024 * 1024  # Uncompressed bytes per stored gzip member
+STORAGE_GZIP_LEVEL = 6
+DECOMPRESS_PIECE_SIZE = 256 * 1024  # Largest piece of output produced at once
+
+_GZIP_WBITS = zlib.MAX_WBITS | 16
+_ERRORS = (zlib.error,) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+def compression_of(name):
+    """Return the compression a file name implies ('gzip' or 'zstd'), None for plain files."""
+    return COMPRESSIONS.get(os.path.splitext(name.lower())[1])
+
+
+def available_compressions():
+    """Return the compressions readable in this environment."""
+    return ['gzip', 'zstd'] if zstandard is not None else ['gzip']
+
+
+class _Sink:
+    """File-like object passing what is written to it to a function."""
+
+    def __init__(self, write):
+        self._write = write
+
+    def write(self, data):
+        self._write(data)
+        return len(data)
+
+
+class StreamDecompressor:
+    """
+    Incrementally decompress a gzip or zstd stream.
+
+    Output is passed to ``write`` as it is produced, in pieces of at most
+    DECOMPRESS_PIECE_SIZE bytes, so a consumer enforcing a size cap can stop
+    a highly compressed stream before it has been expanded. Concatenated
+    gzip members are decompressed one after the other.
+    """
+
+    def __init__(self, compression, write):
+        if compression not in available_compressions():
+            raise ValueError(f"Unsupported compression: {compression}")
+        self.compression = compression
+        self._write = write
+        self._member = None  # Current gzip member
+        if compression == 'zstd':
+            self._zstd = zstandard.ZstdDecompressor().stream_writer(
+                _Sink(write), write_size=DECOMPRESS_PIECE_SIZE)
+
+    def feed(self, data):
+        """Decompress the next chunk of the stream."""
+        try:
+            if self.compression == 'zstd':
+                self._zstd.write(data)
+            else:
+                self._feed_gzip(data)
+        except _ERRORS as e:
+            raise ValueError(f"The file is not valid {self.compression} data ({e}).")
+
+    def _feed_gzip(self, data):
+        while True:
+            if self._member is None:
+                if not data:
+                    return
+                self._member = zlib.decompressobj(_GZIP_WBITS)
+            out = self._member.decompress(data, DECOMPRESS_PIECE_SIZE)
+            if out:
+                self._write(out)
+            if self._member.eof:
+                data = self._member.unused_data  # Next member, if any
+                self._member = None
+            else:
+                data = self._member.unconsumed_tail
+                # A full piece may leave output pending even without input left
+                if not data and len(out) < DECOMPRESS_PIECE_SIZE:
+                    return
+
+    def close(self):
+        """End the stream, checking that it was complete."""
+        if self.compression == 'zstd':
+            try:
+                self._zstd.flush()
+            except _ERRORS as e:
+                raise ValueError(f"The file is not valid {self.compression} data ({e}).")
+        elif self._member is not None:
+            raise ValueError("The compressed file is truncated.")
+
+
+class GzipBlockWriter:
+    """
+    Compress a stream into a file as independent gzip members, each holding
+    STORAGE_BLOCK_SIZE uncompressed bytes (the last one less), and record
+    where each member starts.
+
+    ``blocks`` lists (uncompressed offset, file offset) pairs, the uncompressed
+    offsets counting from ``offset``; the file offsets are the file's
+    positions when the members were written.
+    """
+
+    def __init__(self, fileobj, offset=0, block_size=STORAGE_BLOCK_SIZE, level=STORAGE_GZIP_LEVEL):
+        self.block_size = block_size
+        self.level = level
+        self.blocks = []
+        self._file = fileobj
+        self._flushed = offset
+        self._buffer = bytearray()
+
+    @property
+    def size(self):
+        """Uncompressed offset reached, including bytes not compressed yet."""
+        return self._flushed + len(self._buffer)
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._write_block(self.block_size)
+
+    def close(self):
+        """Compress the buffered bytes (the file itself is left open)."""
+        if self._buffer:
+            self._write_block(len(self._buffer))
+
+    def _write_block(self, length):
+        block = bytes(self._buffer[:length])
+        del self._buffer[:length]
+        self.blocks.append((self._flushed, self._file.tell()))
+        # A fixed mtime keeps the output a function of the content
+        self._file.write(gzip.compress(block, compresslevel=self.level, mtime=0))
+        self._flushed += length
+
+
+def gzip_block_index(path, chunk_size=64 * 1024):
+    """
+    Find the members of a gzip file, decompressing it once.
+
+    Args:
+        path: Path to the gzip file
+        chunk_size: Compressed bytes read at a time
+
+    Returns:
+        numpy.ndarray: (uncompressed offset, file offset) of each member, one row each
+    """
+    blocks = []
+    uncompressed = position = 0
+    member = None
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(chunk_size), b''):
+            while data:
+                if member is None:
+                    member = zlib.decompressobj(_GZIP_WBITS)
+                    blocks.append((uncompressed, position))
+                uncompressed += len(member.decompress(data))
+                if member.eof:
+                    position += len(data) - len(member.unused_data)
+                    data = member.unused_data
+                    member = None
+                else:
+                    position += len(data)
+                    data = b''
+    return np.asarray(blocks, dtype=np.int64).reshape(-1, 2)
+
+
+@contextlib.contextmanager
+def open_csv(path, offset=0, blocks=None, compression='infer'):
+    """
+    Open a plain or gzip-compressed CSV file to read its uncompressed bytes.
+
+    Args:
+        path: Path to the file
+        offset: Uncompressed offset to start reading at
+        blocks: Block index of a gzip file, see gzip_block_index (optional;
+            without it, everything before offset is decompressed)
+        compression: 'gzip', None, or 'infer' from the file name
+
+    Yields:
+        Binary file object positioned at offset
+    """
+    if compression == 'infer':
+        compression = compression_of(path)
+    if compression not in (None, 'gzip'):
+        raise ValueError(f"Unsupported compression for stored files: {compression}")
+    with open(path, 'rb') as f:
+        if compression is None:
+            f.seek(offset)
+            yield f
+            return
+        if blocks is not None and len(blocks):
+            i = max(int(np.searchsorted(blocks[:, 0], offset, side='right')) - 1, 0)
+            f.seek(int(blocks[i, 1]))
+            offset -= int(blocks[i, 0])
+        with gzip.GzipFile(fileobj=f) as g:
+            g.seek(offset)
+            yield g
@@ -0,0 +1,240 @@
+"""
+Operation registry for ModelYourData.
+Maps operation names (as used by the analysis page) to the analysis
+functions and normalizes their request parameters, so that several
+operations can be run against a single loaded DataFrame.
+"""
+
+from .analysis import (
+    generate_table_preview,
+    perform_linear_regression,
+    perform_clustering,
+    generate_distribution_plot,
+    generate_statistical_summary,
+    generate_eda_report,
+    generate_correlation_matrix,
+    generate_scatter_plot,
+    generate_histogram,
+    generate_boxplot,
+    generate_categorical_analysis,
+    get_numeric_columns,
+    get_categorical_columns,
+    get_datetime_columns,
+)
+from .outliers import generate_outlier_report, METHODS as OUTLIER_METHODS
+from .query import parse_filter_spec, apply_filters
+from .timeseries import generate_time_series, PERIODS, AGGREGATES as TIME_AGGREGATES, DEFAULT_MAX_POINTS
+
+
+def split_columns(value):
+    """
+    Normalize a column list parameter.
+
+    Accepts a list or a comma separated string (as sent in query strings).
+
+    Returns:
+        list or None: Column names, or None when nothing was given
+    """
+    if isinstance(value, str):
+        return value.split(',') if value else None
+    return value or None
+
+
+MAX_PREVIEW_ROWS = 200
+MAX_TOP_VALUES = 50
+MAX_TIME_SERIES_POINTS = 10000
+
+
+def _preview_rows(value):
+    return min(max(int(value), 1), MAX_PREVIEW_ROWS)
+
+
+def _top_values(value):
+    return min(max(int(value), 1), MAX_TOP_VALUES)
+
+
+def _reduction(value):
+    if value not in ('auto', 'pca', 'none'):
+        raise ValueError(f"Unknown reduction: {value} (use 'auto', 'pca' or 'none')")
+    return value
+
+
+def _outlier_method(value):
+    if value not in OUTLIER_METHODS:
+        raise ValueError(f"Unknown outlier method: {value} (use {', '.join(OUTLIER_METHODS)})")
+    return value
+
+
+def _contamination(value):
+    value = float(value)
+    if not 0 < value <= 0.5:
+        raise ValueError("contamination must be in (0, 0.5]")
+    return value
+
+
+def _period(value):
+    if value not in PERIODS:
+        raise ValueError(f"Unknown period: {value} (use {', '.join(PERIODS)})")
+    return value
+
+
+def _time_aggregate(value):
+    if value not in TIME_AGGREGATES:
+        raise ValueError(f"Unknown aggregate: {value} (use {', '.join(TIME_AGGREGATES)})")
+    return value
+
+
+def _max_points(value):
+    return min(max(int(value), 10), MAX_TIME_SERIES_POINTS)
+
+
+def _correlation_order(value):
+    if value not in ('original', 'cluster'):
+        raise ValueError(f"Unknown column order: {value} (use 'original' or 'cluster')")
+    return value
+
+
+# Operation name -> {parameter: (converter, default)}
+PARAMETERS = {
+    'table': {'max_rows': (_preview_rows, 20)},
+    'linear_regression': {'x_column': (str, None), 'y_column': (str, None)},
+    'clustering': {'n_clusters': (int, 3), 'columns': (split_columns, None),
+                   'reduce': (_reduction, 'auto'), 'n_components': (int, None)},
+    'distribution': {'column': (str, None)},
+    'statistics': {},
+    'eda': {},
+    'correlation': {'order': (_correlation_order, 'original'), 'top_pairs': (_top_values, 10)},
+    'scatter': {'x_column': (str, None), 'y_column': (str, None)},
+    'histogram': {'column': (str, None), 'bins': (int, 30)},
+    'boxplot': {'columns': (split_columns, None)},
+    'categorical': {'column': (str, None), 'top_k': (_top_values, 20), 'values': (split_columns, None)},
+    'outliers': {'columns': (split_columns, None), 'method': (_outlier_method, 'iqr'),
+                 'threshold': (float, None), 'contamination': (_contamination, None)},
+    'timeseries': {'time_column': (str, None), 'columns': (split_columns, None),
+                   'period': (_period, None), 'agg': (_time_aggregate, 'mean'),
+                   'start': (str, None), 'end': (str, None),
+                   'max_points': (_max_points, DEFAULT_MAX_POINTS)},
+}
+
+
+# Parameters accepted by every operation
+COMMON_PARAMETERS = {
+    'filters': (parse_filter_spec, None),
+    'sample_rows': (int, None),
+}
+
+
+# Operation name -> runner(df, params, profile). Names match the endpoint keys in analysis.js
+OPERATIONS = {
+    'table': lambda df, p, profile: generate_table_preview(df, p['max_rows']),
+    'linear_regression': lambda df, p, profile: perform_linear_regression(
+        df, p['x_column'], p['y_column'], moments=profile),
+    'clustering': lambda df, p, profile: perform_clustering(
+        df, p['n_clusters'], p['columns'], reduce=p['reduce'], n_components=p['n_components'],
+        model=profile),
+    'distribution': lambda df, p, profile: generate_distribution_plot(df, p['column']),
+    'statistics': lambda df, p, profile: generate_statistical_summary(df, profile=profile),
+    'eda': lambda df, p, profile: generate_eda_report(df, profile=profile),
+    'correlation': lambda df, p, profile: generate_correlation_matrix(
+        df, order=p['order'], top_pairs=p['top_pairs'], moments=profile),
+    'scatter': lambda df, p, profile: generate_scatter_plot(df, p['x_column'], p['y_column']),
+    'histogram': lambda df, p, profile: generate_histogram(df, p['column'], p['bins']),
+    'boxplot': lambda df, p, profile: generate_boxplot(df, p['columns'], profile=profile),
+    'categorical': lambda df, p, profile: generate_categorical_analysis(
+        df, p['column'], p['top_k'], p['values'], profile=profile),
+    'outliers': lambda df, p, profile: generate_outlier_report(
+        df, p['columns'], p['method'], p['threshold'], p['contamination']),
+    'timeseries': lambda df, p, profile: generate_time_series(
+        df, p['time_column'], p['columns'], p['period'], p['agg'], p['start'], p['end'],
+        p['max_points'], time_index=profile),
+}
+
+# Operations served from the column profile (quantile sketches, box
+# statistics, categorical frequency sketches)
+PROFILE_OPERATIONS = {'statistics', 'eda', 'boxplot', 'categorical'}
+
+# Operations served from a fitted model of their parameters (passed in
+# place of the profile)
+MODEL_OPERATIONS = {'clustering'}
+
+# Operations served from the sorted time index of a datetime column (passed
+# in place of the profile)
+TIME_INDEX_OPERATIONS = {'timeseries'}
+
+# Operations served from the co-moments of the numeric columns (passed in
+# place of the profile)
+MOMENT_OPERATIONS = {'correlation', 'linear_regression'}
+
+
+def normalize_params(operation, params=None):
+    """
+    Convert request parameters to the canonical form of an operation.
+
+    Unknown parameters are dropped, missing or empty ones get their default,
+    so identical requests always produce identical parameter dicts.
+
+    Returns:
+        dict: Parameters with their converted values
+    """
+    if operation not in PARAMETERS:
+        raise ValueError(f"Unknown operation: {operation}")
+    params = params or {}
+    normalized = {}
+    for name, (convert, default) in {**PARAMETERS[operation], **COMMON_PARAMETERS}.items():
+        value = params.get(name)
+        normalized[name] = default if value in (None, '') else convert(value)
+    return normalized
+
+
+def run_operation(df, operation, params=None, zone_maps=None, profile=None):
+    """
+    Run a registered analysis operation.
+
+    The ``filters`` parameter is applied here, once, so zone maps can be
+    used to skip chunks before the analysis function sees the data. With
+    ``sample_rows`` the (filtered) rows are then reduced to a reproducible
+    random sample, reported in the result's 'sample' entry.
+
+    Args:
+        df: pandas.DataFrame
+        operation: Operation name (key of OPERATIONS)
+        params: dict of request parameters (optional)
+        zone_maps: Zone maps of df (optional)
+        profile: Column profile of df, or the fitted model for
+            MODEL_OPERATIONS, the time index for TIME_INDEX_OPERATIONS
+            or the co-moments for MOMENT_OPERATIONS; ignored when filtering
+            (optional)
+
+    Returns:
+        dict: Result of the analysis function
+    """
+    params = normalize_params(operation, params)
+    if params['filters']:
+        df = apply_filters(df, params['filters'], zone_maps)
+        profile = None
+    total_rows = len(df)
+    sampled = params['sample_rows'] is not None and total_rows > params['sample_rows']
+    if sampled:
+        df = df.sample(n=max(params['sample_rows'], 1), random_state=0).sort_index()
+        profile = None
+    result = OPERATIONS[operation](df, params, profile)
+    if sampled and isinstance(result, dict):
+        result['sample'] = {'rows': int(len(df)), 'total_rows': int(total_rows)}
+    return result
+
+
+def profile_columns(df):
+    """
+    Compute the column profile shared by all operations on a DataFrame.
+
+    Returns:
+        dict: numeric, categorical, datetime and all column names plus the shape
+    """
+    return {
+        'rows': int(len(df)),
+        'columns': int(len(df.columns)),
+        'numeric_columns': get_numeric_columns(df),
+        'categorical_columns': get_categorical_columns(df),
+        'datetime_columns': get_datetime_columns(df),
+        'all_columns': df.columns.tolist(),
+    }
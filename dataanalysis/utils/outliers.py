@@ -0,0 +1,282 @@
+"""
+Outlier detection for ModelYourData.
+Flags outliers per numeric column with the IQR, z-score and MAD rules,
+computed over the whole numeric matrix at once, and across columns with an
+IsolationForest fitted on a row sample and run on several cores. Fitted
+outlier models flag other rows (e.g. export chunks) against the same
+statistics or forest.
+"""
+
+import os
+
+import numpy as np
+import matplotlib.pyplot as plt
+from sklearn.ensemble import IsolationForest
+
+from .analysis import fig_to_base64, impute_and_scale, select_numeric_columns
+from .query import apply_filters
+
+
+UNIVARIATE_METHODS = ('iqr', 'zscore', 'mad')
+METHODS = UNIVARIATE_METHODS + ('isolation_forest',)
+
+# Default threshold of each rule: IQR multiplier, |z|, modified |z|
+DEFAULT_THRESHOLDS = {'iqr': 1.5, 'zscore': 3.0, 'mad': 3.5}
+
+ISOLATION_FOREST_TREES = 100
+ISOLATION_FOREST_FIT_ROWS = 100_000  # Rows the forest is fitted on
+ISOLATION_FOREST_JOBS = min(4, os.cpu_count() or 1)
+
+
+def univariate_stats(X):
+    """
+    Column statistics of the univariate rules, computed with single
+    vectorized calls over the matrix, not column by column.
+
+    Args:
+        X: 2-D float numpy.ndarray, NaN for missing values
+
+    Returns:
+        dict: 'q1', 'median', 'q3', 'mean', 'std' and 'mad' arrays, one
+        value per column
+    """
+    q1, median, q3 = np.nanquantile(X, [0.25, 0.5, 0.75], axis=0)
+    return {
+        'q1': q1,
+        'median': median,
+        'q3': q3,
+        'mean': np.nanmean(X, axis=0),
+        'std': np.nanstd(X, axis=0, ddof=1),
+        'mad': np.nanmedian(np.abs(X - median), axis=0),
+    }
+
+
+def univariate_flags(X, thresholds=None, stats=None):
+    """
+    Flag outlying values of every column with each univariate rule.
+
+    Missing values and constant columns are never flagged.
+
+    Args:
+        X: 2-D float numpy.ndarray, NaN for missing values
+        thresholds: {method: threshold} overriding DEFAULT_THRESHOLDS (optional)
+        stats: Column statistics to flag against, see univariate_stats
+            (optional, those of X by default)
+
+    Returns:
+        dict: {method: boolean numpy.ndarray shaped like X}
+    """
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    if stats is None:
+        stats = univariate_stats(X)
+    q1, median, q3 = stats['q1'], stats['median'], stats['q3']
+    mean, std, mad = stats['mean'], stats['std'], stats['mad']
+
+    iqr = q3 - q1
+    k = thresholds['iqr']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zscore = np.abs(X - mean) / np.where(std > 0, std, np.nan)
+        # Modified z-score (Iglewicz and Hoaglin)
+        modified = 0.6745 * np.abs(X - median) / np.where(mad > 0, mad, np.nan)
+    return {
+        'iqr': (X < q1 - k * iqr) | (X > q3 + k * iqr),
+        'zscore': zscore > thresholds['zscore'],
+        'mad': modified > thresholds['mad'],
+    }
+
+
+def fit_isolation_forest(data, contamination='auto', seed=42):
+    """
+    Fit an IsolationForest on numeric data.
+
+    The forest is fitted on at most ISOLATION_FOREST_FIT_ROWS rows (each
+    tree only sees 256 of them anyway), building trees on
+    ISOLATION_FOREST_JOBS cores.
+
+    Args:
+        data: pandas.DataFrame of numeric columns (missing values are imputed)
+        contamination: Expected share of outliers, or 'auto'
+        seed: Random seed
+
+    Returns:
+        tuple: (fitted model: 'imputer', 'scaler' and 'forest'; scaled
+        numpy.ndarray of data)
+    """
+    imputer, scaler, X = impute_and_scale(data)
+    fit_rows = X
+    if len(X) > ISOLATION_FOREST_FIT_ROWS:
+        sample = np.random.default_rng(seed).choice(len(X), ISOLATION_FOREST_FIT_ROWS, replace=False)
+        fit_rows = X[np.sort(sample)]
+    forest = IsolationForest(n_estimators=ISOLATION_FOREST_TREES, contamination=contamination,
+                             random_state=seed, n_jobs=ISOLATION_FOREST_JOBS)
+    forest.fit(fit_rows)
+    return {'imputer': imputer, 'scaler': scaler, 'forest': forest}, X
+
+
+def isolation_forest_scores(data, contamination='auto', seed=42):
+    """
+    Score rows with an IsolationForest fitted on them (see
+    fit_isolation_forest), applying trees on ISOLATION_FOREST_JOBS cores.
+
+    Args:
+        data: pandas.DataFrame of numeric columns (missing values are imputed)
+        contamination: Expected share of outliers, or 'auto'
+        seed: Random seed
+
+    Returns:
+        tuple: (anomaly scores, lower is more anomalous; boolean outlier flags;
+        score threshold)
+    """
+    model, X = fit_isolation_forest(data, contamination, seed)
+    forest = model['forest']
+    scores = forest.score_samples(X)
+    return scores, scores < forest.offset_, float(forest.offset_)
+
+
+def detect_outliers(df, columns=None, method='iqr', threshold=None, contamination=None):
+    """
+    Flag the outlying rows of a DataFrame.
+
+    Args:
+        df: pandas.DataFrame
+        columns: Numeric columns to check (optional, all numeric by default)
+        method: 'iqr', 'zscore', 'mad' or 'isolation_forest'
+        threshold: Threshold of a univariate method (optional, see DEFAULT_THRESHOLDS)
+        contamination: Expected share of outliers for isolation_forest
+            (optional, 'auto' by default)
+
+    Returns:
+        dict: 'columns', 'mask' (rows flagged by the method), 'flags' (per
+        univariate method and column), 'scores' and 'score_threshold'
+        (isolation_forest only)
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown outlier method: {method} (use {', '.join(METHODS)})")
+    columns = select_numeric_columns(df, columns, analysis='outlier detection')
+    data = df[columns]
+    X = data.to_numpy(dtype=float, na_value=np.nan)
+
+    thresholds = {method: threshold} if threshold is not None and method in UNIVARIATE_METHODS else None
+    flags = univariate_flags(X, thresholds)
+    detected = {'columns': columns, 'flags': flags, 'scores': None, 'score_threshold': None}
+    if method == 'isolation_forest':
+        scores, mask, offset = isolation_forest_scores(data, contamination if contamination is not None else 'auto')
+        detected.update(mask=mask, scores=scores, score_threshold=offset)
+    else:
+        detected['mask'] = flags[method].any(axis=1)
+    return detected
+
+
+def fit_outlier_model(df, columns=None, method='iqr', threshold=None, contamination=None):
+    """
+    Fit what flagging rows of a DataFrame takes, so other rows (e.g. the
+    chunks of an export) can be flagged as the DataFrame's own would be.
+
+    Args:
+        df: pandas.DataFrame
+        columns, method, threshold, contamination: See detect_outliers
+
+    Returns:
+        dict: 'columns', 'method', and the column statistics and
+        'thresholds' of a univariate method or the fitted 'forest' (see
+        fit_isolation_forest) of isolation_forest
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown outlier method: {method} (use {', '.join(METHODS)})")
+    columns = select_numeric_columns(df, columns, analysis='outlier detection')
+    model = {'columns': columns, 'method': method}
+    if method == 'isolation_forest':
+        model['forest'], _ = fit_isolation_forest(df[columns], contamination if contamination is not None else 'auto')
+    else:
+        model['stats'] = univariate_stats(df[columns].to_numpy(dtype=float, na_value=np.nan))
+        model['thresholds'] = {method: threshold} if threshold is not None else None
+    return model
+
+
+def outlier_labels(model, df):
+    """
+    Flag rows with a fitted outlier model.
+
+    Args:
+        model: Fitted model, see fit_outlier_model
+        df: pandas.DataFrame with the model's columns
+
+    Returns:
+        tuple: (boolean outlier flags; ';'-joined flagged columns of each
+        row for univariate methods, or anomaly scores for isolation_forest)
+    """
+    data = df[model['columns']]
+    if model['method'] == 'isolation_forest':
+        if not len(data):
+            return np.zeros(0, dtype=bool), np.zeros(0)
+        fitted = model['forest']
+        X = fitted['scaler'].transform(fitted['imputer'].transform(data))
+        scores = fitted['forest'].score_samples(X)
+        return scores < fitted['forest'].offset_, scores.round(4)
+    X = data.to_numpy(dtype=float, na_value=np.nan)
+    flags = univariate_flags(X, model['thresholds'], model['stats'])[model['method']]
+    names = np.array(model['columns'], dtype=object)
+    return flags.any(axis=1), [';'.join(map(str, names[row])) for row in flags]
+
+
+def generate_outlier_report(df, columns=None, method='iqr', threshold=None, contamination=None,
+                            filters=None):
+    """
+    Generate outlier counts and a chart.
+
+    Univariate methods are charted as per-column outlier counts of all
+    three rules; isolation_forest as the distribution of anomaly scores
+    with the outlier threshold.
+
+    Args:
+        df: pandas.DataFrame
+        columns, method, threshold, contamination: See detect_outliers
+        filters: Filter spec applied before the analysis (optional)
+
+    Returns:
+        dict: Contains plot image and outlier counts
+    """
+    df = apply_filters(df, filters)
+    detected = detect_outliers(df, columns, method, threshold, contamination)
+    columns = detected['columns']
+    counts = {name: detected['flags'][name].sum(axis=0) for name in UNIVARIATE_METHODS}
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    if method == 'isolation_forest':
+        ax.hist(detected['scores'], bins=50, color='#4CAF50', alpha=0.7, edgecolor='#2E7D32')
+        ax.axvline(detected['score_threshold'], color='#D32F2F', linestyle='--', linewidth=2,
+                   label=f"Outlier threshold: {detected['score_threshold']:.3f}")
+        ax.set_xlabel('Anomaly score (lower is more anomalous)', fontsize=12)
+        ax.set_ylabel('Rows', fontsize=12)
+        ax.set_title('Isolation Forest Anomaly Scores', fontsize=14, fontweight='bold')
+        ax.legend()
+    else:
+        shown = columns[:30]  # Keep the bars readable on wide data
+        positions = np.arange(len(shown))
+        width = 0.27
+        colors = {'iqr': '#2E7D32', 'zscore': '#81C784', 'mad': '#FFA726'}
+        labels = {'iqr': 'IQR', 'zscore': 'Z-score', 'mad': 'MAD'}
+        for offset, name in zip((-width, 0, width), UNIVARIATE_METHODS):
+            ax.bar(positions + offset, counts[name][:len(shown)], width, color=colors[name],
+                   alpha=0.85 if name == method else 0.45, label=labels[name])
+        ax.set_xticks(positions)
+        ax.set_xticklabels(shown, rotation=45, ha='right')
+        ax.set_ylabel('Outliers', fontsize=12)
+        ax.set_title('Outliers per Column', fontsize=14, fontweight='bold')
+        ax.legend()
+    ax.grid(True, alpha=0.3, axis='y')
+    fig.tight_layout()
+
+    image_base64 = fig_to_base64(fig)
+
+    return {
+        'image': image_base64,
+        'method': method,
+        'columns': columns,
+        'rows': int(len(df)),
+        'flagged_rows': int(detected['mask'].sum()),
+        'column_counts': {
+            str(col): {name: int(counts[name][i]) for name in UNIVARIATE_METHODS}
+            for i, col in enumerate(columns)
+        },
+    }
@@ -0,0 +1,161 @@
+"""
+Table paging utilities for ModelYourData.
+Serves windows of rows/columns as compact JSON, either sliced from a
+loaded DataFrame (sorted or filtered pages, see query.apply_filters) or read straight from the CSV
+through a row-offset index (plain pages), and streams DataFrames as CSV.
+Offsets are positions in the uncompressed CSV, also for files stored
+compressed (see compression.open_csv).
+"""
+
+import numpy as np
+import pandas as pd
+
+from .compression import open_csv
+
+
+ROW_INDEX_STRIDE = 1000  # One byte offset stored per this many data rows
+MAX_PAGE_ROWS = 500
+MAX_PAGE_COLUMNS = 50
+CSV_CHUNK_ROWS = 10000  # Rows per piece of streamed CSV exports
+
+
+class RecordScanner:
+    """
+    Incrementally find record boundaries in a CSV byte stream.
+
+    Newlines inside double-quoted fields are ignored. Feeding the stream
+    chunk by chunk counts the records and collects the byte offset at which
+    every ``stride``-th data row (the header being the first record) starts.
+    A scan can resume at a record boundary of a stream scanned before, e.g.
+    where rows were appended, given the newlines and bytes before it.
+    """
+
+    def __init__(self, stride=ROW_INDEX_STRIDE, newlines=0, position=0):
+        self.stride = stride
+        self.newlines = newlines
+        self.offsets = []
+        self._in_quotes = False
+        self._position = position
+
+    def feed(self, chunk):
+        """Scan the next chunk of the stream."""
+        data = np.frombuffer(chunk, dtype=np.uint8)
+        if not len(data):
+            return
+        newlines = data == 0x0A
+        quotes = data == 0x22
+        if self._in_quotes or quotes.any():
+            # Quote parity at each byte; doubled quotes toggle twice
+            parity = (np.cumsum(quotes) + self._in_quotes) & 1
+            newlines &= parity == 0
+            self._in_quotes = bool(parity[-1])
+        positions = np.flatnonzero(newlines)
+        # The n-th newline (0-based, stream-wide) ends the header or data row
+        # n - 1, so data row n starts right after it
+        rows = self.newlines + np.arange(len(positions))
+        starts = positions[rows % self.stride == 0] + self._position + 1
+        self.offsets.extend(starts.tolist())
+        self.newlines += len(positions)
+        self._position += len(data)
+
+    def row_offsets(self, row_count):
+        """Offsets of the indexed rows, dropping any pointing past the last row."""
+        return self.offsets[:-(-row_count // self.stride)]
+
+
+def build_row_index(file_path, chunk_size=1024 * 1024):
+    """
+    Build the row-offset index of a CSV file in one pass.
+
+    Args:
+        file_path: Path to the CSV file (plain or gzip-compressed)
+        chunk_size: Bytes read at a time
+
+    Returns:
+        numpy.ndarray: Byte offsets of every ROW_INDEX_STRIDE-th data row
+    """
+    scanner = RecordScanner()
+    last = b''
+    with open_csv(file_path) as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            scanner.feed(chunk)
+            last = chunk[-1:]
+    rows = scanner.newlines - 1 + (1 if last not in (b'\n', b'') else 0)
+    return np.asarray(scanner.row_offsets(max(rows, 0)), dtype=np.int64)
+
+
+def read_csv_columns(file_path, sep=',', encoding=None):
+    """Read the column names of a CSV file, as pandas names them."""
+    return pd.read_csv(file_path, sep=sep, encoding=encoding, nrows=0).columns.tolist()
+
+
+def read_csv_rows(file_path, row_offsets, offset, limit, columns, sep=',', encoding=None,
+                  blocks=None):
+    """
+    Read a range of data rows from a CSV file without parsing earlier rows.
+
+    Args:
+        file_path: Path to the CSV file (plain or gzip-compressed)
+        row_offsets: Index built by build_row_index
+        offset: First data row to read
+        limit: Number of rows to read
+        columns: Column names (the header row)
+        sep: Field delimiter
+        encoding: Text encoding
+        blocks: Block index of a gzip-compressed file, see
+            compression.gzip_block_index (optional)
+
+    Returns:
+        pandas.DataFrame: The requested rows
+    """
+    block = offset // ROW_INDEX_STRIDE
+    if block >= len(row_offsets):
+        return pd.DataFrame(columns=columns)
+    with open_csv(file_path, int(row_offsets[block]), blocks) as f:
+        return pd.read_csv(f, sep=sep, encoding=encoding, header=None, names=columns,
+                           skiprows=offset - block * ROW_INDEX_STRIDE, nrows=limit)
+
+
+def page_dataframe(df, offset=0, limit=50, sort_by=None, descending=False):
+    """
+    Slice a page of rows out of a DataFrame, optionally sorted.
+
+    Returns:
+        pandas.DataFrame: The requested rows
+    """
+    if sort_by:
+        if sort_by not in df.columns:
+            raise ValueError(f"Unknown sort column: {sort_by}")
+        # Only the rows up to the end of the page need ordering
+        n = offset + limit
+        if pd.api.types.is_numeric_dtype(df[sort_by]) and n <= df[sort_by].count():
+            df = df.nlargest(n, sort_by) if descending else df.nsmallest(n, sort_by)
+        else:
+            df = df.sort_values(sort_by, ascending=not descending, na_position='last')
+    return df.iloc[offset:offset + limit]
+
+
+def rows_to_json(page):
+    """
+    Convert a page of rows to JSON-ready lists.
+
+    Returns:
+        list: One list of native Python values (None for missing) per row
+    """
+    return page.astype(object).where(page.notna(), None).values.tolist()
+
+
+def csv_stream(frames):
+    """
+    Encode DataFrames as one CSV piece by piece, for streaming responses.
+
+    Args:
+        frames: Iterable of pandas.DataFrame with the same columns
+
+    Yields:
+        str: Each DataFrame's rows, the first one's with the header line
+    """
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header)
+        header = False
@@ -0,0 +1,239 @@
+"""
+CSV parse engines for ModelYourData.
+Reads CSV files with pandas' C parser or, where pyarrow is installed, its
+multithreaded CSV reader, picking the engine by file size. Column types
+detected at upload time are passed as dtype hints so the parser does not
+have to infer them, and columns detected as dates are converted to
+datetimes. Rows appended to a parsed file are checked and cast against its
+column types.
+"""
+
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401 (only needed by pandas' pyarrow engine)
+except ImportError:
+    pyarrow = None
+
+
+# Files smaller than this parse faster single-threaded than it takes to
+# start pyarrow's thread pool
+PYARROW_MIN_SIZE = 1024 * 1024
+
+# Upload-time column type -> dtype hint. The types come from a sample of the
+# file, so only hints the full parse would agree with are given: integer
+# columns may still turn out to have missing values (float64).
+DTYPE_HINTS = {
+    'float': 'float64',
+    'string': 'str',
+}
+DATETIME_TYPE = 'datetime'
+
+
+def available_engines():
+    """Return the names of the parse engines usable in this environment."""
+    return ['pandas', 'pyarrow'] if pyarrow is not None else ['pandas']
+
+
+def choose_engine(file_size, engine='auto'):
+    """
+    Pick the parse engine for a file.
+
+    Args:
+        file_size: Size of the file in bytes
+        engine: 'auto', 'pandas' or 'pyarrow'
+
+    Returns:
+        str: Engine name ('pandas' when pyarrow was asked for but is missing)
+    """
+    if engine == 'pyarrow' or (engine == 'auto' and file_size >= PYARROW_MIN_SIZE):
+        return 'pyarrow' if pyarrow is not None else 'pandas'
+    return 'pandas'
+
+
+def dtype_hints(column_types):
+    """
+    Convert upload-time column types into read_csv dtype hints.
+
+    Args:
+        column_types: {column name: 'integer' | 'float' | 'datetime' | 'string'}
+
+    Returns:
+        dict: {column name: dtype} for the columns that can be hinted
+    """
+    return {name: DTYPE_HINTS[kind] for name, kind in (column_types or {}).items()
+            if kind in DTYPE_HINTS}
+
+
+def parse_datetimes(df, columns):
+    """
+    Convert text columns holding dates to datetimes, in place.
+
+    A column is only converted when every non-missing value parses, so a
+    column that merely looked like dates in the upload sample stays text.
+    Columns mixing UTC offsets are converted to UTC.
+
+    Args:
+        df: pandas.DataFrame
+        columns: Names of the columns to convert (others are ignored)
+
+    Returns:
+        pandas.DataFrame: df
+    """
+    for name in columns:
+        if name not in df.columns or pd.api.types.is_datetime64_any_dtype(df[name]):
+            continue
+        column = df[name]
+        for options in ({'format': 'ISO8601'}, {'format': 'ISO8601', 'utc': True}, {}):
+            try:
+                converted = pd.to_datetime(column, errors='coerce', **options)
+            except (ValueError, TypeError, OverflowError):
+                continue
+            if converted.isna().sum() == column.isna().sum():
+                df[name] = converted
+                break
+    return df
+
+
+def _read_pandas(file_path, sep, encoding, dtype, dates=(), compression='infer'):
+    return pd.read_csv(file_path, sep=sep, encoding=encoding, dtype=dtype, compression=compression)
+
+
+def _read_pyarrow(file_path, sep, encoding, dtype, dates=(), compression='infer'):
+    # pandas applies the hints after pyarrow has inferred its types, so a
+    # text column of numbers would lose its leading zeros; check those
+    # columns came out as text rather than cast them
+    text = [name for name, kind in (dtype or {}).items() if kind == 'str']
+    hints = {name: kind for name, kind in (dtype or {}).items() if kind != 'str'} or None
+    df = pd.read_csv(file_path, sep=sep, encoding=encoding, dtype=hints, compression=compression,
+                     engine='pyarrow')
+    for name in text:
+        if name not in df.columns:
+            continue
+        if pd.api.types.is_numeric_dtype(df[name]) and not df[name].isna().all():
+            raise ValueError(f"pyarrow parsed text column '{name}' as numbers")
+        df[name] = df[name].astype('str')
+    # pyarrow turns date-like text into date objects where pandas keeps
+    # strings; leave such files to pandas so both engines agree, unless
+    # the columns are converted to datetimes anyway
+    for name in df.columns:
+        column = df[name]
+        if pd.api.types.is_numeric_dtype(column) or isinstance(column.dtype, pd.StringDtype):
+            continue
+        if name in dates:
+            continue
+        if column.dtype == object and pd.api.types.infer_dtype(column, skipna=True) in ('string', 'empty'):
+            continue
+        raise ValueError(f"pyarrow parsed column '{name}' as {pd.api.types.infer_dtype(column)}")
+    return df
+
+
+ENGINES = {
+    'pandas': _read_pandas,
+    'pyarrow': _read_pyarrow,
+}
+
+
+def read_csv(file_path, sep=',', encoding=None, column_types=None, engine='auto',
+             compression='infer'):
+    """
+    Parse a CSV file with the engine suited to its size.
+
+    Files pyarrow cannot read as hinted fall back to pandas, and hinted
+    columns that do not parse as hinted (the upload-time types come from a
+    sample) to a plain pandas parse without hints. Columns typed 'datetime' are then converted
+    with parse_datetimes. Compressed files are decompressed as they are
+    read; the engine is still picked by the size of the file on disk.
+
+    Args:
+        file_path: Path to the CSV file
+        sep: Field delimiter
+        encoding: Text encoding
+        column_types: Upload-time column types, see dtype_hints (optional)
+        engine: 'auto', 'pandas' or 'pyarrow'
+        compression: 'gzip', 'zstd', None, or 'infer' from the file name
+
+    Returns:
+        pandas.DataFrame: Parsed data
+    """
+    chosen = choose_engine(os.path.getsize(file_path), engine)
+    hints = dtype_hints(column_types) or None
+    dates = [name for name, kind in (column_types or {}).items() if kind == DATETIME_TYPE]
+    if chosen == 'pandas' and hints is None:
+        df = _read_pandas(file_path, sep, encoding, None, compression=compression)
+    else:
+        try:
+            df = ENGINES[chosen](file_path, sep, encoding, hints, dates, compression)
+        except (ValueError, TypeError, pd.errors.ParserError):
+            df = None
+            if chosen != 'pandas' and hints is not None:
+                # What pyarrow cannot read as hinted, pandas may
+                try:
+                    df = _read_pandas(file_path, sep, encoding, hints, compression=compression)
+                except (ValueError, TypeError, pd.errors.ParserError):
+                    pass
+            if df is None:
+                df = _read_pandas(file_path, sep, encoding, None, compression=compression)
+    return parse_datetimes(df, dates)
+
+
+def append_column_types(df):
+    """
+    Column types to parse rows appended to df with, so that text columns
+    stay text (e.g. codes with leading zeros) and date columns are dates.
+
+    Returns:
+        dict: {column name: 'string' | 'datetime'}, see read_csv
+    """
+    types = {}
+    for name, dtype in df.dtypes.items():
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            types[name] = DATETIME_TYPE
+        elif not pd.api.types.is_numeric_dtype(dtype):
+            types[name] = 'string'
+    return types
+
+
+def conform_rows(df, rows):
+    """
+    Check rows to be appended to a DataFrame and cast them to its types.
+
+    Args:
+        df: pandas.DataFrame the rows are appended to
+        rows: pandas.DataFrame of the new rows, parsed with
+            append_column_types(df)
+
+    Returns:
+        pandas.DataFrame: rows with a default index and df's columns; numeric
+        columns may be wider than df's (e.g. float for integers)
+
+    Raises:
+        ValueError: When the columns differ or a column's values do not fit
+    """
+    if list(rows.columns) != list(df.columns):
+        raise ValueError(f"The rows must have the columns {', '.join(map(str, df.columns))}, in this order")
+    conformed = {}
+    for name, dtype in df.dtypes.items():
+        column = rows[name].reset_index(drop=True)
+        missing = bool(column.isna().all())
+        if pd.api.types.is_bool_dtype(dtype):
+            if not missing and not pd.api.types.is_bool_dtype(column):
+                raise ValueError(f"Column '{name}' expects True/False values")
+        elif pd.api.types.is_numeric_dtype(dtype):
+            if missing:
+                column = column.astype(float)
+            elif pd.api.types.is_bool_dtype(column) or not pd.api.types.is_numeric_dtype(column):
+                raise ValueError(f"Column '{name}' expects numbers")
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            if not missing and not pd.api.types.is_datetime64_any_dtype(column):
+                raise ValueError(f"Column '{name}' expects dates")
+            try:
+                column = column.astype(dtype)
+            except (TypeError, ValueError):
+                raise ValueError(f"Column '{name}' expects dates in the time zone of the existing rows")
+        else:
+            column = column.astype(dtype)
+        conformed[name] = column
+    return pd.DataFrame(conformed, columns=df.columns)
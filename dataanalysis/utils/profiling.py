@@ -0,0 +1,355 @@
+"""
+Column profiling for ModelYourData.
+Builds, in one pass per column, the summary statistics and sketches that
+describe(), box plots and categorical analyses are served from: quantile
+sketches and box-plot statistics for numeric columns, distinct-count and
+frequency sketches for categorical ones. Rendering cost then depends on
+the number of columns, not rows. Pairwise co-moments of the numeric
+columns serve correlations and regression lines the same way. Everything
+but the box-plot statistics can be merged with the profile of appended
+rows instead of being rebuilt.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .sketches import KLLSketch, HyperLogLog, CountMinSketch, SpaceSaving, hash_values
+
+
+MAX_FLIERS = 200  # Outliers drawn per box; the rest are only counted
+DESCRIBE_QUANTILES = (0.25, 0.5, 0.75)
+CATEGORICAL_CHUNK_ROWS = 65536  # Rows counted at a time when sketching a column
+TOP_VALUES_CAPACITY = 256  # Values tracked per categorical column
+MOMENTS_MAX_COLUMNS = 500  # Wider data has correlations computed directly
+MOMENTS_CHUNK_ROWS = 65536
+
+
+def box_stats(values, label, sketch=None, max_fliers=MAX_FLIERS, seed=0):
+    """
+    Compute matplotlib ``bxp`` statistics for one column.
+
+    Quartiles come from the sketch when given (exact otherwise); whiskers
+    and outliers follow the usual 1.5 IQR rule. At most ``max_fliers``
+    outliers, sampled uniformly, are kept for drawing.
+
+    Args:
+        values: Array-like of numbers (NaN ignored)
+        label: Box label
+        sketch: KLLSketch of the values (optional)
+        max_fliers: Maximum number of outliers kept
+        seed: Sampling seed
+
+    Returns:
+        dict: Statistics accepted by Axes.bxp, plus 'n_fliers'
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        raise ValueError(f"Column '{label}' has no numeric values")
+
+    if sketch is not None:
+        q1, med, q3 = sketch.quantiles([0.25, 0.5, 0.75])
+    else:
+        q1, med, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    low, high = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+    inside = (values >= low) & (values <= high)
+    fliers = values[~inside]
+    n_fliers = len(fliers)
+    if n_fliers > max_fliers:
+        fliers = np.random.default_rng(seed).choice(fliers, max_fliers, replace=False)
+
+    return {
+        'label': label,
+        'med': float(med),
+        'q1': float(q1),
+        'q3': float(q3),
+        'whislo': float(values[inside].min()) if inside.any() else float(q1),
+        'whishi': float(values[inside].max()) if inside.any() else float(q3),
+        'mean': float(values.mean()),
+        'fliers': fliers,
+        'n_fliers': int(n_fliers),
+    }
+
+
+def build_numeric_profile(df):
+    """
+    Profile every numeric column of a DataFrame.
+
+    Args:
+        df: pandas.DataFrame
+
+    Returns:
+        dict: {'rows': n, 'columns': {name: {count, mean, std, min, max,
+        sketch, box}}}
+    """
+    columns = {}
+    for col in df.select_dtypes(include=[np.number]).columns:
+        values = df[col].to_numpy(dtype=float, na_value=np.nan)
+        values = values[~np.isnan(values)]
+        sketch = KLLSketch()
+        sketch.update(values)
+        columns[col] = {
+            'count': int(len(values)),
+            'mean': float(values.mean()) if len(values) else np.nan,
+            'std': float(values.std(ddof=1)) if len(values) > 1 else np.nan,
+            'min': float(values.min()) if len(values) else np.nan,
+            'max': float(values.max()) if len(values) else np.nan,
+            'sketch': sketch,
+            'box': box_stats(values, col, sketch) if len(values) else None,
+        }
+    return {'rows': int(len(df)), 'columns': columns}
+
+
+def build_categorical_profile(df, chunk_rows=CATEGORICAL_CHUNK_ROWS):
+    """
+    Sketch every categorical column of a DataFrame in one pass.
+
+    Each chunk of a column is counted exactly, then folded into a
+    HyperLogLog (distinct values), a count-min sketch (frequency of any
+    value) and a space-saving summary (most frequent values), so memory
+    stays constant however many rows and distinct values there are. Values
+    are compared by their text.
+
+    Args:
+        df: pandas.DataFrame
+        chunk_rows: Rows counted at a time
+
+    Returns:
+        dict: {name: {count, missing, distinct, distinct_exact, hll, cms, top}}
+    """
+    columns = {}
+    for col in df.select_dtypes(include=['object', 'category']).columns:
+        column = df[col]
+        hll, cms, top = HyperLogLog(), CountMinSketch(), SpaceSaving(TOP_VALUES_CAPACITY)
+        for start in range(0, len(column), chunk_rows):
+            counts = column.iloc[start:start + chunk_rows].dropna().astype(str).value_counts()
+            if not len(counts):
+                continue
+            hashes = hash_values(counts.index)
+            hll.update_hashes(hashes)
+            cms.update_hashes(hashes, counts.to_numpy())
+            top.update_counts(counts)
+        columns[col] = {
+            'count': int(top.total),
+            'missing': int(len(column) - top.total),
+            # Counts are exact while no value was dropped from the summary
+            'distinct': len(top.counts) if top.exact else int(round(hll.estimate())),
+            'distinct_exact': top.exact,
+            'hll': hll,
+            'cms': cms,
+            'top': top,
+        }
+    return columns
+
+
+def build_column_profile(df):
+    """
+    Profile every numeric and categorical column of a DataFrame.
+
+    Returns:
+        dict: build_numeric_profile(df) plus 'categorical', the result of
+        build_categorical_profile(df)
+    """
+    profile = build_numeric_profile(df)
+    profile['categorical'] = build_categorical_profile(df)
+    return profile
+
+
+def merge_column_profiles(profile, other):
+    """
+    Fold the profile of appended rows into the profile of a DataFrame.
+
+    Counts, means and standard deviations are combined exactly (Chan et
+    al.'s parallel variance), sketches are merged. Box-plot statistics
+    depend on every value and are dropped; get_box_stats recomputes them.
+
+    Args:
+        profile: build_column_profile result of the DataFrame (updated in place)
+        other: build_column_profile result of the appended rows, with the
+            same column types
+
+    Returns:
+        dict: profile
+    """
+    for col, stats in profile['columns'].items():
+        new = other['columns'].get(col)
+        if new is None or not new['count']:
+            continue
+        n_a, n_b = stats['count'], new['count']
+        n = n_a + n_b
+        if n_a:
+            m2 = ((stats['std'] ** 2 * (n_a - 1) if n_a > 1 else 0.0)
+                  + (new['std'] ** 2 * (n_b - 1) if n_b > 1 else 0.0)
+                  + (new['mean'] - stats['mean']) ** 2 * n_a * n_b / n)
+            stats.update(
+                mean=stats['mean'] + (new['mean'] - stats['mean']) * n_b / n,
+                std=float(np.sqrt(m2 / (n - 1))),
+                min=min(stats['min'], new['min']),
+                max=max(stats['max'], new['max']),
+            )
+        else:
+            stats.update(mean=new['mean'], std=new['std'], min=new['min'], max=new['max'])
+        stats['count'] = n
+        stats['sketch'].merge(new['sketch'])
+        stats['box'] = None
+
+    for col, stats in profile.get('categorical', {}).items():
+        new = other.get('categorical', {}).get(col)
+        if new is None:
+            continue
+        stats['hll'].merge(new['hll'])
+        stats['cms'].merge(new['cms'])
+        stats['top'].merge(new['top'])
+        stats['count'] += new['count']
+        stats['missing'] += new['missing']
+        stats['distinct_exact'] = stats['top'].exact
+        stats['distinct'] = (len(stats['top'].counts) if stats['top'].exact
+                             else int(round(stats['hll'].estimate())))
+    profile['rows'] += other['rows']
+    return profile
+
+
+def build_moments(df):
+    """
+    Accumulate pairwise co-moments of the numeric columns of a DataFrame.
+
+    For every pair of columns the sums below are taken over the rows where
+    both are present, so correlations match DataFrame.corr() (pairwise
+    complete observations). Values are shifted by the column means of the
+    rows seen first, which keeps the sums numerically stable. Returns None
+    for more than MOMENTS_MAX_COLUMNS columns.
+
+    Args:
+        df: pandas.DataFrame
+
+    Returns:
+        dict or None: {'columns', 'shift', 'n', 's', 'ss', 'sxy'}, where for
+        columns i, j: n[i, j] rows, s[i, j] sum of x_i, ss[i, j] sum of
+        x_i ** 2 and sxy[i, j] sum of x_i * x_j (shifted values)
+    """
+    columns = df.select_dtypes(include=[np.number]).columns.tolist()
+    if len(columns) > MOMENTS_MAX_COLUMNS:
+        return None
+    p = len(columns)
+    shift = np.nan_to_num(np.nanmean(df[columns].to_numpy(dtype=float, na_value=np.nan), axis=0)
+                          if p and len(df) else np.zeros(p))
+    moments = {'columns': columns, 'shift': shift}
+    for name in ('n', 's', 'ss', 'sxy'):
+        moments[name] = np.zeros((p, p))
+    return update_moments(moments, df)
+
+
+def update_moments(moments, df, chunk_rows=MOMENTS_CHUNK_ROWS):
+    """
+    Add the rows of a DataFrame to co-moments built by build_moments.
+
+    Args:
+        moments: build_moments result (updated in place)
+        df: pandas.DataFrame holding the moments' columns, e.g. appended rows
+        chunk_rows: Rows processed at a time
+
+    Returns:
+        dict: moments
+    """
+    columns = moments['columns']
+    for start in range(0, len(df), chunk_rows):
+        X = df[columns].iloc[start:start + chunk_rows].to_numpy(dtype=float, na_value=np.nan)
+        present = ~np.isnan(X)
+        X = np.where(present, X - moments['shift'], 0.0)
+        mask = present.astype(float)
+        moments['n'] += mask.T @ mask
+        moments['s'] += X.T @ mask
+        moments['ss'] += (X * X).T @ mask
+        moments['sxy'] += X.T @ X
+    return moments
+
+
+def correlation_from_moments(moments, columns):
+    """
+    Pearson correlation matrix of columns, from their co-moments.
+
+    Returns:
+        pandas.DataFrame: Same as df[columns].corr()
+    """
+    index = [moments['columns'].index(col) for col in columns]
+    grid = np.ix_(index, index)
+    n, s, ss, sxy = (moments[name][grid] for name in ('n', 's', 'ss', 'sxy'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - s * s.T / n
+        var = ss - s * s / n
+        corr = np.clip(cov / np.sqrt(var * var.T), -1.0, 1.0)
+    diagonal = np.diag(var) > 0
+    corr[np.diag_indices_from(corr)] = np.where(diagonal, 1.0, np.nan)
+    return pd.DataFrame(corr, index=columns, columns=columns)
+
+
+def regression_from_moments(moments, x_column, y_column):
+    """
+    Least-squares line of y on x, from their co-moments.
+
+    Returns:
+        tuple: (slope, intercept, R²), as LinearRegression fitted on the rows
+        where both columns are present would give
+    """
+    i, j = moments['columns'].index(x_column), moments['columns'].index(y_column)
+    n = moments['n'][i, j]
+    if n < 2:
+        raise ValueError(f"Not enough rows with both {x_column} and {y_column}")
+    s_x, s_y = moments['s'][i, j], moments['s'][j, i]
+    sxx = moments['ss'][i, j] - s_x * s_x / n
+    syy = moments['ss'][j, i] - s_y * s_y / n
+    sxy = moments['sxy'][i, j] - s_x * s_y / n
+    slope = sxy / sxx if sxx > 0 else 0.0
+    mean_x = s_x / n + moments['shift'][i]
+    mean_y = s_y / n + moments['shift'][j]
+    if syy <= 0:
+        r2 = 1.0  # Constant y is fitted exactly
+    else:
+        r2 = sxy * sxy / (sxx * syy) if sxx > 0 else 0.0
+    return slope, mean_y - slope * mean_x, r2
+
+
+def describe_from_profile(df, profile):
+    """
+    Equivalent of ``df.describe(include='all')`` with numeric quantiles
+    taken from the profile's sketches instead of sorting every column, and
+    categorical unique/top/freq from its frequency sketches instead of
+    hashing every value (estimates for columns with many distinct values).
+
+    Args:
+        df: pandas.DataFrame the profile was built from
+        profile: Result of build_column_profile(df) (or build_numeric_profile)
+
+    Returns:
+        pandas.DataFrame: Descriptive statistics, one column per input column
+    """
+    numeric = {}
+    for col, stats in profile['columns'].items():
+        quantiles = stats['sketch'].quantiles(DESCRIBE_QUANTILES)
+        numeric[col] = [stats['count'], stats['mean'], stats['std'], stats['min'],
+                        *quantiles, stats['max']]
+    categorical = {}
+    for col, stats in profile.get('categorical', {}).items():
+        top = stats['top'].top(1)
+        categorical[col] = ([stats['count'], stats['distinct'], top[0][0], top[0][1]] if top
+                            else [0, 0, np.nan, np.nan])
+    parts = []
+    if numeric:
+        parts.append(pd.DataFrame(numeric, index=['count', 'mean', 'std', 'min',
+                                                  '25%', '50%', '75%', 'max']))
+    if categorical:
+        parts.append(pd.DataFrame(categorical, index=['count', 'unique', 'top', 'freq'],
+                                  dtype=object))
+    other = [col for col in df.columns
+             if col not in profile['columns'] and col not in categorical]
+    if other:
+        parts.append(df[other].describe(include='all'))
+    if not parts:
+        return df.describe(include='all')
+
+    desc = pd.concat(parts, axis=1)
+    order = ['count', 'unique', 'top', 'freq', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+    return desc.reindex(index=[row for row in order if row in desc.index],
+                        columns=[col for col in df.columns if col in desc.columns])
@@ -0,0 +1,315 @@
+"""
+Query utilities for ModelYourData.
+Vectorized filtering, group-by aggregation and top-k over a DataFrame,
+with per-column min/max zone maps so range filters can skip row chunks.
+
+A filter spec is a list of predicates combined with AND, e.g.:
+    [{"column": "Age", "op": "gt", "value": 30},
+     {"column": "Department", "op": "in", "value": ["IT", "HR"]}]
+"""
+
+import json
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+ZONE_MAP_CHUNK_ROWS = 8192
+MAX_QUERY_ROWS = 1000
+
+FILTER_OPERATORS = ('eq', 'ne', 'lt', 'le', 'gt', 'ge', 'between', 'in',
+                    'contains', 'isnull', 'notnull')
+AGGREGATES = ('count', 'sum', 'mean', 'min', 'max', 'median', 'std', 'quantile')
+
+# Operators a chunk can be skipped for when its [min, max] range cannot match
+_PRUNABLE = ('eq', 'lt', 'le', 'gt', 'ge', 'between', 'in')
+
+
+def parse_filter_spec(spec):
+    """
+    Validate a filter spec and return it in canonical form.
+
+    Args:
+        spec: List of predicate dicts, or its JSON encoding (as sent in query strings)
+
+    Returns:
+        list or None: Predicates as {'column', 'op', 'value'} dicts
+    """
+    if isinstance(spec, str):
+        spec = json.loads(spec) if spec else None
+    if not spec:
+        return None
+    if isinstance(spec, dict):
+        spec = [spec]
+
+    predicates = []
+    for predicate in spec:
+        op = predicate.get('op', 'eq')
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f"Unknown filter operator: {op}")
+        if 'column' not in predicate:
+            raise ValueError("Each filter needs a 'column'")
+        value = predicate.get('value')
+        if op in ('between', 'in') and not isinstance(value, list):
+            raise ValueError(f"Filter operator '{op}' needs a list value")
+        if op == 'between' and len(value) != 2:
+            raise ValueError("Filter operator 'between' needs [low, high]")
+        predicates.append({'column': predicate['column'], 'op': op, 'value': value})
+    return predicates
+
+
+def _coerce(series, value):
+    """Convert a filter value to the type of the column it is compared with."""
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        if isinstance(value, list):
+            return [float(v) for v in value]
+        return float(value)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if isinstance(value, list):
+            return [_timestamp(series, v) for v in value]
+        return _timestamp(series, value)
+    return value
+
+
+def _timestamp(series, value):
+    """Parse a filter value as a timestamp comparable with a datetime column (UTC if unspecified)."""
+    timestamp = pd.Timestamp(value)
+    aware = getattr(series.dtype, 'tz', None) is not None
+    if aware and timestamp.tzinfo is None:
+        return timestamp.tz_localize('UTC')
+    if not aware and timestamp.tzinfo is not None:
+        return timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp
+
+
+def _predicate_mask(df, predicate):
+    series = df[predicate['column']]
+    op = predicate['op']
+    if op == 'isnull':
+        return series.isna().to_numpy()
+    if op == 'notnull':
+        return series.notna().to_numpy()
+    if op == 'contains':
+        return series.astype(str).str.contains(
+            str(predicate['value']), case=False, regex=False, na=False).to_numpy()
+
+    value = _coerce(series, predicate['value'])
+    if op == 'eq':
+        mask = series == value
+    elif op == 'ne':
+        mask = series != value
+    elif op == 'lt':
+        mask = series < value
+    elif op == 'le':
+        mask = series <= value
+    elif op == 'gt':
+        mask = series > value
+    elif op == 'ge':
+        mask = series >= value
+    elif op == 'between':
+        mask = series.between(value[0], value[1])
+    else:
+        mask = series.isin(value)
+    return mask.fillna(False).to_numpy(dtype=bool)
+
+
+def build_zone_maps(df, chunk_rows=ZONE_MAP_CHUNK_ROWS):
+    """
+    Compute per-chunk min/max of every numeric column.
+
+    Args:
+        df: pandas.DataFrame
+        chunk_rows: Rows per chunk
+
+    Returns:
+        dict: {'chunk_rows', 'rows', 'columns': {name: (mins, maxs)}}
+    """
+    n = len(df)
+    n_chunks = -(-n // chunk_rows)
+    columns = {}
+    for col in df.select_dtypes(include=[np.number]).columns:
+        values = np.full(n_chunks * chunk_rows, np.nan)
+        values[:n] = df[col].to_numpy(dtype=float, na_value=np.nan)
+        blocks = values.reshape(n_chunks, chunk_rows)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # All-NaN chunks
+            columns[col] = (np.nanmin(blocks, axis=1), np.nanmax(blocks, axis=1))
+    return {'chunk_rows': chunk_rows, 'rows': n, 'columns': columns}
+
+
+def _candidate_chunks(predicates, zone_maps):
+    """Boolean array of chunks that may contain matching rows."""
+    n_chunks = -(-zone_maps['rows'] // zone_maps['chunk_rows'])
+    keep = np.ones(n_chunks, dtype=bool)
+    for predicate in predicates:
+        bounds = zone_maps['columns'].get(predicate['column'])
+        if bounds is None or predicate['op'] not in _PRUNABLE:
+            continue
+        mins, maxs = bounds
+        value = predicate['value']
+        values = value if isinstance(value, list) else [value]
+        try:
+            values = [float(v) for v in values]
+        except (TypeError, ValueError):
+            continue
+        op = predicate['op']
+        with np.errstate(invalid='ignore'):
+            if op == 'eq':
+                keep &= (mins <= values[0]) & (maxs >= values[0])
+            elif op == 'lt':
+                keep &= mins < values[0]
+            elif op == 'le':
+                keep &= mins <= values[0]
+            elif op == 'gt':
+                keep &= maxs > values[0]
+            elif op == 'ge':
+                keep &= maxs >= values[0]
+            elif op == 'between':
+                keep &= (maxs >= values[0]) & (mins <= values[1])
+            else:
+                any_inside = np.zeros(n_chunks, dtype=bool)
+                for v in values:
+                    any_inside |= (mins <= v) & (maxs >= v)
+                keep &= any_inside
+    return keep
+
+
+def candidate_ranges(filters, zone_maps):
+    """
+    Row ranges of the zone map chunks that may contain rows matching a
+    filter spec, for reading filtered rows chunk by chunk.
+
+    Args:
+        filters: Filter spec (see parse_filter_spec)
+        zone_maps: Result of build_zone_maps(df)
+
+    Returns:
+        list: (start, stop) row positions of the candidate chunks
+    """
+    chunk_rows, rows = zone_maps['chunk_rows'], zone_maps['rows']
+    keep = _candidate_chunks(parse_filter_spec(filters) or [], zone_maps)
+    return [(start, min(start + chunk_rows, rows)) for start in np.flatnonzero(keep) * chunk_rows]
+
+
+def apply_filters(df, filters, zone_maps=None):
+    """
+    Return the rows of a DataFrame matching a filter spec.
+
+    With zone maps (built on this same DataFrame) only the chunks whose
+    min/max ranges can satisfy the range predicates are evaluated.
+
+    Args:
+        df: pandas.DataFrame
+        filters: Filter spec (see parse_filter_spec)
+        zone_maps: Result of build_zone_maps(df) (optional)
+
+    Returns:
+        pandas.DataFrame: Matching rows
+    """
+    predicates = parse_filter_spec(filters)
+    if not predicates:
+        return df
+    for predicate in predicates:
+        if predicate['column'] not in df.columns:
+            raise ValueError(f"Unknown filter column: {predicate['column']}")
+
+    if zone_maps is not None and zone_maps['rows'] == len(df):
+        keep = _candidate_chunks(predicates, zone_maps)
+        if not keep.all():
+            chunk_rows = zone_maps['chunk_rows']
+            starts = np.flatnonzero(keep) * chunk_rows
+            positions = (starts[:, None] + np.arange(chunk_rows)).ravel()
+            df = df.iloc[positions[positions < len(df)]]
+
+    mask = np.ones(len(df), dtype=bool)
+    for predicate in predicates:
+        mask &= _predicate_mask(df, predicate)
+    return df[mask]
+
+
+def _aggregate_name(aggregate):
+    func = aggregate['func']
+    if func == 'count' and not aggregate.get('column'):
+        return 'count'
+    if func == 'quantile':
+        return f"p{round(float(aggregate.get('q', 0.5)) * 100):g}_{aggregate['column']}"
+    return f"{func}_{aggregate['column']}"
+
+
+def _aggregate(frame, aggregates, group_by):
+    """Compute named aggregates over the whole frame or per group."""
+    grouped = frame.groupby(group_by, dropna=False, sort=False, observed=True) if group_by else None
+    results = {}
+    for aggregate in aggregates:
+        func = aggregate.get('func')
+        if func not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate: {func}")
+        column = aggregate.get('column')
+        if column is None and func != 'count':
+            raise ValueError(f"Aggregate '{func}' needs a 'column'")
+        if column is not None and column not in frame.columns:
+            raise ValueError(f"Unknown column: {column}")
+
+        target = grouped if grouped is not None else frame
+        if func == 'count' and column is None:
+            value = grouped.size() if grouped is not None else len(frame)
+        elif func == 'quantile':
+            value = target[column].quantile(float(aggregate.get('q', 0.5)))
+        else:
+            value = getattr(target[column], func)()
+        results[_aggregate_name(aggregate)] = value
+
+    if grouped is None:
+        return pd.DataFrame({name: [value] for name, value in results.items()})
+    return pd.DataFrame(results).reset_index()
+
+
+def run_query(df, filters=None, group_by=None, aggregates=None, columns=None,
+              order_by=None, descending=True, top_k=None, zone_maps=None):
+    """
+    Run a filter / group-by / top-k query.
+
+    Args:
+        df: pandas.DataFrame
+        filters: Filter spec (optional)
+        group_by: Column names to group by (optional)
+        aggregates: List of {'func', 'column', 'q'} dicts (optional)
+        columns: Columns to return when not aggregating (optional)
+        order_by: Output column to order by (optional)
+        descending: Order direction
+        top_k: Number of rows to return (capped at MAX_QUERY_ROWS)
+        zone_maps: Zone maps of df, used to skip chunks (optional)
+
+    Returns:
+        dict: Output columns, rows and match counts
+    """
+    matched = apply_filters(df, filters, zone_maps)
+    group_by = [group_by] if isinstance(group_by, str) else (group_by or [])
+    for col in group_by + list(columns or []):
+        if col not in df.columns:
+            raise ValueError(f"Unknown column: {col}")
+
+    if group_by and not aggregates:
+        aggregates = [{'func': 'count'}]
+    if aggregates:
+        output = _aggregate(matched, aggregates, group_by)
+    else:
+        output = matched[list(columns)] if columns else matched
+
+    limit = min(int(top_k or MAX_QUERY_ROWS), MAX_QUERY_ROWS)
+    if order_by:
+        if order_by not in output.columns:
+            raise ValueError(f"Unknown order column: {order_by}")
+        if pd.api.types.is_numeric_dtype(output[order_by]) and limit <= output[order_by].count():
+            output = output.nlargest(limit, order_by) if descending else output.nsmallest(limit, order_by)
+        else:
+            output = output.sort_values(order_by, ascending=not descending, na_position='last')
+    output = output.head(limit)
+
+    return {
+        'columns': [str(col) for col in output.columns],
+        'rows': output.astype(object).where(output.notna(), None).values.tolist(),
+        'matched_rows': int(len(matched)),
+        'total_rows': int(len(df)),
+    }
@@ -0,0 +1,302 @@
+"""
+Streaming sketches for ModelYourData.
+Small, mergeable summaries of a column that can be built in one pass and
+combined later (e.g. when rows are appended) without rescanning the data:
+quantiles (KLL), distinct counts (HyperLogLog) and value frequencies
+(count-min, space-saving).
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch over float values.
+
+    Keeps a hierarchy of compactors: items at level ``h`` stand for
+    ``2 ** h`` original values. With ``k=200`` quantiles are within about 1%
+    rank error, using a few times ``k`` floats regardless of the row count.
+    While nothing has been compacted the sketch is exact and quantiles match
+    numpy's linear interpolation.
+    """
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        # Fixed seed so identical data always gives identical sketches
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compact(self, level):
+        if level + 1 == len(self.levels):
+            self.levels.append(np.empty(0))
+        items = np.sort(self.levels[level])
+        leftover = items[len(items) - len(items) % 2:]
+        promoted = items[self._rng.integers(2):len(items) - len(leftover):2]
+        self.levels[level] = leftover
+        self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) > self._capacity(level):
+                self._compact(level)
+                level = 0  # Adding a level shrinks the capacity of the others
+                continue
+            level += 1
+
+    def update(self, values):
+        """Add an array of values (NaN values are ignored)."""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        """Fold another sketch into this one."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantiles(self, qs):
+        """
+        Estimate several quantiles at once.
+
+        Args:
+            qs: Quantile levels between 0 and 1
+
+        Returns:
+            numpy.ndarray: Estimated values (NaN when the sketch is empty)
+        """
+        qs = np.asarray(qs, dtype=float)
+        if self.count == 0:
+            return np.full(qs.shape, np.nan)
+        if len(self.levels) == 1:
+            return np.quantile(self.levels[0], qs)
+
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items_), 2 ** level)
+                                  for level, items_ in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items = items[order]
+        cumulative = np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, qs * cumulative[-1], side='left')
+        values = items[np.clip(positions, 0, len(items) - 1)]
+        values = np.where(qs <= 0, self.min, values)
+        values = np.where(qs >= 1, self.max, values)
+        return np.clip(values, self.min, self.max)
+
+    def quantile(self, q):
+        """Estimate a single quantile."""
+        return float(self.quantiles([q])[0])
+
+
+def hash_values(values):
+    """
+    Hash values to 64 bits for the frequency and cardinality sketches.
+
+    Values are hashed by their text, so the same value always lands in the
+    same place whether it was read as a string or a number.
+
+    Args:
+        values: Array-like of values (missing values must be removed first)
+
+    Returns:
+        numpy.ndarray: uint64 hashes
+    """
+    return pd.util.hash_array(np.asarray(values, dtype=str).astype(object), categorize=False)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog cardinality sketch.
+
+    Uses ``2 ** p`` one-byte registers (16KB with ``p=14``) for a standard
+    error of about ``1.04 / sqrt(2 ** p)``, 0.8% by default. Small
+    cardinalities are estimated by linear counting, which is near exact.
+    """
+
+    def __init__(self, p=14):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def update_hashes(self, hashes):
+        """Add an array of uint64 hashes (see hash_values)."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not len(hashes):
+            return
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        rest = hashes << np.uint64(self.p)
+        # Rank = position of the first set bit of the remaining 64 - p bits
+        max_rank = 64 - self.p + 1
+        _, exponent = np.frexp(rest.astype(float))
+        rank = np.where(rest == 0, max_rank, np.clip(65 - exponent, 1, max_rank))
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def update(self, values):
+        """Add an array of values."""
+        self.update_hashes(hash_values(values))
+
+    def merge(self, other):
+        """Fold another sketch (with the same ``p``) into this one."""
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        """Return the estimated number of distinct values."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(int)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return float(m * np.log(m / zeros))
+        return float(raw)
+
+
+class CountMinSketch:
+    """
+    Count-min frequency sketch.
+
+    A ``depth`` x ``width`` table of counters, one hash function per row.
+    Estimates never undercount; they overcount by at most ``e / width`` of
+    the total count with probability ``1 - exp(-depth)``.
+    """
+
+    def __init__(self, width=4096, depth=4, seed=0):
+        if width & (width - 1):
+            raise ValueError("width must be a power of two")
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        # Fixed seed so sketches built separately can be merged
+        rng = np.random.default_rng(seed)
+        self._multipliers = rng.integers(1, 2 ** 63, size=depth, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._shift = np.uint64(64 - int(np.log2(width)))
+
+    def _buckets(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        return [((hashes * multiplier) >> self._shift).astype(np.intp)
+                for multiplier in self._multipliers]
+
+    def update_hashes(self, hashes, counts=1):
+        """
+        Add occurrences of hashed values.
+
+        Args:
+            hashes: uint64 hashes (see hash_values)
+            counts: Occurrences of each hash (default one each)
+        """
+        counts = np.broadcast_to(np.asarray(counts, dtype=np.int64), np.shape(hashes))
+        for row, buckets in enumerate(self._buckets(hashes)):
+            np.add.at(self.table[row], buckets, counts)
+        self.total += int(counts.sum())
+
+    def merge(self, other):
+        """Fold another sketch (same width, depth and seed) into this one."""
+        self.table += other.table
+        self.total += other.total
+        return self
+
+    def query(self, values):
+        """
+        Estimate the counts of values.
+
+        Returns:
+            numpy.ndarray: Estimated counts (upper bounds)
+        """
+        buckets = self._buckets(hash_values(values))
+        return np.min([self.table[row][index] for row, index in enumerate(buckets)], axis=0)
+
+
+class SpaceSaving:
+    """
+    Space-saving heavy-hitter summary.
+
+    Tracks at most ``capacity`` values with an overestimated count and a
+    bound on the overestimation. Any value occurring more than
+    ``total / capacity`` times is tracked. Summaries are merged by adding
+    counts, taking ``floor`` (the most an untracked value can have occurred)
+    for values one side does not track. While no value was ever dropped the
+    counts are exact.
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.errors = pd.Series(dtype=np.int64)
+        self.floor = 0
+        self.total = 0
+
+    @classmethod
+    def from_counts(cls, counts, capacity=256):
+        """
+        Build a summary from exact value counts, keeping the largest.
+
+        Args:
+            counts: pandas.Series of counts indexed by value
+            capacity: Values kept
+        """
+        summary = cls(capacity)
+        counts = counts.sort_values(ascending=False, kind='stable')
+        summary.counts = counts.iloc[:capacity].astype(np.int64)
+        summary.errors = pd.Series(0, index=summary.counts.index, dtype=np.int64)
+        summary.floor = int(counts.iloc[capacity]) if len(counts) > capacity else 0
+        summary.total = int(counts.sum())
+        return summary
+
+    def update_counts(self, counts):
+        """Add exact value counts (e.g. of one chunk of a column)."""
+        return self.merge(SpaceSaving.from_counts(counts, self.capacity))
+
+    def merge(self, other):
+        """Fold another summary into this one."""
+        index = self.counts.index.union(other.counts.index)
+        counts = (self.counts.reindex(index, fill_value=self.floor)
+                  + other.counts.reindex(index, fill_value=other.floor))
+        errors = (self.errors.reindex(index, fill_value=self.floor)
+                  + other.errors.reindex(index, fill_value=other.floor))
+        counts = counts.sort_values(ascending=False, kind='stable')
+        dropped = counts.iloc[self.capacity:]
+        self.counts = counts.iloc[:self.capacity]
+        self.errors = errors.reindex(self.counts.index)
+        self.floor = max(self.floor + other.floor, int(dropped.max()) if len(dropped) else 0)
+        self.total += other.total
+        return self
+
+    @property
+    def exact(self):
+        """Whether the tracked counts are exact and cover every value."""
+        return self.floor == 0
+
+    def top(self, k):
+        """
+        Return the ``k`` most frequent values.
+
+        Returns:
+            list: (value, estimated count, maximum overestimation) tuples
+        """
+        return [(value, int(count), int(self.errors[value]))
+                for value, count in self.counts.iloc[:k].items()]
+
+    def estimate(self, value):
+        """Return an upper bound on the count of a value."""
+        return int(self.counts.get(value, self.floor))
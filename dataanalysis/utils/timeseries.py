@@ -0,0 +1,193 @@
+"""
+Time-series charts for ModelYourData.
+Selects a time range by binary search over the sorted time index of a
+datetime column, optionally aggregates it by period, and downsamples long
+series with Largest-Triangle-Three-Buckets before drawing, so a chart costs
+about the same however many points the range holds.
+"""
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from .analysis import fig_to_base64, get_datetime_columns, select_numeric_columns
+from .columnar import build_time_index
+from .query import apply_filters
+
+
+# Period name -> pandas offset alias
+PERIODS = {
+    'minute': 'min',
+    'hour': 'h',
+    'day': 'D',
+    'week': 'W',
+    'month': 'MS',
+    'quarter': 'QS',
+    'year': 'YS',
+}
+AGGREGATES = ('mean', 'median', 'sum', 'min', 'max', 'count')
+DEFAULT_MAX_POINTS = 2000  # Points drawn per series
+MAX_SERIES = 6
+
+
+def time_values(series):
+    """
+    Return the timestamps of a datetime column as datetime64 values
+    (timezone-aware columns in UTC).
+    """
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        series = series.dt.tz_convert('UTC').dt.tz_localize(None)
+    return series.to_numpy()
+
+
+def _timestamp(value):
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.to_datetime64()
+
+
+def time_range(sorted_values, start=None, end=None):
+    """
+    Find the timestamps within [start, end] by binary search.
+
+    Args:
+        sorted_values: Sorted datetime64 array (see columnar.build_time_index)
+        start, end: Range bounds, anything pandas.Timestamp accepts (optional)
+
+    Returns:
+        tuple: (lo, hi) positions, the range being sorted_values[lo:hi]
+    """
+    lo = 0 if start is None else int(np.searchsorted(sorted_values, _timestamp(start), side='left'))
+    hi = len(sorted_values) if end is None else int(np.searchsorted(sorted_values, _timestamp(end), side='right'))
+    return lo, max(lo, hi)
+
+
+def lttb(x, y, n_out):
+    """
+    Downsample a line with Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept; the points in between are split
+    into n_out - 2 buckets, and each bucket keeps the point forming the
+    largest triangle with the point kept before it and the average of the
+    next bucket. Peaks and troughs survive, unlike with plain decimation.
+
+    Args:
+        x: Increasing x values
+        y: y values (no NaN)
+        n_out: Number of points to keep
+
+    Returns:
+        numpy.ndarray: Positions of the kept points
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 1 < n_out - 2:
+            cx, cy = avg_x[i + 1], avg_y[i + 1]
+        else:
+            cx, cy = x[n - 1], y[n - 1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def generate_time_series(df, time_column=None, columns=None, period=None, agg='mean',
+                         start=None, end=None, max_points=DEFAULT_MAX_POINTS, filters=None,
+                         time_index=None):
+    """
+    Generate a line chart of numeric columns over time.
+
+    Args:
+        df: pandas.DataFrame
+        time_column: Datetime column (optional, the first one by default)
+        columns: Numeric columns to draw (optional, the first three by default)
+        period: Aggregate by 'minute', 'hour', 'day', 'week', 'month',
+            'quarter' or 'year' (optional, raw points by default)
+        agg: Aggregate function used with period
+        start, end: Time range (optional, inclusive)
+        max_points: Points drawn per series, LTTB-downsampled beyond that
+        filters: Filter spec applied before the analysis (optional)
+        time_index: Sorted time index of time_column in df, see
+            columnar.build_time_index (optional)
+
+    Returns:
+        dict: Contains plot image and the range and number of points drawn
+    """
+    df = apply_filters(df, filters)
+    if filters:
+        time_index = None  # The index describes the unfiltered rows
+
+    datetime_cols = get_datetime_columns(df)
+    if len(datetime_cols) == 0:
+        raise ValueError("No datetime columns found for time series")
+    if time_column is None:
+        time_column = datetime_cols[0]
+    elif time_column not in datetime_cols:
+        raise ValueError(f"Not a datetime column: {time_column}")
+    columns = select_numeric_columns(df, columns, default_count=3, analysis='time series')[:MAX_SERIES]
+
+    if time_index is None:
+        time_index = build_time_index(time_values(df[time_column]))
+    sorted_times, order = time_index
+    lo, hi = time_range(sorted_times, start, end)
+    if lo == hi:
+        raise ValueError("No rows in the selected time range")
+
+    # Only the rows in range are gathered, already in time order
+    rows = np.asarray(order[lo:hi])
+    times = np.asarray(sorted_times[lo:hi])
+    frame = pd.DataFrame({col: df[col].iloc[rows].to_numpy(dtype=float, na_value=np.nan)
+                          for col in columns}, index=pd.DatetimeIndex(times))
+    if period is not None:
+        frame = frame.resample(PERIODS[period]).agg(agg)
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    colors = ['#2E7D32', '#42A5F5', '#FFA726', '#AB47BC', '#EF5350', '#26A69A']
+    x_all = frame.index.to_numpy()
+    plotted = {}
+    for i, col in enumerate(columns):
+        y = frame[col].to_numpy(dtype=float)
+        present = ~np.isnan(y)
+        x, y = x_all[present], y[present]
+        keep = lttb(x.view(np.int64), y, max_points)
+        plotted[str(col)] = int(len(keep))
+        ax.plot(x[keep], y[keep], color=colors[i % len(colors)], linewidth=1.2, label=col)
+
+    ax.set_xlabel(time_column, fontsize=12)
+    ax.set_ylabel(f'{agg} per {period}' if period else 'Value', fontsize=12)
+    ax.set_title('Time Series', fontsize=14, fontweight='bold')
+    ax.grid(True, alpha=0.3)
+    if len(columns) > 1:
+        ax.legend()
+    fig.autofmt_xdate()
+    fig.tight_layout()
+
+    image_base64 = fig_to_base64(fig)
+
+    return {
+        'image': image_base64,
+        'time_column': time_column,
+        'columns': columns,
+        'period': period,
+        'agg': agg if period else None,
+        'start': str(times[0]),
+        'end': str(times[-1]),
+        'rows': int(hi - lo),
+        'points': int(len(frame)),
+        'plotted_points': plotted,
+    }
@@ -1,34 +1,71 @@
 """
 Views for the DataAnalysis app.
 Handles file upload, analysis operations, and visualization rendering.
+The API endpoints are async views: their CPU-bound work runs on the
+analysis executor, so under ASGI a slow analysis does not hold up cheap
+requests.
 """
 
 import io
 import json
 import base64
+import asyncio
+from functools import wraps
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseNotAllowed,
+    StreamingHttpResponse,
+)
 from django.views.decorators.http import require_http_methods
-from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.core.files.storage import default_storage
+from django.db import transaction
 
 from .models import UploadedFile, AnalysisResult
+from .responses import ApiJsonResponse, dumps
 from .forms import CSVUploadForm
-from .utils.analysis import (
-    load_csv,
-    generate_table_preview,
-    perform_linear_regression,
-    perform_clustering,
-    generate_distribution_plot,
-    generate_statistical_summary,
-    generate_eda_report,
-    generate_correlation_matrix,
-    generate_scatter_plot,
-    generate_histogram,
-    generate_boxplot,
-    get_numeric_columns,
-    get_categorical_columns,
+from .datasets import (
+    load_dataframe,
+    load_column_schema,
+    load_filtered_columns,
+    save_upload,
+    get_table_page,
 )
+from .upload_handlers import CSVInspectingUploadHandler
+from .appending import append_rows
+from .exports import export_data
+from .executor import ExecutorBusy, executor_status, iterate_cpu_bound, run_cpu_bound
+from .results import get_analysis_result
+from .warmup import schedule_warmup
+from .utils.operations import OPERATIONS, normalize_params
+from .utils.paging import MAX_PAGE_ROWS, MAX_PAGE_COLUMNS
+from .utils.query import parse_filter_spec, run_query
+
+
+def async_require_http_methods(request_method_list):
+    """
+    Async counterpart of require_http_methods, which only wraps synchronous
+    views in this Django version.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def inner(request, *args, **kwargs):
+            if request.method not in request_method_list:
+                return HttpResponseNotAllowed(request_method_list)
+            return await func(request, *args, **kwargs)
+        return inner
+    return decorator
+
+
+async def _aget_uploaded_file(file_id):
+    """Async get_object_or_404 for an UploadedFile."""
+    try:
+        return await UploadedFile.objects.aget(id=file_id)
+    except UploadedFile.DoesNotExist:
+        raise Http404("No UploadedFile matches the given query.")
 
 
 def landing_page(request):
@@ -39,38 +76,91 @@ def landing_page(request):
     return render(request, 'dataanalysis/landing.html', {'form': form})
 
 
+@csrf_exempt
 @require_http_methods(["POST"])
 def upload_file(request):
     """
-    Handle CSV file upload via AJAX.
+    Handle CSV, Parquet and Arrow file upload via AJAX.
     Returns JSON with file_id for redirection.
+    
+    The upload is streamed through CSVInspectingUploadHandler, which has to be
+    installed before the CSRF check reads request.POST; CSRF protection is
+    applied by _upload_file instead.
     """
+    handler = CSVInspectingUploadHandler(request)
+    request.upload_handlers = [handler]
+    return _upload_file(request, handler)
+
+
+@csrf_protect
+def _upload_file(request, handler):
     form = CSVUploadForm(request.POST, request.FILES)
     
+    if handler.error:
+        # Rejected while streaming, the file never reached the form
+        return ApiJsonResponse({
+            'success': False,
+            'errors': {'csv_file': [handler.error]}
+        }, status=400)
+    
     if form.is_valid():
-        csv_file = form.cleaned_data['csv_file']
+        uploaded_file = save_upload(form.cleaned_data['csv_file'])
         
-        # Create UploadedFile instance
-        uploaded_file = UploadedFile(
-            file=csv_file,
-            original_filename=csv_file.name,
-            file_size=csv_file.size
-        )
-        uploaded_file.save()
+        # Precompute what the analysis page opens first
+        transaction.on_commit(lambda: schedule_warmup(uploaded_file))
         
-        return JsonResponse({
+        return ApiJsonResponse({
             'success': True,
             'file_id': str(uploaded_file.id),
             'redirect_url': f'/analysis/{uploaded_file.id}/'
         })
     else:
-        errors = {field: errors for field, errors in form.errors.items()}
-        return JsonResponse({
+        errors = {field: list(errors) for field, errors in form.errors.items()}
+        return ApiJsonResponse({
             'success': False,
             'errors': errors
         }, status=400)
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_append(request, file_id):
+    """
+    API endpoint appending the rows of an uploaded CSV to an existing file.
+    The CSV must have the file's columns; see appending.append_rows.
+    
+    Like upload_file, the upload handler is installed before the CSRF check
+    reads request.POST, and _append_rows applies CSRF protection.
+    """
+    handler = CSVInspectingUploadHandler(request)
+    request.upload_handlers = [handler]
+    return _append_rows(request, handler, file_id)
+
+
+@csrf_protect
+def _append_rows(request, handler, file_id):
+    uploaded_file = get_object_or_404(UploadedFile, id=file_id)
+    form = CSVUploadForm(request.POST, request.FILES)
+    
+    if handler.error:
+        return ApiJsonResponse({'success': False, 'error': handler.error}, status=400)
+    if not form.is_valid():
+        return ApiJsonResponse({
+            'success': False,
+            'errors': {field: list(errors) for field, errors in form.errors.items()}
+        }, status=400)
+    
+    try:
+        result = append_rows(uploaded_file, form.cleaned_data['csv_file'])
+    except Exception as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    # Precompute the default analyses of the new content
+    transaction.on_commit(lambda: schedule_warmup(uploaded_file))
+    
+    return ApiJsonResponse({'success': True, 'data': result})
+
+
 def analysis_page(request, file_id):
     """
     Render the analysis page for a specific uploaded file.
@@ -79,10 +169,11 @@ def analysis_page(request, file_id):
     
     # Load the CSV and get column information
     try:
-        df = load_csv(uploaded_file.file.path)
-        numeric_columns = get_numeric_columns(df)
-        categorical_columns = get_categorical_columns(df)
-        all_columns = df.columns.tolist()
+        schema = load_column_schema(uploaded_file)
+        numeric_columns = schema['numeric_columns']
+        categorical_columns = schema['categorical_columns']
+        datetime_columns = schema.get('datetime_columns', [])  # Schemas cached before dates were detected
+        all_columns = schema['all_columns']
     except Exception as e:
         return render(request, 'dataanalysis/error.html', {'error': str(e)})
     
@@ -90,242 +181,459 @@ def analysis_page(request, file_id):
         'file': uploaded_file,
         'numeric_columns': numeric_columns,
         'categorical_columns': categorical_columns,
+        'datetime_columns': datetime_columns,
         'all_columns': all_columns,
+        'warmup_operations': json.dumps(list(settings.WARMUP_OPERATIONS)),
     }
     
     return render(request, 'dataanalysis/analysis.html', context)
 
 
-@require_http_methods(["GET"])
-def api_table_preview(request, file_id):
+@async_require_http_methods(["GET"])
+async def api_table_rows(request, file_id):
+    """
+    API endpoint for paging through the rows of a file (virtual scrolling).
+    Accepts offset/limit, col_offset/col_limit, sort_by/descending and either
+    a JSON filter spec in 'filters' or a simple
+    filter_column/filter_op/filter_value filter.
+    """
+    uploaded_file = await _aget_uploaded_file(file_id)
+    
+    try:
+        params = request.GET
+        filters = parse_filter_spec(params.get('filters'))
+        if filters is None and params.get('filter_column'):
+            filters = parse_filter_spec({
+                'column': params['filter_column'],
+                'op': params.get('filter_op', 'eq'),
+                'value': params.get('filter_value', ''),
+            })
+        
+        result = await run_cpu_bound(
+            get_table_page,
+            uploaded_file,
+            offset=max(int(params.get('offset', 0)), 0),
+            limit=min(max(int(params.get('limit', 50)), 1), MAX_PAGE_ROWS),
+            col_offset=max(int(params.get('col_offset', 0)), 0),
+            col_limit=min(max(int(params.get('col_limit', 20)), 1), MAX_PAGE_COLUMNS),
+            sort_by=params.get('sort_by') or None,
+            descending=params.get('descending', '').lower() in ('1', 'true', 'yes'),
+            filters=filters,
+        )
+        return ApiJsonResponse({'success': True, 'data': result})
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
+    except Exception as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@async_require_http_methods(["POST"])
+async def api_query(request, file_id):
+    """
+    API endpoint for filter / group-by / top-k queries over a file.
+
+    Expects a JSON body such as:
+        {"filters": [{"column": "Age", "op": "ge", "value": 30}],
+         "group_by": ["Department"],
+         "aggregates": [{"func": "count"}, {"func": "mean", "column": "Salary"},
+                        {"func": "quantile", "column": "Salary", "q": 0.9}],
+         "order_by": "mean_Salary", "descending": true, "top_k": 10}
+    Without aggregates the matching rows (optionally restricted to
+    'columns') are returned.
+    """
+    uploaded_file = await _aget_uploaded_file(file_id)
+    
+    try:
+        data = json.loads(request.body) if request.body else {}
+        result = await run_cpu_bound(_run_query, uploaded_file, data)
+        return ApiJsonResponse({'success': True, 'data': result})
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
+    except Exception as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+def _run_query(uploaded_file, data):
+    """Load the matching rows of the columns a query reads and run it on them (see api_query)."""
+    group_by = data.get('group_by')
+    group_by = [group_by] if isinstance(group_by, str) else list(group_by or [])
+    aggregates = data.get('aggregates')
+    if group_by or aggregates:
+        columns = group_by + [aggregate['column'] for aggregate in aggregates or []
+                              if isinstance(aggregate, dict) and aggregate.get('column')]
+    else:
+        columns = data.get('columns')
+    
+    matched = load_filtered_columns(
+        uploaded_file,
+        list(dict.fromkeys(columns)) if columns is not None else None,
+        parse_filter_spec(data.get('filters')),
+    )
+    result = run_query(
+        matched,
+        group_by=group_by,
+        aggregates=aggregates,
+        columns=data.get('columns'),
+        order_by=data.get('order_by'),
+        descending=bool(data.get('descending', True)),
+        top_k=data.get('top_k'),
+    )
+    result['total_rows'] = load_column_schema(uploaded_file)['rows']
+    return result
+
+
+def _request_params(request):
+    """Get operation parameters from the JSON body (POST) or query string (GET)."""
+    if request.method == 'POST':
+        return json.loads(request.body) if request.body else {}
+    return request.GET
+
+
+@async_require_http_methods(["GET"])
+async def api_table_preview(request, file_id):
     """
     API endpoint to get table preview.
     """
-    uploaded_file = get_object_or_404(UploadedFile, id=file_id)
+    uploaded_file = await _aget_uploaded_file(file_id)
     
     try:
-        df = load_csv(uploaded_file.file.path)
-        max_rows = int(request.GET.get('max_rows', 20))
-        result = generate_table_preview(df, max_rows)
-        return JsonResponse({'success': True, 'data': result})
+        result = await run_cpu_bound(get_analysis_result, uploaded_file, 'table', request.GET)
+        return ApiJsonResponse({'success': True, 'data': result})
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
     except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
-@require_http_methods(["GET", "POST"])
-def api_linear_regression(request, file_id):
+@async_require_http_methods(["GET", "POST"])
+async def api_linear_regression(request, file_id):
     """
     API endpoint for linear regression analysis.
     """
-    uploaded_file = get_object_or_404(UploadedFile, id=file_id)
+    uploaded_file = await _aget_uploaded_file(file_id)
     
     try:
-        df = load_csv(uploaded_file.file.path)
-        
-        # Get parameters
-        if request.method == 'POST':
-            data = json.loads(request.body) if request.body else {}
-        else:
-            data = request.GET
-        
-        x_column = data.get('x_column')
-        y_column = data.get('y_column')
-        
-        result = perform_linear_regression(df, x_column, y_column)
-        return JsonResponse({'success': True, 'data': result})
+        result = await run_cpu_bound(get_analysis_result, uploaded_file, 'linear_regression', _request_params(request))
+        return ApiJsonResponse({'success': True, 'data': result})
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
     except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
-@require_http_methods(["GET", "POST"])
-def api_clustering(request, file_id):
+@async_require_http_methods(["GET", "POST"])
+async def api_clustering(request, file_id):
     """
     API endpoint for clustering analysis.
     """
-    uploaded_file = get_object_or_404(UploadedFile, id=file_id)
+    uploaded_file = await _aget_uploaded_file(file_id)
     
     try:
-        df = load_csv(uploaded_file.file.path)
-        
-        # Get parameters
-        if request.method == 'POST':
-            data = json.loads(request.body) if request.body else {}
-        else:
-            data = request.GET
-        
-        n_clusters = int(data.get('n_clusters', 3))
-        columns = data.get('columns')
-        if isinstance(columns, str):
-            columns = columns.split(',') if columns else None
-        
-        result = perform_clustering(df, n_clusters, columns)
-        return JsonResponse({'success': True, 'data': result})
+        result = await run_cpu_bound(get_analysis_result, uploaded_file, 'clustering', _request_params(request))
+        return ApiJsonResponse({'success': True, 'data': result})
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
     except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
-@require_http_methods(["GET", "POST"])
-def api_distribution(request, file_id):
+@async_require_http_methods(["GET", "POST"])
+async def api_distribution(request, file_id):
     """
     API endpoint for distribution plot.
     """
-    uploaded_file = get_object_or_404(UploadedFile, id=file_id)
+    uploaded_file = await _aget_uploaded_file(file_id)
     
     try:
-        df = load_csv(uploaded_file.file.path)
-        
-        # Get parameters
-        if request.method == 'POST':
-            data = json.loads(request.body) if request.body else {}
-        else:
-            data = request.GET
-        
-        column = data.get('column')
-        
-        result = generate_distribution_plot(df, column)
-        return JsonResponse({'success': True, 'data': result})
+        result = await run_cpu_bound(get_analysis_result, uploaded_file, 'distribution', _request_params(request))
+        return ApiJsonResponse({'success': True, 'data': result})
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
     except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
-@require_http_methods(["GET"])
-def api_statistics(request, file_id):
+@async_require_http_methods(["GET"])
+async def api_statistics(request, file_id):
     """
     API endpoint for statistical summary.
     """
-    uploaded_file = get_object_or_404(UploadedFile, id=file_id)
+    uploaded_file = await _aget_uploaded_file(file_id)
     
     try:
-        df = load_csv(uploaded_file.file.path)
-        result = generate_statistical_summary(df)
-        return JsonResponse({'success': True, 'data': result})
+        result = await run_cpu_bound(get_analysis_result, uploaded_file, 'statistics', request.GET)
+        return ApiJsonResponse({'success': True, 'data': result})
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
     except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
-@require_http_methods(["GET"])
-def api_eda_report(request, file_id):
+@async_require_http_methods(["GET"])
+async def api_eda_report(request, file_id):
     """
     API endpoint for full EDA report.
     """
-    uploaded_file = get_object_or_404(UploadedFile, id=file_id)
+    uploaded_file = await _aget_uploaded_file(file_id)
     
     try:
-        df = load_csv(uploaded_file.file.path)
-        result = generate_eda_report(df)
-        return JsonResponse({'success': True, 'data': result})
+        result = await run_cpu_bound(get_analysis_result, uploaded_file, 'eda', request.GET)
+        return ApiJsonResponse({'success': True, 'data': result})
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
     except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
-@require_http_methods(["GET"])
-def api_correlation(request, file_id):
+@async_require_http_methods(["GET"])
+async def api_correlation(request, file_id):
     """
     API endpoint for correlation matrix.
     """
-    uploaded_file = get_object_or_404(UploadedFile, id=file_id)
+    uploaded_file = await _aget_uploaded_file(file_id)
     
     try:
-        df = load_csv(uploaded_file.file.path)
-        result = generate_correlation_matrix(df)
-        return JsonResponse({'success': True, 'data': result})
+        result = await run_cpu_bound(get_analysis_result, uploaded_file, 'correlation', request.GET)
+        return ApiJsonResponse({'success': True, 'data': result})
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
     except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
-@require_http_methods(["GET", "POST"])
-def api_scatter(request, file_id):
+@async_require_http_methods(["GET", "POST"])
+async def api_scatter(request, file_id):
     """
     API endpoint for scatter plot.
     """
-    uploaded_file = get_object_or_404(UploadedFile, id=file_id)
+    uploaded_file = await _aget_uploaded_file(file_id)
     
     try:
-        df = load_csv(uploaded_file.file.path)
-        
-        # Get parameters
-        if request.method == 'POST':
-            data = json.loads(request.body) if request.body else {}
-        else:
-            data = request.GET
-        
-        x_column = data.get('x_column')
-        y_column = data.get('y_column')
-        
-        result = generate_scatter_plot(df, x_column, y_column)
-        return JsonResponse({'success': True, 'data': result})
+        result = await run_cpu_bound(get_analysis_result, uploaded_file, 'scatter', _request_params(request))
+        return ApiJsonResponse({'success': True, 'data': result})
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
     except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
-@require_http_methods(["GET", "POST"])
-def api_histogram(request, file_id):
+@async_require_http_methods(["GET", "POST"])
+async def api_histogram(request, file_id):
     """
     API endpoint for histogram.
     """
-    uploaded_file = get_object_or_404(UploadedFile, id=file_id)
+    uploaded_file = await _aget_uploaded_file(file_id)
     
     try:
-        df = load_csv(uploaded_file.file.path)
-        
-        # Get parameters
-        if request.method == 'POST':
-            data = json.loads(request.body) if request.body else {}
-        else:
-            data = request.GET
-        
-        column = data.get('column')
-        bins = int(data.get('bins', 30))
-        
-        result = generate_histogram(df, column, bins)
-        return JsonResponse({'success': True, 'data': result})
+        result = await run_cpu_bound(get_analysis_result, uploaded_file, 'histogram', _request_params(request))
+        return ApiJsonResponse({'success': True, 'data': result})
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
     except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
-@require_http_methods(["GET", "POST"])
-def api_boxplot(request, file_id):
+@async_require_http_methods(["GET", "POST"])
+async def api_boxplot(request, file_id):
     """
     API endpoint for box plot.
     """
-    uploaded_file = get_object_or_404(UploadedFile, id=file_id)
+    uploaded_file = await _aget_uploaded_file(file_id)
     
     try:
-        df = load_csv(uploaded_file.file.path)
-        
-        # Get parameters
-        if request.method == 'POST':
-            data = json.loads(request.body) if request.body else {}
-        else:
-            data = request.GET
-        
-        columns = data.get('columns')
-        if isinstance(columns, str):
-            columns = columns.split(',') if columns else None
+        result = await run_cpu_bound(get_analysis_result, uploaded_file, 'boxplot', _request_params(request))
+        return ApiJsonResponse({'success': True, 'data': result})
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
+    except Exception as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@async_require_http_methods(["GET", "POST"])
+async def api_categorical(request, file_id):
+    """
+    API endpoint for categorical analysis (top values and frequency estimates).
+    """
+    uploaded_file = await _aget_uploaded_file(file_id)
+    
+    try:
+        result = await run_cpu_bound(get_analysis_result, uploaded_file, 'categorical', _request_params(request))
+        return ApiJsonResponse({'success': True, 'data': result})
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
+    except Exception as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@async_require_http_methods(["GET", "POST"])
+async def api_timeseries(request, file_id):
+    """
+    API endpoint for time-series charts (resampled by period, downsampled
+    for drawing).
+    """
+    uploaded_file = await _aget_uploaded_file(file_id)
+    
+    try:
+        result = await run_cpu_bound(get_analysis_result, uploaded_file, 'timeseries', _request_params(request))
+        return ApiJsonResponse({'success': True, 'data': result})
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
+    except Exception as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@async_require_http_methods(["GET", "POST"])
+async def api_outliers(request, file_id):
+    """
+    API endpoint for outlier detection.
+    The flagged rows are exported through api_export (outliers_only).
+    """
+    uploaded_file = await _aget_uploaded_file(file_id)
+    
+    try:
+        params = _request_params(request)
+        result = await run_cpu_bound(get_analysis_result, uploaded_file, 'outliers', params)
+        return ApiJsonResponse({'success': True, 'data': result})
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
+    except Exception as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@async_require_http_methods(["GET"])
+async def api_export(request, file_id):
+    """
+    API endpoint streaming the rows of a file as CSV or Parquet, optionally
+    filtered, labeled with their cluster (labels=cluster) and/or outlier
+    flags (labels=outlier), and narrowed to one cluster (cluster=k) or to
+    the outliers (outliers_only=true). Labels come from the models of the
+    clustering and outlier analyses; their parameters are those of
+    api_clustering and api_outliers, the column lists passed as
+    cluster_columns and outlier_columns. Every chunk is filtered, labeled
+    and encoded on the analysis executor.
+    """
+    uploaded_file = await _aget_uploaded_file(file_id)
+    
+    try:
+        chunks, content_type, filename = await run_cpu_bound(export_data, uploaded_file, request.GET)
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
+    except Exception as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    response = StreamingHttpResponse(iterate_cpu_bound(chunks), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@async_require_http_methods(["POST"])
+async def api_batch(request, file_id):
+    """
+    API endpoint running several operations on one file in a single request.
+    The CSV is loaded and profiled once; results are streamed back as
+    NDJSON, one line per operation, flushed as each one completes. Each
+    operation runs on the analysis executor, at most BATCH_MAX_WORKERS of
+    a batch at once when parallel.
+
+    Expects a JSON body such as:
+        {"operations": [{"operation": "histogram", "params": {"bins": 20}}, ...],
+         "parallel": true}
+    """
+    uploaded_file = await _aget_uploaded_file(file_id)
+    
+    try:
+        data = json.loads(request.body) if request.body else {}
+        operations = data.get('operations') or []
+        if not isinstance(operations, list) or not operations:
+            raise ValueError("'operations' must be a non-empty list")
+        if len(operations) > settings.BATCH_MAX_OPERATIONS:
+            raise ValueError(f"At most {settings.BATCH_MAX_OPERATIONS} operations per batch")
+        for item in operations:
+            if item.get('operation') not in OPERATIONS:
+                raise ValueError(f"Unknown operation: {item.get('operation')}")
         
-        result = generate_boxplot(df, columns)
-        return JsonResponse({'success': True, 'data': result})
+        df, profile = await run_cpu_bound(_load_batch, uploaded_file)
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
     except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    parallel = bool(data.get('parallel', False)) and len(operations) > 1
+    
+    async def run(index, item, limit):
+        part = {'type': 'result', 'index': index, 'operation': item['operation']}
+        try:
+            async with limit:
+                part['data'] = await run_cpu_bound(get_analysis_result, uploaded_file,
+                                                   item['operation'], item.get('params'), df=df)
+            part['success'] = True
+        except Exception as e:
+            part['success'] = False
+            part['error'] = str(e)
+        return part
+    
+    def encode(part):
+        return dumps(part) + b'\n'
+    
+    async def stream():
+        yield encode({'type': 'profile', 'success': True, 'data': profile})
+        limit = asyncio.Semaphore(settings.BATCH_MAX_WORKERS if parallel else 1)
+        if not parallel:
+            for index, item in enumerate(operations):
+                yield encode(await run(index, item, limit))
+            return
+        
+        tasks = [asyncio.ensure_future(run(index, item, limit)) for index, item in enumerate(operations)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield encode(await task)
+        finally:
+            # Client went away or all parts were sent
+            for task in tasks:
+                task.cancel()
+    
+    response = StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 
+def _load_batch(uploaded_file):
+    """Load the DataFrame and column profile shared by the operations of a batch."""
+    df = load_dataframe(uploaded_file)
+    return df, load_column_schema(uploaded_file, df)
 
-@require_http_methods(["GET"])
-def api_get_columns(request, file_id):
+
+@async_require_http_methods(["GET"])
+async def api_get_columns(request, file_id):
     """
     API endpoint to get column information for a file.
     """
-    uploaded_file = get_object_or_404(UploadedFile, id=file_id)
+    uploaded_file = await _aget_uploaded_file(file_id)
     
     try:
-        df = load_csv(uploaded_file.file.path)
+        schema = await run_cpu_bound(load_column_schema, uploaded_file)
         result = {
-            'numeric_columns': get_numeric_columns(df),
-            'categorical_columns': get_categorical_columns(df),
-            'all_columns': df.columns.tolist()
+            'numeric_columns': schema['numeric_columns'],
+            'categorical_columns': schema['categorical_columns'],
+            'datetime_columns': schema.get('datetime_columns', []),
+            'all_columns': schema['all_columns']
         }
-        return JsonResponse({'success': True, 'data': result})
+        if 'column_stats' in schema:
+            result['column_stats'] = schema['column_stats']  # Parquet and Arrow files
+        return ApiJsonResponse({'success': True, 'data': result})
+    except ExecutorBusy as e:
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=503)
     except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@async_require_http_methods(["GET"])
+async def api_status(request):
+    """
+    API endpoint reporting the load of the analysis executor.
+    Answered on the event loop, so it stays cheap to poll while jobs run.
+    """
+    return ApiJsonResponse({'success': True, 'data': executor_status()})
 
 
 @require_http_methods(["GET", "POST"])
@@ -364,6 +672,6 @@ def download_visualization(request, file_id):
             return response
             
         except Exception as e:
-            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+            return ApiJsonResponse({'success': False, 'error': str(e)}, status=400)
     
-    return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
+    return ApiJsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
@@ -0,0 +1,91 @@
+"""
+Post-upload warm-up for the DataAnalysis app.
+Computes the default analyses a user opens first right after an upload,
+in the background, so they are result cache hits by the time they are
+requested. Warm-up is best effort: it is skipped when the server is busy.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+from .datasets import load_dataframe
+from .results import get_analysis_result
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = 0
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.WARMUP_MAX_WORKERS,
+                                       thread_name_prefix='warmup')
+    return _executor
+
+
+def server_is_busy():
+    """
+    Whether warm-up should be skipped: too many warm-ups already queued in
+    this process, or a system load average above the configured share of
+    the CPUs.
+    """
+    if _pending >= settings.WARMUP_MAX_PENDING:
+        return True
+    try:
+        load = os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return False  # Load average not available on this platform
+    return load > settings.WARMUP_MAX_LOAD
+
+
+def _warm_up(uploaded_file):
+    global _pending
+    try:
+        df = load_dataframe(uploaded_file)
+        for operation in settings.WARMUP_OPERATIONS:
+            try:
+                get_analysis_result(uploaded_file, operation, df=df)
+            except Exception:
+                logger.info("Warm-up of %s failed for %s", operation, uploaded_file.id, exc_info=True)
+    except Exception:
+        logger.warning("Warm-up failed for %s", uploaded_file.id, exc_info=True)
+    finally:
+        connections.close_all()
+        with _lock:
+            _pending -= 1
+
+
+def schedule_warmup(uploaded_file):
+    """
+    Queue the default analyses of a freshly uploaded file for background
+    computation into the result cache.
+
+    Args:
+        uploaded_file: UploadedFile instance
+
+    Returns:
+        bool: Whether warm-up was scheduled
+    """
+    global _pending
+    if not settings.WARMUP_ENABLED or not uploaded_file.content_hash:
+        return False
+    with _lock:
+        if server_is_busy():
+            return False
+        _pending += 1
+    try:
+        _get_executor().submit(_warm_up, uploaded_file)
+    except RuntimeError:  # Interpreter shutting down
+        with _lock:
+            _pending -= 1
+        return False
+    return True
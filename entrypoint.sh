@@ -27,11 +27,20 @@ echo "   Starting Gunicorn Server              "
 echo "   Access at: http://0.0.0.0:80          "
 echo "========================================="
 
-# Start Gunicorn
-exec gunicorn modelyourdata.wsgi:application \
+# Start Gunicorn: threaded WSGI workers by default, or uvicorn (ASGI)
+# workers with SERVER_INTERFACE=asgi
+if [ "${SERVER_INTERFACE:-wsgi}" = "asgi" ]; then
+    APPLICATION=modelyourdata.asgi:application
+    WORKER_OPTIONS="--worker-class uvicorn_worker.UvicornWorker"
+else
+    APPLICATION=modelyourdata.wsgi:application
+    WORKER_OPTIONS="--threads ${GUNICORN_THREADS:-4}"
+fi
+
+exec gunicorn $APPLICATION \
     --bind 0.0.0.0:80 \
     --workers ${GUNICORN_WORKERS:-2} \
-    --threads ${GUNICORN_THREADS:-4} \
+    $WORKER_OPTIONS \
     --timeout ${GUNICORN_TIMEOUT:-120} \
     --access-logfile - \
     --error-logfile - \
@@ -30,13 +30,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # For serving static files
+    'dataanalysis.middleware.AsyncWhiteNoiseMiddleware',  # For serving static files
+    'dataanalysis.middleware.CompressionMiddleware',  # gzip/brotli for API responses
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'dataanalysis.middleware.WorkerRecycleMiddleware',
 ]
 
 ROOT_URLCONF = 'modelyourdata.urls'
@@ -110,6 +112,75 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
 
+# Batch analysis endpoint limits
+BATCH_MAX_OPERATIONS = 20
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 4))
+
+# Shared result cache, on the media volume so every worker and container
+# mounting it sees the same entries. Set REDIS_URL to share through Redis.
+RESULT_CACHE_ALIAS = 'results'
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    RESULT_CACHE_ALIAS: {
+        'BACKEND': 'dataanalysis.cache.DiskCache',
+        'LOCATION': MEDIA_ROOT / 'cache' / 'shared',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_SIZE': int(os.environ.get('RESULT_CACHE_MAX_SIZE', 512 * 1024 * 1024)),
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+if os.environ.get('REDIS_URL'):
+    CACHES[RESULT_CACHE_ALIAS] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+        'TIMEOUT': None,
+    }
+
+# Longest wait for an identical computation running elsewhere before
+# computing it anyway (seconds)
+SINGLE_FLIGHT_TIMEOUT = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# Background warm-up of the default analyses after an upload. Skipped while
+# WARMUP_MAX_PENDING warm-ups are queued in a worker or the 1-minute load
+# average per CPU exceeds WARMUP_MAX_LOAD.
+WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', 'True').lower() in ('true', '1', 'yes')
+WARMUP_OPERATIONS = ('table', 'statistics', 'correlation', 'distribution')
+WARMUP_MAX_WORKERS = int(os.environ.get('WARMUP_MAX_WORKERS', 1))
+WARMUP_MAX_PENDING = int(os.environ.get('WARMUP_MAX_PENDING', 4))
+WARMUP_MAX_LOAD = float(os.environ.get('WARMUP_MAX_LOAD', 0.75))
+
+# Memory admission control: estimated peak memory of the analyses running
+# at once in a worker, and the wait for room before a request is rejected
+ANALYSIS_MEMORY_BUDGET = int(os.environ.get('ANALYSIS_MEMORY_BUDGET', 1024 * 1024 * 1024))
+ADMISSION_QUEUE_TIMEOUT = int(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 30))
+
+# Batch reports (manage.py generate_reports): default analyses, worker
+# processes, and the resident size and run time of each file's report
+# before its worker is killed
+REPORT_OPERATIONS = ('eda', 'correlation', 'distribution', 'outliers')
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))
+REPORT_MEMORY_LIMIT = int(os.environ.get('REPORT_MEMORY_LIMIT', 2048 * 1024 * 1024))
+REPORT_TIMEOUT = int(os.environ.get('REPORT_TIMEOUT', 600))
+
+# Resident size above which a gunicorn worker is gracefully recycled (0 disables)
+WORKER_MAX_RSS = int(os.environ.get('WORKER_MAX_RSS', 1536 * 1024 * 1024))
+
+# Executor running the CPU-bound part of the async API views: worker threads,
+# and how many more jobs may wait before requests are turned away
+ANALYSIS_EXECUTOR_WORKERS = int(os.environ.get('ANALYSIS_EXECUTOR_WORKERS', 4))
+ANALYSIS_EXECUTOR_QUEUE = int(os.environ.get('ANALYSIS_EXECUTOR_QUEUE', 16))
+
+# CSV parse engine: 'auto' (pyarrow's multithreaded reader for large files
+# when installed, pandas otherwise), 'pandas' or 'pyarrow'
+CSV_PARSE_ENGINE = os.environ.get('CSV_PARSE_ENGINE', 'auto')
+
+# Responses smaller than this are sent uncompressed (bytes)
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.environ.get('RESPONSE_COMPRESSION_MIN_SIZE', 1024))
+
 # Session settings for temporary file storage
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 SESSION_COOKIE_AGE = 86400  # 24 hours
@@ -20,7 +20,7 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Get file ID and column data
     const fileId = document.getElementById('file-id').value;
-    const { numericColumns, categoricalColumns, allColumns } = window.fileData;
+    const { numericColumns, categoricalColumns, datetimeColumns = [], allColumns, warmupOperations = [] } = window.fileData;
     
     // Current state
     let currentOperation = 'table';
@@ -39,6 +39,9 @@ document.addEventListener('DOMContentLoaded', function() {
         scatter: `/api/scatter/${fileId}/`,
         histogram: `/api/histogram/${fileId}/`,
         boxplot: `/api/boxplot/${fileId}/`,
+        categorical: `/api/categorical/${fileId}/`,
+        outliers: `/api/outliers/${fileId}/`,
+        timeseries: `/api/timeseries/${fileId}/`,
     };
     
     // Operation titles and icons
@@ -53,6 +56,9 @@ document.addEventListener('DOMContentLoaded', function() {
         scatter: { title: 'Scatter Plot', icon: 'fa-braille' },
         histogram: { title: 'Histogram', icon: 'fa-chart-bar' },
         boxplot: { title: 'Box Plot', icon: 'fa-box' },
+        categorical: { title: 'Categorical Values', icon: 'fa-list-ol' },
+        outliers: { title: 'Outlier Detection', icon: 'fa-exclamation-triangle' },
+        timeseries: { title: 'Time Series', icon: 'fa-clock' },
     };
     
     // Parameter configurations for each operation
@@ -63,6 +69,7 @@ document.addEventListener('DOMContentLoaded', function() {
         ],
         clustering: [
             { name: 'n_clusters', label: 'Number of Clusters', type: 'number', min: 2, max: 10, default: 3 },
+            { name: 'reduce', label: 'Dimensionality Reduction', type: 'select', options: ['auto', 'pca', 'none'] },
         ],
         distribution: [
             { name: 'column', label: 'Column', type: 'select', options: numericColumns, allowEmpty: true },
@@ -75,9 +82,35 @@ document.addEventListener('DOMContentLoaded', function() {
             { name: 'column', label: 'Column', type: 'select', options: numericColumns },
             { name: 'bins', label: 'Number of Bins', type: 'number', min: 5, max: 100, default: 30 },
         ],
+        correlation: [
+            { name: 'order', label: 'Column Order', type: 'select', options: ['original', 'cluster'] },
+        ],
+        categorical: [
+            { name: 'column', label: 'Column', type: 'select', options: categoricalColumns },
+            { name: 'top_k', label: 'Top Values', type: 'number', min: 5, max: 50, default: 20 },
+        ],
+        outliers: [
+            { name: 'method', label: 'Method', type: 'select', options: ['iqr', 'zscore', 'mad', 'isolation_forest'] },
+        ],
+        timeseries: [
+            { name: 'time_column', label: 'Time Column', type: 'select', options: datetimeColumns },
+            { name: 'columns', label: 'Value Column', type: 'select', options: numericColumns, allowEmpty: true, emptyLabel: 'First three columns' },
+            { name: 'period', label: 'Aggregate By', type: 'select', options: ['minute', 'hour', 'day', 'week', 'month', 'quarter', 'year'], allowEmpty: true, emptyLabel: 'Raw points' },
+            { name: 'agg', label: 'Aggregate', type: 'select', options: ['mean', 'median', 'sum', 'min', 'max', 'count'] },
+            { name: 'start', label: 'From', type: 'text', placeholder: 'e.g. 2024-01-01' },
+            { name: 'end', label: 'To', type: 'text', placeholder: 'e.g. 2024-12-31' },
+        ],
     };
     
+    // The analyses warmed up after upload (settings.WARMUP_OPERATIONS) are
+    // fetched together in one batch request on page load, with their
+    // default parameters; the others load when opened. Maps operation ->
+    // promise of its response (null if the batch failed, so the operation
+    // is fetched on its own).
+    const prefetched = {};
+    
     // Initialize - load table preview
+    prefetchDashboard();
     loadOperation('table');
     
     // Operation button click handlers
@@ -152,7 +185,7 @@ document.addEventListener('DOMContentLoaded', function() {
             if (param.type === 'select') {
                 html += `<select class="form-select" name="${param.name}">`;
                 if (param.allowEmpty) {
-                    html += `<option value="">All columns</option>`;
+                    html += `<option value="">${param.emptyLabel || 'All columns'}</option>`;
                 }
                 param.options.forEach((opt, idx) => {
                     const selected = idx === 0 && !param.allowEmpty ? 'selected' : '';
@@ -162,6 +195,8 @@ document.addEventListener('DOMContentLoaded', function() {
             } else if (param.type === 'number') {
                 html += `<input type="number" class="form-input" name="${param.name}" 
                          min="${param.min}" max="${param.max}" value="${param.default || param.min}">`;
+            } else if (param.type === 'text') {
+                html += `<input type="text" class="form-input" name="${param.name}" placeholder="${param.placeholder || ''}">`;
             }
             
             html += `</div>`;
@@ -200,7 +235,13 @@ document.addEventListener('DOMContentLoaded', function() {
                 url += '?' + queryParams;
             }
             
-            const response = await Utils.fetchAPI(url);
+            let response = null;
+            if (prefetched[operation] && isDefault(operation, params)) {
+                response = await prefetched[operation];
+            }
+            if (!response) {
+                response = await Utils.fetchAPI(url);
+            }
             
             if (response.success) {
                 displayResult(operation, response.data);
@@ -213,6 +254,47 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    /**
+     * Fetch the dashboard operations in a single batch request
+     */
+    function prefetchDashboard() {
+        const operations = warmupOperations.filter(operation => endpoints[operation]);
+        if (!operations.length) return;
+        
+        const resolvers = {};
+        operations.forEach(operation => {
+            prefetched[operation] = new Promise(resolve => { resolvers[operation] = resolve; });
+        });
+        
+        Utils.fetchBatch(`/api/batch/${fileId}/`, operations.map(operation => ({ operation })), part => {
+            if (part.type === 'result' && resolvers[part.operation]) {
+                resolvers[part.operation](part);
+            }
+        }).catch(() => {
+            // Fall back to one request per operation
+            operations.forEach(operation => delete prefetched[operation]);
+        }).finally(() => {
+            operations.forEach(operation => resolvers[operation](null));
+        });
+    }
+    
+    /**
+     * Whether parameters are those the parameters panel starts with, which
+     * the server's defaults give the same result as
+     */
+    function isDefault(operation, params) {
+        const defaults = {};
+        (paramConfigs[operation] || []).forEach(param => {
+            if (param.type === 'select' && !param.allowEmpty && param.options.length) {
+                defaults[param.name] = String(param.options[0]);
+            } else if (param.type === 'number') {
+                defaults[param.name] = String(param.default || param.min);
+            }
+        });
+        const names = new Set([...Object.keys(defaults), ...Object.keys(params)]);
+        return [...names].every(name => String(params[name] ?? '') === (defaults[name] ?? ''));
+    }
+    
     /**
      * Display the result based on operation type
      */
@@ -396,11 +478,33 @@ document.addEventListener('DOMContentLoaded', function() {
             `;
             currentImageData = data.image;
             
+            if (data.top_pairs && data.top_pairs.length > 0) {
+                displayTopPairs(data.top_pairs);
+            }
+            
             // Show additional info if available
             showResultInfo(data);
         }
     }
     
+    /**
+     * Display the strongest correlated pairs below the heatmap
+     */
+    function displayTopPairs(pairs) {
+        let rows = '';
+        pairs.forEach(pair => {
+            rows += `<tr><td>${Utils.escapeHtml(pair.x)}</td><td>${Utils.escapeHtml(pair.y)}</td><td>${pair.correlation}</td></tr>`;
+        });
+        vizResult.innerHTML += `
+            <div class="table-wrapper">
+                <table class="data-table">
+                    <thead><tr><th>Column</th><th>Column</th><th>Correlation</th></tr></thead>
+                    <tbody>${rows}</tbody>
+                </table>
+            </div>
+        `;
+    }
+    
     /**
      * Show result info panel
      */
@@ -425,6 +529,11 @@ document.addEventListener('DOMContentLoaded', function() {
         if (data.inertia !== undefined) {
             infoItems.push({ label: 'Inertia', value: data.inertia });
         }
+        if (data.explained_variance !== undefined) {
+            const explained = data.explained_variance.reduce((total, ratio) => total + ratio, 0);
+            infoItems.push({ label: 'Components', value: data.n_components });
+            infoItems.push({ label: 'Explained Variance', value: `${(explained * 100).toFixed(1)}%` });
+        }
         if (data.mean !== undefined) {
             infoItems.push({ label: 'Mean', value: data.mean });
         }
@@ -434,6 +543,29 @@ document.addEventListener('DOMContentLoaded', function() {
         if (data.std !== undefined) {
             infoItems.push({ label: 'Std Dev', value: data.std });
         }
+        if (data.distinct !== undefined) {
+            const distinct = data.distinct.toLocaleString();
+            infoItems.push({ label: 'Distinct Values', value: data.distinct_exact ? distinct : `≈ ${distinct}` });
+        }
+        if (data.missing !== undefined) {
+            infoItems.push({ label: 'Missing', value: data.missing.toLocaleString() });
+        }
+        if (data.flagged_rows !== undefined) {
+            infoItems.push({ label: 'Outlier Rows', value: `${data.flagged_rows.toLocaleString()} of ${data.rows.toLocaleString()}` });
+        }
+        if (data.plotted_points !== undefined) {
+            infoItems.push({ label: 'Range', value: `${data.start} – ${data.end}` });
+            infoItems.push({ label: 'Points', value: `${Object.values(data.plotted_points).reduce((a, b) => Math.max(a, b), 0).toLocaleString()} drawn of ${data.points.toLocaleString()}` });
+        }
+        if (data.flagged_rows !== undefined) {
+            // Flagged rows stream from the export endpoint, labeled by the cached outlier model
+            const exportParams = new URLSearchParams({
+                outliers_only: 'true',
+                method: data.method,
+                outlier_columns: data.columns.join(','),
+            });
+            infoItems.push({ label: 'Export', value: `<a href="/api/export/${fileId}/?${exportParams}">Download CSV</a>` });
+        }
         
         if (infoItems.length > 0) {
             let html = '';
@@ -118,6 +118,15 @@ const Utils = {
         };
     },
 
+    /**
+     * Escape text for insertion into HTML
+     */
+    escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = String(text);
+        return div.innerHTML.replace(/"/g, '&quot;').replace(/'/g, '&#39;');
+    },
+
     /**
      * Download base64 image
      */
@@ -128,6 +137,42 @@ const Utils = {
         document.body.appendChild(link);
         link.click();
         document.body.removeChild(link);
+    },
+
+    /**
+     * POST a batch request and call onPart for each NDJSON line as it arrives
+     */
+    async fetchBatch(url, operations, onPart, parallel = true) {
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': this.getCSRFToken(),
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ operations, parallel }),
+        });
+
+        if (!response.ok) {
+            const data = await response.json();
+            throw new Error(data.error || 'An error occurred');
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (value) buffer += decoder.decode(value, { stream: !done });
+
+            let newline;
+            while ((newline = buffer.indexOf('\n')) >= 0) {
+                const line = buffer.slice(0, newline).trim();
+                buffer = buffer.slice(newline + 1);
+                if (line) onPart(JSON.parse(line));
+            }
+            if (done) break;
+        }
     }
 };
 
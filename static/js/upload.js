@@ -83,13 +83,15 @@ document.addEventListener('DOMContentLoaded', function() {
     function validateFile(file) {
         hideError();
         
-        // Check file type
-        if (!file.name.toLowerCase().endsWith('.csv')) {
-            showError('Only CSV files are allowed.');
+        // Check file type (plain or compressed CSV, Parquet, Arrow)
+        const name = file.name.toLowerCase();
+        const extensions = ['.csv', '.csv.gz', '.csv.zst', '.parquet', '.arrow', '.feather'];
+        if (!extensions.some(ext => name.endsWith(ext))) {
+            showError('Only CSV (.csv, .csv.gz or .csv.zst), Parquet and Arrow files are allowed.');
             return false;
         }
         
-        // Check file size (10MB limit)
+        // Check file size (10MB limit, compressed size for compressed files)
         const maxSize = 10 * 1024 * 1024;
         if (file.size > maxSize) {
             showError('File size must be under 10MB.');